@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+
+# Advanced Multi-Mission Operations System (AMMOS) Instrument Toolkit (AIT)
+# Bespoke Link to Instruments and Small Satellites (BLISS)
+#
+# Copyright 2017, by the California Institute of Technology. ALL RIGHTS
+# RESERVED. United States Government Sponsorship acknowledged. Any
+# commercial use must be negotiated with the Office of Technology Transfer
+# at the California Institute of Technology.
+#
+# This software may be subject to U.S. export control laws. By accepting
+# this software, the user agrees to comply with all applicable U.S. export
+# laws and regulations. User has the responsibility to obtain export licenses,
+# or other export authority as may be required before exporting such
+# information to foreign countries or providing access to foreign persons.
+
+'''
+usage: ait_frame_generator.py [-h] [--frame-type {TMTransFrame,AOSTransFrame}]
+                              [--frame-size FRAME_SIZE]
+                              [--packet-size PACKET_SIZE] [--apids APIDS]
+                              [--spacecraft-id SPACECRAFT_ID]
+                              [--virtual-channel-id VIRTUAL_CHANNEL_ID]
+                              [--fecf] [--frame-rate FRAME_RATE]
+                              [--count COUNT] [--duration DURATION]
+                              [--host HOST] [--port PORT] [--output OUTPUT]
+
+Generates a synthetic downlink of TM or AOS M_PDU frames carrying CCSDS
+packets, and sends it over UDP to a frame port, such as that of the
+deframing processor or the AIT plugins, or writes it to a file. AOS frames
+are laid out per the dsn.sle.aos config.
+
+Examples:
+
+  $ ait_frame_generator.py --frame-type AOSTransFrame --virtual-channel-id 2 --frame-rate 5000
+  $ ait_frame_generator.py --count 100000 --output frames.bin
+'''
+import argparse
+import socket
+import sys
+import time
+
+import ait
+from ait.dsn.sle.frame_encoder import AOSFrameEncoder, SyntheticDownlink, TMFrameEncoder
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Generates a synthetic downlink of transfer frames.',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument('--frame-type', choices=['TMTransFrame', 'AOSTransFrame'],
+                        default=ait.config.get('dsn.sle.downlink_frame_type', 'TMTransFrame'),
+                        help='Type of frames to generate')
+    parser.add_argument('--frame-size', type=int, default=1115,
+                        help='Length of each frame in bytes')
+    parser.add_argument('--packet-size', type=int, default=256,
+                        help='Length of each CCSDS packet in bytes')
+    parser.add_argument('--apids', default='1',
+                        help='Comma separated APIDs to generate packets for')
+    parser.add_argument('--spacecraft-id', type=int, default=0,
+                        help='Spacecraft ID of the frames')
+    parser.add_argument('--virtual-channel-id', type=int, default=0,
+                        help='Virtual channel ID of the frames')
+    parser.add_argument('--fecf', action='store_true',
+                        help='End TM frames with a frame error control field')
+    parser.add_argument('--frame-rate', type=float, default=1000,
+                        help='Frames per second to send, 0 for as fast as possible')
+    parser.add_argument('--count', type=int, default=None,
+                        help='Number of frames to generate')
+    parser.add_argument('--duration', type=float, default=None,
+                        help='Seconds to send for')
+    parser.add_argument('--host', default='localhost', help='Host to send frames to')
+    parser.add_argument('--port', type=int,
+                        default=ait.config.get('dsn.sle.frame_output_port', ait.DEFAULT_FRAME_PORT),
+                        help='UDP port to send frames to')
+    parser.add_argument('--output', default=None,
+                        help='Write --count frames to this file instead of sending them')
+    args = parser.parse_args()
+
+    if args.frame_type == 'TMTransFrame':
+        encoder = TMFrameEncoder(args.frame_size, args.spacecraft_id, args.virtual_channel_id,
+                                 fecf_included=args.fecf)
+    else:
+        encoder = AOSFrameEncoder(args.frame_size, args.spacecraft_id, args.virtual_channel_id)
+    apids = [int(apid) for apid in args.apids.split(',')]
+    downlink = SyntheticDownlink(encoder, args.packet_size, apids)
+
+    start = time.perf_counter()
+    if args.output:
+        if args.count is None:
+            parser.error('--output requires --count')
+        buf = bytearray(args.frame_size * args.count)
+        downlink.generate(buf, args.count)
+        with open(args.output, 'wb') as f:
+            f.write(buf)
+        sent = args.count
+    else:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            sent = downlink.send(sock, (args.host, args.port), args.frame_rate,
+                                 args.count, args.duration)
+        except KeyboardInterrupt:
+            sent = encoder.metrics()['frames']
+    elapsed = time.perf_counter() - start
+
+    print('{} {} frames in {:.2f} s ({:.0f} frames/s)'.format(
+        sent, args.frame_type, elapsed, sent / elapsed if elapsed else 0))
+    sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    main()
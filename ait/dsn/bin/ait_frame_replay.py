@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+
+# Advanced Multi-Mission Operations System (AMMOS) Instrument Toolkit (AIT)
+# Bespoke Link to Instruments and Small Satellites (BLISS)
+#
+# Copyright 2017, by the California Institute of Technology. ALL RIGHTS
+# RESERVED. United States Government Sponsorship acknowledged. Any
+# commercial use must be negotiated with the Office of Technology Transfer
+# at the California Institute of Technology.
+#
+# This software may be subject to U.S. export control laws. By accepting
+# this software, the user agrees to comply with all applicable U.S. export
+# laws and regulations. User has the responsibility to obtain export licenses,
+# or other export authority as may be required before exporting such
+# information to foreign countries or providing access to foreign persons.
+
+'''
+usage: ait_frame_replay.py [-h] [--frame-type {TMTransFrame,AOSTransFrame}]
+                           [--frame-size FRAME_SIZE]
+                           [--record-format {archive,fixed,u16,u32}]
+                           [--speed SPEED] [--frame-rate FRAME_RATE]
+                           [--count COUNT] [--processor] [--host HOST]
+                           [--port PORT]
+                           file
+
+Replays a recorded file of transfer frames, either over UDP to a frame
+port, such as that of the deframing processor or the AIT plugins, or
+in-process through the deframing processor, and reports the replay
+throughput and the time spent in each stage.
+
+Examples:
+
+  $ ait_frame_replay.py frames.bin
+  $ ait_frame_replay.py --speed 1 --frame-rate 5000 frames.bin
+  $ ait_frame_replay.py --processor --record-format u32 pass.dat
+  $ ait_frame_replay.py --speed 10 --record-format archive frames-20240101T000000.000000.frames
+'''
+import argparse
+import sys
+
+import ait
+from ait.dsn.sle.replay import RECORD_FORMATS, FrameReplay
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Replays a recorded file of transfer frames.',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument('file', help='File of frames to replay')
+    parser.add_argument('--frame-type', choices=['TMTransFrame', 'AOSTransFrame'],
+                        default=ait.config.get('dsn.sle.downlink_frame_type', 'TMTransFrame'),
+                        help='Type of the frames, for --processor')
+    parser.add_argument('--frame-size', type=int, default=1115,
+                        help='Length of each frame in bytes, for fixed-length files')
+    parser.add_argument('--record-format', choices=sorted(RECORD_FORMATS), default='fixed',
+                        help='Fixed-length frames, frames preceded by a 2 or 4 byte length, '
+                             'or a frame archive segment')
+    parser.add_argument('--speed', type=float, default=0,
+                        help='0 to replay as fast as possible, 1 for the rate the frames '
+                             'were received at, or N for N times that rate')
+    parser.add_argument('--frame-rate', type=float, default=None,
+                        help='Frames per second the frames were received at, '
+                             'not needed for archive segments')
+    parser.add_argument('--count', type=int, default=None,
+                        help='Number of frames to replay')
+    parser.add_argument('--processor', action='store_true',
+                        help='Replay through an in-process deframing processor instead of UDP')
+    parser.add_argument('--host', default='localhost', help='Host to send frames to')
+    parser.add_argument('--port', type=int,
+                        default=ait.config.get('dsn.sle.frame_output_port', ait.DEFAULT_FRAME_PORT),
+                        help='UDP port to send frames to')
+    args = parser.parse_args()
+
+    if args.speed and not args.frame_rate and args.record_format != 'archive':
+        parser.error('--speed requires --frame-rate')
+
+    with FrameReplay(args.file, args.frame_size, args.record_format) as replay:
+        if args.processor:
+            # Only imported when needed since it patches the standard
+            # library for gevent
+            from ait.dsn.proc.deframe_packet_processor import Processor
+            processor = Processor(downlink_frame_type=args.frame_type)
+            stats = replay.to_processor(processor, args.frame_type, speed=args.speed,
+                                        frame_rate=args.frame_rate, limit=args.count)
+        else:
+            stats = replay.to_udp((args.host, args.port), speed=args.speed,
+                                  frame_rate=args.frame_rate, limit=args.count)
+
+    print(FrameReplay.report(stats))
+    if stats['truncated']:
+        print('{} ends in a truncated frame'.format(args.file))
+    sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+
+# Advanced Multi-Mission Operations System (AMMOS) Instrument Toolkit (AIT)
+# Bespoke Link to Instruments and Small Satellites (BLISS)
+#
+# Copyright 2017, by the California Institute of Technology. ALL RIGHTS
+# RESERVED. United States Government Sponsorship acknowledged. Any
+# commercial use must be negotiated with the Office of Technology Transfer
+# at the California Institute of Technology.
+#
+# This software may be subject to U.S. export control laws. By accepting
+# this software, the user agrees to comply with all applicable U.S. export
+# laws and regulations. User has the responsibility to obtain export licenses,
+# or other export authority as may be required before exporting such
+# information to foreign countries or providing access to foreign persons.
+
+'''
+usage: ait_sle_provider_sim.py [-h] [--service {raf,rcf,cltu}] [--host HOST]
+                               [--port PORT] [--frame-rate FRAME_RATE]
+                               [--frames-per-buffer FRAMES_PER_BUFFER]
+                               [--frame-size FRAME_SIZE]
+                               [--packet-size PACKET_SIZE]
+                               [--cltu-buffer-size CLTU_BUFFER_SIZE]
+                               [--cltu-return-delay CLTU_RETURN_DELAY]
+                               [--uplink-bit-rate UPLINK_BIT_RATE]
+
+Runs a local SLE service provider for testing and benchmarking the RAF, RCF
+and CLTU interfaces. The address the simulator listens on is printed once it
+is ready to accept connections.
+
+Examples:
+
+  $ ait_sle_provider_sim.py --service raf --port 5100 --frame-rate 5000
+  $ ait_sle_provider_sim.py --service raf --port 5100 --packet-size 256
+  $ ait_sle_provider_sim.py --service cltu --port 5101 --uplink-bit-rate 64000
+'''
+import argparse
+import sys
+
+from ait.dsn.sle.frame_encoder import SyntheticDownlink, TMFrameEncoder
+from ait.dsn.sle.simulator import ProviderSimulator, tm_frame_source
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Runs a local SLE service provider.',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument('--service', choices=['raf', 'rcf', 'cltu'], default='raf',
+                        help='SLE service to provide')
+    parser.add_argument('--host', default='127.0.0.1', help='Address to listen on')
+    parser.add_argument('--port', type=int, default=0,
+                        help='Port to listen on, 0 for any free port')
+    parser.add_argument('--frame-rate', type=float, default=1000,
+                        help='Frames per second to stream, 0 for as fast as possible')
+    parser.add_argument('--frames-per-buffer', type=int, default=1,
+                        help='Annotated frames per transfer buffer')
+    parser.add_argument('--frame-size', type=int, default=1115,
+                        help='Length of each frame in bytes')
+    parser.add_argument('--packet-size', type=int, default=0,
+                        help='Length of the CCSDS packets carried by each TM frame, '
+                             '0 for zero filled frames')
+    parser.add_argument('--cltu-buffer-size', type=int, default=100000,
+                        help='Bytes of CLTU data held awaiting radiation')
+    parser.add_argument('--cltu-return-delay', type=float, default=0.005,
+                        help='Seconds before a CLTU transfer data return is sent')
+    parser.add_argument('--uplink-bit-rate', type=float, default=2000,
+                        help='Bits per second at which CLTUs are radiated')
+    args = parser.parse_args()
+
+    if args.packet_size:
+        frame_source = SyntheticDownlink(TMFrameEncoder(args.frame_size), args.packet_size).frame_source()
+    else:
+        frame_source = tm_frame_source(args.frame_size)
+
+    sim = ProviderSimulator(
+        (args.host, args.port),
+        service=args.service,
+        frame_rate=args.frame_rate,
+        frames_per_buffer=args.frames_per_buffer,
+        frame_size=args.frame_size,
+        frame_source=frame_source,
+        cltu_buffer_size=args.cltu_buffer_size,
+        cltu_return_delay=args.cltu_return_delay,
+        uplink_bit_rate=args.uplink_bit_rate
+    )
+    sim.start()
+
+    print('{} simulator listening on {}:{}'.format(args.service.upper(), args.host, sim.server_port))
+    sys.stdout.flush()
+    sim.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
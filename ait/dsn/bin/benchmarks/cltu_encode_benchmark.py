@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+
+# Advanced Multi-Mission Operations System (AMMOS) Instrument Toolkit (AIT)
+# Bespoke Link to Instruments and Small Satellites (BLISS)
+#
+# Copyright 2017, by the California Institute of Technology. ALL RIGHTS
+# RESERVED. United States Government Sponsorship acknowledged. Any
+# commercial use must be negotiated with the Office of Technology Transfer
+# at the California Institute of Technology.
+#
+# This software may be subject to U.S. export control laws. By accepting
+# this software, the user agrees to comply with all applicable U.S. export
+# laws and regulations. User has the responsibility to obtain export licenses,
+# or other export authority as may be required before exporting such
+# information to foreign countries or providing access to foreign persons.
+
+# Usage:
+#   python cltu_encode_benchmark.py [--seconds 3] [--cltu-size 256]
+#
+# Encodes CLTU-TRANSFER-DATA invocations by building the pyasn1 PDU as
+# CLTU._prepare_cltu_pdu does and with ait.dsn.sle.cltu.CltuTransferDataEncoder,
+# checks that both produce the same bytes and reports the CLTUs/s of each.
+# See sle_provider_benchmark.py --service cltu for the end to end uplink rate.
+import argparse
+import time
+
+import ait.dsn.sle
+from ait.dsn.sle.cltu import CltuTransferDataEncoder
+
+
+def run(name, seconds, encode_one):
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        for _ in range(100):
+            encode_one(count)
+            count += 1
+    elapsed = time.perf_counter() - start
+
+    print('{:8s} {:10.0f} CLTUs/s {:8.2f} us/CLTU'.format(name, count / elapsed, elapsed / count * 1e6))
+    return count / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seconds', type=float, default=3)
+    parser.add_argument('--cltu-size', type=int, default=256)
+    args = parser.parse_args()
+
+    cltu = ait.dsn.sle.CLTU(hostnames=['localhost'], port=5100)
+    encoder = CltuTransferDataEncoder()
+    data = bytes(args.cltu_size)
+
+    def with_pyasn1(i):
+        cltu._cltu_id = i & 0xFFFFFFFF
+        cltu._invoke_id = i & 0xFFFF
+        return cltu.encode_pdu(cltu._prepare_cltu_pdu(data))
+
+    def with_encoder(i):
+        return encoder.encode(i & 0xFFFF, i & 0xFFFFFFFF, data)
+
+    for i in (0, 127, 128, 65535, 65536):
+        assert with_pyasn1(i) == with_encoder(i)
+
+    baseline = run('pyasn1', args.seconds, with_pyasn1)
+    template = run('encoder', args.seconds, with_encoder)
+    print('Speedup: {:.1f}x'.format(template / baseline))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+
+# Advanced Multi-Mission Operations System (AMMOS) Instrument Toolkit (AIT)
+# Bespoke Link to Instruments and Small Satellites (BLISS)
+#
+# Copyright 2017, by the California Institute of Technology. ALL RIGHTS
+# RESERVED. United States Government Sponsorship acknowledged. Any
+# commercial use must be negotiated with the Office of Technology Transfer
+# at the California Institute of Technology.
+#
+# This software may be subject to U.S. export control laws. By accepting
+# this software, the user agrees to comply with all applicable U.S. export
+# laws and regulations. User has the responsibility to obtain export licenses,
+# or other export authority as may be required before exporting such
+# information to foreign countries or providing access to foreign persons.
+
+# Usage:
+#   python continuity_benchmark.py [--frames 2000000] [--channels 8] [--loss 0.001]
+#
+# Builds the headers of --frames AOS frames spread over --channels virtual
+# channels, dropping, repeating and swapping a --loss fraction of them, and
+# tracks their frame count continuity one frame at a time with
+# ait.dsn.sle.continuity.ContinuityTracker and at once with
+# batch_continuity. Checks that both agree and reports frames/s for each.
+# Requires NumPy.
+import argparse
+import time
+
+import numpy
+
+from ait.dsn.sle.continuity import ContinuityTracker, batch_continuity
+
+
+def make_headers(count, channels, loss):
+    rng = numpy.random.default_rng(0)
+    vcid = rng.integers(0, channels, size=count)
+    steps = 1 + rng.integers(1, 50, size=count) * (rng.random(count) < loss)
+    counts = numpy.zeros(count, dtype=numpy.int64)
+    for channel in range(channels):
+        mask = vcid == channel
+        counts[mask] = numpy.cumsum(steps[mask]) % (1 << 24)
+
+    headers = numpy.zeros((count, 6), dtype=numpy.uint8)
+    headers[:, 0] = 0x40 | 0x42 >> 2
+    headers[:, 1] = (0x42 & 0x03) << 6 | vcid
+    headers[:, 2] = counts >> 16
+    headers[:, 3] = counts >> 8
+    headers[:, 4] = counts
+
+    repeats = numpy.flatnonzero(rng.random(count) < loss)
+    headers[repeats] = headers[repeats - 1]
+    swaps = numpy.flatnonzero(rng.random(count - 2) < loss)
+    headers[swaps], headers[swaps + 2] = headers[swaps + 2].copy(), headers[swaps].copy()
+    return headers
+
+
+def report(name, count, elapsed):
+    print('{:10s} {:12.0f} frames/s {:8.3f} s'.format(name, count / elapsed, elapsed))
+    return count / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--frames', type=int, default=2000000)
+    parser.add_argument('--channels', type=int, default=8)
+    parser.add_argument('--loss', type=float, default=0.001)
+    args = parser.parse_args()
+
+    headers = make_headers(args.frames, args.channels, args.loss)
+    rows = [bytes(row) for row in headers]
+
+    start = time.perf_counter()
+    tracker = ContinuityTracker('AOSTransFrame')
+    update_frame = tracker.update_frame
+    for row in rows:
+        update_frame(row)
+    streaming = report('streaming', args.frames, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    batch = batch_continuity(headers)
+    fast = report('batch', args.frames, time.perf_counter() - start)
+
+    assert batch == tracker.metrics()
+    missing = sum(m['missing'] for m in batch.values())
+    reorders = sum(m['reorders'] for m in batch.values())
+    print('{} channels, {} frames missing, {} reordered'.format(len(batch), missing, reorders))
+    print('Speedup: {:.0f}x'.format(fast / streaming))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+
+# Advanced Multi-Mission Operations System (AMMOS) Instrument Toolkit (AIT)
+# Bespoke Link to Instruments and Small Satellites (BLISS)
+#
+# Copyright 2017, by the California Institute of Technology. ALL RIGHTS
+# RESERVED. United States Government Sponsorship acknowledged. Any
+# commercial use must be negotiated with the Office of Technology Transfer
+# at the California Institute of Technology.
+#
+# This software may be subject to U.S. export control laws. By accepting
+# this software, the user agrees to comply with all applicable U.S. export
+# laws and regulations. User has the responsibility to obtain export licenses,
+# or other export authority as may be required before exporting such
+# information to foreign countries or providing access to foreign persons.
+
+# Usage:
+#   python credentials_benchmark.py [--seconds 2] [--username LSE]
+#                                   [--password secret]
+#
+# Generates ISP1 credentials by building and encoding the HashInput and
+# ISP1Credentials pyasn1 objects, as SLE.make_credentials did, and with
+# ait.dsn.sle.common.CredentialsEncoder. It checks that both produce the same
+# bytes and reports credentials/s for each, along with the rate of
+# repeated verification of a provider's credentials.
+import argparse
+import datetime as dt
+import hashlib
+import random
+import time
+
+from pyasn1.codec.ber.encoder import encode
+from pyasn1.codec.der.encoder import encode as der_encode
+
+import ait.dsn.sle.common as common
+from ait.dsn.sle.pdu.common import HashInput, ISP1Credentials
+
+
+def pyasn1_credentials(encoded_time, random_number, username, password):
+    hash_input = HashInput()
+    hash_input['time'] = encoded_time
+    hash_input['randomNumber'] = random_number
+    hash_input['username'] = username
+    hash_input['password'] = password
+    the_protected = bytearray.fromhex(hashlib.sha1(der_encode(hash_input)).hexdigest())
+
+    creds = ISP1Credentials()
+    creds['time'] = encoded_time
+    creds['randomNumber'] = random_number
+    creds['theProtected'] = the_protected
+    return encode(creds)
+
+
+def run(name, seconds, func):
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        for _ in range(100):
+            func()
+        count += 100
+    elapsed = time.perf_counter() - start
+
+    print('{:20s} {:10.0f} /s {:8.2f} us each'.format(name, count / elapsed, elapsed / count * 1e6))
+    return count / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seconds', type=float, default=2)
+    parser.add_argument('--username', default='LSE')
+    parser.add_argument('--password', default='secret')
+    args = parser.parse_args()
+
+    encoder = common.CredentialsEncoder(args.username, args.password)
+
+    def inputs():
+        return (common.generate_encoded_time(dt.datetime.utcnow()),
+                random.randint(0, 2147483647))
+
+    for _ in range(100):
+        t, r = inputs()
+        assert encoder.encode(t, r) == pyasn1_credentials(t, r, args.username, args.password)
+
+    baseline = run('pyasn1', args.seconds,
+                   lambda: pyasn1_credentials(*inputs(), args.username, args.password))
+    fast = run('encoder', args.seconds, lambda: encoder.encode(*inputs()))
+    print('Speedup: {:.1f}x'.format(fast / baseline))
+
+    creds = encoder.encode(*inputs())
+    run('verify (uncached)', args.seconds, lambda: encoder._verify(creds))
+    run('verify (cached)', args.seconds, lambda: encoder.verify(creds))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+
+# Advanced Multi-Mission Operations System (AMMOS) Instrument Toolkit (AIT)
+# Bespoke Link to Instruments and Small Satellites (BLISS)
+#
+# Copyright 2017, by the California Institute of Technology. ALL RIGHTS
+# RESERVED. United States Government Sponsorship acknowledged. Any
+# commercial use must be negotiated with the Office of Technology Transfer
+# at the California Institute of Technology.
+#
+# This software may be subject to U.S. export control laws. By accepting
+# this software, the user agrees to comply with all applicable U.S. export
+# laws and regulations. User has the responsibility to obtain export licenses,
+# or other export authority as may be required before exporting such
+# information to foreign countries or providing access to foreign persons.
+
+# Usage:
+#   python fecf_benchmark.py [--frames 100000] [--frame-size 1115]
+#                            [--python 2000] [--bad-every 10]
+#
+# Verifies the FECF of --frames synthetic AOS frames, every --bad-every of
+# which is corrupted, with ait.dsn.sle.frames.FecfCheck one frame at a time
+# and a buffer of frames at a time, and the first --python of them with a
+# table-driven CRC-16-CCITT written in Python for comparison. Reports the
+# verification cost per frame for each, alongside the cost of decoding the
+# frame with an AOSFrameView. The batch path requires NumPy.
+import argparse
+import time
+
+import ait.dsn.sle.frames as frames
+
+
+def make_table():
+    table = []
+    for i in range(256):
+        crc = i << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021 if crc & 0x8000 else crc << 1) & 0xFFFF
+        table.append(crc)
+    return table
+
+
+TABLE = make_table()
+
+
+def python_fecf_is_valid(data):
+    crc = 0xFFFF
+    for byte in data[:-2]:
+        crc = ((crc << 8) & 0xFFFF) ^ TABLE[(crc >> 8) ^ byte]
+    return crc == (data[-2] << 8 | data[-1])
+
+
+def make_frames(frame_size, count, bad_every):
+    result = []
+    for i in range(count):
+        data = bytes([0x40, 0x41 + i % 2, (i >> 16) & 0xFF, (i >> 8) & 0xFF, i & 0xFF, 0])
+        data += bytes([i & 0xFF]) * (frame_size - 8)
+        fecf = frames.compute_fecf(data)
+        if bad_every and i % bad_every == bad_every - 1:
+            fecf ^= 0x0100
+        result.append(data + fecf.to_bytes(2, 'big'))
+    return result
+
+
+def report(name, count, elapsed):
+    print('{:8s} {:10.0f} frames/s {:8.3f} us/frame'.format(name, count / elapsed, elapsed / count * 1e6))
+    return elapsed / count
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--frames', type=int, default=100000)
+    parser.add_argument('--frame-size', type=int, default=1115)
+    parser.add_argument('--python', type=int, default=2000)
+    parser.add_argument('--bad-every', type=int, default=10)
+    args = parser.parse_args()
+
+    data = make_frames(args.frame_size, args.frames, args.bad_every)
+    config = frames.AOSConfig(virtual_channels={1: 'm_pdu', 2: 'vca_sdu'},
+                              frame_error_control_field_included=True,
+                              frame_error_control_field_check=True)
+
+    start = time.perf_counter()
+    for d in data:
+        frames.AOSFrameView(d, config=config).virtual_channel
+    decode = report('decode', len(data), time.perf_counter() - start)
+
+    count = min(args.python, args.frames)
+    start = time.perf_counter()
+    expected = [python_fecf_is_valid(d) for d in data[:count]]
+    python = report('python', count, time.perf_counter() - start)
+
+    check = frames.FecfCheck('AOSTransFrame', config)
+    start = time.perf_counter()
+    single = [check.check(d) for d in data]
+    crc = report('single', len(data), time.perf_counter() - start)
+    assert single[:count] == expected
+
+    if frames.numpy is not None:
+        buf = b''.join(data)
+        batch_check = frames.FecfCheck('AOSTransFrame', config)
+        start = time.perf_counter()
+        valid = batch_check.check_batch(buf, args.frame_size)
+        report('batch', len(data), time.perf_counter() - start)
+        assert valid.tolist() == single
+
+    print(check.metrics()['failed'], 'bad frames dropped')
+    print('Speedup: {:.0f}x over python, verification adds {:.0f}% to a view decode'.format(
+        python / crc, crc / decode * 100))
+
+
+if __name__ == '__main__':
+    main()
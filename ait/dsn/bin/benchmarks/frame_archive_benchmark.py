@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+
+# Advanced Multi-Mission Operations System (AMMOS) Instrument Toolkit (AIT)
+# Bespoke Link to Instruments and Small Satellites (BLISS)
+#
+# Copyright 2017, by the California Institute of Technology. ALL RIGHTS
+# RESERVED. United States Government Sponsorship acknowledged. Any
+# commercial use must be negotiated with the Office of Technology Transfer
+# at the California Institute of Technology.
+#
+# This software may be subject to U.S. export control laws. By accepting
+# this software, the user agrees to comply with all applicable U.S. export
+# laws and regulations. User has the responsibility to obtain export licenses,
+# or other export authority as may be required before exporting such
+# information to foreign countries or providing access to foreign persons.
+
+# Usage:
+#   python frame_archive_benchmark.py [--frames 200000] [--frame-size 1115]
+#                                     [--batch-size 1048576] [--fsync-interval 5]
+#
+# Archives --frames synthetic TM frames to a temporary directory, writing
+# each record and index entry as it arrives, and with
+# ait.dsn.sle.archive.FrameArchive's batched writes. Reports frames/s and
+# the Mbps of downlink each could keep up with, and the longest time a
+# single add took, which is what the SLE read loop would stall for.
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from ait.dsn.sle.archive import INDEX_ENTRY, RECORD_HEADER, FrameArchive, tm_frame_ids
+from ait.dsn.sle.frame_encoder import SyntheticDownlink, TMFrameEncoder
+
+
+def report(name, count, frame_size, elapsed, worst):
+    rate = count / elapsed
+    print('{:8s} {:10.0f} frames/s {:8.0f} Mbps  worst add {:8.3f} ms'.format(
+        name, rate, rate * frame_size * 8 / 1e6, worst * 1e3))
+    return rate
+
+
+def unbatched(directory, data, ert):
+    with open(os.path.join(directory, 'unbatched.frames'), 'wb') as segment, \
+            open(os.path.join(directory, 'unbatched.idx'), 'wb') as index:
+        offset = 0
+        worst = 0
+        for frame in data:
+            start = time.perf_counter()
+            vcid, count = tm_frame_ids(frame)
+            ert_us = int(ert * 1e6)
+            index.write(INDEX_ENTRY.pack(offset, ert_us, vcid))
+            index.flush()
+            segment.write(RECORD_HEADER.pack(ert_us, vcid, count, len(frame)) + frame)
+            segment.flush()
+            offset += RECORD_HEADER.size + len(frame)
+            worst = max(worst, time.perf_counter() - start)
+    return worst
+
+
+def batched(directory, data, ert, batch_size, fsync_interval):
+    archive = FrameArchive(directory, 'TMTransFrame', batch_size=batch_size,
+                           fsync_interval=fsync_interval)
+    worst = 0
+    for frame in data:
+        start = time.perf_counter()
+        archive.add(frame, ert)
+        worst = max(worst, time.perf_counter() - start)
+    archive.close()
+    return worst
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--frames', type=int, default=200000)
+    parser.add_argument('--frame-size', type=int, default=1115)
+    parser.add_argument('--batch-size', type=int, default=1024 * 1024)
+    parser.add_argument('--fsync-interval', type=float, default=5.0)
+    args = parser.parse_args()
+
+    size = args.frame_size
+    buf = bytearray(size * 256)
+    SyntheticDownlink(TMFrameEncoder(size), packet_len=256).generate(buf, 256)
+    distinct = [bytes(buf[i * size:(i + 1) * size]) for i in range(256)]
+    data = [distinct[i % 256] for i in range(args.frames)]
+    ert = time.time()
+
+    directory = tempfile.mkdtemp()
+    try:
+        start = time.perf_counter()
+        worst = unbatched(directory, data, ert)
+        baseline = report('unbatched', args.frames, size, time.perf_counter() - start, worst)
+
+        start = time.perf_counter()
+        worst = batched(directory, data, ert, args.batch_size, args.fsync_interval)
+        fast = report('batched', args.frames, size, time.perf_counter() - start, worst)
+
+        print('Speedup: {:.1f}x'.format(fast / baseline))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+
+# Advanced Multi-Mission Operations System (AMMOS) Instrument Toolkit (AIT)
+# Bespoke Link to Instruments and Small Satellites (BLISS)
+#
+# Copyright 2017, by the California Institute of Technology. ALL RIGHTS
+# RESERVED. United States Government Sponsorship acknowledged. Any
+# commercial use must be negotiated with the Office of Technology Transfer
+# at the California Institute of Technology.
+#
+# This software may be subject to U.S. export control laws. By accepting
+# this software, the user agrees to comply with all applicable U.S. export
+# laws and regulations. User has the responsibility to obtain export licenses,
+# or other export authority as may be required before exporting such
+# information to foreign countries or providing access to foreign persons.
+
+# Usage:
+#   python frame_encoder_benchmark.py [--frames 100000] [--frame-size 1115]
+#                                     [--packet-size 256] [--frame-type AOSTransFrame]
+#                                     [--fecf]
+#
+# Generates --frames frames of synthetic packets the way
+# ait/dsn/proc/test/frame_generator_test.py builds them, concatenating
+# header and packet bytes into a new bytearray for each frame, and with
+# ait.dsn.sle.frame_encoder.SyntheticDownlink writing them into one
+# preallocated buffer. Reports frames/s and MB/s for each.
+import argparse
+import binascii
+import time
+
+import ait.dsn.sle.frames as frames
+from ait.dsn.sle.frame_encoder import AOSFrameEncoder, SyntheticDownlink, TMFrameEncoder
+
+
+def concatenated(frame_type, frame_size, packet_size, count, fecf):
+    header_len = 8 if frame_type == 'AOSTransFrame' else 6
+    zone_len = frame_size - header_len - (2 if fecf else 0)
+    body = bytes(packet_size - 6)
+
+    result = []
+    pending = bytearray()
+    seq = 0
+    for i in range(count):
+        while len(pending) < zone_len:
+            pending += bytearray((0x0801).to_bytes(2, 'big'))
+            pending += bytearray((0xC000 | seq).to_bytes(2, 'big'))
+            pending += bytearray((packet_size - 7).to_bytes(2, 'big'))
+            pending += bytearray(body)
+            seq = (seq + 1) & 0x3FFF
+
+        if frame_type == 'AOSTransFrame':
+            frame = bytearray((0x4042).to_bytes(2, 'big')) + bytearray(i.to_bytes(3, 'big')) + bytearray(3)
+        else:
+            frame = bytearray((0x0002).to_bytes(2, 'big')) + bytearray([i & 0xFF] * 2) + bytearray(2)
+        frame += pending[:zone_len]
+        pending = pending[zone_len:]
+        if fecf:
+            frame += bytearray(binascii.crc_hqx(frame, 0xFFFF).to_bytes(2, 'big'))
+        result.append(bytes(frame))
+    return result
+
+
+def report(name, count, frame_size, elapsed):
+    print('{:12s} {:10.0f} frames/s {:8.1f} MB/s'.format(name, count / elapsed,
+                                                      count * frame_size / elapsed / 1e6))
+    return count / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--frames', type=int, default=100000)
+    parser.add_argument('--frame-size', type=int, default=1115)
+    parser.add_argument('--packet-size', type=int, default=256)
+    parser.add_argument('--frame-type', default='AOSTransFrame',
+                        choices=['AOSTransFrame', 'TMTransFrame'])
+    parser.add_argument('--fecf', action='store_true')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    concatenated(args.frame_type, args.frame_size, args.packet_size, args.frames, args.fecf)
+    baseline = report('concatenated', args.frames, args.frame_size, time.perf_counter() - start)
+
+    if args.frame_type == 'AOSTransFrame':
+        config = frames.AOSConfig(virtual_channels={2: 'm_pdu'},
+                                  frame_error_control_field_included=args.fecf)
+        encoder = AOSFrameEncoder(args.frame_size, 1, 2, config)
+    else:
+        encoder = TMFrameEncoder(args.frame_size, fecf_included=args.fecf)
+    downlink = SyntheticDownlink(encoder, args.packet_size)
+    buf = bytearray(args.frames * args.frame_size)
+
+    start = time.perf_counter()
+    downlink.generate(buf, args.frames)
+    fast = report('encoder', args.frames, args.frame_size, time.perf_counter() - start)
+    print('Speedup: {:.1f}x'.format(fast / baseline))
+
+
+if __name__ == '__main__':
+    main()
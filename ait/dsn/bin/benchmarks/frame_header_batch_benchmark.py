@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+
+# Advanced Multi-Mission Operations System (AMMOS) Instrument Toolkit (AIT)
+# Bespoke Link to Instruments and Small Satellites (BLISS)
+#
+# Copyright 2017, by the California Institute of Technology. ALL RIGHTS
+# RESERVED. United States Government Sponsorship acknowledged. Any
+# commercial use must be negotiated with the Office of Technology Transfer
+# at the California Institute of Technology.
+#
+# This software may be subject to U.S. export control laws. By accepting
+# this software, the user agrees to comply with all applicable U.S. export
+# laws and regulations. User has the responsibility to obtain export licenses,
+# or other export authority as may be required before exporting such
+# information to foreign countries or providing access to foreign persons.
+
+# Usage:
+#   python frame_header_batch_benchmark.py [--frames 1000000] [--frame-size 128]
+#                                          [--frame-type AOSTransFrame] [--scalar 100000]
+#
+# Decodes the headers of --frames synthetic fixed-length frames held in one
+# buffer with ait.dsn.sle.frames.decode_frame_headers, and the first
+# --scalar of them one at a time with the dict-based frame classes and the
+# frame views. Checks that the results agree and reports frames/s for each.
+# Requires NumPy.
+import argparse
+import time
+
+import numpy
+
+import ait.dsn.sle.frames as frames
+
+
+def make_buffer(frame_type, frame_size, count):
+    rng = numpy.random.default_rng(0)
+    buf = rng.integers(0, 256, size=(count, frame_size), dtype=numpy.uint8)
+    if frame_type == 'AOSTransFrame':
+        buf[:, 1] = (buf[:, 1] & 0xC0) | rng.choice([1, 2, 63], size=count)
+    return buf.tobytes()
+
+
+def report(name, count, elapsed):
+    print('{:8s} {:12.0f} frames/s {:8.3f} us/frame'.format(name, count / elapsed, elapsed / count * 1e6))
+    return count / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--frames', type=int, default=1000000)
+    parser.add_argument('--frame-size', type=int, default=128)
+    parser.add_argument('--frame-type', default='AOSTransFrame',
+                        choices=['AOSTransFrame', 'TMTransFrame'])
+    parser.add_argument('--scalar', type=int, default=100000)
+    args = parser.parse_args()
+
+    size = args.frame_size
+    buf = make_buffer(args.frame_type, size, args.frames)
+    config = frames.AOSConfig(virtual_channels={1: 'vca_sdu', 2: 'm_pdu'},
+                              frame_error_control_field_included=True)
+
+    if args.frame_type == 'AOSTransFrame':
+        legacy = lambda d: frames.AOSTransFrame(d, config=config)
+        view = lambda d: frames.AOSFrameView(d, config=config)
+        key = 'virtual_channel_id'
+    else:
+        def legacy(d):
+            frame = frames.TMTransFrame()
+            frame.decode(d)
+            return frame
+        view = frames.TMFrameView
+        key = 'first_hdr_ptr'
+
+    start = time.perf_counter()
+    headers = frames.decode_frame_headers(buf, size, args.frame_type, config)
+    batch = report('batch', args.frames, time.perf_counter() - start)
+
+    scalar = min(args.scalar, args.frames)
+    results = {}
+    for name, decode in (('dict', legacy), ('view', view)):
+        start = time.perf_counter()
+        values = [decode(buf[i * size:(i + 1) * size])[key] for i in range(scalar)]
+        results[name] = report(name, scalar, time.perf_counter() - start)
+        assert values == headers[key][:scalar].tolist()
+
+    print('Speedup: {:.0f}x over dict, {:.0f}x over view'.format(batch / results['dict'],
+                                                                batch / results['view']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+
+# Advanced Multi-Mission Operations System (AMMOS) Instrument Toolkit (AIT)
+# Bespoke Link to Instruments and Small Satellites (BLISS)
+#
+# Copyright 2017, by the California Institute of Technology. ALL RIGHTS
+# RESERVED. United States Government Sponsorship acknowledged. Any
+# commercial use must be negotiated with the Office of Technology Transfer
+# at the California Institute of Technology.
+#
+# This software may be subject to U.S. export control laws. By accepting
+# this software, the user agrees to comply with all applicable U.S. export
+# laws and regulations. User has the responsibility to obtain export licenses,
+# or other export authority as may be required before exporting such
+# information to foreign countries or providing access to foreign persons.
+
+# Usage:
+#   python frame_output_benchmark.py [--seconds 3] [--frame-type AOSTransFrame]
+#                                    [--frame-size 1115] [--batch 10]
+#                                    [--idle-every 4] [--destinations 1]
+#
+# Forwards frames to local UDP sinks the way RAF and RCF did, building a
+# frame object to check each frame for idle and sending it on its own, and
+# with ait.dsn.sle.frame_output.FrameOutput, which checks the header bits
+# and sends the frames of each transfer buffer together. Every --idle-every
+# frame is an idle frame. Reports the frames/s handled by each. Note that
+# TMTransFrame does not decode the data it is constructed with, so the per
+# frame path forwards idle TM frames rather than dropping them.
+import argparse
+import socket
+import time
+
+import ait.dsn.sle.frames as frames
+from ait.dsn.sle.frame_output import FrameOutput
+
+
+def make_frames(frame_type, frame_size, count, idle_every):
+    result = []
+    for i in range(count):
+        idle = idle_every and i % idle_every == idle_every - 1
+        if frame_type == 'AOSTransFrame':
+            header = bytes([0x40, 0x7F if idle else 0x41, 0, 0, i & 0xFF, 0])
+        else:
+            header = bytes([0x12, 0x34, i & 0xFF, 0, 0x07 if idle else 0, 0xFE if idle else 0])
+        result.append(header + bytes(frame_size - len(header)))
+    return result
+
+
+def run(name, seconds, batch, forward):
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        for _ in range(10):
+            forward()
+        count += 10 * len(batch)
+    elapsed = time.perf_counter() - start
+
+    print('{:12s} {:10.0f} frames/s {:8.2f} us/frame'.format(name, count / elapsed, elapsed / count * 1e6))
+    return count / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seconds', type=float, default=3)
+    parser.add_argument('--frame-type', default='AOSTransFrame',
+                        choices=['AOSTransFrame', 'TMTransFrame'])
+    parser.add_argument('--frame-size', type=int, default=1115)
+    parser.add_argument('--batch', type=int, default=10)
+    parser.add_argument('--idle-every', type=int, default=4)
+    parser.add_argument('--destinations', type=int, default=1)
+    args = parser.parse_args()
+
+    sinks = []
+    for _ in range(args.destinations):
+        sink = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sink.bind(('127.0.0.1', 0))
+        sinks.append(sink)
+    addresses = [s.getsockname() for s in sinks]
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    batch = make_frames(args.frame_type, args.frame_size, args.batch, args.idle_every)
+    frame_class = getattr(frames, args.frame_type)
+
+    def per_frame():
+        for data in batch:
+            if frame_class(data).is_idle_frame:
+                continue
+            for address in addresses:
+                sock.sendto(data, address)
+
+    output = FrameOutput(args.frame_type, addresses)
+
+    def batched():
+        for data in batch:
+            output.add(data)
+        output.send(sock)
+
+    # The sinks are never read, so frames beyond their receive buffers are
+    # dropped by the kernel after the send has been counted
+    baseline = run('per frame', args.seconds, batch, per_frame)
+    fast = run('batched', args.seconds, batch, batched)
+    print('Speedup: {:.1f}x'.format(fast / baseline))
+    print(output.metrics())
+
+
+if __name__ == '__main__':
+    main()
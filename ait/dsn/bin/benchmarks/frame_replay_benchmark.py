@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+
+# Advanced Multi-Mission Operations System (AMMOS) Instrument Toolkit (AIT)
+# Bespoke Link to Instruments and Small Satellites (BLISS)
+#
+# Copyright 2017, by the California Institute of Technology. ALL RIGHTS
+# RESERVED. United States Government Sponsorship acknowledged. Any
+# commercial use must be negotiated with the Office of Technology Transfer
+# at the California Institute of Technology.
+#
+# This software may be subject to U.S. export control laws. By accepting
+# this software, the user agrees to comply with all applicable U.S. export
+# laws and regulations. User has the responsibility to obtain export licenses,
+# or other export authority as may be required before exporting such
+# information to foreign countries or providing access to foreign persons.
+
+# Usage:
+#   python frame_replay_benchmark.py [--frames 200000] [--frame-size 1115]
+#
+# Writes --frames synthetic TM frames to a temporary file and reads them
+# back one frame at a time with file reads, as a replay script would, and
+# with ait.dsn.sle.replay.FrameReplay, both just reading the frames and
+# decoding each into a TM frame view. Reports frames/s for each and the
+# replay's per-stage timing.
+import argparse
+import os
+import tempfile
+import time
+
+import ait.dsn.sle.frames as frames
+from ait.dsn.sle.frame_encoder import SyntheticDownlink, TMFrameEncoder
+from ait.dsn.sle.replay import FrameReplay
+
+
+def report(name, count, elapsed):
+    print('{:8s} {:12.0f} frames/s {:8.3f} us/frame'.format(name, count / elapsed, elapsed / count * 1e6))
+    return count / elapsed
+
+
+def read_file(path, frame_size, decode):
+    count = 0
+    with open(path, 'rb') as f:
+        while True:
+            data = f.read(frame_size)
+            if len(data) < frame_size:
+                break
+            decode(data)
+            count += 1
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--frames', type=int, default=200000)
+    parser.add_argument('--frame-size', type=int, default=1115)
+    args = parser.parse_args()
+
+    size = args.frame_size
+    buf = bytearray(size * args.frames)
+    SyntheticDownlink(TMFrameEncoder(size), packet_len=256).generate(buf, args.frames)
+    fd, path = tempfile.mkstemp()
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(buf)
+        del buf
+
+        results = {}
+        for name, decode in (('read', lambda d: None), ('decode', frames.TMFrameView)):
+            start = time.perf_counter()
+            count = read_file(path, size, decode)
+            results['file ' + name] = report('file', count, time.perf_counter() - start)
+
+            with FrameReplay(path, size) as replay:
+                frame_class = None if name == 'read' else decode
+                stats = replay.replay(lambda f: None, frame_class)
+            results['mmap ' + name] = report('mmap', stats['frames'], stats['elapsed'])
+            print(FrameReplay.report(stats))
+
+        print('Speedup: {:.1f}x reading, {:.1f}x decoding'.format(
+            results['mmap read'] / results['file read'],
+            results['mmap decode'] / results['file decode']))
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
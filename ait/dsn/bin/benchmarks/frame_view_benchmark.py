@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+
+# Advanced Multi-Mission Operations System (AMMOS) Instrument Toolkit (AIT)
+# Bespoke Link to Instruments and Small Satellites (BLISS)
+#
+# Copyright 2017, by the California Institute of Technology. ALL RIGHTS
+# RESERVED. United States Government Sponsorship acknowledged. Any
+# commercial use must be negotiated with the Office of Technology Transfer
+# at the California Institute of Technology.
+#
+# This software may be subject to U.S. export control laws. By accepting
+# this software, the user agrees to comply with all applicable U.S. export
+# laws and regulations. User has the responsibility to obtain export licenses,
+# or other export authority as may be required before exporting such
+# information to foreign countries or providing access to foreign persons.
+
+# Usage:
+#   python frame_view_benchmark.py [--frames 1000000] [--retain 100000]
+#                                  [--frame-type AOSTransFrame] [--frame-size 1115]
+#
+# Decodes --frames synthetic frames with the dict-based frame classes in
+# ait.dsn.sle.frames and with the lazily decoded frame views, reading the
+# fields the deframing processor uses for each frame. Reports the CPU time
+# per frame and, from tracemalloc, the memory held per frame when --retain
+# decoded frames are kept, not counting the frame bytes themselves.
+import argparse
+import time
+import tracemalloc
+
+import ait.dsn.sle.frames as frames
+
+
+def make_frames(frame_type, frame_size, count):
+    result = []
+    for i in range(count):
+        if frame_type == 'AOSTransFrame':
+            header = bytes([0x40, 0x41 + i % 2, (i >> 16) & 0xFF, (i >> 8) & 0xFF, i & 0xFF, 0, 0, 0])
+        else:
+            # Packets with 200 byte data fields, and a shorter one to fill
+            # the rest of the TM data field
+            header = bytes([0x12, 0x34, i & 0xFF, i & 0xFF, 0, 0])
+            header += (bytes([0x08, 0x01, 0xC0, 0, 0, 200]) + bytes(200)) * ((frame_size - 6) // 206)
+            rest = frame_size - len(header) - 6
+            if rest >= 0:
+                header += bytes([0x08, 0x01, 0xC0, 0, rest >> 8, rest & 0xFF])
+        result.append(header + bytes(frame_size - len(header)))
+    return result
+
+
+def dict_frame(frame_class):
+    def decode(data):
+        frame = frame_class()
+        frame.decode(data)
+        return frame
+    return decode
+
+
+def read_aos(frame):
+    return (frame.virtual_channel, frame['virtual_channel_frame_count'],
+            frame.is_idle_frame, frame['aos_data_field_type'])
+
+
+def read_tm(frame):
+    return (frame.virtual_channel, frame['virtual_chan_frame_count'],
+            frame.is_idle_frame, frame['first_hdr_ptr'], len(frame._data))
+
+
+def cpu(name, data, decode, read):
+    start = time.process_time()
+    for frame in data:
+        read(decode(frame))
+    elapsed = time.process_time() - start
+
+    print('{:6s} {:10.0f} frames/s {:8.2f} us/frame'.format(name, len(data) / elapsed, elapsed / len(data) * 1e6))
+    return elapsed
+
+
+def memory(name, data, decode):
+    tracemalloc.start()
+    kept = [decode(frame) for frame in data]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print('{:6s} {:10.0f} bytes/frame'.format(name, size / len(kept)))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--frames', type=int, default=1000000)
+    parser.add_argument('--retain', type=int, default=100000)
+    parser.add_argument('--frame-type', default='AOSTransFrame',
+                        choices=['AOSTransFrame', 'TMTransFrame'])
+    parser.add_argument('--frame-size', type=int, default=1115)
+    args = parser.parse_args()
+
+    # A few distinct frames are cycled through to keep the input small
+    distinct = make_frames(args.frame_type, args.frame_size, 256)
+    data = [distinct[i % len(distinct)] for i in range(args.frames)]
+
+    if args.frame_type == 'AOSTransFrame':
+        config = frames.AOSConfig(virtual_channels={1: 'm_pdu', 2: 'vca_sdu'})
+        legacy = lambda d: frames.AOSTransFrame(d, config=config)
+        view = lambda d: frames.AOSFrameView(d, config=config)
+        read = read_aos
+    else:
+        legacy = dict_frame(frames.TMTransFrame)
+        view = frames.TMFrameView
+        read = read_tm
+
+    print('CPU over {} frames'.format(args.frames))
+    baseline = cpu('dict', data, legacy, read)
+    fast = cpu('view', data, view, read)
+    print('Speedup: {:.1f}x'.format(baseline / fast))
+
+    print('Memory with {} frames retained'.format(args.retain))
+    memory('dict', data[:args.retain], legacy)
+    memory('view', data[:args.retain], view)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+
+# Advanced Multi-Mission Operations System (AMMOS) Instrument Toolkit (AIT)
+# Bespoke Link to Instruments and Small Satellites (BLISS)
+#
+# Copyright 2017, by the California Institute of Technology. ALL RIGHTS
+# RESERVED. United States Government Sponsorship acknowledged. Any
+# commercial use must be negotiated with the Office of Technology Transfer
+# at the California Institute of Technology.
+#
+# This software may be subject to U.S. export control laws. By accepting
+# this software, the user agrees to comply with all applicable U.S. export
+# laws and regulations. User has the responsibility to obtain export licenses,
+# or other export authority as may be required before exporting such
+# information to foreign countries or providing access to foreign persons.
+
+# Usage:
+#   python mpdu_benchmark.py [--frames 20000] [--frame-size 1115] [--packet-len 64]
+#
+# Encodes --frames AOS M_PDU frames carrying packets of --packet-len bytes
+# and extracts the packets from their packet zones the way the
+# AOS_to_CCSDS plugin did, slicing the zone and building a run of idle
+# fill bytes to compare each remainder against, and with
+# ait.dsn.sle.mpdu.MPDUReassembler. Then walks the zones the way the
+# deframing processor did, slicing each packet out after reading its
+# length, and with ait.dsn.sle.mpdu.iter_mpdu_packets. Each packet is
+# handed to a handler which drops it, as the plugin and processor hand
+# packets on. Checks that each pair finds the same packets and reports
+# packets/s for each. The plugin did not follow packets spanning a whole
+# frame, so --packet-len should be less than the packet zone.
+import argparse
+import time
+
+from ait.dsn.sle.frame_encoder import AOSFrameEncoder, SyntheticDownlink
+from ait.dsn.sle.frames import AOSFrameView
+from ait.dsn.sle.mpdu import MPDUReassembler, iter_mpdu_packets
+
+
+def sliced_plugin(mpdus, handle):
+    ''' The AOS_to_CCSDS packet extraction before the reassembler '''
+    bytes_from_previous_frame = None
+    for first_packet_header_pointer, m_pdu_data in mpdus:
+        remaining_bytes_to_send = m_pdu_data
+        if bytes_from_previous_frame is not None:
+            handle(bytes_from_previous_frame + m_pdu_data[0:first_packet_header_pointer])
+            bytes_from_previous_frame = None
+            remaining_bytes_to_send = remaining_bytes_to_send[first_packet_header_pointer:]
+
+        while remaining_bytes_to_send is not None:
+            if remaining_bytes_to_send == bytearray(b'\xe0' * len(remaining_bytes_to_send)):
+                remaining_bytes_to_send = None
+                continue
+            length_of_next_packet = int.from_bytes(remaining_bytes_to_send[0:6][4:], 'big') + 7
+            if length_of_next_packet == len(remaining_bytes_to_send):
+                handle(remaining_bytes_to_send)
+                remaining_bytes_to_send = None
+            elif length_of_next_packet < len(remaining_bytes_to_send):
+                handle(remaining_bytes_to_send[:length_of_next_packet])
+                remaining_bytes_to_send = remaining_bytes_to_send[length_of_next_packet:]
+            else:
+                bytes_from_previous_frame = remaining_bytes_to_send
+                remaining_bytes_to_send = None
+
+
+def reassembled_plugin(mpdus, handle):
+    add = MPDUReassembler().add
+    for first_hdr_ptr, zone in mpdus:
+        for packet in add(2, first_hdr_ptr, zone):
+            handle(packet)
+
+
+def sliced_processor(mpdus, handle):
+    ''' The deframing processor packet zone walk before iter_mpdu_packets '''
+    for pkt_hdr_ptr, pkt_zone in mpdus:
+        pkt_zone_end = len(pkt_zone)
+        if pkt_hdr_ptr != 0:
+            handle(pkt_zone[0:pkt_hdr_ptr])
+        current_start_idx = pkt_hdr_ptr
+        while current_start_idx < pkt_zone_end:
+            pkt_is_partial = False
+            pkt_length = None
+            if current_start_idx + 6 > pkt_zone_end:
+                pkt_is_partial = True
+            else:
+                pkt_len = int.from_bytes(pkt_zone[current_start_idx + 4:current_start_idx + 6],
+                                         byteorder='big') + 1
+                pkt_length = pkt_len + 6
+                if current_start_idx + pkt_length > pkt_zone_end:
+                    pkt_is_partial = True
+            if pkt_is_partial:
+                handle(pkt_zone[current_start_idx:pkt_zone_end])
+                current_start_idx = pkt_zone_end
+            else:
+                handle(pkt_zone[current_start_idx:current_start_idx + pkt_length])
+                current_start_idx += pkt_length
+
+
+def walked_processor(mpdus, handle):
+    for first_hdr_ptr, zone in mpdus:
+        for _, view in iter_mpdu_packets(zone, first_hdr_ptr):
+            handle(view)
+
+
+def report(name, count, elapsed):
+    print('{:20s} {:10.0f} packets/s {:8.3f} s'.format(name, count / elapsed, elapsed))
+    return count / elapsed
+
+
+def compare(name, extract, mpdus, baseline=None):
+    ''' Times extract over mpdus, checking it finds the packets of baseline '''
+    packets = []
+    extract(mpdus, lambda packet: packets.append(bytes(packet)))
+    if baseline is not None:
+        extract_baseline, _ = baseline
+        expected = []
+        extract_baseline(mpdus, lambda packet: expected.append(bytes(packet)))
+        assert packets == expected
+
+    start = time.perf_counter()
+    extract(mpdus, len)
+    return report(name, len(packets), time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--frames', type=int, default=20000)
+    parser.add_argument('--frame-size', type=int, default=1115)
+    parser.add_argument('--packet-len', type=int, default=64)
+    args = parser.parse_args()
+
+    size = args.frame_size
+    buf = bytearray(size * args.frames)
+    downlink = SyntheticDownlink(AOSFrameEncoder(size, virtual_channel_id=2), packet_len=args.packet_len)
+    downlink.generate(buf, args.frames)
+    mpdus = []
+    for i in range(args.frames):
+        view = AOSFrameView(bytes(buf[i * size:(i + 1) * size]))
+        mpdus.append((view.mpdu_first_hdr_ptr, view.mpdu_packet_zone.tobytes()))
+
+    baseline = compare('sliced plugin', sliced_plugin, mpdus)
+    fast = compare('reassembler', reassembled_plugin, mpdus, (sliced_plugin, baseline))
+    print('Speedup: {:.1f}x'.format(fast / baseline))
+
+    baseline = compare('sliced processor', sliced_processor, mpdus)
+    fast = compare('iter_mpdu_packets', walked_processor, mpdus, (sliced_processor, baseline))
+    print('Speedup: {:.1f}x'.format(fast / baseline))
+
+
+if __name__ == '__main__':
+    main()
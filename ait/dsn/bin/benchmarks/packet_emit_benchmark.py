@@ -0,0 +1,237 @@
+#!/usr/bin/env python
+
+# Advanced Multi-Mission Operations System (AMMOS) Instrument Toolkit (AIT)
+# Bespoke Link to Instruments and Small Satellites (BLISS)
+#
+# Copyright 2017, by the California Institute of Technology. ALL RIGHTS
+# RESERVED. United States Government Sponsorship acknowledged. Any
+# commercial use must be negotiated with the Office of Technology Transfer
+# at the California Institute of Technology.
+#
+# This software may be subject to U.S. export control laws. By accepting
+# this software, the user agrees to comply with all applicable U.S. export
+# laws and regulations. User has the responsibility to obtain export licenses,
+# or other export authority as may be required before exporting such
+# information to foreign countries or providing access to foreign persons.
+
+# Usage:
+#   python packet_emit_benchmark.py [--packets 50000] [--rate 10000] [--apids 4] [--profile]
+#
+# Feeds --packets whole CCSDS packets, in order across --apids APIDs, to the
+# deframing processor's handle_full_packet at --rate packets/s, as frames
+# arriving at that rate would. Runs this with the packet handling the
+# processor used, copied below, which parsed each header with a CcsdsHeader
+# and printed every packet it emitted, and with the current Processor.
+# Reports the CPU time per packet and the share of a core each takes at
+# that rate, and with --profile the functions taking the most time.
+#
+# The printed lines of the old handling are written to /dev/null, so its
+# cost here is a lower bound of its cost writing to a terminal or log.
+import argparse
+import contextlib
+import cProfile
+import os
+import pstats
+import time
+
+from ait.core import ccsds, log
+
+from ait.dsn.proc.deframe_packet_processor import ApidInfo, Constants, Processor
+
+
+class OldApidInfo(ApidInfo):
+
+    @staticmethod
+    def get_sequence_count(packet):
+        """
+        Extracts the sequence count of a packet from its header
+        :param packet: Packet to be inspected
+        :return: packet sequence count if found, else None
+        """
+        if len(packet) < Constants.CCSDS_PRIMARY_HEADER_LEN:
+            return None
+        ccsds_hdr = ccsds.CcsdsHeader(packet[0:7])
+        return ccsds_hdr.seqcount
+
+    def add_packet(self, packet):
+        """
+        Performs checks on the packet, such as: packet length too shot or packet
+        appears to be have arrived to late, and drops it those cases.
+        Also checks for whether the packet indicates a RESET, and sets state
+        accordingly.
+        Finally adds the packet to our internal records
+        :param packet: Packet to be added
+        """
+        # If packet length doesn't even cover the header, then its a problem
+        if len(packet) < Constants.CCSDS_PRIMARY_HEADER_LEN:
+            log.error("Packet is not legal CCSDS-packet")
+            return
+
+        seq_count = OldApidInfo.get_sequence_count(packet)
+
+        # Check cases where:
+        # 1) there is no lastSent,
+        # 2) where the seq_count appears to be a reset
+        if self._lastSeqCountSent is None:
+            self._lastSeqCountSent = ApidInfo.mod(seq_count - 1)
+        elif seq_count == 0 and \
+                self._lastSeqCountSent  < Constants.RESET_DECISION_VALUE:
+            log.warn("Received a packet with an apparent sequence count RESET (0).")
+            self._reset_packet = packet
+
+        ## The cached reset packet will be held onto while we clear out
+        ## pre-existing packet
+        if self._reset_packet:
+            return
+
+        # We may have received a packet AFTER we decided to skip it, so perform a check
+        if self.should_skip_packet(seq_count):
+            log.error("CCSDS packet with APID '"+str(self.apid)+"' and SeqCount '"+str(seq_count)+" arrived too late to process, dropping it.")
+            return
+
+        # All is well, add seq_count and packet
+        self._seq_counts.add_value(seq_count)
+        self._packet_dict[seq_count] = packet
+
+        # Skip gap check if in reset state
+        self.check_gap()
+
+
+class CountingProcessor(Processor):
+    def __init__(self, *args, **kwargs):
+        super(CountingProcessor, self).__init__(*args, **kwargs)
+        self.emitted = 0
+
+    def emit_packet(self, packet):
+        self.emitted += 1
+
+
+class OldProcessor(CountingProcessor):
+
+    def handle_full_packet(self, packet):
+        """
+        Takes a full CCSDS packet and routes it to the appropriate APID record.
+        If packet has IDLE apid, it is dropped.
+        :param packet: CCSDS packet
+        :return: True if packet as processed, False if packet was rejected
+        """
+
+        if len(packet) < Constants.CCSDS_PRIMARY_HEADER_LEN + 1:
+            log.error("Received CCSDS packet that is too short. Dropping it.")
+            return False
+
+        # Get packet header and create CCSDS header
+        pkt_hdr = packet[0:7]
+        ccsds_hdr = ccsds.CcsdsHeader(pkt_hdr)
+
+        apid = ccsds_hdr.apid
+
+        # Check for Idle APID
+        apid_bin_str = str(bin(apid))
+        if apid_bin_str == '0b11111111111':
+            log.debug("Received an Idle CCSDS packet. Dropping it.")
+            return False
+
+        seq_count = ccsds_hdr.seqcount
+        data_len = ccsds_hdr.length + 1
+
+        ccsds_pkt_len = data_len + Constants.CCSDS_PRIMARY_HEADER_LEN
+
+        if not apid in self._apid_lookup.keys():
+            tmp_lookup = OldApidInfo(apid, self._gap_max)
+            self._apid_lookup[apid] = tmp_lookup
+
+        apid_info = self._apid_lookup.get(apid)
+
+        apid_info.add_packet(packet)
+
+        ## Special Check if we should purge all packets (i.e. a RESET was sent)
+        if apid_info.is_reset_state():
+            self.handle_apid_reset(apid_info)
+
+
+        if apid_info.ready_for_emit():
+            self.process_apid_packets(apid_info)
+
+        return True
+
+    def emit_apid_packet_by_seqcount(self, apid_info, seqcount):
+        """Given an apid info and seqcount, retrieves packet, emits and updates apid info"""
+
+        packet = apid_info.get_packet(seqcount)
+        if not packet:
+            return
+
+        apid_info.remove_packet(seqcount)
+        l_now = time.time()
+        apid_info.setLastPacketEmitTime(l_now)
+        apid_info.setLastSeqCountSent(seqcount)
+
+        print("Emitting CCSDS packet with APID "+str(apid_info.apid)+" and SeqCount "+str(seqcount)+" downstream")
+        self.emit_packet(packet)
+
+
+def make_packets(count, apids, packet_len):
+    packets = []
+    for i in range(count):
+        apid = 1 + i % apids
+        seq_count = (i // apids) % Constants.CCSDS_SEQCOUNT_MODULO
+        length = packet_len - Constants.CCSDS_PRIMARY_HEADER_LEN - 1
+        header = bytes([apid >> 8, apid & 0xFF, 0xC0 | seq_count >> 8, seq_count & 0xFF,
+                        length >> 8, length & 0xFF])
+        packets.append(header + bytes(packet_len - len(header)))
+    return packets
+
+
+def run(name, processor, packets, rate, profile):
+    batch = max(1, rate // 100)
+    interval = batch / rate
+    profiler = cProfile.Profile() if profile else None
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        cpu_start = time.process_time()
+        cpu = 0.0
+        deadline = start
+        for i in range(0, len(packets), batch):
+            cpu_batch = time.process_time()
+            if profiler:
+                profiler.enable()
+            for packet in packets[i:i + batch]:
+                processor.handle_full_packet(packet)
+            if profiler:
+                profiler.disable()
+            cpu += time.process_time() - cpu_batch
+
+            deadline += interval
+            delay = deadline - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        wall = time.perf_counter() - start
+
+    print('{:14s} {:7.2f} us/packet  {:5.1f}% of a core  {:7.0f} packets/s'.format(
+        name, cpu / len(packets) * 1e6, 100 * cpu / wall, len(packets) / wall))
+    if profiler:
+        pstats.Stats(profiler).sort_stats('tottime').print_stats(8)
+    return cpu, processor.emitted
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--packets', type=int, default=50000)
+    parser.add_argument('--rate', type=int, default=10000)
+    parser.add_argument('--apids', type=int, default=4)
+    parser.add_argument('--packet-len', type=int, default=300)
+    parser.add_argument('--profile', action='store_true')
+    args = parser.parse_args()
+
+    packets = make_packets(args.packets, args.apids, args.packet_len)
+
+    baseline, expected = run('CcsdsHeader', OldProcessor(), packets, args.rate, args.profile)
+    fast, emitted = run('unpack_from', CountingProcessor(), packets, args.rate, args.profile)
+    assert emitted == expected == len(packets)
+    print('Speedup: {:.1f}x'.format(baseline / fast))
+
+
+if __name__ == '__main__':
+    main()
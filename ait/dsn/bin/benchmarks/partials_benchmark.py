@@ -0,0 +1,265 @@
+#!/usr/bin/env python
+
+# Advanced Multi-Mission Operations System (AMMOS) Instrument Toolkit (AIT)
+# Bespoke Link to Instruments and Small Satellites (BLISS)
+#
+# Copyright 2017, by the California Institute of Technology. ALL RIGHTS
+# RESERVED. United States Government Sponsorship acknowledged. Any
+# commercial use must be negotiated with the Office of Technology Transfer
+# at the California Institute of Technology.
+#
+# This software may be subject to U.S. export control laws. By accepting
+# this software, the user agrees to comply with all applicable U.S. export
+# laws and regulations. User has the responsibility to obtain export licenses,
+# or other export authority as may be required before exporting such
+# information to foreign countries or providing access to foreign persons.
+
+# Usage:
+#   python partials_benchmark.py [--frames 200000] [--channels 8] [--loss 0.01] [--cleanup-every 1000]
+#
+# Hands the partial packets of --frames frames, spread over --channels
+# virtual channels, to a partials lookup the way the deframing processor
+# does: each frame's leading end partial is paired with the start partial
+# of the frame before, and its trailing start partial is added to await
+# the next frame. A --loss fraction of frames is lost, leaving orphaned
+# partials, and the lookup is cleaned up every --cleanup-every frames.
+# Runs this with the PartialsLookup the processor used, copied below, and
+# with ait.dsn.proc.partials.PartialsLookup, checks both pair the same
+# partials, and reports frames/s and the slowest cleanup pass of each.
+import argparse
+import random
+import sys
+import time
+
+from ait.core import log
+
+import ait.dsn.proc.partials as partials
+
+
+class PartialsLookup(object):
+    """
+    Maintains a lookup of start and end packet partials extracted from Frames.
+    Note: The primary key is the uniqueId (Frame masterId + virtualChannelId)
+    """
+
+    # Type/Keys used for identifying partials type
+    TYPE_START = 'starts'
+    TYPE_END = 'ends'
+
+    HISTORY_MAX = 1500
+    HISTORY_RATIO_CLEANUP = 0.25
+
+    DEFAULT_HOUSEKEEPING = True
+    DEFAULT_MODULUS = sys.maxsize
+
+    def __init__(self, housekeeping=DEFAULT_HOUSEKEEPING, modulus=DEFAULT_MODULUS):
+        """
+        Constructor
+        :param housekeeping: Flag indicating if we will perform internal house-keeping
+        :param modulus: Frame-specific modulo value
+        """
+        # The topmost dictionary for storing partials
+        self._lookup = {}
+
+        # History list contains tuples of entries so we can track
+        # the order of when partials were added
+        self._history = []
+
+        # If true, when number of remaining partials exceeds an amount, perform cleanup
+        self._perform_housekeeping =  housekeeping
+
+        # Frame-specific modulus value, needed when calculating relative
+        # partials indices, since previous/next partials may cross the
+        # mod-boundary
+        self._frame_modulus = modulus if modulus > 0 else PartialsLookup.DEFAULT_MODULUS
+
+    def add_partial(self, primaryId, partialId, type, partial):
+        """
+        Adds a partial, passing in needed index values and partial type
+        :param primaryId: Frame unique id
+        :param partialId: Frame count associated with packet
+        :param type: Partial type, START or END
+        :param partial: The partial instance
+        """
+        # If first time seeing uniqueId add basic lookup info
+        if primaryId not in self._lookup:
+            temp_dict = {PartialsLookup.TYPE_START: {},
+                         PartialsLookup.TYPE_END: {}}
+            self._lookup[primaryId] = temp_dict
+
+        the_dict = self._lookup[primaryId]
+        inner_dict = the_dict[type]
+        inner_dict[partialId] = partial
+
+        # Add history entry
+        history_entry = (primaryId, partialId, type, time.time())
+        self._history.append(history_entry)
+
+
+    def remove_partial(self, primaryId, partialId, type):
+        """
+        Removes a partial entry
+        :param primaryId: Frame unique id
+        :param partialId: Frame count associated with packet
+        :param type: Partial type, START or END
+        :return: True if partial removed, False otherwise
+        """
+        if primaryId not in self._lookup:
+            return False
+        the_dict = self._lookup[primaryId]
+        inner_dict = the_dict[type]
+
+        if partialId not in inner_dict:
+            return False
+
+        inner_dict.pop(partialId, None)
+
+        # Remove history entry (todo smarter way to do this?)
+        history_entries = [entry for entry in self._history if entry[0] == primaryId and
+                           entry[1] == partialId and entry[2] == type]
+        for entry in history_entries:
+            self._history.remove(entry)
+
+        return True
+
+    def get_partial(self, primaryId, partialId, type):
+        """
+        Returns a partial entry
+        :param primaryId: Frame unique id
+        :param partialId: Frame count associated with packet
+        :param type: Partial type, START or END
+        :return: Partial mapped by the provided arguments, or None
+        """
+
+        if primaryId not in self._lookup:
+            return None
+        the_dict = self._lookup[primaryId]
+        inner_dict = the_dict[type]
+
+        if partialId not in inner_dict:
+            return None
+
+        return inner_dict[partialId]
+
+    def contains_partial(self, primaryId, partialId, type):
+        """
+        Returns whether a partial is found in this instanc
+        :param primaryId: Frame unique id
+        :param partialId: Frame count associated with packet
+        :param type: Partial type, START or END
+        :return: True if partial if managed by this instance, False otherwise
+        """
+        if primaryId not in self._lookup:
+            return False
+        the_dict = self._lookup[primaryId]
+        inner_dict = the_dict[type]
+
+        if partialId not in inner_dict:
+            return False
+
+        return True
+
+
+    def perform_cleanup(self):
+        """
+        Perform cleanup if enabled and if the number of entries
+        exceeds the maximum number of entries.
+        """
+        if not self._perform_housekeeping:
+            return
+
+        if len(self._history) >= PartialsLookup.HISTORY_MAX:
+            remove_count = int(PartialsLookup.HISTORY_MAX * PartialsLookup.HISTORY_RATIO_CLEANUP)
+            log.debug("PartialsLookup is performing cleanup by removing the "+str(remove_count)+" oldest entries")
+            for idx in range(remove_count):
+                if idx < len(self._history):
+                    entry = self._history[0]
+                    self.remove_partial(entry[0],entry[1],entry[2])
+
+    def mod(self, value):
+        """
+        Returns the value % frame_modulos, typically the same value except for boundary cases
+        :param value: Value to be mod'd
+        :return: Mod'd value
+        """
+        return value % self._frame_modulus
+
+    def contains_complement_for(self, primaryId, partialId, type):
+        """
+        Returns True if complementary partial is being managed, False otherwise
+        """
+        (lookup_index, lookup_type) = PartialsLookup.get_complement_fields(partialId, type)
+        return self.contains_partial(primaryId, lookup_index, lookup_type)
+
+    def get_complement_fields(self, partialId, type):
+        """
+        Returns a tuple representing the complementary partial to the
+        input arguments
+        """
+        lookup_type = PartialsLookup.TYPE_START if type == PartialsLookup.TYPE_END else PartialsLookup.TYPE_END
+        lookup_index = (partialId - 1) if partialId == PartialsLookup.TYPE_END else (partialId + 1)
+        lookup_index = self.mod(lookup_index)
+        return (lookup_index, lookup_type)
+
+
+def pair_with_lookup(lookup, channel, partial_id, type, partial):
+    ''' Pairs a partial as Processor.handle_partial_packet did '''
+    (lookup_id, lookup_type) = lookup.get_complement_fields(partial_id, type)
+    if lookup.contains_partial(channel, lookup_id, lookup_type):
+        complement = lookup.get_partial(channel, lookup_id, lookup_type)
+        lookup.remove_partial(channel, lookup_id, lookup_type)
+        return complement
+    lookup.add_partial(channel, partial_id, type, partial)
+    return None
+
+
+def pair_with_pop(lookup, channel, partial_id, type, partial):
+    ''' Pairs a partial as Processor.handle_partial_packet does '''
+    (lookup_id, lookup_type) = lookup.get_complement_fields(partial_id, type)
+    complement = lookup.pop_partial(channel, lookup_id, lookup_type)
+    if complement is None:
+        lookup.add_partial(channel, partial_id, type, partial)
+    return complement
+
+
+def run(name, lookup, pair, frames, cleanup_every):
+    paired = 0
+    slowest_cleanup = 0.0
+    start = time.perf_counter()
+    for i, (channel, frame_count) in enumerate(frames):
+        if pair(lookup, channel, frame_count - 1, PartialsLookup.TYPE_END, b'end') is not None:
+            paired += 1
+        pair(lookup, channel, frame_count + 1, PartialsLookup.TYPE_START, b'start')
+        if i % cleanup_every == 0:
+            cleanup_start = time.perf_counter()
+            lookup.perform_cleanup()
+            slowest_cleanup = max(slowest_cleanup, time.perf_counter() - cleanup_start)
+    elapsed = time.perf_counter() - start
+
+    print('{:14s} {:10.0f} frames/s {:8.3f} s  slowest cleanup {:8.3f} ms'.format(
+        name, len(frames) / elapsed, elapsed, slowest_cleanup * 1e3))
+    return len(frames) / elapsed, paired
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--frames', type=int, default=200000)
+    parser.add_argument('--channels', type=int, default=8)
+    parser.add_argument('--loss', type=float, default=0.01)
+    parser.add_argument('--cleanup-every', type=int, default=1000)
+    args = parser.parse_args()
+
+    random.seed(0)
+    frames = [(i % args.channels, i // args.channels) for i in range(args.frames)
+              if random.random() >= args.loss]
+
+    baseline, expected = run('history list', PartialsLookup(), pair_with_lookup,
+                             frames, args.cleanup_every)
+    fast, paired = run('ordered dict', partials.PartialsLookup(), pair_with_pop,
+                       frames, args.cleanup_every)
+    assert paired == expected
+    print('Speedup: {:.1f}x'.format(fast / baseline))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,239 @@
+#!/usr/bin/env python
+
+# Advanced Multi-Mission Operations System (AMMOS) Instrument Toolkit (AIT)
+# Bespoke Link to Instruments and Small Satellites (BLISS)
+#
+# Copyright 2017, by the California Institute of Technology. ALL RIGHTS
+# RESERVED. United States Government Sponsorship acknowledged. Any
+# commercial use must be negotiated with the Office of Technology Transfer
+# at the California Institute of Technology.
+#
+# This software may be subject to U.S. export control laws. By accepting
+# this software, the user agrees to comply with all applicable U.S. export
+# laws and regulations. User has the responsibility to obtain export licenses,
+# or other export authority as may be required before exporting such
+# information to foreign countries or providing access to foreign persons.
+
+# Usage:
+#   python reorder_benchmark.py [--packets 200000] [--apids 32] [--max-gap 1000] [--displacement 30000]
+#
+# Interleaves --packets sequence counts across --apids APIDs, each count
+# arriving up to --displacement places later than in order, and puts them
+# in order per APID the way ait.dsn.proc.deframe_packet_processor.ApidInfo
+# does: each count is added, the next count is taken while it follows the
+# last one taken, and gaps are skipped once --max-gap counts are waiting.
+# Runs this with the ModuloList the processor used, copied below, and with
+# ait.dsn.proc.reorder.SeqCountWindow, checks both take the same counts
+# and reports counts/s for each. The counts of each APID must stay below
+# two thirds of the rollover at 16384, as ModuloList did not follow the
+# rollover.
+import argparse
+import random
+import time
+
+from ait.core import log
+
+from ait.dsn.proc.reorder import SeqCountWindow
+
+MODULO = 16384
+
+
+class ModuloList(object):
+    """
+    Brain-child of a desperate developer to try and maintain order
+    across a bounded range with modulo values.
+
+    The main constraint is that only up to two-thirds of the bounded range is
+    active, with two gatekeeper values which affect the internal state
+    of this list, which is at most two lists with their own sorted order.
+
+    The alpha list is the active list.  The beta list is used for values that
+    FOLLOW the alpha list, but likely have a value less than all of the alpha
+    entry values.  There, I think that makes sense?
+
+    Ultimately, the alpha list is always 'less-than' the beta list, despite
+    the actual values in those respective lists.
+
+    Based on the incoming value to be added and internal state, we determine
+    which list the value should be added to.  We also make decisions when
+    to clear-out or swap internal lists, based on gatekeeper values.
+    """
+
+    def __init__(self, modulo_val):
+        self._modulo_val = modulo_val
+        self._alpha_value = int(self._modulo_val / 3)
+        self._beta_value = 2 * self._alpha_value
+
+        self._alpha_list = []
+        self._beta_list = None
+
+    def reset_state(self):
+        if self._alpha_list:
+            self._alpha_list.clear()
+        if self._beta_list:
+            self._beta_list.clear()
+            self._beta_list = None
+
+    def get_alpha_value(self):
+        return self._alpha_value
+
+    def get_beta_value(self):
+        return self._beta_value
+
+    def get_size(self):
+        """
+        Returns the total size of this instance, across
+        both internal lists.
+        :return: Total number
+        """
+        count = len(self._alpha_list)
+        if self._beta_list:
+            count += len(self._beta_list)
+        return count
+
+    def add_value(self, val):
+        """
+        Adds a value to this list, assuming it is a legal value (non-negative
+        and less than modulus-field).
+        :param val: Value to be added
+         :return:  True if val is added, False otherwise
+        """
+
+        if val is None:
+            return False
+
+        if val > self._modulo_val or val < 0:
+            return False
+
+        target_list = None
+
+        # This is the special logic where we need to determine
+        # to which list (alpha,beta) the val should be
+        # added.
+        if val < self._alpha_value:
+            if self._beta_list is not None:
+                target_list = self._beta_list
+            else:
+                target_list = self._alpha_list
+        # This case we check if we reached the point of advancing
+        # existing beta list as the new alpha list.  Val will
+        # be added to whatever is the alpha list at the end
+        elif self._alpha_value <= val < self._beta_value:
+            if self._beta_list is not None:
+                self.clean_alpha()
+                self._alpha_list = self._beta_list
+                self._beta_list = None
+            target_list = self._alpha_list
+        # Final case where we realize we need to prep a new
+        # beta list for the future.  Val will be added to
+        # the existing alpha list.
+        else:
+            if not self._beta_list:
+                self._beta_list = []
+            target_list = self._alpha_list
+
+        # Sort is easy now that cross-range sorting is handled by this
+        # class
+        target_list.append(val)
+        target_list.sort()
+        return True
+
+    def contains_value(self, val):
+        """
+        Returns True if val is found in any of the internal lists
+        :param val: Value to search for
+        :return: True if val found, False otherwise
+        """
+
+        return val in self._alpha_list or (self._beta_list and val in self._beta_list)
+
+    def remove_value(self, val):
+        if val in self._alpha_list:
+            return self._alpha_list.remove(val)
+        elif val in self._beta_list:
+            return self._beta_list.remove(val)
+        else:
+            return False
+
+    def clean_alpha(self):
+        """
+        Utility method that clears the alpha list, while perform a check
+        and warning if the list was non-empty.
+        """
+        if len(self._alpha_list) != 0:
+            log.warn("ModuloList is advancing to next state but the old alpha list is non-empty "
+                                 "(maybe a result of sequence count reset?)")
+            self._alpha_list.clear()
+
+    def get_next_value(self):
+        """
+        Returns the next in-order value from this class, using class logic.
+        :return: Next value available, or None if no value available
+        """
+        return self._alpha_list[0] if len(self._alpha_list) > 0 else None
+
+    def get_values_in_order(self):
+        """
+        Returns a new list containing all maintained values, where values are
+        sorted using the class modulo sort logic.
+        :return: List of values
+        """
+        r_list = []
+        r_list += self._alpha_list
+        if self._beta_list:
+            r_list += self._beta_list
+        return r_list
+
+
+def reorder(window_class, arrivals, apids, max_gap):
+    windows = [window_class(MODULO) for _ in range(apids)]
+    last_taken = [MODULO - 1] * apids
+    taken = []
+    for apid, count in arrivals:
+        window = windows[apid]
+        window.add_value(count)
+        if window.get_size() >= max_gap:
+            last_taken[apid] = (window.get_next_value() - 1) % MODULO
+        while True:
+            count = window.get_next_value()
+            if count is None or count != (last_taken[apid] + 1) % MODULO:
+                break
+            window.remove_value(count)
+            last_taken[apid] = count
+            taken.append((apid, count))
+    return taken
+
+
+def report(name, count, elapsed):
+    print('{:14s} {:10.0f} counts/s {:8.3f} s'.format(name, count / elapsed, elapsed))
+    return count / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--packets', type=int, default=200000)
+    parser.add_argument('--apids', type=int, default=32)
+    parser.add_argument('--max-gap', type=int, default=1000)
+    parser.add_argument('--displacement', type=int, default=30000)
+    args = parser.parse_args()
+    if args.packets // args.apids >= 2 * MODULO // 3:
+        parser.error('--packets / --apids must be less than {}'.format(2 * MODULO // 3))
+
+    random.seed(0)
+    in_order = [(i % args.apids, (i // args.apids) % MODULO) for i in range(args.packets)]
+    shuffled = sorted(range(args.packets), key=lambda i: i + random.uniform(0, args.displacement))
+    arrivals = [in_order[i] for i in shuffled]
+
+    results = []
+    for name, window_class in (('ModuloList', ModuloList), ('SeqCountWindow', SeqCountWindow)):
+        start = time.perf_counter()
+        taken = reorder(window_class, arrivals, args.apids, args.max_gap)
+        results.append((report(name, len(arrivals), time.perf_counter() - start), taken))
+
+    (baseline, expected), (fast, taken) = results
+    assert taken == expected
+    print('Speedup: {:.1f}x'.format(fast / baseline))
+
+
+if __name__ == '__main__':
+    main()
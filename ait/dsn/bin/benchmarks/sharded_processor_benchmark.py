@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+
+# Advanced Multi-Mission Operations System (AMMOS) Instrument Toolkit (AIT)
+# Bespoke Link to Instruments and Small Satellites (BLISS)
+#
+# Copyright 2017, by the California Institute of Technology. ALL RIGHTS
+# RESERVED. United States Government Sponsorship acknowledged. Any
+# commercial use must be negotiated with the Office of Technology Transfer
+# at the California Institute of Technology.
+#
+# This software may be subject to U.S. export control laws. By accepting
+# this software, the user agrees to comply with all applicable U.S. export
+# laws and regulations. User has the responsibility to obtain export licenses,
+# or other export authority as may be required before exporting such
+# information to foreign countries or providing access to foreign persons.
+
+# Usage:
+#   python sharded_processor_benchmark.py [--frames 20000] [--channels 8] [--workers 1 2 4]
+#
+# Encodes --frames frames of the configured dsn.sle.downlink_frame_type,
+# interleaved across --channels channels each carrying its own APID, and
+# deframes them in-process with a single Processor and then with a
+# ShardedProcessor of each number of --workers, dispatching frames straight
+# onto the worker rings. Checks that every run emits the same packets in
+# the same order per APID and reports frames/s for each. Workers only add
+# throughput with a free core each.
+import argparse
+import time
+from collections import defaultdict
+
+import ait
+from ait.dsn.proc.deframe_packet_processor import Frame_Service, Processor
+from ait.dsn.proc.sharded import ShardedProcessor
+from ait.dsn.sle.frame_encoder import AOSFrameEncoder, SyntheticDownlink, TMFrameEncoder
+
+
+def encode_frames(frame_type, count, channels, frame_len, packet_len):
+    downlinks = []
+    for channel in range(channels):
+        if frame_type == 'TMTransFrame':
+            encoder = TMFrameEncoder(frame_len, spacecraft_id=channel // 8,
+                                     virtual_channel_id=channel % 8)
+        else:
+            # Virtual channel 2 carries M_PDUs in the test config
+            encoder = AOSFrameEncoder(frame_len, spacecraft_id=channel, virtual_channel_id=2)
+        downlinks.append(SyntheticDownlink(encoder, packet_len=packet_len, apids=(channel + 1,)))
+
+    frames = []
+    buf = bytearray(frame_len)
+    for i in range(count):
+        downlinks[i % channels].frame_into(buf)
+        frames.append(bytes(buf))
+    return frames
+
+
+def by_apid(packets):
+    apids = defaultdict(list)
+    for packet in packets:
+        apids[(packet[0] & 0x07) << 8 | packet[1]].append(packet)
+    return apids
+
+
+class CountingProcessor(Processor):
+    def __init__(self, *args, **kwargs):
+        super(CountingProcessor, self).__init__(*args, **kwargs)
+        self.packets = []
+
+    def emit_packet(self, packet):
+        self.packets.append(packet)
+
+
+class CollectingShardedProcessor(ShardedProcessor):
+    def __init__(self, *args, **kwargs):
+        super(CollectingShardedProcessor, self).__init__(*args, **kwargs)
+        self.packets = []
+
+    def emit_packet(self, packet):
+        self.packets.append(packet)
+
+
+def report(name, count, elapsed):
+    print('{:12s} {:10.0f} frames/s {:8.3f} s'.format(name, count / elapsed, elapsed))
+    return count / elapsed
+
+
+def single(frames):
+    processor = CountingProcessor()
+    decode = Frame_Service(None).decode
+    start = time.perf_counter()
+    for data in frames:
+        frame = decode(data)
+        if frame is not None:
+            processor.handle_frame(frame)
+    return report('1 process', len(frames), time.perf_counter() - start), processor.packets
+
+
+def sharded(frames, workers, expected):
+    processor = CollectingShardedProcessor(workers=workers)
+    processor.start_workers()
+    try:
+        start = time.perf_counter()
+        for data in frames:
+            while not processor.dispatch(data):
+                processor.merge_packets()
+            processor.merge_packets(1)
+        while len(processor.packets) < expected:
+            if not processor.merge_packets():
+                time.sleep(0.0005)
+        rate = report('{} workers'.format(workers), len(frames), time.perf_counter() - start)
+    finally:
+        processor.stop()
+    return rate, processor.packets
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--frames', type=int, default=20000)
+    parser.add_argument('--channels', type=int, default=8)
+    parser.add_argument('--frame-len', type=int, default=1115)
+    parser.add_argument('--packet-len', type=int, default=300)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    args = parser.parse_args()
+
+    frame_type = ait.config.get('dsn.sle.downlink_frame_type', ait.DEFAULT_FRAME_TYPE)
+    frames = encode_frames(frame_type, args.frames, args.channels, args.frame_len, args.packet_len)
+
+    baseline, packets = single(frames)
+    expected = by_apid(packets)
+    for workers in args.workers:
+        rate, packets = sharded(frames, workers, len(packets))
+        assert by_apid(packets) == expected
+        print('Speedup: {:.1f}x'.format(rate / baseline))
+
+
+if __name__ == '__main__':
+    main()
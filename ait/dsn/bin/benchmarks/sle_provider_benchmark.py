@@ -0,0 +1,228 @@
+# Advanced Multi-Mission Operations System (AMMOS) Instrument Toolkit (AIT)
+# Bespoke Link to Instruments and Small Satellites (BLISS)
+#
+# Copyright 2017, by the California Institute of Technology. ALL RIGHTS
+# RESERVED. United States Government Sponsorship acknowledged. Any
+# commercial use must be negotiated with the Office of Technology Transfer
+# at the California Institute of Technology.
+#
+# This software may be subject to U.S. export control laws. By accepting
+# this software, the user agrees to comply with all applicable U.S. export
+# laws and regulations. User has the responsibility to obtain export licenses,
+# or other export authority as may be required before exporting such
+# information to foreign countries or providing access to foreign persons.
+
+# Usage:
+#   python sle_provider_benchmark.py [--service raf] [--seconds 10]
+#                                    [--frame-rate 2000] [--frames-per-buffer 16]
+#                                    [--frame-size 1115]
+#   python sle_provider_benchmark.py --service cltu [--count 2000]
+#                                    [--cltu-size 256] [--window 16]
+#                                    [--uplink-bit-rate 10000000]
+#
+# Starts ait_sle_provider_sim.py in a child process so that its CPU time is
+# kept apart from the user side, then drives a RAF, RCF or CLTU instance
+# against it through bind and start.
+#
+# For RAF and RCF the provider streams annotated frames stamped with their
+# generation time as ERT, and the script reports frames/s, the latency from
+# generation to the AnnotatedFrame handler and the user CPU time per frame.
+# With --frame-rate 0 the provider streams as fast as the user accepts data,
+# which measures peak throughput; latency then mostly reflects queueing.
+#
+# For CLTU the script submits --count CLTUs to an ait.dsn.sle.uplink.CltuUplink
+# that keeps at most --window awaiting their CLTU-TRANSFER-DATA return, and
+# reports CLTUs/s, the latency from submission to return and the user CPU
+# time per CLTU.
+import argparse
+import datetime as dt
+import os
+import socket
+import struct
+import subprocess
+import sys
+import time
+
+import gevent
+
+import ait.dsn.sle
+import ait.dsn.sle.common as common
+from ait.dsn.sle.uplink import CltuUplink
+
+SIMULATOR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                         'ait_sle_provider_sim.py')
+
+INST_IDS = {
+    'raf': 'sagr=LSE-SSC.spack=Test.rsl-fg=1.raf=onlt1',
+    'rcf': 'sagr=LSE-SSC.spack=Test.rsl-fg=1.rcf=onlt1',
+    'cltu': 'sagr=LSE-SSC.spack=Test.fsl-fg=1.cltu=cltu1'
+}
+
+
+def start_simulator(args):
+    cmd = [
+        sys.executable, SIMULATOR,
+        '--service', args.service,
+        '--frame-rate', str(args.frame_rate),
+        '--frames-per-buffer', str(args.frames_per_buffer),
+        '--frame-size', str(args.frame_size),
+        '--uplink-bit-rate', str(args.uplink_bit_rate),
+        '--cltu-return-delay', str(args.cltu_return_delay),
+        '--cltu-buffer-size', str(args.cltu_size * args.window * 4)
+    ]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, universal_newlines=True)
+    line = proc.stdout.readline()
+    return proc, int(line.strip().rsplit(':', 1)[1])
+
+
+def percentiles(samples, points=(50, 90, 99)):
+    if not samples:
+        return [0.0] * (len(points) + 1)
+    samples = sorted(samples)
+    values = [samples[min(len(samples) - 1, int(len(samples) * p / 100.0))] for p in points]
+    return values + [samples[-1]]
+
+
+def ert_to_datetime(ert):
+    days, ms, us = struct.unpack('!HIH', ert)
+    return common.CCSDS_EPOCH + dt.timedelta(days=days, milliseconds=ms, microseconds=us)
+
+
+def make_instance(args, port):
+    cls = {'raf': ait.dsn.sle.RAF, 'rcf': ait.dsn.sle.RCF, 'cltu': ait.dsn.sle.CLTU}[args.service]
+    # A short data queue keeps the backlog, and so the latency, bounded
+    # when the provider outpaces the decoder
+    instance = cls(hostnames=['127.0.0.1'], port=port, frame_output_port=args.sink_port,
+                   data_queue_size=64)
+    # Values from the AIT config take precedence over keyword arguments, so
+    # point the instance at the simulator directly
+    instance._hostnames = ['127.0.0.1']
+    instance._port = port
+    return instance
+
+
+def wait_for_state(instance, state, timeout=5):
+    deadline = time.time() + timeout
+    while instance._state != state:
+        if time.time() > deadline:
+            raise RuntimeError('Timed out waiting for state {}'.format(state))
+        gevent.sleep(0.01)
+
+
+def run_downlink(args, instance):
+    latencies = []
+
+    def on_frame(pdu):
+        ert = pdu.getComponent()['earthReceiveTime']['ccsdsFormat'].asOctets()
+        latencies.append((dt.datetime.utcnow() - ert_to_datetime(ert)).total_seconds())
+
+    instance.add_handler('AnnotatedFrame', on_frame)
+    if args.service == 'rcf':
+        instance.start(None, None, virtual_channel=0)
+    else:
+        instance.start(None, None)
+    wait_for_state(instance, 'active')
+
+    # Skip the first second while the connection ramps up
+    gevent.sleep(1)
+    del latencies[:]
+    cpu_start = time.process_time()
+    wall_start = time.time()
+    gevent.sleep(args.seconds)
+    wall = time.time() - wall_start
+    cpu = time.process_time() - cpu_start
+    frames = len(latencies)
+
+    # The stop return queues up behind any frames not yet decoded
+    instance.stop()
+    wait_for_state(instance, 'ready', timeout=300)
+
+    print('Frames:            {} ({:.0f} frames/s)'.format(frames, frames / wall))
+    print('Latency ms:        p50 {:.2f} / p90 {:.2f} / p99 {:.2f} / max {:.2f}'.format(
+        *[v * 1e3 for v in percentiles(latencies)]))
+    print('User CPU / frame:  {:.1f} us'.format(cpu / frames * 1e6 if frames else 0))
+
+
+def run_uplink(args, instance):
+    latencies = []
+    rejected = [0]
+
+    def on_return(pdu):
+        if 'positiveResult' not in pdu['cltuTransferDataReturn']['result']:
+            rejected[0] += 1
+
+    instance.add_handler('CltuTransferDataReturn', on_return)
+    instance.start()
+    wait_for_state(instance, 'active')
+
+    uplink = CltuUplink(instance, window=args.window, buffer_size=args.cltu_size * args.window * 4)
+    uplink.start()
+
+    def on_result(submitted):
+        return lambda result: latencies.append(time.time() - submitted)
+
+    data = bytes(args.cltu_size)
+    cpu_start = time.process_time()
+    wall_start = time.time()
+    results = [uplink.submit(data, callback=on_result(time.time())) for _ in range(args.count)]
+    uplink.flush()
+    wall = time.time() - wall_start
+    cpu = time.process_time() - cpu_start
+
+    failed = sum(1 for r in results if not r.successful())
+    metrics = uplink.metrics()
+    uplink.stop()
+
+    instance.stop()
+    wait_for_state(instance, 'ready')
+
+    print('CLTUs:             {} ({:.0f} CLTUs/s, {} rejected, {} failed)'.format(
+        len(latencies), len(latencies) / wall, rejected[0], failed))
+    print('Submit to return:  p50 {:.2f} / p90 {:.2f} / p99 {:.2f} / max {:.2f} ms'.format(
+        *[v * 1e3 for v in percentiles(latencies)]))
+    print('Sender waits:      {} on the window, {} on buffer space'.format(
+        metrics['window_waits'], metrics['buffer_waits']))
+    print('User CPU / CLTU:   {:.1f} us'.format(cpu / args.count * 1e6))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--service', choices=['raf', 'rcf', 'cltu'], default='raf')
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--frame-rate', type=float, default=2000)
+    parser.add_argument('--frames-per-buffer', type=int, default=16)
+    parser.add_argument('--frame-size', type=int, default=1115)
+    parser.add_argument('--count', type=int, default=2000)
+    parser.add_argument('--cltu-size', type=int, default=256)
+    parser.add_argument('--window', type=int, default=16)
+    parser.add_argument('--uplink-bit-rate', type=float, default=10000000)
+    parser.add_argument('--cltu-return-delay', type=float, default=0.005)
+    args = parser.parse_args()
+
+    # Frames are forwarded to a bound socket that nobody reads from
+    sink = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sink.bind(('127.0.0.1', 0))
+    args.sink_port = sink.getsockname()[1]
+
+    proc, port = start_simulator(args)
+    try:
+        instance = make_instance(args, port)
+        instance.connect()
+        instance.bind(inst_id=INST_IDS[args.service])
+        wait_for_state(instance, 'ready')
+
+        if args.service == 'cltu':
+            run_uplink(args, instance)
+        else:
+            run_downlink(args, instance)
+
+        instance.unbind()
+        wait_for_state(instance, 'unbound')
+        instance.disconnect()
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+# Advanced Multi-Mission Operations System (AMMOS) Instrument Toolkit (AIT)
+# Bespoke Link to Instruments and Small Satellites (BLISS)
+#
+# Copyright 2017, by the California Institute of Technology. ALL RIGHTS
+# RESERVED. United States Government Sponsorship acknowledged. Any
+# commercial use must be negotiated with the Office of Technology Transfer
+# at the California Institute of Technology.
+#
+# This software may be subject to U.S. export control laws. By accepting
+# this software, the user agrees to comply with all applicable U.S. export
+# laws and regulations. User has the responsibility to obtain export licenses,
+# or other export authority as may be required before exporting such
+# information to foreign countries or providing access to foreign persons.
+
+# Usage:
+#   python sle_session_load_test.py [--associations 50] [--seconds 10]
+#                                   [--frames-per-buffer 16] [--frame-size 1115]
+#                                   [--rate 0]
+#
+# Starts one ait.dsn.sle.simulator RAF provider per association on a local
+# port, connects, binds and starts a RAF instance against each through a
+# single ait.dsn.sle.SessionManager and lets the providers stream
+# RafTransferBuffer PDUs for the given time. --rate limits each provider to
+# that many transfer buffers per second; 0 streams as fast as the session
+# accepts them. Reports the aggregate throughput,
+# the spread of PDUs decoded per association and the peak resident memory.
+import argparse
+import resource
+import socket
+import time
+
+import gevent
+
+import ait.dsn.sle
+from ait.dsn.sle.simulator import ProviderSimulator
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--associations', type=int, default=50)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--frames-per-buffer', type=int, default=16)
+    parser.add_argument('--frame-size', type=int, default=1115)
+    parser.add_argument('--rate', type=float, default=0)
+    args = parser.parse_args()
+
+    # Frames are forwarded to a bound socket that nobody reads from
+    sink = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sink.bind(('127.0.0.1', 0))
+    sink_port = sink.getsockname()[1]
+
+    servers = []
+    session = ait.dsn.sle.SessionManager()
+    for i in range(args.associations):
+        server = ProviderSimulator(frame_rate=args.rate * args.frames_per_buffer,
+                                   frames_per_buffer=args.frames_per_buffer,
+                                   frame_size=args.frame_size)
+        server.start()
+        servers.append(server)
+
+        raf = ait.dsn.sle.RAF(frame_output_port=sink_port)
+        # Values from the AIT config take precedence over keyword
+        # arguments, so point the instance at its provider directly
+        raf._inst_id = 'sagr=LSE-SSC.spack=Test.rsl-fg=1.raf=onlt{}'.format(i)
+        raf._hostnames = ['127.0.0.1']
+        raf._port = server.server_port
+        session.add(raf)
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    session.start()
+    for raf in session.services:
+        raf.connect()
+        raf.bind()
+    for raf in session.services:
+        while raf._state != 'ready':
+            gevent.sleep(0.01)
+        raf.start(None, None)
+
+    cpu_start = time.process_time()
+    gevent.sleep(args.seconds)
+    cpu = time.process_time() - cpu_start
+    metrics = session.metrics()
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    session.stop()
+    for server in servers:
+        server.stop()
+
+    decoded = [a['pdus_decoded'] for a in metrics['associations']]
+    frames = metrics['pdus_decoded'] * args.frames_per_buffer
+    print('Associations:        {}'.format(len(decoded)))
+    print('Elapsed:             {:.2f} s'.format(metrics['elapsed']))
+    print('Received:            {:.1f} MB/s'.format(metrics['bytes_per_sec'] / 1e6))
+    print('Transfer buffers:    {} ({:.0f}/s)'.format(metrics['pdus_decoded'], metrics['pdus_per_sec']))
+    print('Frames:              {} ({:.0f}/s)'.format(frames, frames / metrics['elapsed']))
+    print('Decode errors:       {}'.format(metrics['decode_errors']))
+    print('Still queued:        {}'.format(metrics['queued']))
+    print('Per association:     min {} / max {} buffers'.format(min(decoded or [0]), max(decoded or [0])))
+    print('CPU per frame:       {:.1f} us'.format(cpu / frames * 1e6 if frames else 0))
+    print('Peak RSS:            {:.1f} MB (was {:.1f} MB before connecting)'.format(
+        rss_after / 1024.0, rss_before / 1024.0))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+
+# Advanced Multi-Mission Operations System (AMMOS) Instrument Toolkit (AIT)
+# Bespoke Link to Instruments and Small Satellites (BLISS)
+#
+# Copyright 2017, by the California Institute of Technology. ALL RIGHTS
+# RESERVED. United States Government Sponsorship acknowledged. Any
+# commercial use must be negotiated with the Office of Technology Transfer
+# at the California Institute of Technology.
+#
+# This software may be subject to U.S. export control laws. By accepting
+# this software, the user agrees to comply with all applicable U.S. export
+# laws and regulations. User has the responsibility to obtain export licenses,
+# or other export authority as may be required before exporting such
+# information to foreign countries or providing access to foreign persons.
+
+# Usage:
+#   python tml_framer_benchmark.py [--megabytes 16] [--recv-size 256000]
+#                                  [--capture FILE]
+#
+# Replays a capture of TML messages through the original string-concatenating
+# framer that conn_handler used and through ait.dsn.sle.common.TMLFramer, and
+# reports the throughput of each in MB/s. Without --capture a synthetic
+# capture of RAF-sized PDUs with interleaved heartbeats is generated.
+import argparse
+import binascii
+import random
+import struct
+import time
+
+import ait.dsn.sle.common as common
+import ait.dsn.sle.utils as utils
+
+
+def build_capture(megabytes):
+    rand = random.Random(0)
+    chunks = []
+    size = 0
+    while size < megabytes * 1000000:
+        if rand.random() < 0.01:
+            msg = struct.pack(common.TML_CONTEXT_HB_FORMAT, common.TML_CONTEXT_HEARTBEAT_TYPE, 0)
+        else:
+            body = bytes(rand.getrandbits(8) for _ in range(16)) * rand.randint(16, 256)
+            msg = struct.pack(common.TML_SLE_FORMAT, common.TML_SLE_TYPE, len(body)) + body
+        chunks.append(msg)
+        size += len(msg)
+    return b''.join(chunks)
+
+
+def reads(capture, recv_size):
+    for i in range(0, len(capture), recv_size):
+        yield capture[i:i + recv_size]
+
+
+def legacy_framer(capture, recv_size):
+    ''' The framing loop formerly used by conn_handler '''
+    count = 0
+    msg = b''
+    for data in reads(capture, recv_size):
+        msg = msg + data
+        while len(msg) >= 8:
+            hdr, rem = msg[:8], msg[8:]
+            if binascii.hexlify(hdr[:4]) == b'01000000':
+                body_len = utils.hexint(hdr[4:])
+                if len(rem) < body_len:
+                    break
+                body = rem[:body_len]
+                count += 1
+                msg = msg[len(hdr) + len(body):]
+            elif binascii.hexlify(hdr[:8]) == b'0300000000000000':
+                msg = rem
+            else:
+                raise ValueError('Bad header')
+    return count
+
+
+def ring_framer(capture, recv_size):
+    count = 0
+    framer = common.TMLFramer(recv_size)
+    for data in reads(capture, recv_size):
+        framer.feed(data)
+        for _ in framer.pdus():
+            count += 1
+    return count
+
+
+def run(name, func, capture, recv_size):
+    start = time.perf_counter()
+    count = func(capture, recv_size)
+    elapsed = time.perf_counter() - start
+    mbps = len(capture) / elapsed / 1e6
+    print('{:<8} {:>8} PDUs  {:>8.3f} s  {:>10.1f} MB/s'.format(name, count, elapsed, mbps))
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--megabytes', type=int, default=16)
+    parser.add_argument('--recv-size', type=int, default=256000)
+    parser.add_argument('--capture', help='File containing a raw TML byte stream')
+    args = parser.parse_args()
+
+    if args.capture:
+        with open(args.capture, 'rb') as f:
+            capture = f.read()
+    else:
+        capture = build_capture(args.megabytes)
+
+    print('Replaying {:.1f} MB in {} byte reads'.format(len(capture) / 1e6, args.recv_size))
+    legacy = run('legacy', legacy_framer, capture, args.recv_size)
+    ring = run('ring', ring_framer, capture, args.recv_size)
+    assert legacy == ring
+
+
+if __name__ == '__main__':
+    main()
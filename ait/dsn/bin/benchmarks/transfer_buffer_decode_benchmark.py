@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+
+# Advanced Multi-Mission Operations System (AMMOS) Instrument Toolkit (AIT)
+# Bespoke Link to Instruments and Small Satellites (BLISS)
+#
+# Copyright 2017, by the California Institute of Technology. ALL RIGHTS
+# RESERVED. United States Government Sponsorship acknowledged. Any
+# commercial use must be negotiated with the Office of Technology Transfer
+# at the California Institute of Technology.
+#
+# This software may be subject to U.S. export control laws. By accepting
+# this software, the user agrees to comply with all applicable U.S. export
+# laws and regulations. User has the responsibility to obtain export licenses,
+# or other export authority as may be required before exporting such
+# information to foreign countries or providing access to foreign persons.
+
+# Usage:
+#   python transfer_buffer_decode_benchmark.py [--service raf] [--seconds 3]
+#                                              [--frames-per-buffer 16]
+#                                              [--frame-size 1115]
+#
+# Decodes the transfer buffer PDUs generated by ait.dsn.sle.simulator with
+# pyasn1 and with the ait.dsn.sle.ber walker, reading the ERT and data of
+# each annotated frame the way the AnnotatedFrame handlers do, and reports
+# the frames/s and time per frame of each.
+import argparse
+import time
+
+from pyasn1.codec.der.decoder import decode
+
+import ait.dsn.sle.ber as ber
+import ait.dsn.sle.common as common
+from ait.dsn.sle.simulator import ProviderSimulator, SERVICES
+
+
+def run(name, seconds, frames_per_buffer, decode_buffer):
+    buffers = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        for _ in range(100):
+            decode_buffer()
+        buffers += 100
+    elapsed = time.perf_counter() - start
+
+    frames = buffers * frames_per_buffer
+    print('{:8s} {:10.0f} frames/s {:8.2f} us/frame'.format(
+        name, frames / elapsed, elapsed / frames * 1e6))
+    return frames / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--service', choices=['raf', 'rcf'], default='raf')
+    parser.add_argument('--seconds', type=float, default=3)
+    parser.add_argument('--frames-per-buffer', type=int, default=16)
+    parser.add_argument('--frame-size', type=int, default=1115)
+    args = parser.parse_args()
+
+    sim = ProviderSimulator(service=args.service, frames_per_buffer=args.frames_per_buffer,
+                            frame_size=args.frame_size)
+    message = bytes(sim.transfer_buffer_template()[0][common.TML_HEADER_LEN:])
+    pdu_class = SERVICES[args.service][1]
+    name = '{}TransferBuffer'.format(args.service)
+
+    def with_pyasn1():
+        pdu = decode(message, asn1Spec=pdu_class())[0]
+        for element in pdu[name]:
+            frame = element.getComponent()
+            frame['earthReceiveTime']['ccsdsFormat'].asOctets()
+            frame['data'].asOctets()
+
+    def with_walker():
+        for frame in ber.walk_transfer_buffer(message, args.service == 'raf'):
+            frame.earth_receive_time
+            bytes(frame.data)
+
+    baseline = run('pyasn1', args.seconds, args.frames_per_buffer, with_pyasn1)
+    walker = run('walker', args.seconds, args.frames_per_buffer, with_walker)
+    print('Speedup: {:.1f}x'.format(walker / baseline))
+
+
+if __name__ == '__main__':
+    main()
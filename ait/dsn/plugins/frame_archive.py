@@ -0,0 +1,56 @@
+'''
+Implements a plugin which archives the frames it receives
+'''
+import ait
+from ait.core.server.plugins import Plugin
+from ait.core import log
+from ait.dsn.sle.archive import FrameArchive
+
+
+class FrameArchivePlugin(Plugin):
+    '''
+    Archives the frames received on its inputs to rotating, indexed segment
+    files with an ait.dsn.sle.archive.FrameArchive. Frames are stamped with
+    the time they are received by the plugin, and are passed on unchanged to
+    the output topic.
+
+    example in config.yaml:
+
+    - plugin:
+        name: ait.dsn.plugins.frame_archive.FrameArchivePlugin
+        inputs:
+            - raf_frames
+        directory: /data/frames
+        frame_type: AOSTransFrame
+        segment_size: 268435456
+        fsync_interval: 5
+    '''
+    def __init__(self, inputs=None, outputs=None, zmq_args=None, directory=None,
+                 frame_type=None, **kwargs):
+        super().__init__(inputs, outputs, zmq_args)
+
+        if directory is None:
+            directory = ait.config.get('dsn.sle.frame_archive.directory', None)
+        if directory is None:
+            raise ValueError('FrameArchivePlugin requires a directory to archive frames to')
+        if frame_type is None:
+            frame_type = ait.config.get('dsn.sle.downlink_frame_type', ait.DEFAULT_FRAME_TYPE)
+
+        options = {k: kwargs[k] for k in ('prefix', 'segment_size', 'segment_duration', 'batch_size',
+                                          'flush_interval', 'fsync_interval') if k in kwargs}
+        self.archive = FrameArchive(directory, frame_type, **options)
+        log.info(f"Archiving {frame_type} frames to {directory}")
+
+    def process(self, input_data, topic=None):
+        '''
+        archives an incoming frame and publishes it to the output topic
+
+        :param input_data: frame as bytes
+        :type input_data: bytes, bytearray
+        '''
+        self.archive.add(input_data)
+        self.archive.poll()
+        self.publish(input_data)
+
+    def __del__(self):
+        self.archive.close()
@@ -16,6 +16,7 @@
 
 
 from collections import defaultdict
+import logging
 import time
 import sys
 import traceback
@@ -26,10 +27,17 @@ from gevent.server import DatagramServer
 import gevent.monkey; gevent.monkey.patch_all()
 
 import ait
-from ait.core import api, log, ccsds
+from ait.core import api, log
 
+import ait.dsn.sle.continuity as continuity
 import ait.dsn.sle.frames as frames
+import ait.dsn.sle.mpdu as mpdu
+from ait.dsn.sle.continuity import ContinuityTracker, FrameContinuity
+from ait.dsn.proc.packet_header import APID_IDLE, unpack_primary_header
+from ait.dsn.proc.partials import PartialsLookup
+from ait.dsn.proc.reorder import SeqCountWindow
 from ait.dsn.sle.frames import AOSTransFrame, AOSConfig, AOSDataFieldType, TMTransFrame
+from ait.dsn.sle.utils import RateLimitedLog
 
 
 class Constants(object):
@@ -54,13 +62,13 @@ class Constants(object):
     NO_MODULO = sys.maxsize
 
     # Idle TM frame first hdr ptr
-    TM_FRAME_FIRST_HDR_PTR_IDLE_STR = '0b11111111110'
+    TM_FRAME_FIRST_HDR_PTR_IDLE = frames.TM_FIRST_HDR_PTR_IDLE
 
     # TM Frame first hdr ptr indicates no packets
-    TM_FRAME_FIRST_HDR_PTR_NO_PKTS_STR = '0b11111111111'
+    TM_FRAME_FIRST_HDR_PTR_NO_PKTS = frames.TM_FIRST_HDR_PTR_NO_PKTS
 
-    # Binary-String of the Idle APID
-    APID_IDLE_STR = '0b11111111111'
+    # APID of idle packets
+    APID_IDLE = APID_IDLE
 
     # Heuristic for determining when a seqcount of 0 is natural sequence
     # or a reset.
@@ -70,151 +78,11 @@ class Constants(object):
     RESET_FUZZY_DELTA = 100
     RESET_DECISION_VALUE = CCSDS_SEQCOUNT_MODULO - RESET_FUZZY_DELTA
 
-class ModuloList(object):
-    """
-    Brain-child of a desperate developer to try and maintain order
-    across a bounded range with modulo values.
-
-    The main constraint is that only up to two-thirds of the bounded range is
-    active, with two gatekeeper values which affect the internal state
-    of this list, which is at most two lists with their own sorted order.
-
-    The alpha list is the active list.  The beta list is used for values that
-    FOLLOW the alpha list, but likely have a value less than all of the alpha
-    entry values.  There, I think that makes sense?
-
-    Ultimately, the alpha list is always 'less-than' the beta list, despite
-    the actual values in those respective lists.
-
-    Based on the incoming value to be added and internal state, we determine
-    which list the value should be added to.  We also make decisions when
-    to clear-out or swap internal lists, based on gatekeeper values.
-    """
-
-    def __init__(self, modulo_val):
-        self._modulo_val = modulo_val
-        self._alpha_value = int(self._modulo_val / 3)
-        self._beta_value = 2 * self._alpha_value
-
-        self._alpha_list = []
-        self._beta_list = None
-
-    def reset_state(self):
-        if self._alpha_list:
-            self._alpha_list.clear()
-        if self._beta_list:
-            self._beta_list.clear()
-            self._beta_list = None
-
-    def get_alpha_value(self):
-        return self._alpha_value
-
-    def get_beta_value(self):
-        return self._beta_value
-
-    def get_size(self):
-        """
-        Returns the total size of this instance, across
-        both internal lists.
-        :return: Total number
-        """
-        count = len(self._alpha_list)
-        if self._beta_list:
-            count += len(self._beta_list)
-        return count
-
-    def add_value(self, val):
-        """
-        Adds a value to this list, assuming it is a legal value (non-negative
-        and less than modulus-field).
-        :param val: Value to be added
-         :return:  True if val is added, False otherwise
-        """
-
-        if val is None:
-            return False
-
-        if val > self._modulo_val or val < 0:
-            return False
-
-        target_list = None
-
-        # This is the special logic where we need to determine
-        # to which list (alpha,beta) the val should be
-        # added.
-        if val < self._alpha_value:
-            if self._beta_list is not None:
-                target_list = self._beta_list
-            else:
-                target_list = self._alpha_list
-        # This case we check if we reached the point of advancing
-        # existing beta list as the new alpha list.  Val will
-        # be added to whatever is the alpha list at the end
-        elif self._alpha_value <= val < self._beta_value:
-            if self._beta_list is not None:
-                self.clean_alpha()
-                self._alpha_list = self._beta_list
-                self._beta_list = None
-            target_list = self._alpha_list
-        # Final case where we realize we need to prep a new
-        # beta list for the future.  Val will be added to
-        # the existing alpha list.
-        else:
-            if not self._beta_list:
-                self._beta_list = []
-            target_list = self._alpha_list
-
-        # Sort is easy now that cross-range sorting is handled by this
-        # class
-        target_list.append(val)
-        target_list.sort()
-        return True
-
-    def contains_value(self, val):
-        """
-        Returns True if val is found in any of the internal lists
-        :param val: Value to search for
-        :return: True if val found, False otherwise
-        """
-
-        return val in self._alpha_list or (self._beta_list and val in self._beta_list)
-
-    def remove_value(self, val):
-        if val in self._alpha_list:
-            return self._alpha_list.remove(val)
-        elif val in self._beta_list:
-            return self._beta_list.remove(val)
-        else:
-            return False
-
-    def clean_alpha(self):
-        """
-        Utility method that clears the alpha list, while perform a check
-        and warning if the list was non-empty.
-        """
-        if len(self._alpha_list) != 0:
-            log.warn("ModuloList is advancing to next state but the old alpha list is non-empty "
-                                 "(maybe a result of sequence count reset?)")
-            self._alpha_list.clear()
-
-    def get_next_value(self):
-        """
-        Returns the next in-order value from this class, using class logic.
-        :return: Next value available, or None if no value available
-        """
-        return self._alpha_list[0] if len(self._alpha_list) > 0 else None
-
-    def get_values_in_order(self):
-        """
-        Returns a new list containing all maintained values, where values are
-        sorted using the class modulo sort logic.
-        :return: List of values
-        """
-        r_list = []
-        r_list += self._alpha_list
-        if self._beta_list:
-            r_list += self._beta_list
-        return r_list
+    # Heuristic for determining whether a seqcount is older than the last
+    # one sent across rollover.  A seqcount in the upper third is older
+    # than a last sent in the lower third, and vice versa.
+    SEQCOUNT_LOWER_THIRD = CCSDS_SEQCOUNT_MODULO // 3
+    SEQCOUNT_UPPER_THIRD = 2 * SEQCOUNT_LOWER_THIRD
 
 
 class ApidInfo(object):
@@ -245,9 +113,12 @@ class ApidInfo(object):
         self._reset_packet = None
 
         # Create data structures
-        self._seq_counts = ModuloList(Constants.CCSDS_SEQCOUNT_MODULO)
+        self._seq_counts = SeqCountWindow(Constants.CCSDS_SEQCOUNT_MODULO)
         self._packet_dict = {}
 
+        ## Packets dropped for arriving too late, logged at most once a minute
+        self.late_count = 0
+        self._late_log = RateLimitedLog('error', 60)
 
     @staticmethod
     def get_sequence_count(packet):
@@ -258,8 +129,7 @@ class ApidInfo(object):
         """
         if len(packet) < Constants.CCSDS_PRIMARY_HEADER_LEN:
             return None
-        ccsds_hdr = ccsds.CcsdsHeader(packet[0:7])
-        return ccsds_hdr.seqcount
+        return unpack_primary_header(packet)[1]
 
 
     def should_skip_packet(self, seq_count):
@@ -275,14 +145,11 @@ class ApidInfo(object):
             return False
 
         # Case where seq_count is 'older' but has higher value compared to 'latest'
-        # use the same heuristic as the ModuloList
-        ##print(" last sent = " + str(self._lastSeqCountSent) + " alpha = "+str(self._seq_counts.get_alpha_value())+"; beta = "+str(self._seq_counts.get_beta_value()) )
-
-        if self._lastSeqCountSent < self._seq_counts.get_alpha_value() and \
-                seq_count > self._seq_counts.get_beta_value():
+        if self._lastSeqCountSent < Constants.SEQCOUNT_LOWER_THIRD and \
+                seq_count > Constants.SEQCOUNT_UPPER_THIRD:
             return True
-        elif self._lastSeqCountSent > self._seq_counts.get_beta_value() and \
-                seq_count < self._seq_counts.get_alpha_value():
+        elif self._lastSeqCountSent > Constants.SEQCOUNT_UPPER_THIRD and \
+                seq_count < Constants.SEQCOUNT_LOWER_THIRD:
             return False
         elif seq_count < self._lastSeqCountSent:
             return True
@@ -307,8 +174,7 @@ class ApidInfo(object):
         :return: True if packet was removed, False otherwise
         """
 
-        if self._seq_counts.contains_value(seq_count):
-            self._seq_counts.remove_value(seq_count)
+        if self._seq_counts.remove_value(seq_count):
             self._packet_dict.pop(seq_count)
             return True
         return False
@@ -332,7 +198,7 @@ class ApidInfo(object):
         """Perform mod on value, using CSSDS Sequence Count max as the modulus"""
         return value % Constants.CCSDS_SEQCOUNT_MODULO
 
-    def add_packet(self, packet):
+    def add_packet(self, packet, seq_count=None):
         """
         Performs checks on the packet, such as: packet length too shot or packet
         appears to be have arrived to late, and drops it those cases.
@@ -340,13 +206,15 @@ class ApidInfo(object):
         accordingly.
         Finally adds the packet to our internal records
         :param packet: Packet to be added
+        :param seq_count: Sequence count of the packet, if already read from its header
         """
         # If packet length doesn't even cover the header, then its a problem
         if len(packet) < Constants.CCSDS_PRIMARY_HEADER_LEN:
             log.error("Packet is not legal CCSDS-packet")
             return
 
-        seq_count = ApidInfo.get_sequence_count(packet)
+        if seq_count is None:
+            seq_count = ApidInfo.get_sequence_count(packet)
 
         # Check cases where:
         # 1) there is no lastSent,
@@ -365,7 +233,9 @@ class ApidInfo(object):
 
         # We may have received a packet AFTER we decided to skip it, so perform a check
         if self.should_skip_packet(seq_count):
-            log.error("CCSDS packet with APID '"+str(self.apid)+"' and SeqCount '"+str(seq_count)+" arrived too late to process, dropping it.")
+            self.late_count += 1
+            self._late_log('late', "CCSDS packet with APID '{}' and SeqCount '{}' arrived too late "
+                           "to process, dropping it.".format(self.apid, seq_count))
             return
 
         # All is well, add seq_count and packet
@@ -440,172 +310,6 @@ class ApidInfo(object):
             self._lastSeqCountSent = ApidInfo.mod(seq_count - 1)
 
 
-class PartialsLookup(object):
-    """
-    Maintains a lookup of start and end packet partials extracted from Frames.
-    Note: The primary key is the uniqueId (Frame masterId + virtualChannelId)
-    """
-
-    # Type/Keys used for identifying partials type
-    TYPE_START = 'starts'
-    TYPE_END = 'ends'
-
-    HISTORY_MAX = 1500
-    HISTORY_RATIO_CLEANUP = 0.25
-
-    DEFAULT_HOUSEKEEPING = True
-    DEFAULT_MODULUS = Constants.NO_MODULO
-
-    def __init__(self, housekeeping=DEFAULT_HOUSEKEEPING, modulus=DEFAULT_MODULUS):
-        """
-        Constructor
-        :param housekeeping: Flag indicating if we will perform internal house-keeping
-        :param modulus: Frame-specific modulo value
-        """
-        # The topmost dictionary for storing partials
-        self._lookup = {}
-
-        # History list contains tuples of entries so we can track
-        # the order of when partials were added
-        self._history = []
-
-        # If true, when number of remaining partials exceeds an amount, perform cleanup
-        self._perform_housekeeping =  housekeeping
-
-        # Frame-specific modulus value, needed when calculating relative
-        # partials indices, since previous/next partials may cross the
-        # mod-boundary
-        self._frame_modulus = modulus if modulus > 0 else PartialsLookup.DEFAULT_MODULUS
-
-    def add_partial(self, primaryId, partialId, type, partial):
-        """
-        Adds a partial, passing in needed index values and partial type
-        :param primaryId: Frame unique id
-        :param partialId: Frame count associated with packet
-        :param type: Partial type, START or END
-        :param partial: The partial instance
-        """
-        # If first time seeing uniqueId add basic lookup info
-        if primaryId not in self._lookup:
-            temp_dict = {PartialsLookup.TYPE_START: {},
-                         PartialsLookup.TYPE_END: {}}
-            self._lookup[primaryId] = temp_dict
-
-        the_dict = self._lookup[primaryId]
-        inner_dict = the_dict[type]
-        inner_dict[partialId] = partial
-
-        # Add history entry
-        history_entry = (primaryId, partialId, type, time.time())
-        self._history.append(history_entry)
-
-
-    def remove_partial(self, primaryId, partialId, type):
-        """
-        Removes a partial entry
-        :param primaryId: Frame unique id
-        :param partialId: Frame count associated with packet
-        :param type: Partial type, START or END
-        :return: True if partial removed, False otherwise
-        """
-        if primaryId not in self._lookup:
-            return False
-        the_dict = self._lookup[primaryId]
-        inner_dict = the_dict[type]
-
-        if partialId not in inner_dict:
-            return False
-
-        inner_dict.pop(partialId, None)
-
-        # Remove history entry (todo smarter way to do this?)
-        history_entries = [entry for entry in self._history if entry[0] == primaryId and
-                           entry[1] == partialId and entry[2] == type]
-        for entry in history_entries:
-            self._history.remove(entry)
-
-        return True
-
-    def get_partial(self, primaryId, partialId, type):
-        """
-        Returns a partial entry
-        :param primaryId: Frame unique id
-        :param partialId: Frame count associated with packet
-        :param type: Partial type, START or END
-        :return: Partial mapped by the provided arguments, or None
-        """
-
-        if primaryId not in self._lookup:
-            return None
-        the_dict = self._lookup[primaryId]
-        inner_dict = the_dict[type]
-
-        if partialId not in inner_dict:
-            return None
-
-        return inner_dict[partialId]
-
-    def contains_partial(self, primaryId, partialId, type):
-        """
-        Returns whether a partial is found in this instanc
-        :param primaryId: Frame unique id
-        :param partialId: Frame count associated with packet
-        :param type: Partial type, START or END
-        :return: True if partial if managed by this instance, False otherwise
-        """
-        if primaryId not in self._lookup:
-            return False
-        the_dict = self._lookup[primaryId]
-        inner_dict = the_dict[type]
-
-        if partialId not in inner_dict:
-            return False
-
-        return True
-
-
-    def perform_cleanup(self):
-        """
-        Perform cleanup if enabled and if the number of entries
-        exceeds the maximum number of entries.
-        """
-        if not self._perform_housekeeping:
-            return
-
-        if len(self._history) >= PartialsLookup.HISTORY_MAX:
-            remove_count = int(PartialsLookup.HISTORY_MAX * PartialsLookup.HISTORY_RATIO_CLEANUP)
-            log.debug("PartialsLookup is performing cleanup by removing the "+str(remove_count)+" oldest entries")
-            for idx in range(remove_count):
-                if idx < len(self._history):
-                    entry = self._history[0]
-                    self.remove_partial(entry[0],entry[1],entry[2])
-
-    def mod(self, value):
-        """
-        Returns the value % frame_modulos, typically the same value except for boundary cases
-        :param value: Value to be mod'd
-        :return: Mod'd value
-        """
-        return value % self._frame_modulus
-
-    def contains_complement_for(self, primaryId, partialId, type):
-        """
-        Returns True if complementary partial is being managed, False otherwise
-        """
-        (lookup_index, lookup_type) = PartialsLookup.get_complement_fields(partialId, type)
-        return self.contains_partial(primaryId, lookup_index, lookup_type)
-
-    def get_complement_fields(self, partialId, type):
-        """
-        Returns a tuple representing the complementary partial to the
-        input arguments
-        """
-        lookup_type = PartialsLookup.TYPE_START if type == PartialsLookup.TYPE_END else PartialsLookup.TYPE_END
-        lookup_index = (partialId - 1) if partialId == PartialsLookup.TYPE_END else (partialId + 1)
-        lookup_index = self.mod(lookup_index)
-        return (lookup_index, lookup_type)
-
-
 class Processor(object):
 
     """
@@ -648,22 +352,48 @@ class Processor(object):
         # Keep track of last time cleanup was performed
         self._last_cleanup_time = time.time()
 
-        # Queue for incoming transfer frames
-        self._frame_queue = api.GeventDeque(maxlen=1000)
+        # Queue for incoming transfer frames, bounded by the frame service
+        self._frame_queue = api.GeventDeque()
+
+        # Maximum number of frames handled before yielding to the frame service
+        self._ingest_batch_size = ait.config.get('dsn.proc.ingest_batch_size',
+                                                 kwargs.get('ingest_batch_size', 64))
 
         # The APID info structs registry, with apid value mapping to ApidInfo instances
         self._apid_lookup = {}
 
+        # Counts of packets emitted for each APID, and of idle packets dropped
+        self._emit_counts = defaultdict(int)
+        self._idle_count = 0
+
         # Partials manager, handles partials extracted from transfer frames
         t_partials_housecleaning = self._gap_max > 0
         t_frame_mod = Processor.get_modulus_for_frame(self._downlink_frame_type)
+        t_partials_max_count = ait.config.get('dsn.proc.partials_max_count',
+                                              kwargs.get('partials_max_count',
+                                                         PartialsLookup.HISTORY_MAX))
+        t_partials_max_age = ait.config.get('dsn.proc.partials_max_age',
+                                            kwargs.get('partials_max_age',
+                                                       PartialsLookup.DEFAULT_MAX_AGE))
         self._partials_lookup = PartialsLookup(housekeeping=t_partials_housecleaning,
-                                               modulus=t_frame_mod)
+                                               modulus=t_frame_mod,
+                                               max_count=t_partials_max_count,
+                                               max_age=t_partials_max_age)
+
+        # TM frames may end with a frame error control field, which is not
+        # part of their data field
+        self._tm_fecf_included = ait.config.get('dsn.sle.tm.frame_error_control_field_included',
+                                                kwargs.get('tm_frame_error_control_field_included', False))
 
-        # The AIT TMFrame parser currently makes no attempt to handle partial packets.
-        # We have some code that handles either, and this flag indicates which
-        # path to follow
-        self._handle_tmframe_partials = False
+        # Frame count continuity of each master/virtual channel, with gaps
+        # logged at most once a minute per channel
+        self._continuity = ContinuityTracker(self._downlink_frame_type)
+        self._continuity_log = RateLimitedLog('warn', 60)
+
+        # Packets joined from partials whose length does not match their
+        # header, logged at most once a minute per channel
+        self._mismatched_count = 0
+        self._mismatched_log = RateLimitedLog('warn', 60)
 
         # Frame service (listens to incoming port and populates queue with transfer frames)
         self._frame_service = Frame_Service(self._frame_queue, **kwargs)
@@ -726,30 +456,21 @@ class Processor(object):
             log.error("Received CCSDS packet that is too short. Dropping it.")
             return False
 
-        # Get packet header and create CCSDS header
-        pkt_hdr = packet[0:7]
-        ccsds_hdr = ccsds.CcsdsHeader(pkt_hdr)
-
-        apid = ccsds_hdr.apid
+        # Read the packet header fields in place
+        (apid, seq_count, _) = unpack_primary_header(packet)
 
         # Check for Idle APID
-        apid_bin_str = str(bin(apid))
-        if apid_bin_str == Constants.APID_IDLE_STR:
+        if apid == Constants.APID_IDLE:
+            self._idle_count += 1
             log.debug("Received an Idle CCSDS packet. Dropping it.")
             return False
 
-        seq_count = ccsds_hdr.seqcount
-        data_len = ccsds_hdr.length + 1
-
-        ccsds_pkt_len = data_len + Constants.CCSDS_PRIMARY_HEADER_LEN
-
-        if not apid in self._apid_lookup.keys():
-            tmp_lookup = ApidInfo(apid, self._gap_max)
-            self._apid_lookup[apid] = tmp_lookup
-
         apid_info = self._apid_lookup.get(apid)
+        if apid_info is None:
+            apid_info = ApidInfo(apid, self._gap_max)
+            self._apid_lookup[apid] = apid_info
 
-        apid_info.add_packet(packet)
+        apid_info.add_packet(packet, seq_count)
 
         ## Special Check if we should purge all packets (i.e. a RESET was sent)
         if apid_info.is_reset_state():
@@ -811,7 +532,10 @@ class Processor(object):
         apid_info.setLastPacketEmitTime(l_now)
         apid_info.setLastSeqCountSent(seqcount)
 
-        print("Emitting CCSDS packet with APID "+str(apid_info.apid)+" and SeqCount "+str(seqcount)+" downstream")
+        self._emit_counts[apid_info.apid] += 1
+        if log.logger.isEnabledFor(logging.DEBUG):
+            log.debug("Emitting CCSDS packet with APID %d and SeqCount %d downstream",
+                      apid_info.apid, seqcount)
         self.emit_packet(packet)
 
     def emit_packet(self, packet):
@@ -839,16 +563,10 @@ class Processor(object):
         #if self._partials_lookup.contains_partial(uniqueId, partialId, type):
 
         (lookup_id, lookup_type) = self._partials_lookup.get_complement_fields(partialId, type)
-        if self._partials_lookup.contains_partial(uniqueId, lookup_id, lookup_type):
-
-            complement = self._partials_lookup.get_partial(uniqueId, lookup_id, lookup_type)
-            if not complement:
-                log.error("Missing expected component partial for {}-{}-{}".format(
-                                   str(uniqueId),str(partialId),str(type)))
-                return
 
-            # Cleanup the lookup by removing the complement partial
-            self._partials_lookup.remove_partial(uniqueId, lookup_id, lookup_type)
+        # Take the complement partial out of the lookup, if it is there
+        complement = self._partials_lookup.pop_partial(uniqueId, lookup_id, lookup_type)
+        if complement is not None:
 
             #  Create the full combined packet
             if type == PartialsLookup.TYPE_START:
@@ -856,6 +574,17 @@ class Processor(object):
             else:
                 full_pkt = complement + partial_pkt
 
+            ## Partials of different packets may share frame counts, such as
+            ## when the frame count wrapped since one was added, so the
+            ## packet must match the length in its header
+            if len(full_pkt) < Constants.CCSDS_PRIMARY_HEADER_LEN or \
+                    unpack_primary_header(full_pkt)[2] + 7 != len(full_pkt):
+                self._mismatched_count += 1
+                self._mismatched_log(uniqueId, "Dropping packet of " + str(len(full_pkt)) +
+                                     " bytes joined from partials on channel " + uniqueId +
+                                     " not matching its header length")
+                return
+
             self.handle_full_packet(full_pkt)
 
         else:
@@ -863,21 +592,119 @@ class Processor(object):
             self._partials_lookup.add_partial(uniqueId, partialId, type, partial_pkt)
 
 
+    def handle_continuation_packet(self, uniqueId, frameCount, continuation):
+        """
+        Given the middle of a packet spanning a whole frame, joins it to the
+        start partial trailing the previous frame, or else to the end partial
+        leading the next frame, and handles the joined partial in its place.
+        A continuation found with neither is dropped.
+        :param uniqueId: Id of the channel (master + virtual) for the packet
+        :param frameCount: Frame count of the frame holding the continuation
+        :param continuation: The data field of the frame
+        """
+        start = self._partials_lookup.pop_partial(uniqueId, frameCount,
+                                                  PartialsLookup.TYPE_START)
+        if start is not None:
+            self.handle_partial_packet(uniqueId, self.mod(frameCount + 1),
+                                       PartialsLookup.TYPE_START, start + continuation)
+            return
+
+        end = self._partials_lookup.pop_partial(uniqueId, frameCount,
+                                                PartialsLookup.TYPE_END)
+        if end is not None:
+            self.handle_partial_packet(uniqueId, self.mod(frameCount - 1),
+                                       PartialsLookup.TYPE_END, continuation + end)
+            return
+
+        log.debug("Dropping packet continuation of frame " + str(frameCount) +
+                  " on channel " + uniqueId + " with no partial to join")
+
     def handle_frame(self, frame):
         """
         Given a frame object, determines if it is supported and if so, processes it.
         Otherwise the frame will be dropped with message indicating such.
         :param frame: Frame object
         """
-        if isinstance(frame, frames.AOSTransFrame):
+        if isinstance(frame, (frames.AOSTransFrame, frames.AOSFrameView)):
+            self.track_continuity(frame)
             self.handle_aos_frame(frame)
-        elif isinstance(frame, frames.TMTransFrame):
+        elif isinstance(frame, (frames.TMTransFrame, frames.TMFrameView)):
+            self.track_continuity(frame)
             self.handle_tm_frame(frame)
         else:
             frame_class = frame.__class__.__name__
             log.warn("Received frame with unsupported type '"+frame_class+"', dropping it.")
             return
 
+    def track_continuity(self, frame):
+        """
+        Tracks the virtual channel frame count of a frame, logging frames
+        skipped by the count on its channel.
+        :param frame: AOS or TM Frame
+        :return: The FrameContinuity of the frame
+        """
+        if isinstance(frame, (frames.AOSTransFrame, frames.AOSFrameView)):
+            frame_ct = int.from_bytes(frame['virtual_channel_frame_count'], byteorder='big')
+            modulus = continuity.AOS_COUNT_MODULUS
+            if frame['virtual_channel_frame_count_cycle_use_flag']:
+                frame_ct |= frame['virtual_channel_frame_count_cycle'] << 24
+                modulus = continuity.AOS_CYCLE_COUNT_MODULUS
+        else:
+            frame_ct = frame['virtual_chan_frame_count']
+            modulus = continuity.TM_COUNT_MODULUS
+
+        channel = (frame.master_channel_id, frame.virtual_channel)
+        status = self._continuity.update(channel[0], channel[1], frame_ct, modulus)
+        if status is FrameContinuity.GAP:
+            self._continuity_log(channel, "Frame count gap on channel {}-{} before frame {}".format(
+                channel[0], channel[1], frame_ct))
+        return status
+
+    @property
+    def partials_stats(self):
+        """
+        Returns the counts of partial packets paired, evicted, expired and
+        orphaned, as returned by
+        ait.dsn.proc.partials.PartialsLookup.metrics, and of packets joined
+        from partials dropped for not matching their header length
+        """
+        metrics = self._partials_lookup.metrics()
+        metrics['mismatched'] = self._mismatched_count
+        return metrics
+
+    @property
+    def emit_stats(self):
+        """
+        Returns the counts of packets emitted, in total and for each APID, of
+        idle packets dropped and of packets dropped for arriving too late
+        """
+        return {
+            'emitted': sum(self._emit_counts.values()),
+            'emitted_by_apid': dict(self._emit_counts),
+            'idle': self._idle_count,
+            'late': sum(apid_info.late_count for apid_info in self._apid_lookup.values())
+        }
+
+    @property
+    def continuity_stats(self):
+        """
+        Returns the frame count continuity counters of each channel, as
+        returned by ait.dsn.sle.continuity.ContinuityTracker.metrics
+        """
+        return self._continuity.metrics()
+
+    def handle_frames(self, datagrams):
+        """
+        Decodes and handles a batch of frames, as received by the frame
+        service, dropping those the frame service does not accept
+        :param datagrams: Sequence of frame bytes
+        """
+        decode = self._frame_service.decode
+        for data in datagrams:
+            frame = decode(data)
+            if frame is not None:
+                self.handle_frame(frame)
+
     def handle_aos_frame(self, aos_frame):
         """
         AOS Frame handling, checks that frame is support, then grabs needed
@@ -902,48 +729,27 @@ class Processor(object):
 
         pkt_hdr_ptr = aos_frame['mpdu_first_hdr_ptr']
         pkt_zone = aos_frame['mpdu_packet_zone']
-        pkt_zone_end = len(pkt_zone)
 
         # These are the partial IDs relative to our frame count
         previous_partial_id = self.mod(frame_ct - 1)
         next_partial_id = self.mod(frame_ct + 1)
 
-        current_start_idx = 0
-        current_end_idx = None
-
-
-        # Indicates an 'end' partial (missing its beginning)
-        if pkt_hdr_ptr != 0:
-            previous_partial = pkt_zone[0:pkt_hdr_ptr]
-
-            self.handle_partial_packet(frame_id, previous_partial_id,
-                                       PartialsLookup.TYPE_END, previous_partial)
-
-        # Init start index
-        current_start_idx = pkt_hdr_ptr
-
-        # Iterate while start index less than end of packet zone
-        while current_start_idx < pkt_zone_end:
-
-            # Determine if next available is full packet or partial
-            (pkt_length, pkt_is_partial) = self.examine_next_cssds_packet(pkt_zone, current_start_idx)
-
-            # Indicates a 'start' partial (missing its ending)
-            if pkt_is_partial:
-                next_partial = pkt_zone[current_start_idx:pkt_zone_end]
+        ## The packet zone is walked by offset, as for TM frames. The zone
+        ## is bytes, so each packet is sliced out of it once.
+        for segment, pkt in mpdu.iter_mpdu_packets(pkt_zone, pkt_hdr_ptr):
+            if segment is frames.TMPacketSegment.PACKET:
+                self.handle_full_packet(bytes(pkt))
+            elif segment is frames.TMPacketSegment.LEADING_PARTIAL:
+                ## An 'end' partial (missing its beginning)
+                self.handle_partial_packet(frame_id, previous_partial_id,
+                                           PartialsLookup.TYPE_END, bytes(pkt))
+            elif segment is frames.TMPacketSegment.TRAILING_PARTIAL:
+                ## A 'start' partial (missing its ending)
                 self.handle_partial_packet(frame_id, next_partial_id,
-                                           PartialsLookup.TYPE_START, next_partial)
-                current_start_idx = pkt_zone_end
-            else:
-                current_end_idx = current_start_idx + pkt_length
-                current_packet = pkt_zone[current_start_idx:current_end_idx]
-
-                self.handle_full_packet(current_packet)
-
-                # Alert partials lookup of this full packet (supports cleanup)
-                # self._partials_lookup.set_last_full_frame_count(frame_id, frame_ct)
-
-                current_start_idx += pkt_length
+                                           PartialsLookup.TYPE_START, bytes(pkt))
+            elif segment is frames.TMPacketSegment.CONTINUATION:
+                ## The middle of a packet spanning the frame
+                self.handle_continuation_packet(frame_id, frame_ct, bytes(pkt))
 
         return True
 
@@ -957,100 +763,41 @@ class Processor(object):
         """
 
         # Create the unique ID by combining master + virtual channel id
-        frame_id = tm_frame.master_channel_id + tm_frame.virtual_channel
+        frame_id = str(tm_frame.master_channel_id) + '-' + str(tm_frame.virtual_channel)
 
         # Retrieve frame count
         frame_ct = tm_frame['virtual_chan_frame_count']
 
         pkt_hdr_ptr = tm_frame['first_hdr_ptr']
-        pkt_hdr_ptr_str = str(bin(pkt_hdr_ptr))
 
-        if pkt_hdr_ptr_str == Constants.TM_FRAME_FIRST_HDR_PTR_IDLE_STR:
+        if pkt_hdr_ptr == Constants.TM_FRAME_FIRST_HDR_PTR_IDLE:
             log.debug("Processor received IDLE TM frame, dropping it.")
             return False
-        elif pkt_hdr_ptr_str == Constants.TM_FRAME_FIRST_HDR_PTR_NO_PKTS_STR:
-            log.debug("Processor received TM frame with no packets, dropping it.")
-            return False
-
-
-        ## Currently, TMFrame handles the breakup of packets internally
-        ## So processing here will differ from AOS where we have to
-        ## get the CCSDS packets ourselves
-        pkt_array = tm_frame._data
-        pkt_array_len = 0 if not pkt_array else len(pkt_array)
 
-        if pkt_array_len == 0:
-            return False
-
-        if not self._handle_tmframe_partials:
-            for current_packet in pkt_array:
-                self.handle_full_packet(current_packet)
-        else:
-
-            ## These are the partial IDs relative to our frame count
-            previous_partial_id = self.mod(frame_ct - 1)
-            next_partial_id = self.mod(frame_ct + 1)
-
-            ## Assume first packet is complete
-            current_pkt_idx = 0
-            last_pkt_idx = pkt_array_len - 1
+        ## These are the partial IDs relative to our frame count
+        previous_partial_id = self.mod(frame_ct - 1)
+        next_partial_id = self.mod(frame_ct + 1)
 
-            ## Indicates an 'end' partial (missing its beginning)
-            if pkt_hdr_ptr != 0:
-                previous_partial = pkt_array[0]
+        ## The frame reports which of its packets are partial. Packets are
+        ## viewed in place and only copied when handed on, as they may be
+        ## held by the APID and partials records beyond this frame.
+        for segment, pkt_view in tm_frame.iter_packets(self._tm_fecf_included):
+            if segment is frames.TMPacketSegment.PACKET:
+                self.handle_full_packet(pkt_view.tobytes())
+            elif segment is frames.TMPacketSegment.LEADING_PARTIAL:
+                ## An 'end' partial (missing its beginning)
                 self.handle_partial_packet(frame_id, previous_partial_id,
-                                           PartialsLookup.TYPE_END, previous_partial)
-                ## First full packet at index 1
-                current_pkt_idx = 1
-
-            ## Process the full packets
-            for index in range(current_pkt_idx, last_pkt_idx):
-                current_packet = pkt_array[index]
-                self.handle_full_packet(current_packet)
-
-            ## Last packet might be partial, might be complete.
-            ## Check and handle appropriately
-            last_packet = pkt_array[last_pkt_idx]
-            (pkt_length, pkt_is_partial) = self.examine_next_cssds_packet(last_packet, 0)
-            if pkt_is_partial:
+                                           PartialsLookup.TYPE_END, pkt_view.tobytes())
+            elif segment is frames.TMPacketSegment.TRAILING_PARTIAL:
+                ## A 'start' partial (missing its ending)
                 self.handle_partial_packet(frame_id, next_partial_id,
-                                           PartialsLookup.TYPE_START, last_packet)
-            else:
-                self.handle_full_packet(last_packet)
+                                           PartialsLookup.TYPE_START, pkt_view.tobytes())
+            elif segment is frames.TMPacketSegment.CONTINUATION:
+                ## The middle of a packet spanning the frame
+                self.handle_continuation_packet(frame_id, frame_ct, pkt_view.tobytes())
 
         return True
 
-    def examine_next_cssds_packet(self, bytes, start_idx):
-        """
-        Helper method that examines a set of bytes from the 'bytes' starting
-        from start_idx and determines if the full packet can be extracted or
-        of only a partial exists.
-        :param bytes: A byte array
-        :param start_idx: Start index of the potential packet
-        :return: Tuple capturing 1) the affected packets length and 2) if it is a partial
-        """
-
-        ccsds_pkt_len = None
-        ccsds_pkt_partial = False
-
-        total_bytes = len(bytes)
-
-        len_start_idx = start_idx + Constants.CCSDS_HDR_PKT_LEN_START_IDX  #inclusive
-        len_end_idx = start_idx + Constants.CCSDS_HDR_PKT_LEN_END_IDX    #non-inclusive
-
-        if len_end_idx > total_bytes:
-            ccsds_pkt_partial = True
-        else:
-            pkt_len_bytes = bytes[len_start_idx:len_end_idx]
-            pkt_len = int.from_bytes(pkt_len_bytes, byteorder='big') + 1
-            ccsds_pkt_len = pkt_len + Constants.CCSDS_PRIMARY_HEADER_LEN
-            if (start_idx + ccsds_pkt_len) > total_bytes:
-                ccsds_pkt_partial = True
-
-        rtn_val = (ccsds_pkt_len, ccsds_pkt_partial)
-        return rtn_val
-
-
     def run(self):
         """
         The entry point of the processor.  Starts the frame service to accept incoming
@@ -1059,13 +806,11 @@ class Processor(object):
         """
         self._frame_service.start()
 
+        queue = self._frame_queue
         while not self._frame_service.closed:
             try:
                 log.debug("Polling frame queue...")
-                frame, timestamp = self._frame_queue.popleft(timeout=self._timer_poll)
-
-                if frame is not None:
-                    self.handle_frame(frame)
+                batch = [queue.popleft(timeout=self._timer_poll)]
 
             except IndexError:
                 # If no frame has been received by the serice
@@ -1076,8 +821,16 @@ class Processor(object):
                 print(clean_msg)
 
                 self.perform_cleanup_check()
+                continue
+
+            ## Take the frames queued behind the first without waiting, then
+            ## let the frame service read the socket again
+            for _ in range(min(len(queue), self._ingest_batch_size - 1)):
+                batch.append(queue.popleft(block=False))
+            self.handle_frames(batch)
+            gevent.sleep(0)
 
-        ait.info("Incoming-frame service is now closed.")
+        log.info("Incoming-frame service is now closed.")
 
     def stop(self):
         """
@@ -1091,7 +844,15 @@ class Frame_Service(DatagramServer):
     """
   	UDP Datagram server that handles incoming messages TMFrames/AOSFrames from frame
   	output port of the upstream service (AIT DSN RAF/RCF server?)
+
+    Each time the socket is readable, the datagrams waiting on it are read
+    in a batch, without blocking, and handled together on the event loop
+    rather than by a greenlet each.  Frames are queued undecoded; the
+    consumer decodes them with decode().
    	"""
+
+    # Largest datagram read from the socket, bytes
+    MAX_DATAGRAM_LEN = 8192
     def __init__(self, framequeue, *args, **kwargs):
         """
         Constructor
@@ -1113,30 +874,117 @@ class Frame_Service(DatagramServer):
                                                    kwargs.get('downlink_frame_type',
                                                               ait.DEFAULT_FRAME_TYPE))
 
-        # Grab the class from frames only once
-        self._tm_frame_class = getattr(frames, self._downlink_frame_type)
-
-        # Inform server of the address to listen
+        # Grab the class from frames only once, preferring the lazily
+        # decoded view of the frame type where there is one
+        self._tm_frame_class = frames.FRAME_VIEW_CLASSES.get(self._downlink_frame_type)
+        if self._tm_frame_class is None:
+            self._tm_frame_class = getattr(frames, self._downlink_frame_type)
+
+        # Drops frames whose frame error control field is configured to be
+        # verified and does not match
+        self._fecf_check = frames.FecfCheck(self._downlink_frame_type)
+
+        # Maximum number of datagrams read from the socket at a time
+        self._batch_size = ait.config.get('dsn.proc.ingest_batch_size',
+                                          kwargs.get('ingest_batch_size', 64))
+
+        # Frames received while the queue holds this many are dropped
+        self._queue_max = ait.config.get('dsn.proc.frame_queue_max',
+                                         kwargs.get('frame_queue_max', 1000))
+
+        self._counters = {
+            'received': 0,
+            'batches': 0,
+            'overflows': 0
+        }
+        self._overflow_log = RateLimitedLog('warn', 60)
+        self._read_error_log = RateLimitedLog('warn', 60)
+
+        # Inform server of the address to listen, handling datagrams on
+        # the event loop instead of spawning a greenlet for each
         listener = (self._listening_host, self._listening_port)
-        super(Frame_Service, self).__init__(listener)
+        super(Frame_Service, self).__init__(listener, spawn=None)
 
-    def handle(self, data, address):
+    def do_read(self):
         """
-        This handler is called whenever a message is received by the DatagramServer;
-        capturing that message data and putting it into the field queue for downstream
-        processing
-        :param data: The data of the message received
-        :param address: The address that sent the message
+        Reads the datagrams waiting on the socket, up to the batch size,
+        without blocking.  An error reading the socket ends the batch, and
+        is only raised if no datagram was read before it.
+        :return: Tuple of the list of datagrams read, or None if there were none
         """
+        datagrams = []
+        recv = self._socket.recv
+        for _ in range(self._batch_size):
+            try:
+                datagrams.append(recv(Frame_Service.MAX_DATAGRAM_LEN))
+            except BlockingIOError:
+                break
+            except OSError as e:
+                ## Hand on the datagrams already read; an error that
+                ## persists is raised by the next read
+                if not datagrams:
+                    raise
+                self._read_error_log('read', 'Error reading frames: {}'.format(e))
+                break
 
+        if not datagrams:
+            return None
+        self._counters['received'] += len(datagrams)
+        self._counters['batches'] += 1
+        return (datagrams,)
+
+    def handle(self, datagrams):
+        """
+        This handler is called with each batch of messages read by the DatagramServer;
+        putting the message data into the frame queue for downstream processing.
+        Messages received while the queue is full are dropped and counted.
+        :param datagrams: List of the data of the messages received
+        """
+        queue = self._frame_queue
+        room = max(self._queue_max - len(queue), 0)
+        if len(datagrams) > room:
+            dropped = len(datagrams) - room
+            self._counters['overflows'] += dropped
+            self._overflow_log('overflow', 'Frame queue is full, dropped {} frames'.format(dropped))
+            datagrams = datagrams[:room]
+
+        queue.extend(datagrams)
+
+    def decode(self, data):
+        """
+        Wraps the message data in the frame class of the downlink frame type,
+        dropping idle frames and those failing frame error control
+        :param data: The data of the message received
+        :return: The frame, or None if it was dropped
+        """
         in_frame = self._tm_frame_class(data)
 
         # Add any frame-based logic/decisions here
         if in_frame.is_idle_frame:
             log.debug('Dropping {} marked as an idle frame'.format(self._tm_frame_class))
-            return
+            return None
+
+        if not self._fecf_check.check(data):
+            log.debug('Dropping {} with a bad frame error control field'.format(self._tm_frame_class))
+            return None
 
-        self._frame_queue.append( ( in_frame, ( int(time.time())) ) )
+        return in_frame
+
+    @property
+    def fecf_stats(self):
+        """
+        Returns the counts of frames whose frame error control field was
+        verified and of those dropped for failing
+        """
+        return self._fecf_check.metrics()
+
+    @property
+    def ingest_stats(self):
+        """
+        Returns the counts of frames received, of the batches they were read
+        in and of those dropped because the frame queue was full
+        """
+        return dict(self._counters)
 
     def start(self):
         """Starts this Frame_Service."""
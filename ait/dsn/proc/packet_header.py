@@ -0,0 +1,44 @@
+# Advanced Multi-Mission Operations System (AMMOS) Instrument Toolkit (AIT)
+#
+#
+# Copyright 2020, by the California Institute of Technology. ALL RIGHTS
+# RESERVED. United States Government Sponsorship acknowledged. Any
+# commercial use must be negotiated with the Office of Technology Transfer
+# at the California Institute of Technology.
+#
+# This software may be subject to U.S. export control laws. By accepting
+# this software, the user agrees to comply with all applicable U.S. export
+# laws and regulations. User has the responsibility to obtain export licenses,
+# or other export authority as may be required before exporting such
+# information to foreign countries or providing access to foreign persons.
+
+"""
+CCSDS space packet primary header fields read by the deframing processor.
+"""
+
+import struct
+
+# The packet identification, packet sequence control and packet data
+# length words of the primary header
+_PRIMARY_HEADER = struct.Struct('>HHH')
+
+PRIMARY_HEADER_LEN = _PRIMARY_HEADER.size
+
+APID_MASK = 0x07FF
+SEQCOUNT_MASK = 0x3FFF
+
+# APID of idle packets
+APID_IDLE = 0x07FF
+
+
+def unpack_primary_header(packet, offset=0):
+    """
+    Reads the APID, sequence count and packet data length of the primary
+    header at offset in packet, in place
+    :param packet: Packet bytes, bytearray or memoryview
+    :param offset: Offset of the header in packet
+    :return: Tuple of (apid, seqcount, length), length being the packet data
+             length field, one less than the length of the packet data
+    """
+    (ident, seq_ctrl, length) = _PRIMARY_HEADER.unpack_from(packet, offset)
+    return (ident & APID_MASK, seq_ctrl & SEQCOUNT_MASK, length)
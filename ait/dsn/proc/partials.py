@@ -0,0 +1,265 @@
+# Advanced Multi-Mission Operations System (AMMOS) Instrument Toolkit (AIT)
+#
+#
+# Copyright 2020, by the California Institute of Technology. ALL RIGHTS
+# RESERVED. United States Government Sponsorship acknowledged. Any
+# commercial use must be negotiated with the Office of Technology Transfer
+# at the California Institute of Technology.
+#
+# This software may be subject to U.S. export control laws. By accepting
+# this software, the user agrees to comply with all applicable U.S. export
+# laws and regulations. User has the responsibility to obtain export licenses,
+# or other export authority as may be required before exporting such
+# information to foreign countries or providing access to foreign persons.
+
+"""
+Lookup of the partial CCSDS packets extracted from frames by the deframing
+processor, awaiting their complements.
+"""
+
+from collections import OrderedDict
+import sys
+import time
+
+from ait.core import log
+
+
+class PartialsLookup(object):
+    """
+    Maintains a lookup of start and end packet partials extracted from Frames.
+    Note: The primary key is the uniqueId (Frame masterId + virtualChannelId)
+
+    The partials of each channel are kept in an OrderedDict in the order
+    they were added, so adding, finding and removing a partial, and
+    evicting the oldest, take constant time.  When housekeeping is enabled,
+    a partial is evicted once max_count partials have been added after it
+    on its channel, and partials older than max_age seconds are expired.
+    Partials evicted or expired without their complement are counted as
+    orphans.
+
+    A partial is paired by the frame count of the frame expected next, so
+    a partial left over from a lost frame would be paired with one from a
+    later cycle of the frame count.  Each channel adds about one partial a
+    frame, so the default max_count evicts partials well within the 256
+    frame counts of a TM virtual channel, however busy other channels are.
+    """
+
+    # Type/Keys used for identifying partials type
+    TYPE_START = 'starts'
+    TYPE_END = 'ends'
+
+    # Partials added on a channel before its oldest is evicted, fewer than
+    # the frame counts of a TM virtual channel
+    HISTORY_MAX = 128
+
+    # Partials do not expire by default
+    DEFAULT_MAX_AGE = 0
+
+    DEFAULT_HOUSEKEEPING = True
+    DEFAULT_MODULUS = sys.maxsize
+
+    def __init__(self, housekeeping=DEFAULT_HOUSEKEEPING, modulus=DEFAULT_MODULUS,
+                 max_count=HISTORY_MAX, max_age=DEFAULT_MAX_AGE):
+        """
+        Constructor
+        :param housekeeping: Flag indicating if we will perform internal house-keeping
+        :param modulus: Frame-specific modulo value
+        :param max_count: Number of partials added on its channel after a partial
+                          before it is evicted
+        :param max_age: Age in seconds at which partials expire, 0 for no expiry
+        """
+        # Partials of each primaryId keyed by (partialId, type), mapping to
+        # (partial, time added, count of partials added on the channel
+        # before), in the order they were added
+        self._partials = {}
+
+        # Count of partials added on each channel
+        self._added = {}
+
+        # If true, when number of remaining partials exceeds an amount, perform cleanup
+        self._perform_housekeeping = housekeeping
+        self._max_count = max_count
+        self._max_age = max_age
+
+        # Frame-specific modulus value, needed when calculating relative
+        # partials indices, since previous/next partials may cross the
+        # mod-boundary
+        self._frame_modulus = modulus if modulus > 0 else PartialsLookup.DEFAULT_MODULUS
+
+        self._counters = {
+            'added': 0,
+            'paired': 0,
+            'evicted': 0,
+            'expired': 0,
+            'orphaned_' + PartialsLookup.TYPE_START: 0,
+            'orphaned_' + PartialsLookup.TYPE_END: 0
+        }
+
+    def add_partial(self, primaryId, partialId, type, partial):
+        """
+        Adds a partial, passing in needed index values and partial type.
+        If housekeeping is enabled, evicts the partials of the channel
+        max_count or more partials were added after and expires those older
+        than max_age.
+        :param primaryId: Frame unique id
+        :param partialId: Frame count associated with packet
+        :param type: Partial type, START or END
+        :param partial: The partial instance
+        """
+        key = (partialId, type)
+        now = time.time()
+        partials = self._partials.get(primaryId)
+        if partials is None:
+            partials = self._partials[primaryId] = OrderedDict()
+        added = self._added.get(primaryId, 0)
+
+        # A partial added again, such as from a repeated frame, becomes the newest
+        partials.pop(key, None)
+        partials[key] = (partial, now, added)
+        self._added[primaryId] = added + 1
+        self._counters['added'] += 1
+
+        if self._perform_housekeeping:
+            self._evict(now, primaryId)
+
+    def remove_partial(self, primaryId, partialId, type):
+        """
+        Removes a partial entry
+        :param primaryId: Frame unique id
+        :param partialId: Frame count associated with packet
+        :param type: Partial type, START or END
+        :return: True if partial removed, False otherwise
+        """
+        partials = self._partials.get(primaryId)
+        return partials is not None and partials.pop((partialId, type), None) is not None
+
+    def pop_partial(self, primaryId, partialId, type):
+        """
+        Removes and returns a partial entry, counting it as paired
+        :param primaryId: Frame unique id
+        :param partialId: Frame count associated with packet
+        :param type: Partial type, START or END
+        :return: Partial mapped by the provided arguments, or None
+        """
+        partials = self._partials.get(primaryId)
+        entry = partials.pop((partialId, type), None) if partials is not None else None
+        if entry is None:
+            return None
+        self._counters['paired'] += 1
+        return entry[0]
+
+    def get_partial(self, primaryId, partialId, type):
+        """
+        Returns a partial entry
+        :param primaryId: Frame unique id
+        :param partialId: Frame count associated with packet
+        :param type: Partial type, START or END
+        :return: Partial mapped by the provided arguments, or None
+        """
+        entry = self._partials.get(primaryId, {}).get((partialId, type))
+        return entry[0] if entry is not None else None
+
+    def contains_partial(self, primaryId, partialId, type):
+        """
+        Returns whether a partial is found in this instanc
+        :param primaryId: Frame unique id
+        :param partialId: Frame count associated with packet
+        :param type: Partial type, START or END
+        :return: True if partial if managed by this instance, False otherwise
+        """
+        return (partialId, type) in self._partials.get(primaryId, {})
+
+    def _evict(self, now, primaryId=None):
+        """
+        Evicts the partials of a channel max_count or more partials were
+        added after on it, then expires those older than max_age, counting
+        each as an orphan.
+        :param now: Current time, seconds since the epoch
+        :param primaryId: Frame unique id of the channel, or None for every channel
+        :return: Number of partials removed
+        """
+        if primaryId is None:
+            channels = list(self._partials)
+        else:
+            channels = [primaryId]
+        counters = self._counters
+        removed = 0
+
+        for channel in channels:
+            partials = self._partials[channel]
+            oldest_added = self._added[channel] - self._max_count
+            while partials:
+                key = next(iter(partials))
+                if partials[key][2] >= oldest_added:
+                    break
+                del partials[key]
+                counters['evicted'] += 1
+                counters['orphaned_' + key[1]] += 1
+                removed += 1
+
+        if self._max_age > 0:
+            oldest = now - self._max_age
+            for partials in self._partials.values():
+                while partials:
+                    key = next(iter(partials))
+                    if partials[key][1] > oldest:
+                        break
+                    del partials[key]
+                    counters['expired'] += 1
+                    counters['orphaned_' + key[1]] += 1
+                    removed += 1
+
+        return removed
+
+    def perform_cleanup(self):
+        """
+        Perform cleanup if enabled, evicting the oldest entries beyond the
+        maximum number of entries and expiring entries older than the
+        maximum age.
+        :return: Number of partials removed
+        """
+        if not self._perform_housekeeping:
+            return 0
+
+        removed = self._evict(time.time())
+        if removed:
+            log.debug("PartialsLookup removed " + str(removed) + " orphaned partials during cleanup")
+        return removed
+
+    def metrics(self):
+        """
+        Returns the counts of partials added, paired with their complement,
+        evicted by count and expired by age, and of orphaned start and end partials, with the number of partials
+        pending.
+        :return: Dict of counters
+        """
+        metrics = dict(self._counters)
+        metrics['pending'] = sum(len(partials) for partials in self._partials.values())
+        return metrics
+
+    def mod(self, value):
+        """
+        Returns the value % frame_modulos, typically the same value except for boundary cases
+        :param value: Value to be mod'd
+        :return: Mod'd value
+        """
+        return value % self._frame_modulus
+
+    def contains_complement_for(self, primaryId, partialId, type):
+        """
+        Returns True if complementary partial is being managed, False otherwise
+        """
+        (lookup_index, lookup_type) = self.get_complement_fields(partialId, type)
+        return self.contains_partial(primaryId, lookup_index, lookup_type)
+
+    def get_complement_fields(self, partialId, type):
+        """
+        Returns a tuple representing the complementary partial to the
+        input arguments.  The end partial leading frame N is added with the
+        partialId N - 1 and the start partial trailing frame N - 1 with the
+        partialId N, so the complement of an end partial is the start
+        partial one partialId after it, and vice versa.
+        """
+        if type == PartialsLookup.TYPE_END:
+            return (self.mod(partialId + 1), PartialsLookup.TYPE_START)
+        return (self.mod(partialId - 1), PartialsLookup.TYPE_END)
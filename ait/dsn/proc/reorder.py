@@ -0,0 +1,156 @@
+# Advanced Multi-Mission Operations System (AMMOS) Instrument Toolkit (AIT)
+#
+#
+# Copyright 2020, by the California Institute of Technology. ALL RIGHTS
+# RESERVED. United States Government Sponsorship acknowledged. Any
+# commercial use must be negotiated with the Office of Technology Transfer
+# at the California Institute of Technology.
+#
+# This software may be subject to U.S. export control laws. By accepting
+# this software, the user agrees to comply with all applicable U.S. export
+# laws and regulations. User has the responsibility to obtain export licenses,
+# or other export authority as may be required before exporting such
+# information to foreign countries or providing access to foreign persons.
+
+"""
+Reorder window for the CCSDS packet sequence counts of the deframing
+processor.
+"""
+
+
+class SeqCountWindow(object):
+    """
+    Keeps a set of sequence counts in order across rollover of their modulus.
+
+    Each count is a slot of a bytearray indexed by the count itself, so
+    adding, finding and removing a count take constant time, and the next
+    count in order is found by searching the array from the head of the
+    window, the earliest count held.
+
+    Counts are ordered by their distance forward from the head.  A count
+    outside the window extends it, past the latest count held or before
+    the head, whichever is nearer.
+    """
+
+    def __init__(self, modulo_val):
+        self._modulo_val = modulo_val
+        self._slots = bytearray(modulo_val)
+        self._size = 0
+
+        ## Earliest and latest counts of the window, None when empty
+        self._head = None
+        self._tail = None
+
+    def reset_state(self):
+        """
+        Removes all values from this window
+        """
+        if self._size:
+            self._slots = bytearray(self._modulo_val)
+        self._size = 0
+        self._head = None
+        self._tail = None
+
+    def get_size(self):
+        """
+        Returns the number of values held in this window
+        :return: Total number
+        """
+        return self._size
+
+    def add_value(self, val):
+        """
+        Adds a value to this window, assuming it is a legal value (non-negative
+        and less than modulus-field).
+        :param val: Value to be added
+        :return:  True if val is added, False otherwise
+        """
+        if val is None or val < 0 or val >= self._modulo_val:
+            return False
+
+        if self._slots[val]:
+            return True
+
+        if self._head is None:
+            self._head = self._tail = val
+        else:
+            ## A value outside the window extends it on the nearer side
+            ahead = (val - self._head) % self._modulo_val
+            past_tail = ahead - (self._tail - self._head) % self._modulo_val
+            if past_tail > 0:
+                if past_tail <= self._modulo_val - ahead:
+                    self._tail = val
+                else:
+                    self._head = val
+
+        self._slots[val] = 1
+        self._size += 1
+        return True
+
+    def contains_value(self, val):
+        """
+        Returns True if val is held in this window
+        :param val: Value to search for
+        :return: True if val found, False otherwise
+        """
+        return 0 <= val < self._modulo_val and self._slots[val] == 1
+
+    def remove_value(self, val):
+        """
+        Removes a value from this window, advancing the head past it if it
+        was the next value.
+        :param val: Value to be removed
+        :return: True if val was removed, False otherwise
+        """
+        if not self.contains_value(val):
+            return False
+
+        self._slots[val] = 0
+        self._size -= 1
+        if self._size == 0:
+            self._head = None
+            self._tail = None
+        elif val == self._head:
+            self._head = self._find_next(val)
+        elif val == self._tail:
+            self._tail = self._find_previous(val)
+        return True
+
+    def _find_next(self, start):
+        """
+        Returns the first value held at or after start, wrapping around
+        the modulus.
+        """
+        idx = self._slots.find(1, start)
+        if idx < 0:
+            idx = self._slots.find(1, 0, start)
+        return idx
+
+    def _find_previous(self, end):
+        """
+        Returns the last value held before end, wrapping around the modulus.
+        """
+        idx = self._slots.rfind(1, 0, end)
+        if idx < 0:
+            idx = self._slots.rfind(1, end)
+        return idx
+
+    def get_next_value(self):
+        """
+        Returns the next in-order value from this window.
+        :return: Next value available, or None if no value available
+        """
+        return self._head
+
+    def get_values_in_order(self):
+        """
+        Returns a new list containing all held values, in window order.
+        :return: List of values
+        """
+        r_list = []
+        val = self._head
+        while len(r_list) < self._size:
+            val = self._find_next(val)
+            r_list.append(val)
+            val = (val + 1) % self._modulo_val
+        return r_list
@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+
+# Advanced Multi-Mission Operations System (AMMOS) Instrument Toolkit (AIT)
+#
+#
+# Copyright 2020, by the California Institute of Technology. ALL RIGHTS
+# RESERVED. United States Government Sponsorship acknowledged. Any
+# commercial use must be negotiated with the Office of Technology Transfer
+# at the California Institute of Technology.
+#
+# This software may be subject to U.S. export control laws. By accepting
+# this software, the user agrees to comply with all applicable U.S. export
+# laws and regulations. User has the responsibility to obtain export licenses,
+# or other export authority as may be required before exporting such
+# information to foreign countries or providing access to foreign persons.
+
+"""
+Sharded deframing processor, which partitions incoming frames by master and
+virtual channel across worker processes, each running its own Processor.
+"""
+
+import multiprocessing
+import socket
+import time
+import traceback
+
+import gevent
+
+import ait
+from ait.core import cfg, log
+
+from ait.dsn.proc.deframe_packet_processor import Frame_Service, Processor
+from ait.dsn.proc.shm_ring import ShmRing
+
+
+class _ShardProcessor(Processor):
+    """
+    Processor run by a worker process, which takes frames from a shared
+    memory ring and puts the packets it emits onto another.
+    """
+
+    # How long to wait for frames, or for room for packets, seconds
+    IDLE_SLEEP = 0.001
+
+    def __init__(self, packet_ring, stop_event, *args, **kwargs):
+        super(_ShardProcessor, self).__init__(*args, **kwargs)
+        self._packet_ring = packet_ring
+        self._stop_event = stop_event
+
+    def emit_packet(self, packet):
+        """Pushes packet to the packet ring, waiting while it is full"""
+        while not self._packet_ring.put(packet):
+            if self._stop_event.is_set():
+                log.error("Packet ring is full while stopping, dropping packet.")
+                return
+            time.sleep(_ShardProcessor.IDLE_SLEEP)
+
+    def run_shard(self, frame_ring):
+        """
+        Handles frames from frame_ring until the stop event is set and the
+        ring is empty, performing a cleanup check whenever it is empty
+        :param frame_ring: The ShmRing of frames for this worker
+        """
+        while True:
+            batch = frame_ring.get_batch()
+            if not batch:
+                if self._stop_event.is_set():
+                    return
+                self.perform_cleanup_check()
+                time.sleep(_ShardProcessor.IDLE_SLEEP)
+                continue
+
+            self.handle_frames(batch)
+
+
+def _run_worker(frame_ring_name, packet_ring_name, ready_event, stop_event, kwargs):
+    """Entry point of a worker process"""
+    frame_ring = ShmRing(frame_ring_name)
+    packet_ring = ShmRing(packet_ring_name)
+    try:
+        shard = _ShardProcessor(packet_ring, stop_event, **kwargs)
+        ready_event.set()
+        shard.run_shard(frame_ring)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        frame_ring.close()
+        packet_ring.close()
+
+
+class Sharded_Frame_Service(Frame_Service):
+    """
+    UDP Datagram server which dispatches each incoming frame to the frame
+    ring of the worker for its master and virtual channel, without decoding
+    the frame.
+
+    Frames of the virtual channels mapped to a worker by shard_channels go
+    to that worker, whatever their spacecraft.  Frames of other channels are
+    spread across the workers by master and virtual channel.
+    """
+    def __init__(self, frame_rings, *args, **kwargs):
+        """
+        Constructor
+        :param frame_rings: The ShmRing of frames of each worker
+        :param args: Arguments
+        :param kwargs: Keyword arguments
+        """
+        super(Sharded_Frame_Service, self).__init__(None, *args, **kwargs)
+        self._frame_rings = frame_rings
+
+        # The version, spacecraft ID and virtual channel ID make up the
+        # first 16 bits of AOS frames, and the first 15 of TM frames
+        if self._downlink_frame_type == 'TMTransFrame':
+            (self._channel_shift, self._vc_mask) = (1, 0x07)
+        else:
+            (self._channel_shift, self._vc_mask) = (0, 0x3F)
+
+        # Worker of each virtual channel ID, or None for those not mapped
+        shard_channels = ait.config.get('dsn.proc.shard_channels',
+                                        kwargs.get('shard_channels', None))
+        self._vc_shards = self._map_channels(shard_channels)
+
+        self._dispatched = [0] * len(frame_rings)
+        self._overflows = [0] * len(frame_rings)
+
+    def _map_channels(self, shard_channels):
+        """
+        Validates a mapping of virtual channel IDs to worker indices
+        :param shard_channels: Dict of virtual channel ID to worker index, or None
+        :return: List of the worker index of each virtual channel ID, None
+                 for those not mapped
+        :raises ValueError: If a virtual channel ID or worker index is out of range
+        """
+        vc_shards = [None] * (self._vc_mask + 1)
+
+        ## AitConfig instance is returned for underlying YAML dict types
+        if isinstance(shard_channels, cfg.AitConfig):
+            shard_channels = shard_channels._config
+
+        for (vc, shard) in (shard_channels or {}).items():
+            if not isinstance(vc, int) or not 0 <= vc <= self._vc_mask:
+                raise ValueError('Virtual channel {} of shard_channels is not a {} '
+                                 'virtual channel ID'.format(vc, self._downlink_frame_type))
+            if not isinstance(shard, int) or not 0 <= shard < len(self._frame_rings):
+                raise ValueError('Virtual channel {} is mapped to worker {}, not one of '
+                                 'the {} workers'.format(vc, shard, len(self._frame_rings)))
+            vc_shards[vc] = shard
+        return vc_shards
+
+    def shard_for(self, data):
+        """
+        Returns the index of the worker for the channel of a frame
+        :param data: The frame bytes
+        :return: Worker index
+        """
+        shard = self._vc_shards[(data[1] >> self._channel_shift) & self._vc_mask]
+        if shard is not None:
+            return shard
+
+        channel = (data[0] << 8 | data[1]) >> self._channel_shift
+        return channel % len(self._frame_rings)
+
+    def handle(self, datagrams):
+        """
+        This handler is called with each batch of messages read by the DatagramServer;
+        dispatching the message data to the frame ring of its channel's worker.
+        Frames for a worker whose ring is full are dropped and counted.
+        :param datagrams: List of the data of the messages received
+        """
+        for data in datagrams:
+            self.dispatch(data)
+
+    def dispatch(self, data):
+        """
+        Puts a frame onto the frame ring of its channel's worker
+        :param data: The frame bytes
+        :return: True if the frame was dispatched, False if it was dropped
+        """
+        if len(data) < 2:
+            log.debug('Dropping message too short to be a frame')
+            return False
+
+        shard = self.shard_for(data)
+        if self._frame_rings[shard].put(data):
+            self._dispatched[shard] += 1
+            return True
+
+        self._overflows[shard] += 1
+        return False
+
+    @property
+    def shard_stats(self):
+        """
+        Returns the counts of frames dispatched to each worker and of those
+        dropped because its ring was full
+        """
+        return {
+            'dispatched': list(self._dispatched),
+            'overflows': list(self._overflows)
+        }
+
+
+class ShardedProcessor(object):
+    """
+    Runs a Processor per worker process, partitioning frames between them by
+    master and virtual channel.
+
+    The Sharded_Frame_Service reads the channel of each frame from the first
+    bytes of its header and puts the frame on the shared memory ring of the
+    worker for that channel.  Each worker decodes its frames and reassembles
+    and orders their packets with its own Processor state, and puts the
+    packets it emits on a ring back to this process, which sends them on to
+    the packet output port.  Packets of each worker keep the order in which
+    it emitted them, so the packets of an APID stay in order as long as the
+    APID is only carried on channels of one worker.  The shard_channels
+    config maps virtual channels to workers, so that the channels carrying
+    an APID can be kept on one worker.
+    """
+
+    # How long to wait when no packets are available, seconds
+    MERGE_POLL = 0.001
+
+    # How long to wait for the workers to start and stop, seconds
+    WORKER_TIMEOUT = 30
+
+    def __init__(self, *args, **kwargs):
+        """
+        Constructor
+        :param workers: Number of worker processes
+        :param shard_ring_size: Size in bytes of each frame and packet ring
+        :param shard_channels: Dict mapping virtual channel IDs to worker indices
+        :param kwargs: Keyword arguments of each worker's Processor
+        """
+        # Number of worker processes
+        self._worker_count = ait.config.get('dsn.proc.workers', kwargs.get('workers', 2))
+        if self._worker_count < 1:
+            raise ValueError('ShardedProcessor requires at least 1 worker, not {}'.format(
+                self._worker_count))
+
+        # Size of each shared memory ring, bytes
+        self._ring_size = ait.config.get('dsn.proc.shard_ring_size',
+                                         kwargs.get('shard_ring_size', ShmRing.DEFAULT_SIZE))
+
+        # UDP Destination settings, and create output socket
+        self._packet_dest_host = "localhost"
+        self._packet_dest_port = ait.config.get('dsn.proc.packet_output_port',
+                                                kwargs.get('packet_output_port', 3076))
+        self._packet_dest = (self._packet_dest_host, self._packet_dest_port)
+        self._packet_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+        self._worker_kwargs = kwargs
+        self._frame_rings = [ShmRing(size=self._ring_size) for _ in range(self._worker_count)]
+        self._packet_rings = [ShmRing(size=self._ring_size) for _ in range(self._worker_count)]
+
+        # Workers are spawned, so they do not inherit the gevent hub or
+        # sockets of this process.  The event stopping them is created with
+        # them, as it starts the multiprocessing resource tracker
+        self._context = multiprocessing.get_context('spawn')
+        self._stop_event = None
+        self._workers = []
+        self._packets_emitted = 0
+
+        # Frame service (listens to incoming port and dispatches frames to the workers)
+        self._frame_service = Sharded_Frame_Service(self._frame_rings, **kwargs)
+
+    def start_workers(self):
+        """
+        Starts the worker processes, waiting until each has set up its Processor
+        """
+        self._stop_event = self._context.Event()
+        ready_events = []
+        for frame_ring, packet_ring in zip(self._frame_rings, self._packet_rings):
+            ready_event = self._context.Event()
+            worker = self._context.Process(target=_run_worker,
+                                           args=(frame_ring.name, packet_ring.name, ready_event,
+                                                 self._stop_event, self._worker_kwargs),
+                                           daemon=True)
+            worker.start()
+            self._workers.append(worker)
+            ready_events.append(ready_event)
+
+        for index, ready_event in enumerate(ready_events):
+            if not ready_event.wait(ShardedProcessor.WORKER_TIMEOUT):
+                raise RuntimeError('Deframing worker {} did not start'.format(index))
+        log.info('Started {} deframing workers'.format(self._worker_count))
+
+    def dispatch(self, data):
+        """
+        Dispatches a frame to its channel's worker, as the frame service does
+        for each frame it receives
+        :param data: The frame bytes
+        :return: True if the frame was dispatched, False if its ring was full
+        """
+        return self._frame_service.dispatch(data)
+
+    def merge_packets(self, max_count=64):
+        """
+        Emits the packets waiting on each worker's packet ring, up to
+        max_count from each
+        :param max_count: Maximum number of packets taken from each ring
+        :return: Number of packets emitted
+        """
+        count = 0
+        for packet_ring in self._packet_rings:
+            for packet in packet_ring.get_batch(max_count):
+                self.emit_packet(packet)
+                count += 1
+        self._packets_emitted += count
+        return count
+
+    def emit_packet(self, packet):
+        """Pushes packet to downstream UDP socket"""
+        try:
+            self._packet_socket.sendto(packet, self._packet_dest)
+        except socket.error as e:
+            log.error("IO error: {0}".format(e))
+
+    @property
+    def shard_stats(self):
+        """
+        Returns the number of workers, the counts of frames dispatched to
+        and dropped for each, and the count of packets emitted
+        """
+        stats = self._frame_service.shard_stats
+        stats['workers'] = self._worker_count
+        stats['packets'] = self._packets_emitted
+        return stats
+
+    def run(self):
+        """
+        The entry point of the processor.  Starts the workers and the frame
+        service, then emits the packets of the workers until the frame
+        service is closed.
+        """
+        self.start_workers()
+        self._frame_service.start()
+
+        while not self._frame_service.closed:
+            if self.merge_packets():
+                gevent.sleep(0)
+            else:
+                gevent.sleep(ShardedProcessor.MERGE_POLL)
+
+        log.info("Incoming-frame service is now closed.")
+
+    def stop(self):
+        """
+        Stops and closes the frame service, then lets the workers handle the
+        frames already dispatched, emitting their packets, before they exit
+        """
+        if self._frame_service:
+            self._frame_service.stop()
+            self._frame_service.close()
+
+        if self._stop_event is not None:
+            self._stop_event.set()
+        deadline = time.time() + ShardedProcessor.WORKER_TIMEOUT
+        while any(worker.is_alive() for worker in self._workers) and time.time() < deadline:
+            if not self.merge_packets():
+                gevent.sleep(ShardedProcessor.MERGE_POLL)
+        for worker in self._workers:
+            worker.join(1)
+            if worker.is_alive():
+                log.warn('Terminating deframing worker {}'.format(worker.pid))
+                worker.terminate()
+        while self.merge_packets():
+            pass
+
+        for ring in self._frame_rings + self._packet_rings:
+            ring.close()
+        self._workers = []
+
+
+if __name__ == '__main__':
+
+    processor = ShardedProcessor()
+    try:
+        processor.run()
+    except KeyboardInterrupt:
+        print('Disconnecting...')
+    except Exception as e:
+        print(traceback.print_exc())
+    finally:
+        processor.stop()
@@ -0,0 +1,193 @@
+# Advanced Multi-Mission Operations System (AMMOS) Instrument Toolkit (AIT)
+#
+#
+# Copyright 2020, by the California Institute of Technology. ALL RIGHTS
+# RESERVED. United States Government Sponsorship acknowledged. Any
+# commercial use must be negotiated with the Office of Technology Transfer
+# at the California Institute of Technology.
+#
+# This software may be subject to U.S. export control laws. By accepting
+# this software, the user agrees to comply with all applicable U.S. export
+# laws and regulations. User has the responsibility to obtain export licenses,
+# or other export authority as may be required before exporting such
+# information to foreign countries or providing access to foreign persons.
+
+"""
+Shared-memory ring buffer passing frames and packets between the processes
+of the sharded deframing processor.
+"""
+
+import struct
+import sys
+
+try:
+    from multiprocessing import resource_tracker, shared_memory
+except ImportError:
+    shared_memory = None
+
+
+class ShmRing(object):
+    """
+    A ring buffer of variable-length records in shared memory, with a
+    single producer and a single consumer, each of which may be in a
+    different process.
+
+    The ring starts with the total bytes written and read, each on its own
+    cache line, followed by the records.  Each record is a 4 byte length
+    and its data, padded to 4 bytes.  A record which does not fit before
+    the end of the ring is written at its start, after a wrap marker.  The
+    producer updates the bytes written only once a record is in place, and
+    the consumer updates the bytes read only once it has copied records
+    out, so neither needs a lock.
+
+    Rings are not left to the multiprocessing resource tracker, which would
+    unlink a ring when any process attached to it exits; the instance which
+    creates a ring removes it on close.
+    """
+
+    DEFAULT_SIZE = 4 * 1024 * 1024
+
+    # Offsets of the total bytes written and read, and of the ring capacity
+    _WRITE_OFFSET = 0
+    _READ_OFFSET = 64
+    _CAPACITY_OFFSET = 72
+    _HEADER_LEN = 128
+
+    _WRAP = 0xFFFFFFFF
+
+    _U64 = struct.Struct('<Q')
+    _U32 = struct.Struct('<I')
+
+    def __init__(self, name=None, size=DEFAULT_SIZE):
+        """
+        Constructor
+        :param name: Name of an existing ring to attach to, or None to create one
+        :param size: Capacity in bytes of a ring created, rounded down to 4 bytes
+        """
+        if shared_memory is None:
+            raise ImportError('ShmRing requires multiprocessing.shared_memory (Python 3.8)')
+
+        if name is None:
+            capacity = size & ~3
+            if capacity < 64:
+                raise ValueError('ShmRing size must be at least 64 bytes')
+            self._shm = self._open(None, self._HEADER_LEN + capacity)
+            self._buf = self._shm.buf
+            self._buf[:self._HEADER_LEN] = bytes(self._HEADER_LEN)
+            self._U64.pack_into(self._buf, self._CAPACITY_OFFSET, capacity)
+            self._owner = True
+        else:
+            self._shm = self._open(name, 0)
+            self._buf = self._shm.buf
+            self._owner = False
+
+        self._capacity = self._U64.unpack_from(self._buf, self._CAPACITY_OFFSET)[0]
+        self._write_pos = self._U64.unpack_from(self._buf, self._WRITE_OFFSET)[0]
+        self._read_pos = self._U64.unpack_from(self._buf, self._READ_OFFSET)[0]
+
+    @staticmethod
+    def _open(name, size):
+        """
+        Creates or attaches to a shared memory block, untracked
+        :param name: Name of the block to attach to, or None to create one
+        :param size: Size in bytes of a block created
+        :return: The SharedMemory instance
+        """
+        create = name is None
+        if sys.version_info >= (3, 13):
+            return shared_memory.SharedMemory(name, create, size, track=False)
+
+        shm = shared_memory.SharedMemory(name, create, size)
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+    @property
+    def name(self):
+        """ Returns the name to attach to this ring from another process """
+        return self._shm.name
+
+    @property
+    def capacity(self):
+        """ Returns the capacity of this ring in bytes """
+        return self._capacity
+
+    def put(self, data):
+        """
+        Writes a record to the ring, if there is room for it.  Only one
+        process may put records to a ring.
+        :param data: Bytes of the record
+        :return: True if the record was written, False if the ring is full
+        """
+        length = len(data)
+        need = (length + 7) & ~3
+        if need > self._capacity // 2:
+            raise ValueError('ShmRing record of {} bytes exceeds half the ring capacity'.format(length))
+
+        buf = self._buf
+        capacity = self._capacity
+        pos = self._write_pos
+        free = capacity - (pos - self._U64.unpack_from(buf, self._READ_OFFSET)[0])
+        offset = pos % capacity
+        contiguous = capacity - offset
+
+        if contiguous < need:
+            if free < contiguous + need:
+                return False
+            self._U32.pack_into(buf, self._HEADER_LEN + offset, self._WRAP)
+            pos += contiguous
+            offset = 0
+        elif free < need:
+            return False
+
+        start = self._HEADER_LEN + offset
+        self._U32.pack_into(buf, start, length)
+        buf[start + 4:start + 4 + length] = data
+
+        self._write_pos = pos + need
+        self._U64.pack_into(buf, self._WRITE_OFFSET, self._write_pos)
+        return True
+
+    def get_batch(self, max_count=64):
+        """
+        Reads up to max_count records from the ring.  Only one process may
+        get records from a ring.
+        :param max_count: Maximum number of records read
+        :return: List of the bytes of each record read, empty if the ring is empty
+        """
+        buf = self._buf
+        capacity = self._capacity
+        pos = self._read_pos
+        end = self._U64.unpack_from(buf, self._WRITE_OFFSET)[0]
+
+        records = []
+        while pos < end and len(records) < max_count:
+            offset = pos % capacity
+            start = self._HEADER_LEN + offset
+            length = self._U32.unpack_from(buf, start)[0]
+            if length == self._WRAP:
+                pos += capacity - offset
+                continue
+            records.append(bytes(buf[start + 4:start + 4 + length]))
+            pos += (length + 7) & ~3
+
+        if pos != self._read_pos:
+            self._read_pos = pos
+            self._U64.pack_into(buf, self._READ_OFFSET, pos)
+        return records
+
+    def pending(self):
+        """ Returns the number of bytes written to the ring and not yet read """
+        return (self._U64.unpack_from(self._buf, self._WRITE_OFFSET)[0] -
+                self._U64.unpack_from(self._buf, self._READ_OFFSET)[0])
+
+    def close(self):
+        """
+        Detaches from the ring, removing it if this instance created it
+        """
+        if self._shm is None:
+            return
+        self._buf = None
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+        self._shm = None
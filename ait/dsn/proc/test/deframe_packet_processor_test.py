@@ -0,0 +1,232 @@
+# Advanced Multi-Mission Operations System (AMMOS) Instrument Toolkit (AIT)
+#
+#
+# Copyright 2020, by the California Institute of Technology. ALL RIGHTS
+# RESERVED. United States Government Sponsorship acknowledged. Any
+# commercial use must be negotiated with the Office of Technology Transfer
+# at the California Institute of Technology.
+#
+# This software may be subject to U.S. export control laws. By accepting
+# this software, the user agrees to comply with all applicable U.S. export
+# laws and regulations. User has the responsibility to obtain export licenses,
+# or other export authority as may be required before exporting such
+# information to foreign countries or providing access to foreign persons.
+import collections
+
+import pytest
+
+import ait
+
+from ait.dsn.proc.deframe_packet_processor import Frame_Service, Processor
+from ait.dsn.proc.packet_header import unpack_primary_header
+from ait.dsn.proc.partials import PartialsLookup
+from ait.dsn.sle.frame_encoder import AOSFrameEncoder, SyntheticDownlink, TMFrameEncoder
+
+
+class CollectingProcessor(Processor):
+    def __init__(self, *args, **kwargs):
+        super(CollectingProcessor, self).__init__(*args, **kwargs)
+        self.emitted = []
+
+    def emit_packet(self, packet):
+        self.emitted.append(packet)
+
+
+def _processor(monkeypatch, **config):
+    # Config values take precedence over keyword arguments
+    get = ait.config.get
+    monkeypatch.setattr(ait.config, "get",
+                        lambda name, default=None: config.get(name, get(name, default)))
+    return CollectingProcessor()
+
+
+def _frames(downlink, count):
+    buf = bytearray(downlink.frame_len * count)
+    downlink.generate(buf, count)
+    return [bytes(buf[i:i + downlink.frame_len])
+            for i in range(0, len(buf), downlink.frame_len)]
+
+
+def _assert_in_order(packets, packet_len):
+    seq_counts = []
+    for packet in packets:
+        (apid, seq_count, length) = unpack_primary_header(packet)
+        assert apid == 1
+        assert len(packet) == packet_len == length + 7
+        seq_counts.append(seq_count)
+    assert seq_counts == list(range(seq_counts[0], seq_counts[0] + len(seq_counts)))
+
+
+def test_tm_packets_spanning_frames(monkeypatch):
+    processor = _processor(monkeypatch, **{"dsn.sle.downlink_frame_type": "TMTransFrame"})
+    downlink = SyntheticDownlink(TMFrameEncoder(1115), packet_len=2000)
+    processor.handle_frames(_frames(downlink, 300))
+
+    # Every packet but the one cut short by the last frame is emitted
+    assert len(processor.emitted) == 300 * 1109 // 2000
+    _assert_in_order(processor.emitted, 2000)
+    assert processor.partials_stats["pending"] == 1
+
+
+def test_aos_packets_spanning_frames(monkeypatch):
+    processor = _processor(monkeypatch, **{"dsn.sle.downlink_frame_type": "AOSTransFrame"})
+    # Virtual channel 2 carries M_PDUs in the test configuration
+    encoder = AOSFrameEncoder(1115, virtual_channel_id=2)
+    downlink = SyntheticDownlink(encoder, packet_len=2000)
+    processor.handle_frames(_frames(downlink, 300))
+
+    assert len(processor.emitted) == 300 * encoder.packet_zone_len // 2000
+    _assert_in_order(processor.emitted, 2000)
+    assert processor.partials_stats["pending"] == 1
+
+
+def test_dropped_frame_does_not_join_partials_across_cycles(monkeypatch):
+    processor = _processor(monkeypatch, **{"dsn.sle.downlink_frame_type": "TMTransFrame"})
+    downlink = SyntheticDownlink(TMFrameEncoder(1115), packet_len=300)
+    frames = _frames(downlink, 600)
+    del frames[100]
+    processor.handle_frames(frames)
+
+    # The five packets with bytes in the dropped frame are lost, and no
+    # packet is joined from partials of different frame count cycles
+    for packet in processor.emitted:
+        assert len(packet) == 300 == unpack_primary_header(packet)[2] + 7
+    assert len(processor.emitted) == 600 * 1109 // 300 - 5
+    stats = processor.partials_stats
+    assert stats["evicted"] == 2
+    assert stats["mismatched"] == 0
+    assert stats["pending"] == 0
+
+
+def test_swapped_frames_are_joined(monkeypatch):
+    processor = _processor(monkeypatch, **{"dsn.sle.downlink_frame_type": "TMTransFrame"})
+    downlink = SyntheticDownlink(TMFrameEncoder(1115), packet_len=300)
+    frames = _frames(downlink, 600)
+    frames[100], frames[101] = frames[101], frames[100]
+    processor.handle_frames(frames)
+
+    # Partials are paired by frame count, whatever order frames arrive in
+    assert len(processor.emitted) == 600 * 1109 // 300
+    _assert_in_order(processor.emitted, 300)
+    assert processor.continuity_stats[(0, 0)]["reorders"] == 1
+    stats = processor.partials_stats
+    assert stats["evicted"] == 0
+    assert stats["pending"] == 0
+
+
+def test_burst_on_one_channel_does_not_evict_partials_of_another(monkeypatch):
+    processor = _processor(monkeypatch, **{"dsn.sle.downlink_frame_type": "TMTransFrame"})
+    # APID 1 is carried on virtual channel 0, and APID 2 on virtual channel 1
+    quiet = SyntheticDownlink(TMFrameEncoder(1115, virtual_channel_id=0), packet_len=2000)
+    busy = SyntheticDownlink(TMFrameEncoder(1115, virtual_channel_id=1), packet_len=300,
+                             apids=(2,))
+    quiet_frames = _frames(quiet, 26)
+    busy_frames = _frames(busy, 150)
+    processor.handle_frames(quiet_frames[:2] + busy_frames + quiet_frames[2:])
+
+    apid_1 = [packet for packet in processor.emitted if unpack_primary_header(packet)[0] == 1]
+    assert len(apid_1) == 26 * 1109 // 2000
+    _assert_in_order(apid_1, 2000)
+    assert processor.emit_stats["emitted_by_apid"][2] == 150 * 1109 // 300
+    assert processor.partials_stats["evicted"] == 0
+
+
+def test_joined_packet_must_match_header_length(monkeypatch):
+    processor = _processor(monkeypatch, **{"dsn.sle.downlink_frame_type": "TMTransFrame"})
+    # APID 1, sequence count 0 and a data length of 293, for a 300 byte packet
+    header = bytes([0x08, 0x01, 0xC0, 0x00, 0x01, 0x25])
+    start = header + bytes(100)
+
+    processor.handle_partial_packet("0-0", 5, PartialsLookup.TYPE_START, start)
+    processor.handle_partial_packet("0-0", 4, PartialsLookup.TYPE_END, bytes(150))
+    assert processor.emitted == []
+    assert processor.partials_stats["mismatched"] == 1
+
+    processor.handle_partial_packet("0-0", 9, PartialsLookup.TYPE_START, start)
+    processor.handle_partial_packet("0-0", 8, PartialsLookup.TYPE_END, bytes(194))
+    assert processor.emitted == [start + bytes(194)]
+
+
+class FakeSocket(object):
+    """Non-blocking datagram socket returning queued datagrams, or errors"""
+
+    def __init__(self, datagrams):
+        self.datagrams = collections.deque(datagrams)
+
+    def recv(self, size):
+        if not self.datagrams:
+            raise BlockingIOError()
+        datagram = self.datagrams.popleft()
+        if isinstance(datagram, Exception):
+            raise datagram
+        return datagram[:size]
+
+
+def _frame_service(datagrams, **kwargs):
+    service = Frame_Service(collections.deque(), **kwargs)
+    service._socket = FakeSocket(datagrams)
+    return service
+
+
+def test_frame_service_reads_in_batches():
+    service = _frame_service([bytes([i]) for i in range(10)], ingest_batch_size=4,
+                             frame_queue_max=6)
+    queue = service._frame_queue
+
+    batches = []
+    while True:
+        read = service.do_read()
+        if read is None:
+            break
+        batches.append(read[0])
+        service.handle(*read)
+
+    assert [len(batch) for batch in batches] == [4, 4, 2]
+    # Frames arriving while the queue is full are dropped
+    assert list(queue) == [bytes([i]) for i in range(6)]
+    assert service.ingest_stats == {"received": 10, "batches": 3, "overflows": 4}
+
+    queue.clear()
+    service._socket.datagrams.append(b"late")
+    service.handle(*service.do_read())
+    assert list(queue) == [b"late"]
+    assert service.ingest_stats["overflows"] == 4
+
+
+def test_frame_service_returns_batch_read_before_error():
+    service = _frame_service([b"a", b"b", ConnectionRefusedError(),
+                              ConnectionRefusedError(), b"c"])
+
+    assert service.do_read() == ([b"a", b"b"],)
+    # An error before any datagram is read is raised
+    with pytest.raises(ConnectionRefusedError):
+        service.do_read()
+    assert service.do_read() == ([b"c"],)
+    assert service.ingest_stats == {"received": 3, "batches": 2, "overflows": 0}
+
+
+class FakeFrameService(object):
+    closed = False
+
+    def start(self):
+        pass
+
+
+def test_run_handles_queued_frames_in_batches(monkeypatch):
+    processor = _processor(monkeypatch, **{"dsn.sle.downlink_frame_type": "TMTransFrame"})
+    processor._ingest_batch_size = 3
+    processor._frame_service = FakeFrameService()
+    processor._frame_queue.extend(bytes([i]) for i in range(10))
+
+    batches = []
+
+    def handle_frames(datagrams):
+        batches.append(list(datagrams))
+        if not processor._frame_queue:
+            processor._frame_service.closed = True
+
+    processor.handle_frames = handle_frames
+    processor.run()
+
+    assert [len(batch) for batch in batches] == [3, 3, 3, 1]
+    assert sum(batches, []) == [bytes([i]) for i in range(10)]
@@ -0,0 +1,39 @@
+# Advanced Multi-Mission Operations System (AMMOS) Instrument Toolkit (AIT)
+#
+#
+# Copyright 2020, by the California Institute of Technology. ALL RIGHTS
+# RESERVED. United States Government Sponsorship acknowledged. Any
+# commercial use must be negotiated with the Office of Technology Transfer
+# at the California Institute of Technology.
+#
+# This software may be subject to U.S. export control laws. By accepting
+# this software, the user agrees to comply with all applicable U.S. export
+# laws and regulations. User has the responsibility to obtain export licenses,
+# or other export authority as may be required before exporting such
+# information to foreign countries or providing access to foreign persons.
+import random
+
+from ait.dsn.proc import packet_header
+
+
+def test_unpack_primary_header_fields():
+    rng = random.Random(7)
+    for _ in range(500):
+        (version, type, shflag, apid) = (rng.randrange(8), rng.randrange(2),
+                                         rng.randrange(2), rng.randrange(2048))
+        (seqflags, seqcount, length) = (rng.randrange(4), rng.randrange(16384),
+                                        rng.randrange(65536))
+        header = bytes([version << 5 | type << 4 | shflag << 3 | apid >> 8, apid & 0xFF,
+                        seqflags << 6 | seqcount >> 8, seqcount & 0xFF,
+                        length >> 8, length & 0xFF])
+        assert packet_header.unpack_primary_header(header) == (apid, seqcount, length)
+
+
+def test_unpack_primary_header_at_offset():
+    # Version 0, telemetry, secondary header, APID 0x7FF (idle); sequence
+    # flags 3, count 16383; data length 299
+    packet = memoryview(b"\xAA\xAA" + b"\x0F\xFF\xFF\xFF\x01\x2B" + bytes(300))
+    (apid, seqcount, length) = packet_header.unpack_primary_header(packet, 2)
+    assert apid == packet_header.APID_IDLE
+    assert seqcount == 16383
+    assert length == 299
@@ -0,0 +1,127 @@
+# Advanced Multi-Mission Operations System (AMMOS) Instrument Toolkit (AIT)
+#
+#
+# Copyright 2020, by the California Institute of Technology. ALL RIGHTS
+# RESERVED. United States Government Sponsorship acknowledged. Any
+# commercial use must be negotiated with the Office of Technology Transfer
+# at the California Institute of Technology.
+#
+# This software may be subject to U.S. export control laws. By accepting
+# this software, the user agrees to comply with all applicable U.S. export
+# laws and regulations. User has the responsibility to obtain export licenses,
+# or other export authority as may be required before exporting such
+# information to foreign countries or providing access to foreign persons.
+import ait.dsn.proc.partials as partials
+from ait.dsn.proc.partials import PartialsLookup
+
+START = PartialsLookup.TYPE_START
+END = PartialsLookup.TYPE_END
+
+
+def test_partials_complement_either_order():
+    lookup = PartialsLookup(modulus=256)
+    # Frame 9 ends with a start partial added as 10, and frame 10 begins
+    # with the end partial added as 9
+    assert lookup.get_complement_fields(10, START) == (9, END)
+    assert lookup.get_complement_fields(9, END) == (10, START)
+    assert lookup.get_complement_fields(0, START) == (255, END)
+    assert lookup.get_complement_fields(255, END) == (0, START)
+
+    # Frame 10 arrives before frame 9
+    lookup.add_partial("0-1", 9, END, b"tail")
+    assert lookup.contains_complement_for("0-1", 10, START)
+    assert lookup.pop_partial("0-1", *lookup.get_complement_fields(10, START)) == b"tail"
+    assert lookup.pop_partial("0-1", 9, END) is None
+
+    lookup.add_partial("0-1", 10, START, b"head")
+    assert lookup.get_partial("0-1", 10, START) == b"head"
+    assert not lookup.contains_partial("0-2", 10, START)
+    assert lookup.remove_partial("0-1", 10, START)
+    assert not lookup.remove_partial("0-1", 10, START)
+
+    metrics = lookup.metrics()
+    assert metrics["added"] == 2
+    assert metrics["paired"] == 1
+    assert metrics["pending"] == 0
+
+
+def test_partials_evicted_by_count():
+    lookup = PartialsLookup(max_count=10)
+    for i in range(25):
+        lookup.add_partial("0-1", i, START if i % 2 else END, bytes([i]))
+
+    # The oldest partials are evicted as new ones are added
+    assert not lookup.contains_partial("0-1", 14, END)
+    assert lookup.contains_partial("0-1", 15, START)
+    metrics = lookup.metrics()
+    assert metrics["pending"] == 10
+    assert metrics["evicted"] == 15
+    assert metrics["orphaned_starts"] == 7
+    assert metrics["orphaned_ends"] == 8
+
+    # Without housekeeping nothing is dropped
+    lookup = PartialsLookup(housekeeping=False, max_count=10, max_age=1)
+    for i in range(25):
+        lookup.add_partial("0-1", i, START, bytes([i]))
+    assert lookup.perform_cleanup() == 0
+    assert lookup.metrics()["pending"] == 25
+
+
+def test_partials_evicted_by_count_added_after():
+    lookup = PartialsLookup(max_count=10)
+    lookup.add_partial("0-1", 0, END, b"orphan")
+
+    # Partials paired as they arrive leave few pending, but still age the
+    # orphan out before the frame count could bring its id round again
+    for i in range(1, 10):
+        lookup.add_partial("0-1", i, START, bytes([i]))
+        assert lookup.pop_partial("0-1", i, START) == bytes([i])
+    assert lookup.contains_partial("0-1", 0, END)
+    lookup.add_partial("0-1", 10, START, b"head")
+
+    assert not lookup.contains_partial("0-1", 0, END)
+    metrics = lookup.metrics()
+    assert metrics["evicted"] == 1
+    assert metrics["orphaned_ends"] == 1
+    assert metrics["pending"] == 1
+
+
+def test_partials_evicted_by_count_on_their_channel():
+    lookup = PartialsLookup(max_count=10)
+    lookup.add_partial("0-0", 2, START, b"quiet")
+
+    # A burst of partials on another channel does not evict it
+    for i in range(50):
+        lookup.add_partial("0-1", i, END, bytes([i]))
+    assert lookup.contains_partial("0-0", 2, START)
+    assert lookup.pop_partial("0-0", 2, START) == b"quiet"
+
+    metrics = lookup.metrics()
+    assert metrics["evicted"] == 40
+    assert metrics["orphaned_ends"] == 40
+    assert metrics["pending"] == 10
+
+
+def test_partials_expired_by_age(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(partials.time, "time", lambda: now[0])
+
+    lookup = PartialsLookup(max_age=30)
+    lookup.add_partial("0-1", 1, START, b"a")
+    now[0] += 20
+    lookup.add_partial("0-1", 2, END, b"b")
+    # Adding a partial again makes it the newest
+    lookup.add_partial("0-1", 1, START, b"a")
+    now[0] += 20
+    lookup.add_partial("0-1", 3, START, b"c")
+
+    assert lookup.metrics()["pending"] == 3
+    now[0] += 15
+    assert lookup.perform_cleanup() == 2
+    assert lookup.contains_partial("0-1", 3, START)
+
+    metrics = lookup.metrics()
+    assert metrics["expired"] == 2
+    assert metrics["orphaned_starts"] == 1
+    assert metrics["orphaned_ends"] == 1
+    assert metrics["pending"] == 1
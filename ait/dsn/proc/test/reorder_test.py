@@ -0,0 +1,79 @@
+# Advanced Multi-Mission Operations System (AMMOS) Instrument Toolkit (AIT)
+#
+#
+# Copyright 2020, by the California Institute of Technology. ALL RIGHTS
+# RESERVED. United States Government Sponsorship acknowledged. Any
+# commercial use must be negotiated with the Office of Technology Transfer
+# at the California Institute of Technology.
+#
+# This software may be subject to U.S. export control laws. By accepting
+# this software, the user agrees to comply with all applicable U.S. export
+# laws and regulations. User has the responsibility to obtain export licenses,
+# or other export authority as may be required before exporting such
+# information to foreign countries or providing access to foreign persons.
+import random
+
+from ait.dsn.proc.reorder import SeqCountWindow
+
+
+def _drain(window):
+    out = []
+    while window.get_size():
+        value = window.get_next_value()
+        assert window.remove_value(value)
+        out.append(value)
+    return out
+
+
+def test_seqcount_window_modulo_scenario():
+    # The run_modulo_list.py scenario: runs of 0-9 with a gap, removing the
+    # next value after each odd value is added
+    values = [0, 1, 2, 4, 5, 6, 7, 8, 9] + list(range(10)) * 2 + [0, 1, 7, 9, 1, 5]
+    window = SeqCountWindow(10)
+    removed = []
+    for value in values:
+        assert window.add_value(value)
+        if value % 2:
+            removed.append(window.get_next_value())
+            window.remove_value(removed[-1])
+
+    assert removed == [0, 1, 2, 4, 5, 6, 7, 8, 9, 0, 1, 2, 3, 4, 5, 6, 7, 8, 9]
+    assert window.get_values_in_order() == [0, 1, 5]
+    assert _drain(window) == [0, 1, 5]
+    assert window.get_next_value() is None
+
+
+def test_seqcount_window_rollover():
+    random.seed(0)
+    counts = [(16000 + i) % 16384 for i in range(1000)]
+    window = SeqCountWindow(16384)
+    # Each count arrives at most 50 places out of order
+    for i in sorted(range(len(counts)), key=lambda i: i + random.uniform(0, 50)):
+        window.add_value(counts[i])
+    assert window.get_size() == len(counts)
+    assert window.get_values_in_order() == counts
+    assert _drain(window) == counts
+
+
+def test_seqcount_window_values():
+    window = SeqCountWindow(16384)
+    assert not window.add_value(None)
+    assert not window.add_value(-1)
+    assert not window.add_value(16384)
+
+    for value in (10, 12, 11, 12):
+        window.add_value(value)
+    assert window.get_size() == 3
+    assert window.contains_value(11)
+    assert not window.contains_value(13)
+
+    assert window.remove_value(12)
+    assert not window.remove_value(12)
+    # A count before the head becomes the next value
+    window.add_value(5)
+    assert window.get_values_in_order() == [5, 10, 11]
+
+    window.reset_state()
+    assert window.get_size() == 0
+    assert window.get_next_value() is None
+    assert not window.contains_value(10)
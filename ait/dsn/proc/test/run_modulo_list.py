@@ -2,14 +2,12 @@ import socket
 import struct
 import time
 
-from ait.dsn.proc.deframe_packet_processor import ModuloList
+from ait.dsn.proc.reorder import SeqCountWindow
 
 
 def test_modulus_list():
     size = 10
-    ml = ModuloList(size)
-    print("alphaVal: " + str(ml._alpha_value))
-    print("betaVal:  " + str(ml._beta_value))
+    ml = SeqCountWindow(size)
 
     value_list = [
         0,
@@ -50,17 +48,15 @@ def test_modulus_list():
     ]
     for value in value_list:
         ml.add_value(value)
-        print("ModList contents after adding " + str(value) + ": ")
-        print("alpha: " + str(ml._alpha_list))
-        print("beta:  " + str(ml._beta_list))
+        print("SeqCountWindow contents after adding " + str(value) + ": ")
+        print(str(ml.get_values_in_order()))
 
         if value % 2:
             to_remove = ml.get_next_value()
             if to_remove is not None:
                 ml.remove_value(to_remove)
-                print("ModList contents after removing " + str(to_remove) + ": ")
-                print("alpha: " + str(ml._alpha_list))
-                print("beta:  " + str(ml._beta_list))
+                print("SeqCountWindow contents after removing " + str(to_remove) + ": ")
+                print(str(ml.get_values_in_order()))
 
         # time.sleep(2)
 
@@ -0,0 +1,145 @@
+# Advanced Multi-Mission Operations System (AMMOS) Instrument Toolkit (AIT)
+#
+#
+# Copyright 2020, by the California Institute of Technology. ALL RIGHTS
+# RESERVED. United States Government Sponsorship acknowledged. Any
+# commercial use must be negotiated with the Office of Technology Transfer
+# at the California Institute of Technology.
+#
+# This software may be subject to U.S. export control laws. By accepting
+# this software, the user agrees to comply with all applicable U.S. export
+# laws and regulations. User has the responsibility to obtain export licenses,
+# or other export authority as may be required before exporting such
+# information to foreign countries or providing access to foreign persons.
+import threading
+
+import pytest
+
+# ShmRing requires Python 3.8
+pytest.importorskip("multiprocessing.shared_memory")
+
+import ait
+from ait.dsn.proc.packet_header import unpack_primary_header
+from ait.dsn.proc.sharded import Sharded_Frame_Service, ShardedProcessor, _ShardProcessor
+from ait.dsn.proc.shm_ring import ShmRing
+from ait.dsn.sle.frame_encoder import AOSFrameEncoder, SyntheticDownlink, TMFrameEncoder
+
+
+def _config(monkeypatch, frame_type):
+    # Config values take precedence over keyword arguments
+    get = ait.config.get
+    config = {"dsn.sle.downlink_frame_type": frame_type}
+    monkeypatch.setattr(ait.config, "get",
+                        lambda name, default=None: config.get(name, get(name, default)))
+
+
+def _frame(encoder):
+    buf = bytearray(encoder.frame_len)
+    SyntheticDownlink(encoder).frame_into(buf)
+    return buf
+
+
+def _frame_service(workers, **kwargs):
+    rings = [ShmRing(size=4096) for _ in range(workers)]
+    return Sharded_Frame_Service(rings, **kwargs)
+
+
+def _close(service):
+    for ring in service._frame_rings:
+        ring.close()
+
+
+def test_shard_for_tm_frames(monkeypatch):
+    _config(monkeypatch, "TMTransFrame")
+    service = _frame_service(4, shard_channels={5: 3})
+    try:
+        # Spacecraft 1, virtual channel 2: (0x0014 >> 1) % 4
+        tm = _frame(TMFrameEncoder(64, spacecraft_id=1, virtual_channel_id=2))
+        assert service.shard_for(tm) == 2
+        # The operational control field flag does not move a channel
+        tm_ocf = _frame(TMFrameEncoder(64, spacecraft_id=1, virtual_channel_id=2,
+                                       ocf_included=True))
+        assert service.shard_for(tm_ocf) == 2
+
+        # Virtual channel 5 of any spacecraft is mapped to worker 3
+        for scid in (0, 1, 1023):
+            tm = _frame(TMFrameEncoder(64, spacecraft_id=scid, virtual_channel_id=5))
+            assert service.shard_for(tm) == 3
+    finally:
+        _close(service)
+
+
+def test_shard_for_aos_frames(monkeypatch):
+    _config(monkeypatch, "AOSTransFrame")
+    service = _frame_service(4, shard_channels={40: 0})
+    try:
+        # Version 2, spacecraft 1, virtual channel 2: 0x4042 % 4
+        aos = _frame(AOSFrameEncoder(64, spacecraft_id=1, virtual_channel_id=2))
+        assert service.shard_for(aos) == 2
+
+        for scid in (0, 1, 255):
+            aos = _frame(AOSFrameEncoder(64, spacecraft_id=scid, virtual_channel_id=40))
+            assert service.shard_for(aos) == 0
+    finally:
+        _close(service)
+
+
+def test_shard_channels_are_validated(monkeypatch):
+    _config(monkeypatch, "TMTransFrame")
+    # TM virtual channel IDs are 3 bits
+    with pytest.raises(ValueError):
+        _frame_service(2, shard_channels={8: 0})
+    with pytest.raises(ValueError):
+        _frame_service(2, shard_channels={1: 2})
+    with pytest.raises(ValueError):
+        _frame_service(2, shard_channels={"1": 0})
+
+
+class CollectingShardedProcessor(ShardedProcessor):
+    def __init__(self, *args, **kwargs):
+        super(CollectingShardedProcessor, self).__init__(*args, **kwargs)
+        self.emitted = []
+
+    def emit_packet(self, packet):
+        self.emitted.append(packet)
+
+
+def test_dispatch_and_merge_keep_packet_order(monkeypatch):
+    _config(monkeypatch, "TMTransFrame")
+    # APID 1 is carried on virtual channel 0, and APID 2 on virtual channel 6
+    processor = CollectingShardedProcessor(workers=2, shard_ring_size=1 << 20,
+                                           shard_channels={0: 1, 6: 0})
+    try:
+        downlinks = [SyntheticDownlink(TMFrameEncoder(512, virtual_channel_id=vc),
+                                       packet_len=100, apids=(apid,))
+                     for (vc, apid) in ((0, 1), (6, 2))]
+        frames = []
+        for i in range(80):
+            for downlink in downlinks:
+                buf = bytearray(512)
+                downlink.frame_into(buf)
+                frames.append(bytes(buf))
+        for frame in frames:
+            assert processor.dispatch(frame)
+        assert processor.shard_stats["dispatched"] == [80, 80]
+
+        # Run each worker's Processor on its ring in this process
+        stop_event = threading.Event()
+        stop_event.set()
+        for (frame_ring, packet_ring) in zip(processor._frame_rings, processor._packet_rings):
+            shard = _ShardProcessor(packet_ring, stop_event, downlink_frame_type="TMTransFrame")
+            shard.run_shard(frame_ring)
+        while processor.merge_packets(8):
+            pass
+
+        seq_counts = {1: [], 2: []}
+        for packet in processor.emitted:
+            (apid, seq_count, _) = unpack_primary_header(packet)
+            seq_counts[apid].append(seq_count)
+        for apid in (1, 2):
+            assert seq_counts[apid] == list(range(len(seq_counts[apid])))
+            assert len(seq_counts[apid]) == 80 * 506 // 100
+        assert processor.shard_stats["packets"] == len(processor.emitted)
+    finally:
+        for ring in processor._frame_rings + processor._packet_rings:
+            ring.close()
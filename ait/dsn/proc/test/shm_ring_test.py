@@ -0,0 +1,86 @@
+# Advanced Multi-Mission Operations System (AMMOS) Instrument Toolkit (AIT)
+#
+#
+# Copyright 2020, by the California Institute of Technology. ALL RIGHTS
+# RESERVED. United States Government Sponsorship acknowledged. Any
+# commercial use must be negotiated with the Office of Technology Transfer
+# at the California Institute of Technology.
+#
+# This software may be subject to U.S. export control laws. By accepting
+# this software, the user agrees to comply with all applicable U.S. export
+# laws and regulations. User has the responsibility to obtain export licenses,
+# or other export authority as may be required before exporting such
+# information to foreign countries or providing access to foreign persons.
+import multiprocessing
+
+import pytest
+
+# ShmRing requires Python 3.8
+pytest.importorskip("multiprocessing.shared_memory")
+
+from ait.dsn.proc.shm_ring import ShmRing
+
+
+def _records(count):
+    return [bytes([i & 0xFF]) * (1 + (i * 37) % 200) for i in range(count)]
+
+
+def test_shm_ring_wraps_in_order():
+    ring = ShmRing(size=1024)
+    try:
+        records = _records(500)
+        out = []
+        pending = list(records)
+        while pending:
+            # Fill the ring, then drain part of it, so records wrap around
+            while pending and ring.put(pending[0]):
+                pending.pop(0)
+            out += ring.get_batch(3)
+        while ring.pending():
+            out += ring.get_batch()
+        assert out == records
+        assert ring.get_batch() == []
+    finally:
+        ring.close()
+
+
+def test_shm_ring_full_and_oversized():
+    ring = ShmRing(size=256)
+    try:
+        assert ring.capacity == 256
+        # Each record takes 84 bytes with its length
+        for i in range(3):
+            assert ring.put(bytes([i]) * 80)
+        assert not ring.put(b"y" * 80)
+        assert ring.pending() == 252
+        assert ring.get_batch(1) == [b"\x00" * 80]
+        assert ring.put(b"y" * 80)
+        assert ring.get_batch() == [b"\x01" * 80, b"\x02" * 80, b"y" * 80]
+        with pytest.raises(ValueError):
+            ring.put(b"z" * 200)
+    finally:
+        ring.close()
+
+
+def _produce(name, count):
+    ring = ShmRing(name)
+    for record in _records(count):
+        while not ring.put(record):
+            pass
+    ring.close()
+
+
+def test_shm_ring_across_processes():
+    ring = ShmRing(size=4096)
+    try:
+        # Forked, as a spawned process would start the resource tracker
+        producer = multiprocessing.get_context("fork").Process(
+            target=_produce, args=(ring.name, 2000))
+        producer.start()
+        out = []
+        while len(out) < 2000:
+            out += ring.get_batch()
+        producer.join(10)
+        assert out == _records(2000)
+    finally:
+        ring.close()
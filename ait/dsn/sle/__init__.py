@@ -17,6 +17,7 @@ import sys
 from .raf import RAF
 from .rcf import RCF
 from .cltu import CLTU
+from .session import SessionManager
 
 # Default port to which Frames will be emitted by SLE RAF/RCF ('FRAM')
 sys.modules['ait'].DEFAULT_FRAME_PORT = 3726
@@ -0,0 +1,478 @@
+# Advanced Multi-Mission Operations System (AMMOS) Instrument Toolkit (AIT)
+# Bespoke Link to Instruments and Small Satellites (BLISS)
+#
+# Copyright 2017, by the California Institute of Technology. ALL RIGHTS
+# RESERVED. United States Government Sponsorship acknowledged. Any
+# commercial use must be negotiated with the Office of Technology Transfer
+# at the California Institute of Technology.
+#
+# This software may be subject to U.S. export control laws. By accepting
+# this software, the user agrees to comply with all applicable U.S. export
+# laws and regulations. User has the responsibility to obtain export licenses,
+# or other export authority as may be required before exporting such
+# information to foreign countries or providing access to foreign persons.
+
+''' SLE Frame Archive
+
+The ait.dsn.sle.archive module persists received transfer frames so a pass
+can be inspected or replayed after the fact.
+
+Frames are appended to segment files as records of a
+:data:`RECORD_HEADER` followed by the frame. The header holds the earth
+receive time (ERT) of the frame in microseconds since the Unix epoch, its
+virtual channel ID, its virtual channel frame count and its length. Each
+segment has a sidecar index of :data:`INDEX_ENTRY` entries, one per record,
+giving the offset of the record, its ERT and its virtual channel ID, which
+is enough to find the frames of a time range or virtual channel without
+reading the segment.
+
+Records are collected in memory and written in batches, and the files are
+only fsynced on a configurable cadence, so that archiving costs the SLE
+read loop a memory copy per frame rather than a system call. Segments are
+rotated once they reach a size or age limit. Segment files can be replayed
+with :class:`ait.dsn.sle.replay.FrameReplay` using the 'archive' record
+format.
+
+Attributes:
+    RECORD_HEADER: The struct of the header preceding each frame in a
+        segment file.
+
+    INDEX_ENTRY: The struct of each entry in a segment's index file.
+
+    SEGMENT_SUFFIX: The file name suffix of segment files.
+
+    INDEX_SUFFIX: The file name suffix of index files.
+
+Classes:
+    FrameArchive: Appends frames to rotating, indexed segment files.
+
+    FrameArchiveReader: Looks up and reads frames from the segment files
+        of an archive.
+'''
+import glob
+import os
+import struct
+import time
+
+import ait
+import ait.core.log
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+RECORD_HEADER = struct.Struct('>qBIH')
+INDEX_ENTRY = struct.Struct('>QqB')
+
+SEGMENT_SUFFIX = '.frames'
+INDEX_SUFFIX = '.idx'
+
+# Days from the CCSDS epoch of 1958-01-01 to the Unix epoch
+_CDS_UNIX_EPOCH_DAYS = 4383
+
+
+def cds_to_unix(time_code):
+    ''' Returns the seconds since the Unix epoch of a CCSDS day segmented time
+
+    Arguments:
+        time_code:
+            The 8 byte ccsdsFormat or 10 byte ccsdsPicoFormat time code of
+            an SLE earth receive time.
+    '''
+    days = time_code[0] << 8 | time_code[1]
+    millis = int.from_bytes(time_code[2:6], 'big')
+    if len(time_code) > 8:
+        sub_millis = int.from_bytes(time_code[6:10], 'big') / 1e12
+    else:
+        sub_millis = (time_code[6] << 8 | time_code[7]) / 1e6
+    return (days - _CDS_UNIX_EPOCH_DAYS) * 86400 + millis / 1000.0 + sub_millis
+
+
+def tm_frame_ids(data):
+    ''' Returns the virtual channel ID and frame count of a TM frame '''
+    return (data[1] >> 1) & 0x07, data[3]
+
+
+def aos_frame_ids(data):
+    ''' Returns the virtual channel ID and frame count of an AOS frame '''
+    return data[1] & 0x3F, data[2] << 16 | data[3] << 8 | data[4]
+
+
+FRAME_IDS = {
+    'TMTransFrame': tm_frame_ids,
+    'AOSTransFrame': aos_frame_ids
+}
+
+
+class FrameArchive(object):
+    ''' Archive of frames in rotating, indexed segment files
+
+    Frames are added with :meth:`add` and written once the pending batch
+    reaches batch_size bytes, or by :meth:`poll` once flush_interval
+    seconds have passed since the last write. Callers such as the RAF and
+    RCF transfer buffer handlers call :meth:`poll` after each batch of
+    frames they add.
+
+    Segment files are named after the archive's prefix and the UTC time
+    they were opened at, and are rotated once they reach segment_size
+    bytes or are segment_duration seconds old.
+
+    Arguments:
+        directory:
+            The directory to write segment files to. It is created if
+            needed.
+
+        frame_type (optional):
+            'TMTransFrame' or 'AOSTransFrame', to read the virtual channel
+            ID and frame count of frames from their headers.
+
+        prefix (optional):
+            The prefix of segment file names.
+
+        segment_size (optional):
+            The size in bytes at which segments are rotated.
+
+        segment_duration (optional):
+            The age in seconds at which segments are rotated.
+
+        batch_size (optional):
+            The size in bytes of pending records at which they are written.
+
+        flush_interval (optional):
+            The seconds after which :meth:`poll` writes pending records.
+
+        fsync_interval (optional):
+            The seconds between fsyncs of the segment and index files, 0 to
+            fsync after every write or None to only fsync when a segment is
+            closed.
+
+    Raises:
+        ValueError: If frame_type is not a known frame type.
+    '''
+
+    def __init__(self, directory, frame_type='TMTransFrame', prefix='frames',
+                 segment_size=256 * 1024 * 1024, segment_duration=3600,
+                 batch_size=1024 * 1024, flush_interval=1.0, fsync_interval=5.0):
+        if frame_type not in FRAME_IDS:
+            raise ValueError('Frame archive does not support frame type {}'.format(frame_type))
+
+        self.directory = directory
+        self.prefix = prefix
+        self._frame_ids = FRAME_IDS[frame_type]
+        self._segment_size = segment_size
+        self._segment_duration = segment_duration
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._fsync_interval = fsync_interval
+
+        os.makedirs(directory, exist_ok=True)
+
+        self._segment = None
+        self._index = None
+        self._segment_path = None
+        self._segment_opened = 0
+        self._segment_pos = 0
+        self._last_flush = self._last_fsync = time.monotonic()
+
+        self._batch = bytearray()
+        self._index_batch = bytearray()
+        self._counters = {
+            'frames': 0,
+            'bytes': 0,
+            'writes': 0,
+            'fsyncs': 0,
+            'segments': 0,
+            'write_errors': 0
+        }
+
+    @property
+    def segment_path(self):
+        ''' The path of the segment being written, or None between segments '''
+        return self._segment_path
+
+    def add(self, data, ert=None, vcid=None, frame_count=None):
+        ''' Add a frame to the archive
+
+        Arguments:
+            data:
+                The bytes of the frame.
+
+            ert (optional):
+                The earth receive time of the frame in seconds since the
+                Unix epoch. Defaults to the current time.
+
+            vcid, frame_count (optional):
+                The virtual channel ID and frame count of the frame.
+                Defaults to those in the frame header.
+        '''
+        if vcid is None or frame_count is None:
+            header_vcid, header_count = self._frame_ids(data)
+            vcid = header_vcid if vcid is None else vcid
+            frame_count = header_count if frame_count is None else frame_count
+        ert_us = int((time.time() if ert is None else ert) * 1e6)
+
+        batch = self._batch
+        self._index_batch += INDEX_ENTRY.pack(self._segment_pos + len(batch), ert_us, vcid)
+        batch += RECORD_HEADER.pack(ert_us, vcid, frame_count, len(data))
+        batch += data
+        self._counters['frames'] += 1
+
+        if len(batch) >= self._batch_size:
+            self.flush()
+
+    def poll(self):
+        ''' Write pending records if the flush interval has passed
+
+        Returns:
+            True if records were written, False otherwise.
+        '''
+        if self._batch and time.monotonic() - self._last_flush >= self._flush_interval:
+            self.flush()
+            return True
+        return False
+
+    def flush(self):
+        ''' Write pending records, then fsync or rotate the segment if due '''
+        now = time.monotonic()
+        self._last_flush = now
+        if not self._batch:
+            return
+
+        batch, index_batch = self._batch, self._index_batch
+        self._batch, self._index_batch = bytearray(), bytearray()
+        try:
+            if self._segment is None:
+                self._open_segment()
+            self._segment.write(batch)
+            self._index.write(index_batch)
+        except (IOError, OSError) as e:
+            # Offsets of later records assume these were written, so the
+            # segment is closed and the next batch starts a new one
+            self._counters['write_errors'] += 1
+            ait.core.log.error('Unable to write frames to archive {}: {}'.format(self._segment_path, e))
+            self._close_segment()
+            return
+
+        self._segment_pos += len(batch)
+        self._counters['bytes'] += len(batch)
+        self._counters['writes'] += 1
+
+        if (self._segment_pos >= self._segment_size or
+                now - self._segment_opened >= self._segment_duration):
+            self._close_segment()
+        elif self._fsync_interval is not None and now - self._last_fsync >= self._fsync_interval:
+            self.sync()
+
+    def sync(self):
+        ''' fsync the segment being written and its index '''
+        self._last_fsync = time.monotonic()
+        if self._segment is None:
+            return
+        for f in (self._segment, self._index):
+            f.flush()
+            os.fsync(f.fileno())
+        self._counters['fsyncs'] += 1
+
+    def close(self):
+        ''' Write pending records and close the segment being written '''
+        self.flush()
+        self._close_segment()
+
+    def _open_segment(self):
+        ''''''
+        now = time.time()
+        name = '{}-{}.{:06d}'.format(self.prefix, time.strftime('%Y%m%dT%H%M%S', time.gmtime(now)),
+                                     int(now % 1 * 1e6))
+        self._segment_path = os.path.join(self.directory, name + SEGMENT_SUFFIX)
+        # Records are batched here, so the files are not buffered again.
+        # Index offsets assume a new file, so existing ones are not reused.
+        self._segment = open(self._segment_path, 'xb', buffering=0)
+        self._index = open(os.path.join(self.directory, name + INDEX_SUFFIX), 'xb', buffering=0)
+        self._segment_opened = time.monotonic()
+        self._segment_pos = 0
+        self._counters['segments'] += 1
+        ait.core.log.info('Archiving frames to {}'.format(self._segment_path))
+
+    def _close_segment(self):
+        ''''''
+        if self._segment is None:
+            return
+        try:
+            self.sync()
+        except (IOError, OSError) as e:
+            ait.core.log.error('Unable to sync frame archive {}: {}'.format(self._segment_path, e))
+        self._segment.close()
+        self._index.close()
+        self._segment = self._index = self._segment_path = None
+        self._segment_pos = 0
+
+    def metrics(self):
+        ''' Returns the archive counters as a dict
+
+        The dict holds the number of frames added ('frames'), the bytes
+        ('bytes') and batches ('writes') written, the fsyncs done
+        ('fsyncs'), the segments opened ('segments'), the batches that
+        could not be written ('write_errors') and the bytes waiting to be
+        written ('pending').
+        '''
+        metrics = dict(self._counters)
+        metrics['pending'] = len(self._batch)
+        return metrics
+
+
+def archive_from_config(frame_type, **kwargs):
+    ''' Returns a FrameArchive per the dsn.sle.frame_archive config
+
+    Each option is read from dsn.sle.frame_archive in the config, or from
+    kwargs prefixed with 'frame_archive_', such as frame_archive_directory.
+
+    Returns:
+        A :class:`FrameArchive`, or None if no archive directory is
+        configured.
+    '''
+    def option(name, default):
+        return ait.config.get('dsn.sle.frame_archive.' + name,
+                              kwargs.get('frame_archive_' + name, default))
+
+    directory = option('directory', None)
+    if not directory:
+        return None
+
+    return FrameArchive(
+        directory,
+        frame_type,
+        prefix=option('prefix', 'frames'),
+        segment_size=int(option('segment_size', 256 * 1024 * 1024)),
+        segment_duration=float(option('segment_duration', 3600)),
+        batch_size=int(option('batch_size', 1024 * 1024)),
+        flush_interval=float(option('flush_interval', 1.0)),
+        fsync_interval=option('fsync_interval', 5.0)
+    )
+
+
+class FrameArchiveReader(object):
+    ''' Reads the frames of an archive's segment files
+
+    Arguments:
+        directory:
+            The directory of the archive.
+
+        prefix (optional):
+            The prefix of the archive's segment file names.
+    '''
+
+    def __init__(self, directory, prefix='frames'):
+        self.directory = directory
+        self.prefix = prefix
+
+    @property
+    def segments(self):
+        ''' The paths of the archive's segment files, oldest first '''
+        pattern = os.path.join(self.directory, self.prefix + '-*' + SEGMENT_SUFFIX)
+        return sorted(glob.glob(pattern))
+
+    @staticmethod
+    def index(segment):
+        ''' Returns the index entries of a segment
+
+        Entries for records beyond the end of the segment, as may be left
+        by a crash between writing the index and the segment, are left
+        out.
+
+        Returns:
+            A list of (offset, ert, vcid) tuples, with the ERT in seconds
+            since the Unix epoch.
+        '''
+        with open(segment[:-len(SEGMENT_SUFFIX)] + INDEX_SUFFIX, 'rb') as f:
+            data = f.read()
+        size = os.path.getsize(segment)
+
+        entries = []
+        usable = len(data) - len(data) % INDEX_ENTRY.size
+        for offset, ert_us, vcid in INDEX_ENTRY.iter_unpack(memoryview(data)[:usable]):
+            if offset + RECORD_HEADER.size > size:
+                break
+            entries.append((offset, ert_us / 1e6, vcid))
+        return entries
+
+    def lookup(self, start=None, stop=None, vcids=None):
+        ''' Returns the records in a time range and set of virtual channels
+
+        Arguments:
+            start, stop (optional):
+                The ERT range, in seconds since the Unix epoch, of the
+                records to return. start is inclusive and stop exclusive.
+
+            vcids (optional):
+                The virtual channel IDs of the records to return.
+
+        Returns:
+            A list of (segment, offsets) tuples giving the offsets of the
+            matching records in each segment that has any.
+        '''
+        vcids = None if vcids is None else set(vcids)
+        result = []
+        for segment in self.segments:
+            offsets = [
+                offset for offset, ert, vcid in self.index(segment)
+                if (start is None or ert >= start) and (stop is None or ert < stop)
+                and (vcids is None or vcid in vcids)
+            ]
+            if offsets:
+                result.append((segment, offsets))
+        return result
+
+    def frame_headers(self, length=6):
+        ''' Returns the leading bytes of every frame in the archive
+
+        The bytes are gathered from each segment with NumPy using the
+        segment's index, for analyses of a whole pass such as
+        :func:`ait.dsn.sle.continuity.batch_continuity`. Frames shorter
+        than length are padded with zeros.
+
+        Arguments:
+            length (optional):
+                The number of bytes of each frame to return.
+
+        Returns:
+            A (number of frames, length) numpy.uint8 array, in the order
+            the frames were archived.
+
+        Raises:
+            ImportError: If NumPy is not installed.
+        '''
+        if numpy is None:
+            raise ImportError('Reading archived frame headers requires NumPy')
+
+        arrays = []
+        for segment in self.segments:
+            offsets = numpy.array([entry[0] for entry in self.index(segment)], dtype=numpy.int64)
+            if not len(offsets):
+                continue
+            data = numpy.fromfile(segment, dtype=numpy.uint8)
+            data = numpy.concatenate((data, numpy.zeros(length, dtype=numpy.uint8)))
+            columns = offsets[:, None] + (RECORD_HEADER.size + numpy.arange(length))
+            arrays.append(data[columns])
+        if not arrays:
+            return numpy.zeros((0, length), dtype=numpy.uint8)
+        return numpy.concatenate(arrays)
+
+    def frames(self, start=None, stop=None, vcids=None):
+        ''' Yields the frames in a time range and set of virtual channels
+
+        Arguments are as for :meth:`lookup`.
+
+        Yields:
+            (ert, vcid, frame_count, frame) tuples, with the ERT in seconds
+            since the Unix epoch and the frame as bytes.
+        '''
+        for segment, offsets in self.lookup(start, stop, vcids):
+            with open(segment, 'rb') as f:
+                for offset in offsets:
+                    f.seek(offset)
+                    ert_us, vcid, frame_count, length = RECORD_HEADER.unpack(f.read(RECORD_HEADER.size))
+                    frame = f.read(length)
+                    if len(frame) < length:
+                        break
+                    yield ert_us / 1e6, vcid, frame_count, frame
@@ -0,0 +1,418 @@
+# Advanced Multi-Mission Operations System (AMMOS) Instrument Toolkit (AIT)
+# Bespoke Link to Instruments and Small Satellites (BLISS)
+#
+# Copyright 2017, by the California Institute of Technology. ALL RIGHTS
+# RESERVED. United States Government Sponsorship acknowledged. Any
+# commercial use must be negotiated with the Office of Technology Transfer
+# at the California Institute of Technology.
+#
+# This software may be subject to U.S. export control laws. By accepting
+# this software, the user agrees to comply with all applicable U.S. export
+# laws and regulations. User has the responsibility to obtain export licenses,
+# or other export authority as may be required before exporting such
+# information to foreign countries or providing access to foreign persons.
+
+''' Transfer Buffer Fast Path
+
+The ait.dsn.sle.ber module walks the BER encoding of RAF and RCF transfer
+buffer PDUs directly instead of decoding them with pyasn1. Transfer buffers
+make up nearly all of the traffic on a return link and have a fixed
+structure, so locating the fields of each annotated frame by their tags is
+far cheaper than building the generic pyasn1 object tree.
+
+Anything the walker does not recognize is left to pyasn1: PDUs other than
+transfer buffers are reported as such and unexpected encodings raise
+ValueError, in which case the caller decodes the whole PDU as before.
+
+The module also provides the length and integer encoders used by the
+precompiled PDU encoders such as
+:class:`ait.dsn.sle.cltu.CltuTransferDataEncoder`. They produce the same
+definite length, minimal octet encodings as the pyasn1 BER encoder.
+
+Attributes:
+    TRANSFER_BUFFER_TAG: The identifier octet of the RafTransferBuffer and
+        RcfTransferBuffer components of a provider to user PDU.
+
+    ANNOTATED_FRAME_TAG: The identifier octet of an annotatedFrame element
+        of a transfer buffer.
+
+    SYNC_NOTIFICATION_TAG: The identifier octet of a syncNotification
+        element of a transfer buffer.
+
+Classes:
+    TransferBuffer: A transfer buffer located by the walker, standing in
+        for the pyasn1 decoded PDU.
+
+    AnnotatedFrame: The fields of an annotated frame as memoryviews over
+        the received PDU.
+'''
+from pyasn1.codec.der.decoder import decode
+
+TRANSFER_BUFFER_TAG = 0xA8
+ANNOTATED_FRAME_TAG = 0xA0
+SYNC_NOTIFICATION_TAG = 0xA1
+
+_INTEGER_TAG = 0x02
+_OCTET_STRING_TAG = 0x04
+
+# Identifier octets of the two alternatives of the CHOICE types in an
+# annotated frame, e.g. ccsdsFormat [0] and ccsdsPicoFormat [1] for Time
+_CHOICE_0 = 0x80
+_CHOICE_1 = 0x81
+
+_TIME_FORMATS = {_CHOICE_0: ('ccsdsFormat', 8), _CHOICE_1: ('ccsdsPicoFormat', 10)}
+_ANTENNA_ID_FORMATS = {_CHOICE_0: 'globalForm', _CHOICE_1: 'localForm'}
+
+
+def read_tlv(buf, offset):
+    ''' Read the identifier and length octets of a BER element
+
+    Arguments:
+        buf (memoryview):
+            The encoded data.
+
+        offset (int):
+            The offset of the element's identifier octet in buf.
+
+    Returns:
+        A (tag, start, end) tuple with the identifier octet and the offsets
+        of the element's contents in buf.
+
+    Raises:
+        ValueError: If the element uses a high tag number or the indefinite
+            length form, or extends past the end of buf.
+    '''
+    try:
+        tag = buf[offset]
+        length = buf[offset + 1]
+    except IndexError:
+        raise ValueError('BER element truncated at offset {}'.format(offset))
+
+    if tag & 0x1F == 0x1F:
+        raise ValueError('BER high tag numbers are not supported')
+
+    start = offset + 2
+    if length & 0x80:
+        num_octets = length & 0x7F
+        if num_octets == 0 or num_octets > 4:
+            raise ValueError('BER length form not supported at offset {}'.format(offset))
+        length = int.from_bytes(buf[start:start + num_octets], 'big')
+        start += num_octets
+
+    end = start + length
+    if end > len(buf):
+        raise ValueError('BER element at offset {} overruns the PDU'.format(offset))
+
+    return tag, start, end
+
+
+def encode_length(length):
+    ''' Returns the BER length octets for contents of the given length '''
+    if length < 0x80:
+        return bytes((length,))
+    octets = length.to_bytes((length.bit_length() + 7) // 8, 'big')
+    return bytes((0x80 | len(octets),)) + octets
+
+
+def encode_integer(value):
+    ''' Returns the BER encoding of a universal INTEGER '''
+    contents = value.to_bytes(value.bit_length() // 8 + 1, 'big', signed=True)
+    return bytes((_INTEGER_TAG, len(contents))) + contents
+
+
+def walk_transfer_buffer(message, frame_quality=True):
+    ''' Locate the annotated frames and notifications in a transfer buffer
+
+    Arguments:
+        message (bytes or memoryview):
+            A BER encoded RAF or RCF provider to user PDU.
+
+        frame_quality (bool):
+            True if annotated frames carry a deliveredFrameQuality field, as
+            RAF frames do. RCF frames do not.
+
+    Returns:
+        None if message is not a transfer buffer. Otherwise a list holding
+        an :class:`AnnotatedFrame` for each annotated frame and, for each
+        sync notification, a memoryview of its complete encoding so that it
+        can be decoded with pyasn1.
+
+    Raises:
+        ValueError: If the transfer buffer is encoded in a way the walker
+            does not handle.
+    '''
+    buf = memoryview(message)
+    if len(buf) == 0 or buf[0] != TRANSFER_BUFFER_TAG:
+        return None
+
+    tag, offset, end = read_tlv(buf, 0)
+    if end != len(buf):
+        raise ValueError('Trailing data after transfer buffer')
+
+    items = []
+    while offset < end:
+        tag, start, stop = read_tlv(buf, offset)
+        if tag == ANNOTATED_FRAME_TAG:
+            items.append(_annotated_frame(buf, start, stop, frame_quality))
+        elif tag == SYNC_NOTIFICATION_TAG:
+            items.append(buf[offset:stop])
+        else:
+            raise ValueError('Unexpected transfer buffer element tag {:#x}'.format(tag))
+        offset = stop
+
+    return items
+
+
+def decode_transfer_buffer(message, name, frame_quality, notification_spec):
+    ''' Decode a transfer buffer PDU with the walker
+
+    Sync notifications are rare and varied so they are decoded with pyasn1
+    against notification_spec, leaving their handlers unchanged.
+
+    Arguments:
+        message (bytes):
+            A BER encoded RAF or RCF provider to user PDU.
+
+        name (str):
+            The name of the transfer buffer component of the PDU, e.g.
+            'rafTransferBuffer'.
+
+        frame_quality (bool):
+            True if annotated frames carry a deliveredFrameQuality field.
+
+        notification_spec:
+            An instance of the service's FrameOrNotification pyasn1 class.
+
+    Returns:
+        A :class:`TransferBuffer` or None if message is not a transfer
+        buffer.
+
+    Raises:
+        ValueError: If the transfer buffer is encoded in a way the walker
+            does not handle.
+        pyasn1.error.PyAsn1Error: If a sync notification cannot be decoded.
+    '''
+    items = walk_transfer_buffer(message, frame_quality)
+    if items is None:
+        return None
+
+    for i, item in enumerate(items):
+        if not isinstance(item, AnnotatedFrame):
+            items[i] = decode(bytes(item), asn1Spec=notification_spec)[0]
+
+    return TransferBuffer(name, items)
+
+
+def _annotated_frame(buf, offset, end, frame_quality):
+    ''' Walk the fields of the annotated frame in buf[offset:end] '''
+    frame = AnnotatedFrame()
+
+    tag, start, offset = read_tlv(buf, offset)
+    if tag == _CHOICE_1:
+        frame.invoker_credentials = buf[start:offset]
+    elif tag != _CHOICE_0:
+        raise ValueError('Unexpected invokerCredentials tag {:#x}'.format(tag))
+
+    tag, start, offset = read_tlv(buf, offset)
+    if tag not in _TIME_FORMATS or offset - start != _TIME_FORMATS[tag][1]:
+        raise ValueError('Unexpected earthReceiveTime encoding')
+    frame.earth_receive_time_format = _TIME_FORMATS[tag][0]
+    frame.earth_receive_time = buf[start:offset]
+
+    tag, start, offset = read_tlv(buf, offset)
+    if tag not in _ANTENNA_ID_FORMATS:
+        raise ValueError('Unexpected antennaId tag {:#x}'.format(tag))
+    frame.antenna_id_format = _ANTENNA_ID_FORMATS[tag]
+    frame.antenna_id = buf[start:offset]
+
+    tag, start, offset = read_tlv(buf, offset)
+    if tag != _INTEGER_TAG:
+        raise ValueError('Unexpected dataLinkContinuity tag {:#x}'.format(tag))
+    frame.data_link_continuity = int.from_bytes(buf[start:offset], 'big', signed=True)
+
+    if frame_quality:
+        tag, start, offset = read_tlv(buf, offset)
+        if tag != _INTEGER_TAG:
+            raise ValueError('Unexpected deliveredFrameQuality tag {:#x}'.format(tag))
+        frame.delivered_frame_quality = int.from_bytes(buf[start:offset], 'big', signed=True)
+
+    tag, start, offset = read_tlv(buf, offset)
+    if tag == _CHOICE_1:
+        frame.private_annotation = buf[start:offset]
+    elif tag != _CHOICE_0:
+        raise ValueError('Unexpected privateAnnotation tag {:#x}'.format(tag))
+
+    tag, start, offset = read_tlv(buf, offset)
+    if tag != _OCTET_STRING_TAG:
+        raise ValueError('Unexpected data tag {:#x}'.format(tag))
+    frame.data = buf[start:offset]
+
+    if offset != end:
+        raise ValueError('Unexpected fields after annotated frame data')
+
+    return frame
+
+
+class TransferBuffer(object):
+    ''' A transfer buffer decoded by :func:`decode_transfer_buffer`
+
+    Dispatches and iterates like the pyasn1 decoded provider to user PDU,
+    so ``pdu['rafTransferBuffer']`` yields the AnnotatedFrame and decoded
+    sync notification elements in order.
+    '''
+    __slots__ = ('_name', 'items')
+
+    def __init__(self, name, items):
+        self._name = name
+        self.items = items
+
+    def getName(self):
+        ''''''
+        return self._name
+
+    def getComponent(self):
+        ''''''
+        return self.items
+
+    def __getitem__(self, name):
+        if name != self._name:
+            raise KeyError(name)
+        return self.items
+
+    def __contains__(self, name):
+        return name == self._name
+
+
+class AnnotatedFrame(object):
+    ''' An annotated frame located by :func:`walk_transfer_buffer`
+
+    The octet string fields are memoryviews over the received PDU, which
+    they keep alive. Handlers that hold on to a frame for long should copy
+    the fields they need with bytes() so the rest of the PDU can be freed.
+
+    AnnotatedFrame also answers the subset of the pyasn1 interface that
+    AnnotatedFrame handlers use on the decoded FrameOrNotification, such as
+    ``pdu.getComponent()['data'].asOctets()`` and
+    ``frame['earthReceiveTime']['ccsdsFormat']``, so that existing handlers
+    receive either form unchanged.
+
+    Attributes:
+        earth_receive_time: The 8 (ccsdsFormat) or 10 (ccsdsPicoFormat)
+            byte CCSDS time code at which the frame was received.
+
+        earth_receive_time_format: 'ccsdsFormat' or 'ccsdsPicoFormat'.
+
+        antenna_id: The contents of the antennaId field.
+
+        antenna_id_format: 'globalForm' or 'localForm'.
+
+        data_link_continuity: The dataLinkContinuity integer.
+
+        delivered_frame_quality: The deliveredFrameQuality integer for RAF
+            frames, None for RCF frames.
+
+        private_annotation: The private annotation or None if there is none.
+
+        invoker_credentials: The invoker credentials or None if unused.
+
+        data: The frame.
+    '''
+    __slots__ = (
+        'earth_receive_time', 'earth_receive_time_format', 'antenna_id',
+        'antenna_id_format', 'data_link_continuity', 'delivered_frame_quality',
+        'private_annotation', 'invoker_credentials', 'data'
+    )
+
+    def __init__(self):
+        self.delivered_frame_quality = None
+        self.private_annotation = None
+        self.invoker_credentials = None
+
+    def getName(self):
+        ''''''
+        return 'annotatedFrame'
+
+    def getComponent(self):
+        ''''''
+        return self
+
+    def __getitem__(self, name):
+        if name == 'data':
+            return _Octets(self.data)
+        elif name == 'earthReceiveTime':
+            return _Choice(self.earth_receive_time_format, _Octets(self.earth_receive_time))
+        elif name == 'antennaId':
+            return _Choice(self.antenna_id_format, _Octets(self.antenna_id))
+        elif name == 'dataLinkContinuity':
+            return self.data_link_continuity
+        elif name == 'deliveredFrameQuality' and self.delivered_frame_quality is not None:
+            return self.delivered_frame_quality
+        elif name == 'privateAnnotation':
+            if self.private_annotation is None:
+                return _Choice('null', None)
+            return _Choice('notNull', _Octets(self.private_annotation))
+        elif name == 'invokerCredentials':
+            if self.invoker_credentials is None:
+                return _Choice('unused', None)
+            return _Choice('used', _Octets(self.invoker_credentials))
+        raise KeyError(name)
+
+    def __contains__(self, name):
+        try:
+            self[name]
+        except KeyError:
+            return False
+        return True
+
+
+class _Octets(object):
+    ''' pyasn1 OctetString style access to a memoryview '''
+    __slots__ = ('_view',)
+
+    isValue = True
+
+    def __init__(self, view):
+        self._view = view
+
+    def asOctets(self):
+        return bytes(self._view)
+
+    def asNumbers(self):
+        return tuple(self._view)
+
+    def __bytes__(self):
+        return bytes(self._view)
+
+    def __len__(self):
+        return len(self._view)
+
+    def __eq__(self, other):
+        return bytes(self._view) == bytes(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+
+class _Choice(object):
+    ''' pyasn1 Choice style access to one selected alternative '''
+    __slots__ = ('_name', '_value')
+
+    isValue = True
+
+    def __init__(self, name, value):
+        self._name = name
+        self._value = value
+
+    def getName(self):
+        return self._name
+
+    def getComponent(self):
+        return self._value
+
+    def __getitem__(self, name):
+        if name != self._name:
+            raise KeyError(name)
+        return self._value
+
+    def __contains__(self, name):
+        return name == self._name
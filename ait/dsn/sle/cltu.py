@@ -20,11 +20,15 @@ Unit (CLTU) interface classes, methods, and attributes.
 Classes:
     CLTU: An extension of the generic :class:`ait.dsn.sle.common.SLE` which
         implements the Forward CLTU standard.
+
+    CltuTransferDataEncoder: Encodes CLTU-TRANSFER-DATA invocations from
+        pre-encoded invariant parts without building pyasn1 objects.
 '''
 import binascii
 import struct
 
 import ait.core.log
+import ait.dsn.sle.ber as ber
 import ait.dsn.sle.common as common
 
 if ait.config.get('dsn.sle.fcltu.version', None) == 4:
@@ -129,6 +133,8 @@ class CLTU(common.SLE):
         self._handlers['CltuPeerAbortInvocation'].append(self._peer_abort_handler)
         self._handlers['CltuThrowEventReturn'].append(self._throw_event_handler)
 
+        self._transfer_data_encoder = CltuTransferDataEncoder()
+
     def bind(self, inst_id=None):
         ''' Bind to a CLTU interface
 
@@ -178,6 +184,20 @@ class CLTU(common.SLE):
 
     #TODO save_cltu method
 
+    @property
+    def next_cltu_id(self):
+        ''' The CLTU identification the next CLTU will be sent with
+
+        CLTU-TRANSFER-DATA returns carry the identification the provider
+        expects next. Setting this resynchronizes the CLTUs sent from then
+        on with it.
+        '''
+        return self._cltu_id
+
+    @next_cltu_id.setter
+    def next_cltu_id(self, cltu_id):
+        self._cltu_id = cltu_id
+
     def upload_cltu(self, tc_data, earliest_time=None, latest_time=None, delay=0, notify=False):
         ''' Upload a CLTU to the service
 
@@ -200,11 +220,34 @@ class CLTU(common.SLE):
             notify (optional boolean):
                 Specify whether the provider shall invoke the CLTU-ASYNCNOTIFY
                 operation upon completion of the radiation of the CLTU.
+
+        Returns:
+            The CLTU identification the CLTU was sent with.
+
+        See :class:`ait.dsn.sle.uplink.CltuUplink` for keeping several CLTUs
+        in flight and tracking their returns.
         '''
-        pdu = self._prepare_cltu_pdu(tc_data, earliest_time, latest_time, delay, notify)
+        return self.transfer_data(tc_data, earliest_time, latest_time, delay, notify)[1]
+
+    def transfer_data(self, tc_data, earliest_time=None, latest_time=None, delay=0, notify=False):
+        ''' Upload a CLTU to the service, as :meth:`upload_cltu` does
+
+        Returns:
+            A tuple of the invoke id and the CLTU identification the CLTU was
+            sent with. The provider's CLTU-TRANSFER-DATA return carries the
+            same invoke id.
+        '''
+        invoke_id = self.invoke_id
+        cltu_id = self._cltu_id
+        credentials = self.make_credentials() if self._auth_level == 'all' else None
+        msg = self._transfer_data_encoder.encode(invoke_id, cltu_id, tc_data,
+                                                 earliest_time, latest_time, delay, notify,
+                                                 credentials)
+        self._cltu_id += 1
 
         ait.core.log.info('Sending TC Data ...')
-        self.send(self.encode_pdu(pdu))
+        self.send(msg)
+        return (invoke_id, cltu_id)
 
     def _prepare_cltu_pdu(self, tc_data, earliest_time=None, latest_time=None, delay=0, notify=False):
         ''' Returns CLTU PDU prepared for upload
@@ -454,9 +497,9 @@ class CLTU(common.SLE):
             ))
         else:
             result = result['negativeResult']
-            if 'commmon' in result:
-                opts = ['Duplicate Invoke Id', 'Other Reason']
-                diag = opts[result['common']]
+            if 'common' in result:
+                opts = {100: 'Duplicate Invoke Id', 127: 'Other Reason'}
+                diag = opts.get(int(result['common']), 'Other Reason')
             else:
                 opts = ['Unable to Process', 'Unable to Store', 'Out of Sequence',
                         'Inconsistent Time Range', 'Invalid Time', 'Late Sldu',
@@ -616,3 +659,120 @@ class CLTU(common.SLE):
             diag = diag_options[diag]
             msg = 'Event Invocation #{} Failed. Reason: {}'.format(eid, diag)
         ait.core.log.info(msg)
+
+
+class CltuTransferDataEncoder(object):
+    ''' Precompiled encoder for CLTU-TRANSFER-DATA invocations
+
+    Building a :class:`CltuUserToProviderPdu` and encoding it with pyasn1
+    dominates the cost of uploading a CLTU. The invocation has a fixed
+    layout, so this encoder keeps the encodings of its invariant parts (the
+    PDU tag, unused credentials, undefined transmission times and both
+    radiation notification values) and splices the invoke id, CLTU
+    identification, times, delay and data in between with the matching BER
+    lengths. The TML message it returns is byte for byte the same as
+    :meth:`ait.dsn.sle.common.SLE.encode_pdu` produces for the PDU built by
+    :meth:`CLTU._prepare_cltu_pdu`.
+    '''
+    # cltuTransferDataInvocation is [10] IMPLICIT SEQUENCE in both the v4
+    # and v5 CltuUserToProviderPdu
+    PDU_TAG = b'\xaa'
+    UNUSED_CREDENTIALS = b'\x80\x00'
+    UNDEFINED_TIME = b'\x80\x00'
+    # ConditionalTime known [1] holding a Time ccsdsFormat [0] of 8 bytes
+    KNOWN_TIME = b'\xa1\x0a\x80\x08'
+    CLTU_DATA_TAG = b'\x04'
+
+    MAX_INVOKE_ID = 0xFFFF
+    MAX_UNSIGNED_LONG = 0xFFFFFFFF
+    MAX_CLTU_DATA = 65536
+
+    def __init__(self):
+        # slduRadiationNotification is produceNotification (0) or
+        # doNotProduceNotification (1)
+        self._notification = {True: ber.encode_integer(0), False: ber.encode_integer(1)}
+        self._no_delay = ber.encode_integer(0)
+
+    def encode(self, invoke_id, cltu_id, tc_data, earliest_time=None, latest_time=None,
+               delay=0, notify=False, credentials=None):
+        ''' Encode a CLTU-TRANSFER-DATA invocation into a TML message
+
+        Arguments:
+            invoke_id:
+                The invoke id of the operation.
+
+            cltu_id:
+                The CLTU identification.
+
+            tc_data:
+                The data to transfer in the CLTU.
+
+            earliest_time (optional :class:`datetime.datetime`):
+                The earliest time that the provider shall start processing
+                the CLTU.
+
+            latest_time (optional :class:`datetime.datetime`):
+                The latest time at which the provider shall start processing
+                the CLTU.
+
+            delay=0:
+                The minimum radiation delay, in microseconds, between this
+                CLTU and the next.
+
+            notify (optional boolean):
+                Whether the provider shall invoke CLTU-ASYNC-NOTIFY once the
+                CLTU has been radiated.
+
+            credentials (optional bytes):
+                The encoded invoker credentials, or None if unused.
+
+        Returns:
+            The encoded PDU packed into a TML SLE PDU message.
+
+        Raises:
+            ValueError: If a value is outside the range its type allows.
+        '''
+        if not 0 <= invoke_id <= self.MAX_INVOKE_ID:
+            raise ValueError('Invoke id {} out of range'.format(invoke_id))
+        if not 0 <= cltu_id <= self.MAX_UNSIGNED_LONG:
+            raise ValueError('CLTU identification {} out of range'.format(cltu_id))
+        if not 0 <= delay <= self.MAX_UNSIGNED_LONG:
+            raise ValueError('Delay time {} out of range'.format(delay))
+
+        tc_data = bytes(tc_data)
+        if not 1 <= len(tc_data) <= self.MAX_CLTU_DATA:
+            raise ValueError('CLTU data must be 1 to {} bytes'.format(self.MAX_CLTU_DATA))
+
+        if credentials is None:
+            credentials = self.UNUSED_CREDENTIALS
+        else:
+            credentials = b'\x81' + ber.encode_length(len(credentials)) + bytes(credentials)
+
+        head = b''.join((
+            credentials,
+            ber.encode_integer(invoke_id),
+            ber.encode_integer(cltu_id),
+            self._conditional_time(earliest_time),
+            self._conditional_time(latest_time),
+            ber.encode_integer(delay) if delay else self._no_delay,
+            self._notification[bool(notify)],
+            self.CLTU_DATA_TAG,
+            ber.encode_length(len(tc_data))
+        ))
+
+        contents_len = len(head) + len(tc_data)
+        pdu_head = self.PDU_TAG + ber.encode_length(contents_len)
+        pdu_len = len(pdu_head) + contents_len
+
+        return b''.join((
+            struct.pack(common.TML_SLE_FORMAT, common.TML_SLE_TYPE, pdu_len),
+            pdu_head,
+            head,
+            tc_data
+        ))
+
+    def _conditional_time(self, time_):
+        ''''''
+        if not time_:
+            return self.UNDEFINED_TIME
+        return self.KNOWN_TIME + struct.pack('!HIH', (time_ - common.CCSDS_EPOCH).days, 0, 0)
@@ -36,11 +36,28 @@ Attributes:
     TML_CONTEXT_HEARTBEAT_TYPE: The first 4 bytes of an SLE Heartbeat
         message PDU header for use when struct.pack-ing.
 
+    TML_HEADER_FORMAT: The struct format string for unpack-ing the
+        type and length fields common to every TML message header.
+
+    TML_HEADER_LEN: The length in bytes of a TML message header.
+
     CCSDS_EPOCH: A datetime object pointing to the CCSDS Epoch.
 
+    DATA_QUEUE_POLICIES: The backpressure policies that can be applied when
+        the queue of received PDUs awaiting decode is full.
+
+    DATA_PROCESSOR_BATCH_SIZE: The maximum number of queued PDUs decoded
+        before the data processor yields to other greenlets.
+
 Classes:
     SLE: An SLE interface "base" class that provides interface-agnostic
         methods and attributes for interfacing with SLE.
+
+    TMLFramer: A streaming framer that splits the TML byte stream received
+        from the provider into SLE PDUs without intermediate copies.
+
+    CredentialsEncoder: Generates and verifies ISP1 credentials for one
+        username and password from pre-encoded parts.
 '''
 
 import binascii
@@ -48,6 +65,7 @@ from collections import defaultdict
 import datetime as dt
 import errno
 import fcntl
+import functools
 import hashlib
 import random
 import socket
@@ -62,7 +80,6 @@ import gevent.monkey; gevent.monkey.patch_all()
 
 import pyasn1.error
 from pyasn1.codec.ber.encoder import encode
-from pyasn1.codec.der.encoder import encode as der_encode
 from pyasn1.codec.der.decoder import decode
 
 import ait.core
@@ -70,7 +87,7 @@ import ait.core.log
 
 from ait.dsn.sle.pdu import service_instance
 from ait.dsn.sle.pdu.service_instance import *
-from ait.dsn.sle.pdu.common import HashInput, ISP1Credentials
+import ait.dsn.sle.ber as ber
 import ait.dsn.sle.utils as utils
 
 TML_SLE_FORMAT = '!ii'
@@ -82,8 +99,28 @@ TML_CONTEXT_MSG_TYPE = 0x02000000
 TML_CONTEXT_HB_FORMAT = '!ii'
 TML_CONTEXT_HEARTBEAT_TYPE = 0x03000000
 
+TML_HEADER_FORMAT = '!II'
+TML_HEADER_LEN = struct.calcsize(TML_HEADER_FORMAT)
+
 CCSDS_EPOCH = dt.datetime(1958, 1, 1)
 
+DATA_QUEUE_POLICIES = ['block', 'drop_oldest', 'drop_newest']
+
+DATA_PROCESSOR_BATCH_SIZE = 64
+
+# Maps pyasn1 component names (e.g. 'rafTransferBuffer') to the handler
+# event names they are registered under (e.g. 'RafTransferBuffer')
+_handler_keys = {}
+
+
+def pdu_handler_key(name):
+    ''' Return the handler event name for a pyasn1 PDU component name '''
+    key = _handler_keys.get(name)
+    if key is None:
+        key = name[:1].upper() + name[1:]
+        _handler_keys[name] = key
+    return key
+
 
 class SLE(object):
     ''' SLE interface "base" class
@@ -91,14 +128,19 @@ class SLE(object):
     The SLE class provides SLE interface-agnostic methods and attributes
     for interfacing with SLE.
 
+    Each instance owns its handler table, data queue and invoke id counter,
+    so any number of RAF, RCF and CLTU instances can run in one process
+    without sharing state.
     '''
-    _state = 'unbound'
-    _handlers = defaultdict(list)
-    _data_queue = gevent.queue.Queue()
-    _invoke_id = 0
 
     def __init__(self, *args, **kwargs):
         ''''''
+        self._state = 'unbound'
+        self._handlers = defaultdict(list)
+        self._invoke_id = 0
+        self._session = None
+        self._frame_archive = None
+
         self._downlink_frame_type = ait.config.get('dsn.sle.downlink_frame_type',
                                                    kwargs.get('downlink_frame_type', 'TMTransFrame'))
         self._heartbeat = ait.config.get('dsn.sle.heartbeat',
@@ -120,6 +162,12 @@ class SLE(object):
         self._telem_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self._auth_level = ait.config.get('dsn.sle.auth_level',
                                           kwargs.get('auth_level', 'none'))
+        self._data_queue_size = ait.config.get('dsn.sle.data_queue_size',
+                                               kwargs.get('data_queue_size', 10000))
+        self._data_queue_policy = ait.config.get('dsn.sle.data_queue_policy',
+                                                 kwargs.get('data_queue_policy', 'block'))
+        self._fast_decode = ait.config.get('dsn.sle.fast_decode',
+                                           kwargs.get('fast_decode', True))
 
         if not self._hostnames or not self._port:
             msg = 'Connection configuration missing hostnames ({}) or port ({})'
@@ -130,6 +178,17 @@ class SLE(object):
         if self._auth_level not in ['none', 'bind', 'all']:
             raise ValueError('Authentication level must be one of: "none", "bind", "all"')
 
+        if self._data_queue_policy not in DATA_QUEUE_POLICIES:
+            raise ValueError('Data queue policy must be one of: "block", "drop_oldest", "drop_newest"')
+
+        self._data_queue = gevent.queue.Queue(self._data_queue_size)
+        self._data_queue_stats = {
+            'enqueued': 0,
+            'blocked': 0,
+            'dropped_oldest': 0,
+            'dropped_newest': 0
+        }
+
         self._local_entity_auth = {
             'local_entity_id': self._initiator_id,
             'auth_level': self._auth_level,
@@ -137,6 +196,10 @@ class SLE(object):
             'random_number': None
         }
 
+        # The credentials encoder for each username, with the password
+        # it was made with
+        self._credentials_encoders = {}
+
     @property
     def invoke_id(self):
         ''''''
@@ -144,6 +207,18 @@ class SLE(object):
         self._invoke_id += 1
         return iid
 
+    @property
+    def data_queue_stats(self):
+        ''' Counters for PDUs passed from the socket reader to the decoder
+
+        Returns:
+            A dict with the number of PDUs 'enqueued' for decoding and the
+            number of times the backpressure policy kicked in because the
+            queue was full: 'blocked' (reader waited for space),
+            'dropped_oldest' and 'dropped_newest'.
+        '''
+        return dict(self._data_queue_stats)
+
     def add_handler(self, event, handler):
         ''' Add a "handler" function for an "event"
 
@@ -173,6 +248,40 @@ class SLE(object):
                 ait.core.log.error('Unexpected error encountered when sending data. Aborting ...')
                 raise e
 
+    def _enqueue_pdu(self, pdu):
+        ''' Queue a received PDU for decoding, applying the backpressure policy
+
+        Arguments:
+            pdu:
+                The bytes of the PDU body.
+        '''
+        queue = self._data_queue
+        stats = self._data_queue_stats
+
+        if self._data_queue_policy == 'block':
+            if queue.full():
+                stats['blocked'] += 1
+            queue.put(pdu)
+        elif self._data_queue_policy == 'drop_newest':
+            try:
+                queue.put_nowait(pdu)
+            except gevent.queue.Full:
+                stats['dropped_newest'] += 1
+                return
+        else:
+            while True:
+                try:
+                    queue.put_nowait(pdu)
+                    break
+                except gevent.queue.Full:
+                    try:
+                        queue.get_nowait()
+                        stats['dropped_oldest'] += 1
+                    except gevent.queue.Empty:
+                        pass
+
+        stats['enqueued'] += 1
+
     def decode(self, message, asn1Spec):
         ''' Decode a chunk of ASN.1 data
 
@@ -194,6 +303,26 @@ class SLE(object):
         '''
         return decode(message, asn1Spec=asn1Spec)
 
+    def _decode_transfer_buffer(self, message, name, frame_quality, notification_spec):
+        ''' Decode a transfer buffer PDU without pyasn1 where possible
+
+        See :func:`ait.dsn.sle.ber.decode_transfer_buffer` for the
+        arguments.
+
+        Returns:
+            A :class:`ait.dsn.sle.ber.TransferBuffer` or None if the fast
+            path is disabled or does not apply, in which case the PDU should
+            be decoded with pyasn1.
+        '''
+        if not self._fast_decode:
+            return None
+
+        try:
+            return ber.decode_transfer_buffer(message, name, frame_quality, notification_spec)
+        except ValueError as e:
+            ait.core.log.debug('Falling back to pyasn1 to decode transfer buffer: {}'.format(e))
+            return None
+
     def encode_pdu(self, pdu):
         ''' Encode a SLE PDU
 
@@ -306,8 +435,11 @@ class SLE(object):
             ait.core.log.error('Connection failure with DSN. Aborting ...')
             raise Exception('Unable to connect to DSN through any provided hostnames.')
 
-        self._conn_monitor = gevent.spawn(conn_handler, self)
-        self._data_processor = gevent.spawn(data_processor, self)
+        if self._session is None:
+            self._conn_monitor = gevent.spawn(conn_handler, self)
+            self._data_processor = gevent.spawn(data_processor, self)
+        else:
+            self._session.attach(self)
 
         context_msg = struct.pack(
             TML_CONTEXT_MSG_FORMAT,
@@ -331,13 +463,22 @@ class SLE(object):
     def disconnect(self):
         ''' Disconnect from SLE
 
-        Disconnect the SLE and telemetry output sockets and kill the
-        greenlets for monitoring and processing data.
+        Disconnect the SLE and telemetry output sockets, close the frame
+        archive if there is one and kill the greenlets for monitoring and
+        processing data. If the instance is
+        managed by a :class:`ait.dsn.sle.session.SessionManager` it is
+        detached from the session instead, leaving the shared telemetry
+        socket and greenlets running.
         '''
         self._socket.close()
-        self._telem_sock.close()
-        self._conn_monitor.kill()
-        self._data_processor.kill()
+        if self._frame_archive is not None:
+            self._frame_archive.close()
+        if self._session is None:
+            self._telem_sock.close()
+            self._conn_monitor.kill()
+            self._data_processor.kill()
+        else:
+            self._session.detach(self)
 
     def stop(self, pdu):
         ''' Send a SLE Stop PDU.
@@ -372,10 +513,9 @@ class SLE(object):
 
     def _handle_pdu(self, pdu):
         ''''''
-        pdu_key = pdu.getName()
-        pdu_key = pdu_key[:1].upper() + pdu_key[1:]
-        if pdu_key in self._handlers:
-            pdu_handlers = self._handlers[pdu_key]
+        pdu_key = pdu_handler_key(pdu.getName())
+        pdu_handlers = self._handlers.get(pdu_key)
+        if pdu_handlers is not None:
             for h in pdu_handlers:
                 h(pdu)
         else:
@@ -399,16 +539,21 @@ class SLE(object):
         return self._generate_encoded_credentials(now, random_number, self._initiator_id, self._password)
 
     def _check_return_credentials(self, responder_performer_credentials, username, password):
-        decoded_credentials = decode(responder_performer_credentials.asOctets(), ISP1Credentials())[0]
-        days, ms, us = struct.unpack('!HIH', str(bytearray(decoded_credentials['time'].asNumbers())))
-        time_delta = dt.timedelta(days=days, milliseconds=ms, microseconds=us)
-        cred_time = time_delta + dt.datetime(1958, 1, 1)
-        random_number = decoded_credentials['randomNumber']
-        performer_credentials = self._generate_encoded_credentials(cred_time,
-                                                                   random_number,
-                                                                   self._responder_id,
-                                                                   self._peer_password)
-        return performer_credentials == responder_performer_credentials
+        '''Verifies the ISP1 credentials returned by the responder
+
+        Arguments:
+            responder_performer_credentials:
+                The performer credentials from the return.
+            username:
+                The responder's username.
+            password:
+                The responder's password.
+
+        Returns:
+            True if the credentials were generated with the given username
+            and password.
+        '''
+        return self._credentials_encoder(username, password).verify(responder_performer_credentials.asOctets())
 
     def _generate_encoded_credentials(self, current_time, random_number, username, password):
         '''Generates encoded ISP1 credentials
@@ -423,92 +568,304 @@ class SLE(object):
             password:
                 The password to use to create the credentials.
         '''
-        hash_input = HashInput()
-        credential_time = generate_encoded_time(current_time)
-
-        hash_input['time'] = credential_time
-        hash_input['randomNumber'] = random_number
-        hash_input['username'] = username
-        hash_input['password'] = password
-        der_encoded_hash_input = der_encode(hash_input)
-        the_protected = bytearray.fromhex(hashlib.sha1(der_encoded_hash_input).hexdigest())
+        return self._credentials_encoder(username, password).encode(generate_encoded_time(current_time),
+                                                                    random_number)
 
-        isp1_creds = ISP1Credentials()
-        isp1_creds['time'] = credential_time
-        isp1_creds['randomNumber'] = random_number
-        isp1_creds['theProtected'] = the_protected
+    def _credentials_encoder(self, username, password):
+        ''' Returns the :class:`CredentialsEncoder` for a username and password
 
-        return encode(isp1_creds)
+        The encoder is kept until the password of the username changes, so
+        the instance holds at most one per username.
+        '''
+        (encoder_password, encoder) = self._credentials_encoders.get(username, (None, None))
+        if encoder is None or encoder_password != password:
+            encoder = CredentialsEncoder(username, password)
+            self._credentials_encoders[username] = (password, encoder)
+        return encoder
 
     def _generate_encoded_time(self, datetime_):
         return generate_encoded_time(datetime_)
 
 
-def conn_handler(handler):
-    ''' Handler for processing data received from the DSN into PDUs'''
-    hb_time = int(time.time())
-    msg = b''
+class CredentialsEncoder(object):
+    ''' ISP1 credentials generation and verification
 
-    while True:
-        gevent.sleep(0)
+    The ISP1 credentials of an operation are the SHA-1 hash of the DER
+    encoded HashInput (time, random number, username and password) together
+    with the time and random number it was generated from. Only the time and
+    random number change between operations, so the encoder keeps the DER
+    encoding of the username and password and encodes the remaining fields
+    directly. The bytes it produces are identical to building and encoding
+    the :class:`ait.dsn.sle.pdu.common.HashInput` and
+    :class:`ait.dsn.sle.pdu.common.ISP1Credentials` pyasn1 objects.
 
-        now = int(time.time())
-        if handler._need_heartbeat(now - hb_time):
-            hb_time = now
-            handler._send_heartbeat()
+    Verification results are cached, as the provider's credentials are
+    checked again for every return when the authentication level is "all".
+
+    Arguments:
+        username:
+            The username the credentials are generated for.
+
+        password:
+            The password the credentials are generated with.
+    '''
+    TIME_PREFIX = b'\x04\x08'
+    PROTECTED_PREFIX = b'\x04\x14'
+    SEQUENCE_TAG = b'\x30'
+    MAX_RANDOM_NUMBER = 2 ** 31 - 1
+
+    def __init__(self, username, password):
+        if password is None:
+            raise ValueError('A password is required to generate ISP1 credentials')
+
+        if isinstance(username, str):
+            username = username.encode('us-ascii')
+        if isinstance(password, str):
+            password = password.encode('iso-8859-1')
+
+        # VisibleString username and OCTET STRING password
+        self._hash_input_suffix = b''.join((
+            b'\x1a', ber.encode_length(len(username)), bytes(username),
+            b'\x04', ber.encode_length(len(password)), bytes(password)
+        ))
+        self.verify = functools.lru_cache(maxsize=64)(self._verify)
+
+    def encode(self, encoded_time, random_number):
+        ''' Encode ISP1 credentials
+
+        Arguments:
+            encoded_time:
+                The 8 byte CCSDS time code, as returned by
+                :func:`generate_encoded_time`.
+
+            random_number:
+                The random number to use to create the credentials.
 
+        Returns:
+            The BER encoded ISP1Credentials.
+
+        Raises:
+            ValueError: If the time is not 8 bytes or the random number is
+                out of range.
+        '''
+        if len(encoded_time) != 8:
+            raise ValueError('Credentials time must be 8 bytes')
+        if not 0 <= random_number <= self.MAX_RANDOM_NUMBER:
+            raise ValueError('Credentials random number {} out of range'.format(random_number))
+
+        time_and_random = self.TIME_PREFIX + bytes(encoded_time) + ber.encode_integer(int(random_number))
+
+        hash_input = time_and_random + self._hash_input_suffix
+        hash_input = self.SEQUENCE_TAG + ber.encode_length(len(hash_input)) + hash_input
+        protected = hashlib.sha1(hash_input).digest()
+
+        body = time_and_random + self.PROTECTED_PREFIX + protected
+        return self.SEQUENCE_TAG + ber.encode_length(len(body)) + body
+
+    def _verify(self, credentials):
+        ''' Returns True if the encoded credentials match this username and password '''
         try:
-            msg = msg + handler._socket.recv(handler._buffer_size)
-        except:
-            gevent.sleep(1)
+            tag, start, end = ber.read_tlv(credentials, 0)
+            if tag != 0x30 or end != len(credentials):
+                return False
+            tag, time_start, offset = ber.read_tlv(credentials, start)
+            tag_int, int_start, offset = ber.read_tlv(credentials, offset)
+        except ValueError:
+            return False
+
+        if credentials[start:time_start] != self.TIME_PREFIX or tag_int != 0x02:
+            return False
+
+        random_number = int.from_bytes(credentials[int_start:offset], 'big', signed=True)
+        try:
+            return self.encode(credentials[time_start:time_start + 8], random_number) == credentials
+        except ValueError:
+            return False
+
+
+class TMLFramer(object):
+    ''' Streaming framer for TML messages received from the provider
+
+    Incoming bytes are read straight into a preallocated buffer via
+    ``recv_into`` and complete SLE PDUs are handed out as memoryview
+    slices of that buffer, so no per-PDU copies are made while framing.
+    Consumed space is reclaimed by moving the (at most one) incomplete
+    trailing message to the front of the buffer once the free tail gets
+    too small for another read. The buffer only grows when a single
+    message would not fit otherwise.
+
+    Views returned by :meth:`pdus` are only valid until the next call to
+    :meth:`recv_into` or :meth:`feed`. Callers that hold on to a PDU
+    beyond that point must copy it (e.g. ``bytes(view)``).
+    '''
+
+    def __init__(self, recv_size=256000):
+        '''
+        Arguments:
+            recv_size:
+                The maximum number of bytes requested from the socket on
+                each call to :meth:`recv_into`.
+        '''
+        self._recv_size = recv_size
+        self._buf = bytearray(recv_size * 2)
+        self._view = memoryview(self._buf)
+        self._start = 0
+        self._end = 0
+
+    def __len__(self):
+        ''' Number of received bytes not yet handed out as PDUs '''
+        return self._end - self._start
+
+    @property
+    def capacity(self):
+        ''' Current size of the underlying buffer in bytes '''
+        return len(self._buf)
+
+    def _reserve(self, size):
+        ''' Ensure at least size bytes are free at the end of the buffer '''
+        if len(self._buf) - self._end >= size:
+            return
+
+        pending = self._end - self._start
+        if pending + size <= len(self._buf):
+            # memoryview slice assignment handles the overlapping move
+            self._view[:pending] = self._view[self._start:self._end]
+        else:
+            buf = bytearray(max(len(self._buf) * 2, pending + size))
+            buf[:pending] = self._view[self._start:self._end]
+            self._buf = buf
+            self._view = memoryview(buf)
+
+        self._start = 0
+        self._end = pending
+
+    def recv_into(self, sock):
+        ''' Read available data from sock directly into the buffer
+
+        Arguments:
+            sock:
+                A connected stream socket supporting ``recv_into``.
+
+        Returns:
+            The number of bytes read.
+        '''
+        self._reserve(self._recv_size)
+        nbytes = sock.recv_into(self._view[self._end:self._end + self._recv_size])
+        self._end += nbytes
+        return nbytes
+
+    def feed(self, data):
+        ''' Append data that was received by some other means '''
+        size = len(data)
+        self._reserve(size)
+        self._view[self._end:self._end + size] = data
+        self._end += size
+
+    def pdus(self):
+        ''' Yield the body of every complete SLE PDU in the buffer
 
-        while len(msg) >= 8:
-            hdr, rem = msg[:8], msg[8:]
+        Heartbeat messages are consumed silently. Any trailing partial
+        message is kept for the next read.
+
+        Raises:
+            ValueError: if a message with an unexpected TML header is
+                encountered.
+        '''
+        while self._end - self._start >= TML_HEADER_LEN:
+            msg_type, body_len = struct.unpack_from(TML_HEADER_FORMAT, self._buf, self._start)
 
             # PDU Received
-            if binascii.hexlify(hdr[:4]) == b'01000000':
-                # Get length of body and check if the entirety of the
-                # body has been received. If we can, process the message(s)
-                body_len = utils.hexint(hdr[4:])
-                if len(rem) < body_len:
+            if msg_type == TML_SLE_TYPE:
+                body_start = self._start + TML_HEADER_LEN
+                body_end = body_start + body_len
+                if body_end > self._end:
                     break
-                else:
-                    body = rem[:body_len]
-                    handler._data_queue.put(hdr + body)
-                    msg = msg[len(hdr) + len(body):]
+
+                self._start = body_end
+                yield self._view[body_start:body_end]
             # Heartbeat Received
-            elif binascii.hexlify(hdr[:8]) == b'0300000000000000':
-                msg = rem
+            elif msg_type == TML_CONTEXT_HEARTBEAT_TYPE and body_len == 0:
+                self._start += TML_HEADER_LEN
             else:
                 err = (
                     'Received PDU with unexpected header. '
                     'Unable to parse data further.\n'
                 )
                 ait.core.log.error(err)
-                ait.core.log.error('\n'.join([msg[i:i+16] for i in range(0, len(msg), 16)]))
+                pending = self._view[self._start:self._end]
+                ait.core.log.error('\n'.join([
+                    binascii.hexlify(pending[i:i + 16]).decode()
+                    for i in range(0, len(pending), 16)
+                ]))
                 raise ValueError(err)
 
+        if self._start == self._end:
+            self._start = self._end = 0
+
+
+def conn_handler(handler):
+    ''' Handler for processing data received from the DSN into PDUs'''
+    hb_time = int(time.time())
+    framer = TMLFramer(handler._buffer_size)
 
-def data_processor(handler):
-    ''' Handler for decoding ASN.1 encoded PDUs '''
     while True:
         gevent.sleep(0)
-        if handler._data_queue.empty():
-            continue
 
-        msg = handler._data_queue.get()
-        hdr, body = msg[:8], msg[8:]
+        now = int(time.time())
+        if handler._need_heartbeat(now - hb_time):
+            hb_time = now
+            handler._send_heartbeat()
 
         try:
-            decoded_pdu, remainder = handler.decode(body)
-        except pyasn1.error.PyAsn1Error as e:
-            ait.core.log.error('Unable to decode PDU. Skipping ...')
-            continue
-        except TypeError as e:
-            ait.core.log.error('Unable to decode PDU due to type error ...')
-            continue
-
-        handler._handle_pdu(decoded_pdu)
+            framer.recv_into(handler._socket)
+        except:
+            gevent.sleep(1)
+
+        # The decoder runs in another greenlet, so each PDU is copied
+        # out of the framer buffer exactly once on its way to the queue
+        for pdu in framer.pdus():
+            handler._enqueue_pdu(bytes(pdu))
+
+
+def data_processor(handler):
+    ''' Handler for decoding ASN.1 encoded PDUs
+
+    Blocks on the data queue while it is empty and otherwise drains up to
+    DATA_PROCESSOR_BATCH_SIZE PDUs before yielding to other greenlets.
+    '''
+    queue = handler._data_queue
+
+    while True:
+        batch = [queue.get()]
+        while len(batch) < DATA_PROCESSOR_BATCH_SIZE:
+            try:
+                batch.append(queue.get_nowait())
+            except gevent.queue.Empty:
+                break
+
+        for body in batch:
+            decode_and_handle(handler, body)
+
+        gevent.sleep(0)
+
+
+def decode_and_handle(handler, body):
+    ''' Decode a PDU body and pass it to the handler's PDU handlers
+
+    Returns:
+        True if the PDU was decoded, False otherwise.
+    '''
+    try:
+        decoded_pdu, remainder = handler.decode(body)
+    except pyasn1.error.PyAsn1Error as e:
+        ait.core.log.error('Unable to decode PDU. Skipping ...')
+        return False
+    except TypeError as e:
+        ait.core.log.error('Unable to decode PDU due to type error ...')
+        return False
+
+    handler._handle_pdu(decoded_pdu)
+    return True
 
 
 def generate_encoded_time(datetime_):
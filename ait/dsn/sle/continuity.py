@@ -0,0 +1,315 @@
+# Advanced Multi-Mission Operations System (AMMOS) Instrument Toolkit (AIT)
+# Bespoke Link to Instruments and Small Satellites (BLISS)
+#
+# Copyright 2017, by the California Institute of Technology. ALL RIGHTS
+# RESERVED. United States Government Sponsorship acknowledged. Any
+# commercial use must be negotiated with the Office of Technology Transfer
+# at the California Institute of Technology.
+#
+# This software may be subject to U.S. export control laws. By accepting
+# this software, the user agrees to comply with all applicable U.S. export
+# laws and regulations. User has the responsibility to obtain export licenses,
+# or other export authority as may be required before exporting such
+# information to foreign countries or providing access to foreign persons.
+
+''' SLE Frame Continuity
+
+The ait.dsn.sle.continuity module tracks the virtual channel frame counts
+of received transfer frames to report frames lost, duplicated or received
+out of order on each virtual channel.
+
+Channels are identified by their master channel ID and virtual channel
+ID. TM frames have an 8 bit virtual channel frame count. AOS frames have a
+24 bit count, extended to 28 bits by the frame count cycle when the frame
+sets the cycle use flag.
+
+Each frame's count is compared with the highest count seen on its channel,
+modulo the count's range. The next count is in sequence and the same count
+is a duplicate. A count up to half the range ahead is a gap, and the
+frames skipped are counted as missing. A count behind is a reorder, a
+frame arriving after later ones, which will have been counted as missing
+when the later frame arrived. Gap sizes and reorder distances are kept in
+histograms of power of two buckets.
+
+:class:`ContinuityTracker` follows frames as they are received, keeping a
+fixed amount of state per channel. :func:`batch_continuity` analyzes the
+frames of a recording, such as a frame file or a frame archive, at once
+with NumPy.
+
+Attributes:
+    TM_COUNT_MODULUS: The range of TM virtual channel frame counts.
+
+    AOS_COUNT_MODULUS: The range of AOS virtual channel frame counts.
+
+    AOS_CYCLE_COUNT_MODULUS: The range of AOS virtual channel frame counts
+        extended by the frame count cycle.
+
+Classes:
+    FrameContinuity: How a frame's count relates to those before it.
+
+    ContinuityTracker: Tracks the frame counts of each channel as frames
+        are received.
+'''
+from enum import Enum
+
+import ait.dsn.sle.frames as frames
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+TM_COUNT_MODULUS = 1 << 8
+AOS_COUNT_MODULUS = 1 << 24
+AOS_CYCLE_COUNT_MODULUS = 1 << 28
+
+# Histogram buckets needed for the sizes of gaps in any count
+_BUCKETS = AOS_CYCLE_COUNT_MODULUS.bit_length()
+
+
+class FrameContinuity(Enum):
+    ''' How a frame's count relates to the highest count seen before it '''
+    FIRST = 0
+    IN_SEQUENCE = 1
+    GAP = 2
+    DUPLICATE = 3
+    REORDER = 4
+
+
+def tm_channel_count(data):
+    ''' Returns the master channel ID, virtual channel ID, frame count and
+    count modulus of a TM frame '''
+    return (data[0] << 8 | data[1]) >> 4, (data[1] >> 1) & 0x07, data[3], TM_COUNT_MODULUS
+
+
+def aos_channel_count(data):
+    ''' Returns the master channel ID, virtual channel ID, frame count and
+    count modulus of an AOS frame, extending the count by the frame count
+    cycle if the frame uses it '''
+    mcid = (data[0] << 8 | data[1]) >> 6
+    count = data[2] << 16 | data[3] << 8 | data[4]
+    if data[5] & 0x40:
+        return mcid, data[1] & 0x3F, (data[5] & 0x0F) << 24 | count, AOS_CYCLE_COUNT_MODULUS
+    return mcid, data[1] & 0x3F, count, AOS_COUNT_MODULUS
+
+
+CHANNEL_COUNTS = {
+    'TMTransFrame': tm_channel_count,
+    'AOSTransFrame': aos_channel_count
+}
+
+
+def _histogram(buckets):
+    ''' Returns a list of bucket counts as a dict keyed by bucket lower bound '''
+    return {1 << (i - 1): n for i, n in enumerate(buckets) if n}
+
+
+class _ChannelState(object):
+    ''' The continuity counters of one channel '''
+    __slots__ = ('last', 'frames', 'gaps', 'missing', 'duplicates', 'reorders',
+                 'gap_buckets', 'reorder_buckets')
+
+    def __init__(self, count):
+        self.last = count
+        self.frames = 1
+        self.gaps = self.missing = self.duplicates = self.reorders = 0
+        # Bucket i counts sizes of bit length i
+        self.gap_buckets = [0] * _BUCKETS
+        self.reorder_buckets = [0] * _BUCKETS
+
+    def metrics(self):
+        ''''''
+        return {
+            'frames': self.frames,
+            'gaps': self.gaps,
+            'missing': self.missing,
+            'duplicates': self.duplicates,
+            'reorders': self.reorders,
+            'last_count': self.last,
+            'gap_histogram': _histogram(self.gap_buckets),
+            'reorder_histogram': _histogram(self.reorder_buckets)
+        }
+
+
+class ContinuityTracker(object):
+    ''' Frame count continuity of each channel of a stream of frames
+
+    Arguments:
+        frame_type (optional):
+            'TMTransFrame' or 'AOSTransFrame', to read the channel and
+            count of frames passed to :meth:`update_frame`.
+
+    Raises:
+        ValueError: If frame_type is not a known frame type.
+    '''
+
+    def __init__(self, frame_type='AOSTransFrame'):
+        if frame_type not in CHANNEL_COUNTS:
+            raise ValueError('Continuity tracking does not support frame type {}'.format(frame_type))
+        self._channel_count = CHANNEL_COUNTS[frame_type]
+        self._channels = {}
+
+    def update(self, mcid, vcid, count, modulus):
+        ''' Track the count of a frame received on a channel
+
+        Arguments:
+            mcid, vcid:
+                The master and virtual channel IDs of the frame.
+
+            count:
+                The frame's virtual channel frame count.
+
+            modulus:
+                The range of the count, such as :data:`TM_COUNT_MODULUS`.
+
+        Returns:
+            The :class:`FrameContinuity` of the frame.
+        '''
+        state = self._channels.get((mcid, vcid))
+        if state is None:
+            self._channels[(mcid, vcid)] = _ChannelState(count)
+            return FrameContinuity.FIRST
+
+        state.frames += 1
+        delta = (count - state.last) % modulus
+        if delta == 1:
+            state.last = count
+            return FrameContinuity.IN_SEQUENCE
+        elif delta == 0:
+            state.duplicates += 1
+            return FrameContinuity.DUPLICATE
+        elif delta <= modulus >> 1:
+            state.last = count
+            state.gaps += 1
+            state.missing += delta - 1
+            state.gap_buckets[(delta - 1).bit_length()] += 1
+            return FrameContinuity.GAP
+        else:
+            state.reorders += 1
+            state.reorder_buckets[(modulus - delta).bit_length()] += 1
+            return FrameContinuity.REORDER
+
+    def update_frame(self, data):
+        ''' Track the count of a frame from its header
+
+        Arguments:
+            data:
+                The bytes of the frame, or at least of its first 6 bytes.
+
+        Returns:
+            The :class:`FrameContinuity` of the frame.
+        '''
+        return self.update(*self._channel_count(data))
+
+    def metrics(self):
+        ''' Returns the continuity counters of each channel
+
+        Returns:
+            A dict keyed by (master channel ID, virtual channel ID). Each
+            value is a dict of the frames received ('frames'), the gaps
+            ('gaps') and the frames they skipped ('missing'), the
+            duplicates ('duplicates'), the reorders ('reorders'), the
+            highest count seen ('last_count'), and histograms of gap sizes
+            ('gap_histogram') and of how far behind reordered frames were
+            ('reorder_histogram'). Histograms map the lower bound of each
+            power of two bucket, 1, 2, 4 and so on, to its count.
+        '''
+        return {channel: state.metrics() for channel, state in self._channels.items()}
+
+    def reset(self):
+        ''' Forget every channel, such as at the start of a pass '''
+        self._channels = {}
+
+
+def _channel_arrays(headers, frame_type):
+    ''' Returns the channel keys, counts and moduli of an array of headers '''
+    headers = numpy.asarray(headers, dtype=numpy.uint8)
+    id_bytes = headers[:, 0].astype(numpy.int64) << 8 | headers[:, 1]
+    if frame_type == 'TMTransFrame':
+        mcid = id_bytes >> 4
+        vcid = (headers[:, 1] >> 1) & 0x07
+        counts = headers[:, 3].astype(numpy.int64)
+        moduli = numpy.full(len(headers), TM_COUNT_MODULUS, dtype=numpy.int64)
+    elif frame_type == 'AOSTransFrame':
+        mcid = id_bytes >> 6
+        vcid = headers[:, 1] & 0x3F
+        counts = (headers[:, 2].astype(numpy.int64) << 16 | headers[:, 3].astype(numpy.int64) << 8 |
+                  headers[:, 4])
+        cycle = (headers[:, 5] & 0x40) != 0
+        counts |= numpy.where(cycle, (headers[:, 5] & 0x0F).astype(numpy.int64) << 24, 0)
+        moduli = numpy.where(cycle, AOS_CYCLE_COUNT_MODULUS, AOS_COUNT_MODULUS)
+    else:
+        raise ValueError('Continuity tracking does not support frame type {}'.format(frame_type))
+    return mcid << 6 | vcid, counts, moduli
+
+
+def _histogram_array(sizes):
+    ''' Returns the power of two bucket histogram of an array of sizes '''
+    if not len(sizes):
+        return {}
+    # frexp gives the bit length of each size as its exponent
+    lower = 1 << (numpy.frexp(sizes)[1].astype(numpy.int64) - 1)
+    values, counts = numpy.unique(lower, return_counts=True)
+    return dict(zip(values.tolist(), counts.tolist()))
+
+
+def batch_continuity(headers, frame_type='AOSTransFrame'):
+    ''' Analyze the frame count continuity of a recording of frames
+
+    The counts of each channel are unwrapped by taking each step from one
+    frame to the next as the shortest way around the count's range, and
+    then compared with the running maximum. This agrees with
+    :class:`ContinuityTracker` unless a channel's count moves by more than
+    half its range from one frame to the next. Requires NumPy.
+
+    Arguments:
+        headers:
+            The first 6 or more bytes of each frame, in the order received,
+            as a 2-D numpy.uint8 array such as the one returned by
+            :func:`ait.dsn.sle.frames.frame_array` or
+            :meth:`ait.dsn.sle.archive.FrameArchiveReader.frame_headers`.
+
+        frame_type (optional):
+            'TMTransFrame' or 'AOSTransFrame'.
+
+    Returns:
+        The counters of each channel, as returned by
+        :meth:`ContinuityTracker.metrics`.
+
+    Raises:
+        ValueError: If frame_type is not a known frame type.
+    '''
+    frames._require_numpy()
+    channels, counts, moduli = _channel_arrays(headers, frame_type)
+
+    result = {}
+    if not len(channels):
+        return result
+
+    # Group the frames of each channel, keeping them in the order received
+    order = numpy.argsort(channels, kind='stable')
+    channels, counts, moduli = channels[order], counts[order], moduli[order]
+    starts = numpy.flatnonzero(numpy.diff(channels)) + 1
+    groups = zip(numpy.concatenate(([0], starts)), numpy.split(counts, starts), numpy.split(moduli, starts))
+    for start, group_counts, group_moduli in groups:
+        channel = int(channels[start])
+        modulus = int(group_moduli.max())
+        steps = numpy.diff(group_counts) % modulus
+        steps[steps > modulus >> 1] -= modulus
+        unwrapped = numpy.concatenate(([0], numpy.cumsum(steps)))
+        highest = numpy.maximum.accumulate(unwrapped)
+        deltas = unwrapped[1:] - highest[:-1]
+
+        gaps = deltas[deltas > 1] - 1
+        reorders = -deltas[deltas < 0]
+        result[(channel >> 6, channel & 0x3F)] = {
+            'frames': len(group_counts),
+            'gaps': len(gaps),
+            'missing': int(gaps.sum()),
+            'duplicates': int(numpy.count_nonzero(deltas == 0)),
+            'reorders': len(reorders),
+            'last_count': int((group_counts[0] + highest[-1]) % modulus),
+            'gap_histogram': _histogram_array(gaps),
+            'reorder_histogram': _histogram_array(reorders)
+        }
+    return result
@@ -0,0 +1,535 @@
+# Advanced Multi-Mission Operations System (AMMOS) Instrument Toolkit (AIT)
+# Bespoke Link to Instruments and Small Satellites (BLISS)
+#
+# Copyright 2017, by the California Institute of Technology. ALL RIGHTS
+# RESERVED. United States Government Sponsorship acknowledged. Any
+# commercial use must be negotiated with the Office of Technology Transfer
+# at the California Institute of Technology.
+#
+# This software may be subject to U.S. export control laws. By accepting
+# this software, the user agrees to comply with all applicable U.S. export
+# laws and regulations. User has the responsibility to obtain export licenses,
+# or other export authority as may be required before exporting such
+# information to foreign countries or providing access to foreign persons.
+
+''' SLE Frame Encoder
+
+The ait.dsn.sle.frame_encoder module packs CCSDS space packets into TM
+transfer frames and AOS M_PDU transfer frames, the inverse of the decoding
+done by :mod:`ait.dsn.sle.frames` and the deframing processor.
+
+Packets are queued on an encoder with :meth:`~TMFrameEncoder.put` and each
+frame is written straight into a caller supplied buffer, so a stream of
+frames can be built back to back in one preallocated bytearray or mmap.
+Packets are split across frames as needed and the first header pointer of
+each frame is set to the first packet header starting in it. When a frame
+has to be sent before enough packets have been queued to fill it, the rest
+is filled with an idle packet. Frames with nothing to send can be written
+as idle frames instead.
+
+Attributes:
+    IDLE_APID: The APID of CCSDS idle packets.
+
+Classes:
+    TMFrameEncoder: Packs packets into TM transfer frames of one virtual
+        channel.
+    AOSFrameEncoder: Packs packets into AOS M_PDU transfer frames of one
+        virtual channel.
+    SyntheticDownlink: Generates a stream of frames carrying synthetic
+        packets, for load testing without a station.
+'''
+import binascii
+import collections
+import socket
+import struct
+import time
+
+import ait
+import ait.core.log
+
+import ait.dsn.sle.frames as frames
+
+IDLE_APID = 0x7FF
+
+# Shortest CCSDS space packet, a primary header and one octet of data
+_MIN_PACKET_LEN = 7
+
+# First header pointer of a frame in which no packet header starts
+_NO_FIRST_HDR_PTR = 0x7FF
+
+
+class _FrameEncoder(object):
+    ''' Packs queued packets into the packet zone of fixed-length frames
+
+    Subclasses set the packet zone of their frame format and write the
+    header and trailer of each frame.
+    '''
+
+    def __init__(self, frame_len, zone_start, zone_end, fecf_included):
+        if zone_end - zone_start < 1:
+            raise ValueError('Frames of {} bytes leave no room for packets'.format(frame_len))
+
+        self.frame_len = frame_len
+        self.fecf_included = fecf_included
+        self._zone_start = zone_start
+        self._zone_end = zone_end
+        self._zone_len = zone_end - zone_start
+
+        # Bytes of queued packets, the lengths of the queued packets whose
+        # headers have not been written yet, and the bytes left of the
+        # packet being written before the next header
+        self._pending = bytearray()
+        self._lengths = collections.deque()
+        self._to_header = 0
+
+        self._idle_header = struct.Struct('>HHH')
+        self._counters = {
+            'frames': 0,
+            'idle_frames': 0,
+            'packets': 0,
+            'idle_fill_bytes': 0
+        }
+
+    @property
+    def pending(self):
+        ''' Number of queued packet bytes not yet written to a frame '''
+        return len(self._pending)
+
+    @property
+    def packet_zone_len(self):
+        ''' Number of packet bytes carried by each frame '''
+        return self._zone_len
+
+    def put(self, packet):
+        ''' Queue a CCSDS space packet
+
+        Arguments:
+            packet:
+                The bytes of the whole packet, as any bytes-like object.
+
+        Raises:
+            ValueError: If the packet is shorter than a packet header or
+                its length field disagrees with its length.
+        '''
+        length = len(packet)
+        if length < _MIN_PACKET_LEN or (packet[4] << 8 | packet[5]) + 7 != length:
+            raise ValueError('Packet of {} bytes does not match its length field'.format(length))
+
+        self._pending += packet
+        self._lengths.append(length)
+        self._counters['packets'] += 1
+
+    def put_block(self, block, lengths):
+        ''' Queue CCSDS space packets held back to back in one buffer
+
+        Unlike :meth:`put`, the length fields of the packets are not
+        checked against the lengths given.
+
+        Arguments:
+            block:
+                The bytes of the packets, as any bytes-like object.
+
+            lengths:
+                A sequence of the length of each packet in block.
+
+        Raises:
+            ValueError: If the lengths do not add up to the block length.
+        '''
+        if sum(lengths) != len(block):
+            raise ValueError('Packet lengths do not add up to the {} byte block'.format(len(block)))
+
+        self._pending += block
+        self._lengths.extend(lengths)
+        self._counters['packets'] += len(lengths)
+
+    def _put_idle_packet(self, length):
+        ''' Queue an idle packet of at least length bytes '''
+        length = max(length, _MIN_PACKET_LEN)
+        self._pending += self._idle_header.pack(IDLE_APID, 0xC000, length - 7)
+        self._pending += bytes(length - 6)
+        self._lengths.append(length)
+        self._counters['idle_fill_bytes'] += length
+
+    def encode_into(self, buf, offset=0, fill=False):
+        ''' Write the next frame into buf if there are packets for it
+
+        Arguments:
+            buf:
+                A writable buffer, such as a bytearray, a memoryview or an
+                mmap, with room for a frame at offset.
+
+            offset (optional):
+                The position in buf to write the frame at.
+
+            fill (optional):
+                If True, a frame is written once any packet bytes are
+                queued, with the rest of its packet zone filled by an idle
+                packet. Otherwise frames are only written once enough
+                packet bytes are queued to fill them.
+
+        Returns:
+            True if a frame was written, False otherwise.
+        '''
+        zone_len = self._zone_len
+        pending = self._pending
+        if len(pending) < zone_len:
+            if not fill or not pending:
+                return False
+            self._put_idle_packet(zone_len - len(pending))
+
+        # Find the first packet header starting in this frame, popping the
+        # lengths of every packet whose header it holds
+        position = self._to_header
+        first_hdr_ptr = position if position < zone_len else _NO_FIRST_HDR_PTR
+        lengths = self._lengths
+        while position < zone_len:
+            position += lengths.popleft()
+        self._to_header = position - zone_len
+
+        self._write_header(buf, offset, first_hdr_ptr)
+        start = offset + self._zone_start
+        buf[start:start + zone_len] = memoryview(pending)[:zone_len]
+        del pending[:zone_len]
+        self._write_trailer(buf, offset)
+
+        self._counters['frames'] += 1
+        return True
+
+    def encode(self, fill=False):
+        ''' Returns the next frame as bytes, or None
+
+        See :meth:`encode_into`.
+        '''
+        buf = bytearray(self.frame_len)
+        if self.encode_into(buf, 0, fill):
+            return bytes(buf)
+        return None
+
+    def idle_frame_into(self, buf, offset=0):
+        ''' Write an idle frame into buf at offset '''
+        self._write_idle(buf, offset)
+        self._write_trailer(buf, offset)
+        self._counters['idle_frames'] += 1
+
+    def _write_fecf(self, buf, offset):
+        ''''''
+        end = offset + self.frame_len - 2
+        fecf = binascii.crc_hqx(memoryview(buf)[offset:end], frames.FECF_CRC_INIT)
+        buf[end] = fecf >> 8
+        buf[end + 1] = fecf & 0xFF
+
+    def metrics(self):
+        ''' Returns the encoder counters as a dict
+
+        The dict holds the number of frames ('frames') and idle frames
+        ('idle_frames') written, the packets queued ('packets'), the bytes
+        of idle packets added to fill frames ('idle_fill_bytes') and the
+        queued packet bytes not yet written ('pending').
+        '''
+        metrics = dict(self._counters)
+        metrics['pending'] = len(self._pending)
+        return metrics
+
+
+class TMFrameEncoder(_FrameEncoder):
+    ''' Packs CCSDS space packets into TM transfer frames
+
+    Frames carry packets of one virtual channel, with no secondary header,
+    and incrementing master and virtual channel frame counts. Idle frames
+    have a first header pointer of 0x7FE and are counted like other frames
+    of the virtual channel.
+
+    Arguments:
+        frame_len:
+            The total length of each frame in bytes.
+
+        spacecraft_id (optional):
+            The 10 bit spacecraft ID put in each frame header.
+
+        virtual_channel_id (optional):
+            The 3 bit virtual channel ID put in each frame header.
+
+        ocf_included (optional):
+            True to end each frame with the 4 byte operational control
+            field held in :attr:`ocf`.
+
+        fecf_included (optional):
+            True to end each frame with a frame error control field.
+    '''
+
+    def __init__(self, frame_len, spacecraft_id=0, virtual_channel_id=0,
+                 ocf_included=False, fecf_included=False):
+        if not 0 <= spacecraft_id <= 0x3FF:
+            raise ValueError('TM spacecraft ID {} is not 10 bits'.format(spacecraft_id))
+        if not 0 <= virtual_channel_id <= 7:
+            raise ValueError('TM virtual channel ID {} is not 3 bits'.format(virtual_channel_id))
+
+        trailer_len = (4 if ocf_included else 0) + (2 if fecf_included else 0)
+        super(TMFrameEncoder, self).__init__(frame_len, 6, frame_len - trailer_len, fecf_included)
+
+        self.ocf_included = ocf_included
+        self.ocf = bytes(4)
+        self.master_chan_frame_count = 0
+        self.virtual_chan_frame_count = 0
+
+        self._header = struct.Struct('>HBBH')
+        self._ids = (spacecraft_id << 4) | (virtual_channel_id << 1) | (1 if ocf_included else 0)
+
+    def _write_header(self, buf, offset, first_hdr_ptr):
+        ''''''
+        # The segment length ID is 0b11 when the sync flag is clear
+        self._header.pack_into(buf, offset, self._ids, self.master_chan_frame_count,
+                               self.virtual_chan_frame_count, 0x1800 | first_hdr_ptr)
+        self.master_chan_frame_count = (self.master_chan_frame_count + 1) & 0xFF
+        self.virtual_chan_frame_count = (self.virtual_chan_frame_count + 1) & 0xFF
+
+    def _write_idle(self, buf, offset):
+        ''''''
+        self._header.pack_into(buf, offset, self._ids, self.master_chan_frame_count,
+                               self.virtual_chan_frame_count, 0x1800 | frames.TM_FIRST_HDR_PTR_IDLE)
+        self.master_chan_frame_count = (self.master_chan_frame_count + 1) & 0xFF
+        self.virtual_chan_frame_count = (self.virtual_chan_frame_count + 1) & 0xFF
+        buf[offset + 6:offset + self._zone_end] = bytes(self._zone_end - 6)
+
+    def _write_trailer(self, buf, offset):
+        ''''''
+        if self.ocf_included:
+            start = offset + self._zone_end
+            buf[start:start + 4] = self.ocf
+        if self.fecf_included:
+            self._write_fecf(buf, offset)
+
+
+class AOSFrameEncoder(_FrameEncoder):
+    ''' Packs CCSDS space packets into AOS M_PDU transfer frames
+
+    Frames carry packets of one virtual channel with an incrementing 24 bit
+    virtual channel frame count. The optional fields are laid out as given
+    by the :class:`ait.dsn.sle.frames.AOSConfig`. The frame header error
+    control and insert zone, if included, are written as zeros, and the
+    operational control field as :attr:`ocf`. Idle frames use virtual
+    channel 63 with their own frame count.
+
+    Arguments:
+        frame_len:
+            The total length of each frame in bytes.
+
+        spacecraft_id (optional):
+            The 8 bit spacecraft ID put in each frame header.
+
+        virtual_channel_id (optional):
+            The virtual channel ID put in each frame header. It must not be
+            declared in the config as anything but M_PDU.
+
+        config (optional):
+            The AOSConfig of the frames. Defaults to the AOSTransFrame
+            default config.
+    '''
+
+    def __init__(self, frame_len, spacecraft_id=0, virtual_channel_id=0, config=None):
+        config = config or frames.AOSTransFrame.defaultConfig
+        if not 0 <= spacecraft_id <= 0xFF:
+            raise ValueError('AOS spacecraft ID {} is not 8 bits'.format(spacecraft_id))
+        if not 0 <= virtual_channel_id < 63:
+            raise ValueError('AOS virtual channel ID {} is not 0 to 62'.format(virtual_channel_id))
+        vc_type = config.get_data_field_type(virtual_channel_id)
+        if vc_type not in (None, frames.AOSDataFieldType.M_PDU):
+            raise ValueError('Virtual channel {} is configured as {}, not M_PDU'.format(
+                virtual_channel_id, vc_type.value))
+
+        layout = config.layout
+        data_start, data_end, _ = layout.data_field.indices(frame_len)
+
+        # The packet zone follows the 2 byte M_PDU header
+        super(AOSFrameEncoder, self).__init__(frame_len, data_start + 2, data_end,
+                                              config.frame_error_control_field_included)
+
+        self.config = config
+        self.ocf = bytes(4)
+        self.virtual_channel_frame_count = 0
+        self.idle_frame_count = 0
+
+        self._header = struct.Struct('>HI')
+        self._mpdu_header = struct.Struct('>H')
+        self._ids = (1 << 14) | (spacecraft_id << 6)
+        self._header_fill = bytes(self._zone_start - 8)
+        self._vcid = virtual_channel_id
+        self._ocf_slice = layout.operational_control_field
+
+    def _write_primary_header(self, buf, offset, vcid, count, first_hdr_ptr):
+        ''''''
+        # The frame count and signaling field are packed together, leaving
+        # the signaling field zero
+        self._header.pack_into(buf, offset, self._ids | vcid, count << 8)
+        self._mpdu_header.pack_into(buf, offset + self._zone_start - 2, first_hdr_ptr)
+        if self._header_fill:
+            buf[offset + 6:offset + self._zone_start - 2] = self._header_fill
+
+    def _write_header(self, buf, offset, first_hdr_ptr):
+        ''''''
+        self._write_primary_header(buf, offset, self._vcid, self.virtual_channel_frame_count,
+                                   first_hdr_ptr)
+        self.virtual_channel_frame_count = (self.virtual_channel_frame_count + 1) & 0xFFFFFF
+
+    def _write_idle(self, buf, offset):
+        ''''''
+        self._write_primary_header(buf, offset, 63, self.idle_frame_count, 0)
+        self.idle_frame_count = (self.idle_frame_count + 1) & 0xFFFFFF
+        start = offset + self._zone_start - 2
+        buf[start:offset + self._zone_end] = bytes(self._zone_end - self._zone_start + 2)
+
+    def _write_trailer(self, buf, offset):
+        ''''''
+        if self._ocf_slice is not None:
+            start, end, _ = self._ocf_slice.indices(self.frame_len)
+            buf[offset + start:offset + end] = self.ocf
+        if self.fecf_included:
+            self._write_fecf(buf, offset)
+
+
+class SyntheticDownlink(object):
+    ''' A stream of frames carrying synthetic CCSDS packets
+
+    Packets of packet_len bytes are generated for each APID in turn, with
+    per-APID sequence counts, and packed into frames by the encoder. The
+    frames can be generated into a buffer, used as the frame source of an
+    :class:`ait.dsn.sle.simulator.ProviderSimulator` to load test RAF and
+    RCF, or sent over UDP to the frame port of the deframing processor and
+    plugins at a configurable rate.
+
+    Arguments:
+        encoder:
+            The :class:`TMFrameEncoder` or :class:`AOSFrameEncoder` to
+            pack the packets with.
+
+        packet_len (optional):
+            The total length of each packet in bytes.
+
+        apids (optional):
+            The APIDs to generate packets for, in turn.
+    '''
+
+    def __init__(self, encoder, packet_len=256, apids=(1,)):
+        if packet_len < _MIN_PACKET_LEN or packet_len > 65542:
+            raise ValueError('Packet length {} is outside 7 to 65542 bytes'.format(packet_len))
+        if not apids:
+            raise ValueError('At least one APID is required')
+
+        self.encoder = encoder
+        self.frame_len = encoder.frame_len
+        self._apids = [apid & 0x7FF for apid in apids]
+        self._seq_counts = [0] * len(self._apids)
+        self._next = 0
+
+        # Packets are queued in blocks of about 64 frames worth, patching
+        # the headers of a reused block of packets
+        packet = bytearray(packet_len)
+        packet[4:6] = (packet_len - 7).to_bytes(2, 'big')
+        for i in range(6, packet_len):
+            packet[i] = i & 0xFF
+        count = 64 * encoder.packet_zone_len // packet_len + 1
+        self._block = packet * count
+        self._lengths = (packet_len,) * count
+        self._offsets = range(0, packet_len * count, packet_len)
+        self._packet_header = struct.Struct('>HH')
+
+    def _queue_packets(self):
+        ''''''
+        block = self._block
+        pack_into = self._packet_header.pack_into
+        apids = self._apids
+        seq_counts = self._seq_counts
+        i = self._next
+        for offset in self._offsets:
+            pack_into(block, offset, 0x0800 | apids[i], 0xC000 | seq_counts[i])
+            seq_counts[i] = (seq_counts[i] + 1) & 0x3FFF
+            i = (i + 1) % len(apids)
+        self._next = i
+        self.encoder.put_block(block, self._lengths)
+
+    def frame_into(self, buf, offset=0):
+        ''' Write the next frame of the stream into buf at offset '''
+        encode_into = self.encoder.encode_into
+        while not encode_into(buf, offset):
+            self._queue_packets()
+
+    def generate(self, buf, count):
+        ''' Write count frames back to back into buf
+
+        Arguments:
+            buf:
+                A writable buffer with room for count frames.
+
+            count:
+                The number of frames to write.
+        '''
+        frame_len = self.frame_len
+        for i in range(count):
+            self.frame_into(buf, i * frame_len)
+
+    def frame_source(self):
+        ''' Returns a frame source function for ProviderSimulator
+
+        The function ignores the frame index it is called with and returns
+        the next frame of the stream. The bytearray returned is reused for
+        every frame.
+        '''
+        buf = bytearray(self.frame_len)
+
+        def source(index):
+            self.frame_into(buf)
+            return buf
+
+        return source
+
+    def send(self, sock, address, frame_rate=0, count=None, duration=None, batch=64):
+        ''' Send frames of the stream as UDP datagrams
+
+        Frames are generated into a reused buffer batch at a time and paced
+        to frame_rate on average.
+
+        Arguments:
+            sock:
+                The UDP socket to send from.
+
+            address:
+                The (host, port) to send to.
+
+            frame_rate (optional):
+                Frames per second to send, or 0 to send as fast as possible.
+
+            count (optional):
+                The number of frames to send.
+
+            duration (optional):
+                Seconds to send for. Without count or duration frames are
+                sent until interrupted.
+
+            batch (optional):
+                Frames generated and sent between checks of the pacing.
+
+        Returns:
+            The number of frames sent.
+        '''
+        frame_len = self.frame_len
+        buf = bytearray(frame_len * batch)
+        view = memoryview(buf)
+
+        sent = 0
+        start = time.perf_counter()
+        while (count is None or sent < count) and \
+                (duration is None or time.perf_counter() - start < duration):
+            n = batch if count is None else min(batch, count - sent)
+            self.generate(buf, n)
+            for i in range(n):
+                try:
+                    sock.sendto(view[i * frame_len:(i + 1) * frame_len], address)
+                except socket.error as e:
+                    ait.core.log.error('Unable to send frame to {}:{}: {}'.format(address[0], address[1], e))
+            sent += n
+
+            if frame_rate:
+                delay = start + sent / float(frame_rate) - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+        return sent
@@ -0,0 +1,192 @@
+# Advanced Multi-Mission Operations System (AMMOS) Instrument Toolkit (AIT)
+# Bespoke Link to Instruments and Small Satellites (BLISS)
+#
+# Copyright 2017, by the California Institute of Technology. ALL RIGHTS
+# RESERVED. United States Government Sponsorship acknowledged. Any
+# commercial use must be negotiated with the Office of Technology Transfer
+# at the California Institute of Technology.
+#
+# This software may be subject to U.S. export control laws. By accepting
+# this software, the user agrees to comply with all applicable U.S. export
+# laws and regulations. User has the responsibility to obtain export licenses,
+# or other export authority as may be required before exporting such
+# information to foreign countries or providing access to foreign persons.
+
+''' SLE Frame Output
+
+The ait.dsn.sle.frame_output module forwards the frames received by RAF and
+RCF instances to one or more UDP destinations.
+
+Idle frames are recognized from their header bits rather than by decoding
+a :mod:`ait.dsn.sle.frames` object for each frame. The frames of a transfer
+buffer are collected as the buffer is handled and sent together once it
+has been, so that a buffer's worth of frames leaves in one tight loop per
+destination rather than interleaved with decoding.
+
+Attributes:
+    IDLE_FRAME_CHECKS: Maps downlink frame type names to functions that
+        return True if the bytes of a frame of that type are an idle frame.
+
+Classes:
+    FrameOutput: Collects non-idle frames and sends them in batches to the
+        configured destinations.
+'''
+import socket
+
+import ait
+import ait.core.log
+
+import ait.dsn.sle.frames as frames
+
+
+def is_idle_tm_frame(data):
+    ''' Returns True if data is an idle TM transfer frame
+
+    An idle TM frame has the first header pointer set to 0b11111111110.
+    '''
+    return len(data) >= 6 and ((data[4] & 0x07) << 8 | data[5]) == 0x7FE
+
+
+def is_idle_aos_frame(data):
+    ''' Returns True if data is an idle AOS transfer frame
+
+    An idle AOS frame has the virtual channel ID set to 0b111111.
+    '''
+    return len(data) >= 2 and data[1] & 0x3F == 0x3F
+
+
+IDLE_FRAME_CHECKS = {
+    'TMTransFrame': is_idle_tm_frame,
+    'AOSTransFrame': is_idle_aos_frame
+}
+
+
+def parse_destination(destination):
+    ''' Returns a (host, port) tuple for a configured destination
+
+    Arguments:
+        destination:
+            A 'host:port' string or a (host, port) pair.
+
+    Raises:
+        ValueError: If the destination cannot be parsed.
+    '''
+    if isinstance(destination, str):
+        host, sep, port = destination.rpartition(':')
+        if not sep:
+            raise ValueError('Frame output destination {} is not host:port'.format(destination))
+    else:
+        try:
+            host, port = destination
+        except (TypeError, ValueError):
+            raise ValueError('Frame output destination {} is not (host, port)'.format(destination))
+
+    try:
+        return (host or 'localhost', int(port))
+    except (TypeError, ValueError):
+        raise ValueError('Frame output destination {} has an invalid port'.format(destination))
+
+
+class FrameOutput(object):
+    ''' Batched UDP output of received frames
+
+    Frames are queued with :meth:`add` as the AnnotatedFrames of a transfer
+    buffer are handled and sent with :meth:`send` once the whole buffer has
+    been. Each destination receives every non-idle frame as its own
+    datagram, in the order received.
+
+    Arguments:
+        frame_type:
+            The name of the downlink frame class in :mod:`ait.dsn.sle.frames`
+            that frames are checked against for idle frames. Types without
+            an entry in :data:`IDLE_FRAME_CHECKS` are decoded with that
+            class to check them.
+
+        destinations:
+            A list of 'host:port' strings or (host, port) pairs to send
+            frames to.
+    '''
+
+    def __init__(self, frame_type, destinations):
+        if not destinations:
+            raise ValueError('At least one frame output destination is required')
+
+        self._destinations = [parse_destination(d) for d in destinations]
+        self._is_idle = IDLE_FRAME_CHECKS.get(frame_type)
+        if self._is_idle is None:
+            frame_class = getattr(frames, frame_type)
+            self._is_idle = lambda data: frame_class(data).is_idle_frame
+
+        self._batch = []
+        self._counters = {
+            'frames_out': 0,
+            'idle_dropped': 0,
+            'send_errors': 0,
+            'batches': 0
+        }
+
+    @property
+    def destinations(self):
+        ''' The list of (host, port) tuples frames are sent to '''
+        return list(self._destinations)
+
+    def add(self, data):
+        ''' Queue a frame for the next :meth:`send` unless it is idle
+
+        Arguments:
+            data:
+                The bytes of the frame.
+
+        Returns:
+            False if the frame was dropped as an idle frame, True otherwise.
+        '''
+        if self._is_idle(data):
+            self._counters['idle_dropped'] += 1
+            return False
+
+        self._batch.append(data)
+        return True
+
+    def send(self, sock):
+        ''' Send the queued frames to every destination
+
+        Arguments:
+            sock:
+                The UDP socket to send from.
+
+        Returns:
+            The number of datagrams sent.
+        '''
+        if not self._batch:
+            return 0
+
+        batch = self._batch
+        self._batch = []
+        self._counters['batches'] += 1
+
+        sendto = sock.sendto
+        sent = 0
+        for address in self._destinations:
+            try:
+                for data in batch:
+                    sendto(data, address)
+                    sent += 1
+            except socket.error as e:
+                # The rest of the batch would fail the same way
+                self._counters['send_errors'] += 1
+                ait.core.log.error('Unable to send frames to {}:{}: {}'.format(address[0], address[1], e))
+
+        self._counters['frames_out'] += sent
+        return sent
+
+    def metrics(self):
+        ''' Returns the output counters as a dict
+
+        The dict holds the number of datagrams sent ('frames_out'), the
+        idle frames dropped ('idle_dropped'), the sends that failed
+        ('send_errors'), the batches sent ('batches') and the frames queued
+        for the next batch ('queued').
+        '''
+        metrics = dict(self._counters)
+        metrics['queued'] = len(self._batch)
+        return metrics
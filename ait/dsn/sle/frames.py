@@ -10,6 +10,10 @@
 # laws and regulations. User has the responsibility to obtain export licenses,
 # or other export authority as may be required before exporting such
 # information to foreign countries or providing access to foreign persons.
+import binascii
+import collections
+import struct
+from collections.abc import Mapping
 from typing import Any
 
 from ait.dsn.sle.util import *
@@ -17,6 +21,15 @@ from enum import Enum
 import ait
 import ait.dsn.sle.utils as utils
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Logs frames received on virtual channels missing from the AOSConfig
+_undeclared_vc_log = utils.RateLimitedLog('info', 60)
+
+
 class BaseTransferFrame(dict):
     ''' Transfer Frame interface "base" class
 
@@ -82,12 +95,45 @@ class BaseTransferFrame(dict):
         return self.is_idle
 
 
+# First header pointer values of TM frames that carry no packet header
+TM_FIRST_HDR_PTR_IDLE = 0x7FE
+TM_FIRST_HDR_PTR_NO_PKTS = 0x7FF
+
+
+def _tm_packet_data_fields(view, start):
+    ''' Returns the packet data fields of a TM frame as split by TMTransFrame
+
+    The split assumes a packet header at start and reads the packet length
+    field as the length of the data field, which is how TMTransFrame has
+    always filled in ``_data``. Use :func:`iter_tm_packets` for the packets
+    located by the first header pointer.
+    '''
+    packets = []
+    end = len(view)
+    while start < end:
+        if start + 6 <= end:
+            length = view[start + 4] << 8 | view[start + 5]
+            if length > end - start - 6:
+                break
+        else:
+            # A truncated header reads as a short or empty packet
+            length = int.from_bytes(view[start + 4:start + 6], 'big')
+            if length:
+                break
+        packets.append(view[start + 6:start + 6 + length].tobytes())
+        start += 6 + length
+    return packets
+
+
 class TMTransFrame(BaseTransferFrame):
     def __init__(self, data=None):
         super(TMTransFrame, self).__init__()
+        self._frame_data = None
 
     def decode(self, data):
         ''' Decode data as a TM Transfer Frame '''
+        self._frame_data = data
+
         self['master_channel_id'] = (utils.hexint(data[0:2]) & 0xFFF0) >> 4  # 12 bits
         self['version'] = (utils.hexint(data[0]) & 0xC0) >> 6  # 2 bits
         self['spacecraft_id'] = (utils.hexint(data[0:2]) & 0x3FF0) >> 4  # 10 bits
@@ -103,11 +149,11 @@ class TMTransFrame(BaseTransferFrame):
         self['first_hdr_ptr'] = utils.hexint(data[4:6]) & 0x07FF
 
 
-        if str(bin(self['first_hdr_ptr'])) == '0b11111111110':
+        if self['first_hdr_ptr'] == TM_FIRST_HDR_PTR_IDLE:
             self.is_idle = True
             return
 
-        if str(bin(self['first_hdr_ptr'])) == '0b11111111111':
+        if self['first_hdr_ptr'] == TM_FIRST_HDR_PTR_NO_PKTS:
             self.has_no_pkts = True
             return
 
@@ -115,36 +161,102 @@ class TMTransFrame(BaseTransferFrame):
         if self['sec_header_flag']:
             self['sec_hdr_ver'] = (utils.hexint(data[6]) & 0xC0) >> 6
             sec_hdr_len = utils.hexint(data[6]) & 0x3F
-            sec_hdr_data = data[7:7+sec_hdr_len]
-            pkt_data = data[8 + sec_hdr_len:]
+            start = 8 + sec_hdr_len
         else:
-            pkt_data = data[6:]
+            start = 6
 
         # We're assuming that we're getting CCSDS packets w/o secondary
-        # headers here. All of this needs to be fleshed out more
-        while True:
-            if len(pkt_data) == 0:
-                break
-
-            pkt_data_len = utils.hexint(pkt_data[4:6])
+        # headers here, and not handling packets split across frames.
+        # iter_packets handles both.
+        self._data = _tm_packet_data_fields(memoryview(data), start)
 
-            if pkt_data_len <= len(pkt_data[6:]):
-                self._data.append(pkt_data[6:6 + pkt_data_len])
+    def iter_packets(self, fecf_included=False):
+        ''' Iterate over the CCSDS packets of the decoded frame
 
-                try:
-                    pkt_data = pkt_data[6 + pkt_data_len:]
-                except:
-                    break
-            # We're not handling the case where packets are split
-            # across TM frames at the moment.
-            else:
-                # print 'Pkt split across TM frames. AAAHHHHH!!!'
-                break
+        See :func:`iter_tm_packets`. Nothing is yielded if no frame has
+        been decoded.
+        '''
+        if self._frame_data is None:
+            return iter(())
+        return iter_tm_packets(self._frame_data, fecf_included)
 
     def encode(self):
         pass
 
 
+class TMPacketSegment(Enum):
+    '''
+    Enumeration for the packet data yielded by iter_tm_packets and
+    ait.dsn.sle.mpdu.iter_mpdu_packets
+    '''
+    LEADING_PARTIAL  = "LEADING_PARTIAL"   # End of a packet begun in an earlier frame
+    PACKET           = "PACKET"            # Whole packet
+    TRAILING_PARTIAL = "TRAILING_PARTIAL"  # Start of a packet ending in a later frame
+    CONTINUATION     = "CONTINUATION"      # Middle of a packet spanning the frame
+
+
+def iter_tm_packets(data, fecf_included=False):
+    ''' Iterate over the CCSDS packets in the data field of a TM frame
+
+    The data field is walked by offset from the first header pointer, and
+    each part of it is yielded as a memoryview into data along with the
+    :class:`TMPacketSegment` it holds. Bytes before the first header
+    pointer are the LEADING_PARTIAL, and a packet running past the end of
+    the data field, or a packet header cut short by it, is the
+    TRAILING_PARTIAL. A frame with no first header pointer yields its
+    whole data field as a CONTINUATION, and an idle frame yields nothing.
+
+    The data field follows the secondary header, if the frame has one, and
+    ends before the operational control field, if the OCF flag is set, and
+    the frame error control field, if fecf_included.
+
+    Arguments:
+        data:
+            The bytes of the whole frame, or any object supporting the
+            buffer protocol.
+
+        fecf_included (optional):
+            True if the frame ends with a frame error control field.
+
+    Returns:
+        A generator of (TMPacketSegment, memoryview) tuples, in frame order.
+    '''
+    view = memoryview(data)
+    if len(view) < 6:
+        return
+
+    first_hdr_ptr = (view[4] & 0x07) << 8 | view[5]
+    if first_hdr_ptr == TM_FIRST_HDR_PTR_IDLE:
+        return
+
+    start = 6
+    if view[4] & 0x80:
+        # The secondary header length field is one less than its length
+        start += (view[6] & 0x3F) + 1
+    end = len(view) - (4 if view[1] & 0x01 else 0) - (2 if fecf_included else 0)
+    if start >= end:
+        return
+
+    if first_hdr_ptr == TM_FIRST_HDR_PTR_NO_PKTS:
+        yield TMPacketSegment.CONTINUATION, view[start:end]
+        return
+
+    offset = min(start + first_hdr_ptr, end)
+    if offset > start:
+        yield TMPacketSegment.LEADING_PARTIAL, view[start:offset]
+
+    while offset < end:
+        if offset + 6 > end:
+            yield TMPacketSegment.TRAILING_PARTIAL, view[offset:end]
+            return
+        length = (view[offset + 4] << 8 | view[offset + 5]) + 7
+        if offset + length > end:
+            yield TMPacketSegment.TRAILING_PARTIAL, view[offset:end]
+            return
+        yield TMPacketSegment.PACKET, view[offset:offset + length]
+        offset += length
+
+
 class AOSDataFieldType(Enum):
     '''
     Enumeration for AOS Data Field types
@@ -155,6 +267,41 @@ class AOSDataFieldType(Enum):
     IDLE    = "IDLE"     # Idle data
 
 
+class AOSFrameLayout(collections.namedtuple('AOSFrameLayout', [
+        'header_struct', 'frame_header_error_control', 'transfer_frame_insert_zone',
+        'data_field', 'operational_control_field', 'frame_error_control_field',
+        'vc_types', 'vc_decoders', 'vc_fecf_checks'])):
+    ''' Precomputed locations of the fields of AOS frames for one AOSConfig
+
+    Layouts are compiled by :meth:`AOSConfig.compile_layout` and read
+    through :attr:`AOSConfig.layout`.
+
+    Attributes:
+        header_struct: A struct.Struct unpacking the primary header into the
+            master channel and virtual channel ID bits and the signaling
+            field.
+
+        frame_header_error_control, transfer_frame_insert_zone,
+        operational_control_field, frame_error_control_field: The slice of
+        a frame holding each optional field, or None if the field is not
+        included.
+
+        data_field: The slice of a frame holding the data field.
+
+        vc_types: A 64-entry tuple of the AOSDataFieldType configured for
+            each virtual channel ID, or None. Virtual channel 63, which
+            carries idle frames, is always None.
+
+        vc_decoders: A 64-entry tuple of the function decoding the data
+            field of each virtual channel ID, called with the
+            AOSTransFrame and the data field.
+
+        vc_fecf_checks: A 64-entry tuple of whether the frame error control
+            field of frames on each virtual channel ID is verified.
+    '''
+    __slots__ = ()
+
+
 class AOSConfig(object):
     '''
     AOS frame configuration class.
@@ -277,6 +424,20 @@ class AOSConfig(object):
         # id and to what datafield type it maps
 
         self.vc_to_datafield_map = {}
+        self._layout = None
+
+        # Verify the frame error control field of all virtual channels
+        # (True), none (False) or a list of virtual channel ids
+        prop_name = 'frame_error_control_field_check'
+        fecf_check = kwargs.get(prop_name,
+                                ait.config.get(cfg_pfx + prop_name,
+                                               False))
+        if fecf_check and not self.frame_error_control_field_included:
+            raise ValueError('{} requires frame_error_control_field_included'.format(prop_name))
+        if isinstance(fecf_check, bool):
+            self.fecf_check_vcs = frozenset(range(64)) if fecf_check else frozenset()
+        else:
+            self.fecf_check_vcs = frozenset(int(vc) for vc in fecf_check)
 
         # Maps property names to associated enum values
         field_type_name_to_enums = {
@@ -328,6 +489,15 @@ class AOSConfig(object):
             return self.vc_to_datafield_map[vc_number]
         return None
 
+    def fecf_check_enabled(self, vc_number):
+        '''
+        Returns true if the frame error control field of frames on a
+        virtual channel id is verified, false otherwise
+        :param vc_number: The virtual channel id number (int)
+        :return: Flag indicating FECF verification for the virtual channel
+        '''
+        return vc_number in self.fecf_check_vcs
+
     def get_virtual_channel_count(self):
         '''
         Returns the size of the virtual channel data field type map
@@ -374,8 +544,8 @@ class AOSConfig(object):
         :return: Operation control field indices or None
         '''
         if self.operational_control_field_included:
-            return self.transfer_frame_insert_zone_startIndex, \
-                   self.transfer_frame_insert_zone_endIndex
+            return self.operational_control_field_startIndex, \
+                   self.operational_control_field_endIndex
         else:
             return None, None
 
@@ -398,6 +568,59 @@ class AOSConfig(object):
         '''
         return self.data_field_startIndex, self.data_field_endIndex
 
+    @property
+    def layout(self):
+        '''
+        Returns the AOSFrameLayout for this configuration, compiling it on
+        first use. Call compile_layout after changing the configuration.
+        :return: AOSFrameLayout of this configuration
+        '''
+        layout = self._layout
+        if layout is None:
+            layout = self.compile_layout()
+        return layout
+
+    def compile_layout(self):
+        '''
+        Compiles the field slices, virtual channel data field types and
+        decoders of this configuration into an AOSFrameLayout
+        :return: The new AOSFrameLayout, also available as layout
+        '''
+        def field_slice(included, indices):
+            return slice(*indices) if included else None
+
+        decoders = {
+            AOSDataFieldType.M_PDU: AOSTransFrame.decode_dataField_MPDU,
+            AOSDataFieldType.B_PDU: AOSTransFrame.decode_dataField_BPDU,
+            AOSDataFieldType.VCA_SDU: AOSTransFrame.decode_dataField_VCASDU,
+            AOSDataFieldType.IDLE: AOSTransFrame.decode_dataField_Idle
+        }
+        # Virtual channel 63 is reserved for idle frames
+        vc_types = tuple(self.get_data_field_type(vc) for vc in range(63)) + (None,)
+        vc_decoders = tuple(decoders.get(t, AOSTransFrame.decode_dataField_undeclared)
+                            for t in vc_types)
+
+        self._layout = AOSFrameLayout(
+            header_struct=struct.Struct('>H3xB'),
+            frame_header_error_control=field_slice(
+                self.frame_header_error_control_included,
+                self.get_frame_header_error_control_indices()),
+            transfer_frame_insert_zone=field_slice(
+                self.transfer_frame_insert_zone_included,
+                self.get_transfer_frame_insert_zone_indices()),
+            data_field=slice(*self.get_data_field_indices()),
+            operational_control_field=field_slice(
+                self.operational_control_field_included,
+                self.get_operational_control_field_indices()),
+            frame_error_control_field=field_slice(
+                self.frame_error_control_field_included,
+                self.get_frame_error_control_field_indices()),
+            vc_types=vc_types,
+            vc_decoders=vc_decoders,
+            vc_fecf_checks=tuple(self.fecf_check_enabled(vc) for vc in range(64))
+        )
+        return self._layout
+
 
 class AOSTransFrame(BaseTransferFrame):
     '''
@@ -427,71 +650,45 @@ class AOSTransFrame(BaseTransferFrame):
 
     def decode(self, data):
         ''' Decode data as a AOS Transfer Frame '''
-        self['master_channel_id'] = (utils.hexint(data[0:2]) & 0xFFC0) >> 6  #10 bits
-        self['version'] = (utils.hexint(data[0]) & 0xC0) >> 6 #bits 0:1
-        self['spacecraft_id'] = (utils.hexint(data[0:2]) & 0x3FC0) >> 6 #bits 2:9
-        self['virtual_channel_id'] = utils.hexint(data[1]) & 0x3F #bits 10:15
+        layout = self.aosConfig.layout
+        ids, signaling_field = layout.header_struct.unpack_from(data)
+        vcid = ids & 0x3F
+
+        self['master_channel_id'] = ids >> 6  #10 bits
+        self['version'] = ids >> 14 #bits 0:1
+        self['spacecraft_id'] = (ids & 0x3FC0) >> 6 #bits 2:9
+        self['virtual_channel_id'] = vcid #bits 10:15
         self['virtual_channel_frame_count'] = data[2:5]
 
-        signaling_field = utils.hexint(data[5])
-        self['replay_flag'] = (signaling_field & 0x80)  >> 7 # 1 bit
+        self['replay_flag'] = signaling_field >> 7 # 1 bit
         self['virtual_channel_frame_count_cycle_use_flag'] = (signaling_field & 0x40) >> 6  # 1 bit
         self['signal_field_reserved'] = (signaling_field & 0x30) >> 4 # 2 bits, should be '00'
         self['virtual_channel_frame_count_cycle'] = (signaling_field & 0x0F)  # 4 bits
 
-        # check if frame header error control section is included
-        if self.aosConfig.frame_header_error_control_included:
-            beg_idx, end_idx = self.aosConfig.get_frame_header_error_control_indices()
-            self['frame_header_error_control'] = data[beg_idx:end_idx]
-        else:
-            self['frame_header_error_control'] = None
-
-        # check if transfer frame insert zone section is included
-        if self.aosConfig.transfer_frame_insert_zone_included:
-            beg_idx, end_idx = self.aosConfig.get_transfer_frame_insert_zone_indices()
-            self['transfer_frame_insert_zone'] = data[beg_idx:end_idx]
-        else:
-            self['transfer_frame_insert_zone'] = None
+        # Optional fields are None when the config does not include them
+        field = layout.frame_header_error_control
+        self['frame_header_error_control'] = None if field is None else data[field]
+        field = layout.transfer_frame_insert_zone
+        self['transfer_frame_insert_zone'] = None if field is None else data[field]
 
         # Check for special IDLE virtual channel ID (0x3F indicates idle AOS transfer frames)
-        if str(bin(self['virtual_channel_id'])) == '0b111111':
+        if vcid == 0x3F:
             self.is_idle = True
             self.has_no_pkts = True
             self['aos_data_field_type'] = None
             return
 
-        # Per AOS documentation, if only one Virtual Channel is used, then
-        # the bits are set to 'all-zeros'
-        # Question: is all-zeros but more than one VCs an issue?
-        if str(bin(self['virtual_channel_id'])) == '0b000000':
-            if self.aosConfig.get_virtual_channel_count() == 1:
-                pass
-            else:
-                pass  # For now just proceed
-
         ## Get the general data field body
-        beg_idx, end_idx = self.aosConfig.get_data_field_indices()
-
-        data_field =  data[beg_idx:end_idx]
-        #self._data = data_field
+        data_field = data[layout.data_field]
         self._data.append(data_field)
 
         # Decode the contents of the data field
-        self.decode_data_field(data_field)
-
-        # check if operational control field is included
-        if self.aosConfig.operational_control_field_included:
-            beg_idx, end_idx = self.aosConfig.get_operational_control_field_indices()
-            self['operational_control_field'] = data[beg_idx:end_idx]
-        else:
-            self['operational_control_field'] = None
+        layout.vc_decoders[vcid](self, data_field)
 
-        # check if frame error control field is included
-        if self.aosConfig.frame_error_control_field_included:
-            beg_idx, end_idx = self.aosConfig.get_frame_error_control_field_indices()
-            self['frame_error_control_field'] = data[beg_idx:end_idx]
-        else:
-            self['frame_error_control_field'] = None
+        field = layout.operational_control_field
+        self['operational_control_field'] = None if field is None else data[field]
+        field = layout.frame_error_control_field
+        self['frame_error_control_field'] = None if field is None else data[field]
 
 
     def decode_data_field(self, datafield):
@@ -500,31 +697,22 @@ class AOSTransFrame(BaseTransferFrame):
 
         :param datafield: Data-field section of the AOS frame
         '''
+        self.aosConfig.layout.vc_decoders[self.virtual_channel](self, datafield)
+
+    def decode_dataField_undeclared(self, datafield):
+        ''' Leaves the data field of a virtual channel without a configured
+        data field type undecoded, with a data field type of None, logging
+        this at most once a minute per virtual channel
+
+        :param datafield: AOS datafield
+        '''
+        self['aos_data_field_type'] = None
         vc_key = self.virtual_channel
-        vc_df_type = self.aosConfig.get_data_field_type(vc_key)
-
-        if vc_df_type is None:
-            err = (
-                'AOSTransFrame received data with undeclared virtual channel ('+str(vc_key)+'). '
-                'Skipping further processing of this AOS transfer frame data field...'
-            )
-            ait.core.log.info(err)
-            pass
-        elif vc_df_type == AOSDataFieldType.M_PDU:
-            self.decode_dataField_MPDU(datafield)
-        elif vc_df_type == AOSDataFieldType.B_PDU:
-            self.decode_dataField_BPDU(datafield)
-        elif vc_df_type == AOSDataFieldType.VCA_SDU:
-            self.decode_dataField_VCASDU(datafield)
-        elif vc_df_type == AOSDataFieldType.IDLE:
-            self.decode_dataField_Idle(datafield)
-        else:
-            err = (
-                    'AOSTransFrame received data with unknown virtual channel type (' + str(vc_df_type) + '). '
-                    'Skipping further processing of this AOS transfer frame data field...'
-            )
-            ait.core.log.info(err)
-            pass
+        err = (
+            'AOSTransFrame received data with undeclared virtual channel ('+str(vc_key)+'). '
+            'Skipping further processing of this AOS transfer frame data field...'
+        )
+        _undeclared_vc_log(vc_key, err)
 
     def decode_dataField_MPDU(self, datafield):
         ''' Decodes the M_PDU datafield
@@ -566,7 +754,7 @@ class AOSTransFrame(BaseTransferFrame):
         # AOS Spec 4.1.4.3.3.4 If there are no valid user data in the Bitstream
         # Data Zone (i.e., the B_PDU contains only idle data), the Bitstream
         # Data Pointer shall be set to the value 'all ones minus one'.
-        self['bpdu_contains_idle_data'] = (self['bpdu_bitstream_data_ptr'] == b'11111111111110')
+        self['bpdu_contains_idle_data'] = (self['bpdu_bitstream_data_ptr'] == 0x3FFE)
 
     def decode_dataField_VCASDU(self, datafield):
         ''' Decodes the VCA_SDU datafield
@@ -586,3 +774,736 @@ class AOSTransFrame(BaseTransferFrame):
 
     def encode(self):
         pass
+
+
+def _header_field(start, length, mask, shift=0):
+    ''' Returns a property decoding a big-endian header field on access
+
+    Arguments:
+        start: The offset of the first byte holding the field.
+        length: The number of bytes holding the field (1 or 2).
+        mask: The mask selecting the field's bits from those bytes.
+        shift: The number of bits to shift the masked value right by.
+    '''
+    if length == 1:
+        def fget(self):
+            return (self._view[start] & mask) >> shift
+    else:
+        second = start + 1
+
+        def fget(self):
+            view = self._view
+            return ((view[start] << 8 | view[second]) & mask) >> shift
+    return property(fget)
+
+
+class FrameView(Mapping):
+    ''' Lazily decoded, read-only view of a transfer frame
+
+    A FrameView wraps a memoryview of the frame bytes and decodes each
+    header field only when it is accessed, so creating one costs a single
+    small object regardless of how many fields the frame has. Fields are
+    read as attributes, e.g. ``frame.virtual_channel_id``, and byte fields
+    are returned as memoryviews into the frame without copying.
+
+    For code written against :class:`BaseTransferFrame` a view is also a
+    read-only mapping with the same keys the dict-based classes fill in, so
+    ``frame['first_hdr_ptr']``, ``frame.get(...)`` and ``key in frame``
+    keep working. Byte fields read this way are returned as bytes, as they
+    are by the dict-based classes. The frame bytes must not change while
+    the view is in use.
+
+    Arguments:
+        data:
+            The bytes of the frame, or any object supporting the buffer
+            protocol. Frames may also be given later with :meth:`decode`.
+    '''
+    __slots__ = ('_view',)
+
+    # Keys present in every frame, in the order of the dict-based classes
+    _HEADER_KEYS = ()
+
+    def __init__(self, data=None):
+        self._view = None if data is None else memoryview(data)
+
+    def decode(self, data):
+        ''' Point the view at the bytes of another frame '''
+        self._view = memoryview(data)
+
+    def _keys(self):
+        ''' Returns the mapping keys present in this frame '''
+        return self._HEADER_KEYS
+
+    def __getitem__(self, key):
+        if key not in self._HEADER_KEYS and key not in self._keys():
+            raise KeyError(key)
+        value = getattr(self, key)
+        if isinstance(value, memoryview):
+            return value.tobytes()
+        return value
+
+    def __iter__(self):
+        return iter(self._keys())
+
+    def __len__(self):
+        return len(self._keys())
+
+    def __repr__(self):
+        return '{}({})'.format(self.__class__.__name__, dict(self))
+
+    @property
+    def virtual_channel(self):
+        ''' Returns Virtual Channel ID (integer) '''
+        return self.virtual_channel_id
+
+    @property
+    def is_idle_frame(self):
+        ''' Returns True if this frame is an Idle frame, False otherwise '''
+        return self.is_idle
+
+    @property
+    def data_field(self):
+        ''' Returns the data portion of the transfer frame as bytes, or None '''
+        if self.contains_data():
+            return self._data[0]
+        return None
+
+    def contains_data(self):
+        ''' Returns True if frame contains data, False otherwise '''
+        if self.is_idle or self.has_no_pkts:
+            return False
+        return len(self._data) > 0
+
+
+class TMFrameView(FrameView):
+    ''' Lazily decoded view of a TM transfer frame
+
+    The view exposes the same fields as :class:`TMTransFrame`.
+    ``_data`` holds the packet data fields found in the frame, as split by
+    :meth:`TMTransFrame.decode`, and is computed each time it is read.
+    :meth:`iter_packets` yields the whole and partial packets located by
+    the first header pointer without copying.
+    '''
+    __slots__ = ()
+
+    _HEADER_KEYS = (
+        'master_channel_id', 'version', 'spacecraft_id', 'virtual_channel_id',
+        'ocf_flag', 'master_chan_frame_count', 'virtual_chan_frame_count',
+        'sec_header_flag', 'sync_flag', 'pkt_order_flag', 'seg_len_id',
+        'first_hdr_ptr'
+    )
+
+    master_channel_id = _header_field(0, 2, 0xFFF0, 4)
+    version = _header_field(0, 1, 0xC0, 6)
+    spacecraft_id = _header_field(0, 2, 0x3FF0, 4)
+    virtual_channel_id = _header_field(1, 1, 0x0E, 1)
+    ocf_flag = _header_field(1, 1, 0x01)
+    master_chan_frame_count = _header_field(2, 1, 0xFF)
+    virtual_chan_frame_count = _header_field(3, 1, 0xFF)
+    sec_header_flag = _header_field(4, 1, 0x80, 7)
+    sync_flag = _header_field(4, 1, 0x40, 6)
+    pkt_order_flag = _header_field(4, 1, 0x20, 5)
+    seg_len_id = _header_field(4, 1, 0x18, 3)
+    first_hdr_ptr = _header_field(4, 2, 0x07FF)
+    sec_hdr_ver = _header_field(6, 1, 0xC0, 6)
+
+    @property
+    def is_idle(self):
+        return self.first_hdr_ptr == TM_FIRST_HDR_PTR_IDLE
+
+    @property
+    def has_no_pkts(self):
+        return self.first_hdr_ptr == TM_FIRST_HDR_PTR_NO_PKTS
+
+    def _keys(self):
+        if self.sec_header_flag and self.first_hdr_ptr < TM_FIRST_HDR_PTR_IDLE:
+            return self._HEADER_KEYS + ('sec_hdr_ver',)
+        return self._HEADER_KEYS
+
+    @property
+    def _data(self):
+        if self.first_hdr_ptr >= TM_FIRST_HDR_PTR_IDLE:
+            return []
+
+        if self.sec_header_flag:
+            start = 8 + (self._view[6] & 0x3F)
+        else:
+            start = 6
+        return _tm_packet_data_fields(self._view, start)
+
+    def iter_packets(self, fecf_included=False):
+        ''' Iterate over the CCSDS packets of the frame
+
+        See :func:`iter_tm_packets`.
+        '''
+        return iter_tm_packets(self._view, fecf_included)
+
+
+class AOSFrameView(FrameView):
+    ''' Lazily decoded view of an AOS transfer frame
+
+    The view exposes the same fields as :class:`AOSTransFrame`, located
+    using an :class:`AOSConfig` as that class does. The data field keys
+    present depend on the data field type configured for the frame's
+    virtual channel, although the attributes decode the data field as the
+    named type whatever the configuration. ``aos_data_field_type`` is None
+    for idle frames and virtual channels missing from the configuration.
+
+    Arguments:
+        data:
+            The bytes of the frame.
+
+        config (optional):
+            The :class:`AOSConfig` describing the frames. Defaults to
+            :attr:`AOSTransFrame.defaultConfig`.
+    '''
+    __slots__ = ('aosConfig',)
+
+    _HEADER_KEYS = (
+        'master_channel_id', 'version', 'spacecraft_id', 'virtual_channel_id',
+        'virtual_channel_frame_count', 'replay_flag',
+        'virtual_channel_frame_count_cycle_use_flag', 'signal_field_reserved',
+        'virtual_channel_frame_count_cycle', 'frame_header_error_control',
+        'transfer_frame_insert_zone', 'aos_data_field_type'
+    )
+
+    _TRAILER_KEYS = ('operational_control_field', 'frame_error_control_field')
+
+    _DATA_FIELD_KEYS = {
+        AOSDataFieldType.M_PDU: ('mpdu_first_hdr_ptr', 'mpdu_packet_zone',
+                                 'mpdu_is_idle_data', 'mpdu_contains_idle_data'),
+        AOSDataFieldType.B_PDU: ('bpdu_bitstream_data_ptr', 'bpdu_data_zone',
+                                 'bpdu_contains_idle_data'),
+        AOSDataFieldType.VCA_SDU: ('vcasdu_data_zone',),
+        AOSDataFieldType.IDLE: ('idle_data_zone',)
+    }
+
+    master_channel_id = _header_field(0, 2, 0xFFC0, 6)
+    version = _header_field(0, 1, 0xC0, 6)
+    spacecraft_id = _header_field(0, 2, 0x3FC0, 6)
+    virtual_channel_id = _header_field(1, 1, 0x3F)
+    replay_flag = _header_field(5, 1, 0x80, 7)
+    virtual_channel_frame_count_cycle_use_flag = _header_field(5, 1, 0x40, 6)
+    signal_field_reserved = _header_field(5, 1, 0x30, 4)
+    virtual_channel_frame_count_cycle = _header_field(5, 1, 0x0F)
+
+    def __init__(self, data=None, config=None):
+        super(AOSFrameView, self).__init__(data)
+        self.aosConfig = AOSTransFrame.defaultConfig if config is None else config
+
+    def _keys(self):
+        if self.is_idle:
+            return self._HEADER_KEYS
+        data_field_keys = self._DATA_FIELD_KEYS.get(self.aos_data_field_type, ())
+        return self._HEADER_KEYS + data_field_keys + self._TRAILER_KEYS
+
+    @property
+    def is_idle(self):
+        return self._view[1] & 0x3F == 0x3F
+
+    @property
+    def has_no_pkts(self):
+        return self.is_idle
+
+    @property
+    def virtual_channel_frame_count(self):
+        return self._view[2:5]
+
+    @property
+    def frame_header_error_control(self):
+        field = self.aosConfig.layout.frame_header_error_control
+        return None if field is None else self._view[field]
+
+    @property
+    def transfer_frame_insert_zone(self):
+        field = self.aosConfig.layout.transfer_frame_insert_zone
+        return None if field is None else self._view[field]
+
+    @property
+    def operational_control_field(self):
+        field = self.aosConfig.layout.operational_control_field
+        return None if field is None else self._view[field]
+
+    @property
+    def frame_error_control_field(self):
+        field = self.aosConfig.layout.frame_error_control_field
+        return None if field is None else self._view[field]
+
+    @property
+    def aos_data_field_type(self):
+        vcid = self._view[1] & 0x3F
+        if vcid == 0x3F:
+            return None
+        return self.aosConfig.layout.vc_types[vcid]
+
+    @property
+    def data_field_view(self):
+        ''' Returns the data field of the frame as a memoryview '''
+        return self._view[self.aosConfig.layout.data_field]
+
+    @property
+    def _data(self):
+        if self.is_idle:
+            return []
+        return [self.data_field_view.tobytes()]
+
+    @property
+    def mpdu_first_hdr_ptr(self):
+        return int.from_bytes(self.data_field_view[0:2], 'big') & 0x07FF
+
+    @property
+    def mpdu_packet_zone(self):
+        return self.data_field_view[2:]
+
+    @property
+    def mpdu_is_idle_data(self):
+        return self.mpdu_first_hdr_ptr == 0x7FE
+
+    mpdu_contains_idle_data = mpdu_is_idle_data
+
+    @property
+    def bpdu_bitstream_data_ptr(self):
+        return int.from_bytes(self.data_field_view[0:2], 'big') & 0x3FFF
+
+    @property
+    def bpdu_data_zone(self):
+        return self.data_field_view[2:]
+
+    @property
+    def bpdu_contains_idle_data(self):
+        return self.bpdu_bitstream_data_ptr == 0x3FFE
+
+    @property
+    def vcasdu_data_zone(self):
+        return self.data_field_view
+
+    idle_data_zone = vcasdu_data_zone
+
+
+# Maps downlink frame type names to the view class for frames of that type
+FRAME_VIEW_CLASSES = {
+    'TMTransFrame': TMFrameView,
+    'AOSTransFrame': AOSFrameView
+}
+
+
+# Value of mpdu_first_hdr_ptr in batch decoded AOS headers of frames that
+# are idle or whose virtual channel is not configured as M_PDU
+NO_FIRST_HDR_PTR = 0xFFFF
+
+
+def _require_numpy():
+    ''''''
+    if numpy is None:
+        raise ImportError('Batch frame decoding requires NumPy')
+
+
+def frame_array(buf, frame_len):
+    ''' Returns a 2-D array viewing a buffer of fixed-length frames
+
+    Arguments:
+        buf:
+            The frames back to back, as bytes, a memoryview, an mmap or a
+            NumPy array. The array returned shares memory with buf where
+            possible.
+
+        frame_len:
+            The length of each frame in bytes.
+
+    Returns:
+        A (number of frames, frame_len) numpy.uint8 array.
+
+    Raises:
+        ValueError: If buf does not hold a whole number of frames.
+    '''
+    _require_numpy()
+    if frame_len <= 0:
+        raise ValueError('Frame length must be positive')
+
+    if isinstance(buf, numpy.ndarray):
+        flat = buf.view(numpy.uint8).reshape(-1)
+    else:
+        flat = numpy.frombuffer(buf, dtype=numpy.uint8)
+
+    if flat.size % frame_len:
+        raise ValueError('Buffer of {} bytes does not hold whole {} byte frames'.format(flat.size, frame_len))
+    return flat.reshape(-1, frame_len)
+
+
+def _big_endian(frames_, start, length, dtype):
+    ''' Returns the big-endian integers held in a column range of frames_ '''
+    value = frames_[:, start].astype(dtype)
+    for i in range(start + 1, start + length):
+        value <<= 8
+        value |= frames_[:, i]
+    return value
+
+
+def decode_tm_headers(buf, frame_len):
+    ''' Decode the primary headers of a buffer of fixed-length TM frames
+
+    Arguments:
+        buf:
+            The frames back to back, as accepted by :func:`frame_array`.
+
+        frame_len:
+            The length of each frame in bytes.
+
+    Returns:
+        A NumPy structured array with one record per frame. Its fields are
+        named after the :class:`TMTransFrame` keys: master_channel_id,
+        version, spacecraft_id, virtual_channel_id, ocf_flag,
+        master_chan_frame_count, virtual_chan_frame_count, sec_header_flag,
+        sync_flag, pkt_order_flag, seg_len_id and first_hdr_ptr, along with
+        is_idle.
+
+    Raises:
+        ValueError: If the frames are shorter than the primary header.
+    '''
+    frames_ = frame_array(buf, frame_len)
+    if frame_len < 6:
+        raise ValueError('TM frames must be at least 6 bytes long')
+
+    # Copy out the header so the decoding below runs over contiguous memory
+    frames_ = numpy.ascontiguousarray(frames_[:, :6])
+
+    u1, u2 = numpy.uint8, numpy.uint16
+    out = numpy.empty(len(frames_), dtype=[
+        ('master_channel_id', u2), ('version', u1), ('spacecraft_id', u2),
+        ('virtual_channel_id', u1), ('ocf_flag', u1), ('master_chan_frame_count', u1),
+        ('virtual_chan_frame_count', u1), ('sec_header_flag', u1), ('sync_flag', u1),
+        ('pkt_order_flag', u1), ('seg_len_id', u1), ('first_hdr_ptr', u2),
+        ('is_idle', numpy.bool_)
+    ])
+
+    id_bytes = _big_endian(frames_, 0, 2, u2)
+    b1 = frames_[:, 1]
+    b4 = frames_[:, 4]
+    first_hdr_ptr = _big_endian(frames_, 4, 2, u2) & 0x07FF
+
+    out['master_channel_id'] = id_bytes >> 4
+    out['version'] = frames_[:, 0] >> 6
+    out['spacecraft_id'] = (id_bytes & 0x3FF0) >> 4
+    out['virtual_channel_id'] = (b1 & 0x0E) >> 1
+    out['ocf_flag'] = b1 & 0x01
+    out['master_chan_frame_count'] = frames_[:, 2]
+    out['virtual_chan_frame_count'] = frames_[:, 3]
+    out['sec_header_flag'] = b4 >> 7
+    out['sync_flag'] = (b4 >> 6) & 0x01
+    out['pkt_order_flag'] = (b4 >> 5) & 0x01
+    out['seg_len_id'] = (b4 >> 3) & 0x03
+    out['first_hdr_ptr'] = first_hdr_ptr
+    out['is_idle'] = first_hdr_ptr == 0x7FE
+    return out
+
+
+def decode_aos_headers(buf, frame_len, config=None):
+    ''' Decode the headers of a buffer of fixed-length AOS frames
+
+    Arguments:
+        buf:
+            The frames back to back, as accepted by :func:`frame_array`.
+
+        frame_len:
+            The length of each frame in bytes.
+
+        config (optional):
+            The :class:`AOSConfig` giving the optional fields of the frames
+            and the data field type of each virtual channel. Defaults to
+            :attr:`AOSTransFrame.defaultConfig`.
+
+    Returns:
+        A NumPy structured array with one record per frame. Its fields are
+        named after the :class:`AOSTransFrame` keys: master_channel_id,
+        version, spacecraft_id, virtual_channel_id,
+        virtual_channel_frame_count (as an integer),
+        replay_flag, virtual_channel_frame_count_cycle_use_flag,
+        virtual_channel_frame_count_cycle and mpdu_first_hdr_ptr, which is
+        :data:`NO_FIRST_HDR_PTR` unless the frame carries an M_PDU, along
+        with is_idle. operational_control_field (as an integer) and
+        frame_error_control_field are included when the config has them.
+
+    Raises:
+        ValueError: If the frames are too short for the configured fields.
+    '''
+    config = AOSTransFrame.defaultConfig if config is None else config
+    frames_ = frame_array(buf, frame_len)
+
+    data_start = config.data_field_startIndex
+    trailer_len = config.operational_control_field_len + config.frame_error_control_field_len
+    if frame_len < data_start + 2 + trailer_len:
+        raise ValueError('AOS frames of {} bytes are too short for the configured fields'.format(frame_len))
+
+    u1, u2, u4 = numpy.uint8, numpy.uint16, numpy.uint32
+    fields = [
+        ('master_channel_id', u2), ('version', u1), ('spacecraft_id', u1),
+        ('virtual_channel_id', u1), ('virtual_channel_frame_count', u4), ('replay_flag', u1),
+        ('virtual_channel_frame_count_cycle_use_flag', u1),
+        ('virtual_channel_frame_count_cycle', u1), ('mpdu_first_hdr_ptr', u2),
+        ('is_idle', numpy.bool_)
+    ]
+    if config.operational_control_field_included:
+        fields.append(('operational_control_field', u4))
+    if config.frame_error_control_field_included:
+        fields.append(('frame_error_control_field', u2))
+    out = numpy.empty(len(frames_), dtype=fields)
+
+    # Copy out the header, M_PDU header and trailer bytes so the decoding
+    # below runs over contiguous memory: columns 0-5 hold the primary
+    # header, 6-7 the M_PDU header and any after that the trailer
+    trailer_start = frame_len - trailer_len
+    frames_ = numpy.concatenate((frames_[:, :6], frames_[:, data_start:data_start + 2],
+                                 frames_[:, trailer_start:]), axis=1)
+
+    id_bytes = _big_endian(frames_, 0, 2, u2)
+    vcid = frames_[:, 1] & 0x3F
+    signaling = frames_[:, 5]
+    is_idle = vcid == 0x3F
+
+    mpdu_vcs = numpy.array([t == AOSDataFieldType.M_PDU for t in config.layout.vc_types])
+    first_hdr_ptr = _big_endian(frames_, 6, 2, u2) & 0x07FF
+
+    out['master_channel_id'] = id_bytes >> 6
+    out['version'] = frames_[:, 0] >> 6
+    out['spacecraft_id'] = (id_bytes & 0x3FC0) >> 6
+    out['virtual_channel_id'] = vcid
+    out['virtual_channel_frame_count'] = _big_endian(frames_, 2, 3, u4)
+    out['replay_flag'] = signaling >> 7
+    out['virtual_channel_frame_count_cycle_use_flag'] = (signaling >> 6) & 0x01
+    out['virtual_channel_frame_count_cycle'] = signaling & 0x0F
+    out['mpdu_first_hdr_ptr'] = numpy.where(mpdu_vcs[vcid], first_hdr_ptr, NO_FIRST_HDR_PTR)
+    out['is_idle'] = is_idle
+
+    if config.operational_control_field_included:
+        out['operational_control_field'] = _big_endian(frames_, 8, 4, u4)
+    if config.frame_error_control_field_included:
+        out['frame_error_control_field'] = _big_endian(frames_, frames_.shape[1] - 2, 2, u2)
+    return out
+
+
+def decode_frame_headers(buf, frame_len, frame_type='AOSTransFrame', config=None):
+    ''' Decode the headers of a buffer of fixed-length frames of a given type
+
+    Arguments:
+        buf:
+            The frames back to back, as accepted by :func:`frame_array`.
+
+        frame_len:
+            The length of each frame in bytes.
+
+        frame_type:
+            'TMTransFrame' or 'AOSTransFrame', as in the
+            dsn.sle.downlink_frame_type config.
+
+        config (optional):
+            The :class:`AOSConfig` for AOS frames.
+
+    Returns:
+        The structured array returned by :func:`decode_tm_headers` or
+        :func:`decode_aos_headers`.
+
+    Raises:
+        ValueError: If the frame type is not supported or the frames
+            cannot be decoded.
+    '''
+    if frame_type == 'TMTransFrame':
+        return decode_tm_headers(buf, frame_len)
+    elif frame_type == 'AOSTransFrame':
+        return decode_aos_headers(buf, frame_len, config)
+    raise ValueError('Batch decoding does not support {} frames'.format(frame_type))
+
+
+# Initial value of the CRC-16-CCITT frame error control field
+FECF_CRC_INIT = 0xFFFF
+
+
+def compute_fecf(data):
+    ''' Returns the frame error control field value for the bytes of a frame
+
+    The FECF of TM and AOS transfer frames is a CRC-16-CCITT with generator
+    polynomial 0x1021 and initial value 0xFFFF, computed over every byte of
+    the frame before the FECF.
+
+    Arguments:
+        data:
+            The bytes of the frame preceding the FECF, as any bytes-like
+            object.
+    '''
+    return binascii.crc_hqx(data, FECF_CRC_INIT)
+
+
+def fecf_is_valid(data):
+    ''' Returns True if the last two bytes of a frame hold its valid FECF
+
+    Arguments:
+        data:
+            The bytes of the whole frame, ending with the FECF.
+    '''
+    if len(data) < 3:
+        return False
+    return binascii.crc_hqx(memoryview(data)[:-2], FECF_CRC_INIT) == (data[-2] << 8 | data[-1])
+
+
+def verify_fecf(buf, frame_len, select=None):
+    ''' Verify the FECF of a buffer of fixed-length frames
+
+    Arguments:
+        buf:
+            The frames back to back, as accepted by :func:`frame_array`.
+
+        frame_len:
+            The length of each frame in bytes, including the FECF.
+
+        select (optional):
+            A boolean array selecting the frames to verify. Frames not
+            selected are reported as valid.
+
+    Returns:
+        A numpy.bool_ array, True for each frame whose FECF is valid.
+
+    Raises:
+        ValueError: If buf does not hold a whole number of frames.
+    '''
+    frames_ = frame_array(buf, frame_len)
+    if frame_len < 3:
+        raise ValueError('Frames of {} bytes cannot hold a FECF'.format(frame_len))
+
+    valid = numpy.ones(len(frames_), dtype=numpy.bool_)
+    rows = numpy.arange(len(frames_)) if select is None else numpy.flatnonzero(select)
+    if not len(rows):
+        return valid
+
+    # The CRC of each frame is computed by binascii over a slice of the
+    # buffer, which outruns a vectorized table-driven CRC since that has
+    # to step through the frames a byte column at a time
+    flat = memoryview(frames_.reshape(-1))
+    data_len = frame_len - 2
+    crc = binascii.crc_hqx
+    computed = numpy.fromiter((crc(flat[r * frame_len:r * frame_len + data_len], FECF_CRC_INIT)
+                               for r in rows.tolist()),
+                              dtype=numpy.uint16, count=len(rows))
+    received = _big_endian(frames_, data_len, 2, numpy.uint16)[rows]
+    valid[rows] = computed == received
+    return valid
+
+
+class FecfCheck(object):
+    ''' Verification of the FECF of received frames
+
+    Frames of checked virtual channels whose frame error control field
+    does not match their contents are reported so the caller can drop
+    them, and are counted per virtual channel. Frames of other virtual
+    channels always pass.
+
+    For AOS frames the virtual channels to check are set by the
+    frame_error_control_field_check option of the :class:`AOSConfig`. TM
+    frames are all checked if dsn.sle.tm.frame_error_control_field_check
+    is set, or if the keyword argument of the same name is True.
+
+    Arguments:
+        frame_type:
+            'TMTransFrame' or 'AOSTransFrame', as in the
+            dsn.sle.downlink_frame_type config. Other frame types are not
+            checked.
+
+        config (optional):
+            The :class:`AOSConfig` for AOS frames. Defaults to the
+            AOSTransFrame default config.
+    '''
+
+    def __init__(self, frame_type, config=None, **kwargs):
+        self._frame_type = frame_type
+        if frame_type == 'AOSTransFrame':
+            config = config or AOSTransFrame.defaultConfig
+            self._vc_checks = config.layout.vc_fecf_checks
+        elif frame_type == 'TMTransFrame':
+            prop_name = 'frame_error_control_field_check'
+            enabled = ait.config.get('dsn.sle.tm.' + prop_name, kwargs.get(prop_name, False))
+            self._vc_checks = (bool(enabled),) * 8
+        else:
+            self._vc_checks = (False,)
+
+        self._counters = {'checked': 0, 'failed': 0}
+        self._failed_by_vc = collections.Counter()
+
+    @property
+    def enabled(self):
+        ''' True if the FECF of any frames is verified '''
+        return any(self._vc_checks)
+
+    def _virtual_channel(self, data):
+        ''''''
+        if self._frame_type == 'AOSTransFrame':
+            return data[1] & 0x3F
+        if self._frame_type == 'TMTransFrame':
+            return (data[1] >> 1) & 0x07
+        return 0
+
+    def check(self, data):
+        ''' Verify the FECF of a frame if its virtual channel is checked
+
+        Arguments:
+            data:
+                The bytes of the whole frame.
+
+        Returns:
+            False if the frame should be dropped for a bad FECF, True
+            otherwise.
+        '''
+        if len(data) < 2:
+            return True
+        vcid = self._virtual_channel(data)
+        if not self._vc_checks[vcid]:
+            return True
+
+        self._counters['checked'] += 1
+        if fecf_is_valid(data):
+            return True
+
+        self._counters['failed'] += 1
+        self._failed_by_vc[vcid] += 1
+        return False
+
+    def check_batch(self, buf, frame_len):
+        ''' Verify the FECF of the checked frames in a buffer of frames
+
+        Arguments:
+            buf:
+                The frames back to back, as accepted by
+                :func:`frame_array`.
+
+            frame_len:
+                The length of each frame in bytes.
+
+        Returns:
+            A numpy.bool_ array, False for each frame that should be dropped
+            for a bad FECF.
+        '''
+        frames_ = frame_array(buf, frame_len)
+        if self._frame_type == 'AOSTransFrame':
+            vcids = frames_[:, 1] & 0x3F
+        elif self._frame_type == 'TMTransFrame':
+            vcids = (frames_[:, 1] >> 1) & 0x07
+        else:
+            vcids = numpy.zeros(len(frames_), dtype=numpy.uint8)
+
+        select = numpy.asarray(self._vc_checks, dtype=numpy.bool_)[vcids]
+        valid = verify_fecf(frames_, frame_len, select)
+
+        failed = ~valid
+        self._counters['checked'] += int(select.sum())
+        self._counters['failed'] += int(failed.sum())
+        for vcid, count in zip(*numpy.unique(vcids[failed], return_counts=True)):
+            self._failed_by_vc[int(vcid)] += int(count)
+        return valid
+
+    def metrics(self):
+        ''' Returns the verification counters as a dict
+
+        The dict holds the number of frames whose FECF was verified
+        ('checked'), the frames that failed ('failed') and a dict of the
+        failures per virtual channel ID ('failed_by_vc').
+        '''
+        metrics = dict(self._counters)
+        metrics['failed_by_vc'] = dict(self._failed_by_vc)
+        return metrics
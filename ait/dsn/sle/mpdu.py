@@ -0,0 +1,255 @@
+# Advanced Multi-Mission Operations System (AMMOS) Instrument Toolkit (AIT)
+# Bespoke Link to Instruments and Small Satellites (BLISS)
+#
+# Copyright 2017, by the California Institute of Technology. ALL RIGHTS
+# RESERVED. United States Government Sponsorship acknowledged. Any
+# commercial use must be negotiated with the Office of Technology Transfer
+# at the California Institute of Technology.
+#
+# This software may be subject to U.S. export control laws. By accepting
+# this software, the user agrees to comply with all applicable U.S. export
+# laws and regulations. User has the responsibility to obtain export licenses,
+# or other export authority as may be required before exporting such
+# information to foreign countries or providing access to foreign persons.
+
+''' SLE M_PDU Packet Extraction
+
+The ait.dsn.sle.mpdu module extracts CCSDS space packets from the M_PDU
+packet zones of AOS frames.
+
+:func:`iter_mpdu_packets` walks the packet zone of one frame by offset
+from its first header pointer, reading each packet length in place, and
+yields each packet and the partial packets at either end of the zone as
+slices of the zone. Given a memoryview, the slices are views into the
+frame; given bytes, each packet is copied once, which for packets of up
+to a few kilobytes is quicker than creating a view of it. A packet zone
+ending in idle fill, bytes of :data:`IDLE_FILL_BYTE`, is recognized with
+a single comparison of the rest of the zone.
+
+:class:`MPDUReassembler` follows the frames of each virtual channel in
+order, keeping a single carry-over buffer per channel for the packet
+spanning from one frame to the next, and yields whole packets. It suits
+streams where the frames of a channel arrive contiguously, such as the
+AOS_to_CCSDS plugin. The deframing processor, which may see frames out of
+order, pairs the partials yielded by :func:`iter_mpdu_packets` by frame
+count instead.
+
+Attributes:
+    AOS_FIRST_HDR_PTR_IDLE: The first header pointer of an M_PDU holding
+        only idle data.
+
+    AOS_FIRST_HDR_PTR_NO_PKTS: The first header pointer of an M_PDU in
+        which no packet header starts.
+
+    IDLE_FILL_BYTE: The value of the bytes filling the rest of a packet
+        zone after its last packet.
+
+Classes:
+    MPDUReassembler: Reassembles the packets of contiguous M_PDUs of each
+        virtual channel.
+'''
+from ait.core import log
+
+from ait.dsn.sle.continuity import AOS_COUNT_MODULUS
+from ait.dsn.sle.frames import TMPacketSegment
+
+AOS_FIRST_HDR_PTR_IDLE = 0x7FE
+AOS_FIRST_HDR_PTR_NO_PKTS = 0x7FF
+IDLE_FILL_BYTE = 0xE0
+
+# Idle fill to compare the rest of a packet zone against. AOS frames are
+# at most 2048 bytes, so this covers any packet zone.
+_IDLE_FILL = bytes([IDLE_FILL_BYTE]) * 2048
+
+_PACKET_HEADER_LEN = 6
+
+_PACKET = TMPacketSegment.PACKET
+_LEADING_PARTIAL = TMPacketSegment.LEADING_PARTIAL
+_TRAILING_PARTIAL = TMPacketSegment.TRAILING_PARTIAL
+_CONTINUATION = TMPacketSegment.CONTINUATION
+
+
+def _is_idle_fill(zone, start, end):
+    ''' Returns True if zone holds only idle fill from start to end '''
+    if end - start > len(_IDLE_FILL):
+        return bytes(zone[start:end]) == bytes([IDLE_FILL_BYTE]) * (end - start)
+    return _IDLE_FILL.startswith(zone[start:end])
+
+
+def iter_mpdu_packets(packet_zone, first_hdr_ptr):
+    ''' Iterate over the CCSDS packets in the packet zone of an M_PDU
+
+    The packet zone is walked by offset from the first header pointer,
+    and each part of it is yielded as a slice of packet_zone along with
+    the :class:`ait.dsn.sle.frames.TMPacketSegment` it holds. Bytes before the first header pointer are the LEADING_PARTIAL, and a packet
+    running past the end of the zone, or a packet header cut short by it,
+    is the TRAILING_PARTIAL. A zone with no packet header yields its whole
+    data as a CONTINUATION, and a zone of idle data yields nothing. Idle
+    fill after the last packet ends the walk.
+
+    Arguments:
+        packet_zone:
+            The M_PDU packet zone as bytes, a bytearray or a memoryview,
+            such as the ``mpdu_packet_zone`` of an
+            :class:`ait.dsn.sle.frames.AOSTransFrame` or
+            :class:`ait.dsn.sle.frames.AOSFrameView`.
+
+        first_hdr_ptr:
+            The M_PDU first header pointer.
+
+    Returns:
+        A generator of (TMPacketSegment, slice of packet_zone) tuples, in
+        zone order.
+    '''
+    zone = packet_zone
+    end = len(zone)
+    if not end or first_hdr_ptr == AOS_FIRST_HDR_PTR_IDLE:
+        return
+
+    if first_hdr_ptr == AOS_FIRST_HDR_PTR_NO_PKTS:
+        yield _CONTINUATION, zone
+        return
+
+    offset = first_hdr_ptr if first_hdr_ptr < end else end
+    if offset:
+        yield _LEADING_PARTIAL, zone[:offset]
+
+    while offset < end:
+        # A packet header can not start with the idle fill byte, as its
+        # version number is 0, so only then is the rest of the zone scanned
+        if zone[offset] == IDLE_FILL_BYTE and _is_idle_fill(zone, offset, end):
+            return
+        header_end = offset + _PACKET_HEADER_LEN
+        if header_end > end:
+            yield _TRAILING_PARTIAL, zone[offset:]
+            return
+        # The packet length field is one less than the packet data length
+        packet_end = header_end + (zone[offset + 4] << 8 | zone[offset + 5]) + 1
+        if packet_end > end:
+            yield _TRAILING_PARTIAL, zone[offset:]
+            return
+        yield _PACKET, zone[offset:packet_end]
+        offset = packet_end
+
+
+class MPDUReassembler(object):
+    ''' Reassembles the CCSDS packets of contiguous M_PDUs
+
+    Frames are added in the order received, and the packets they complete
+    are yielded. Each virtual channel has one carry-over buffer holding the
+    start of the packet spanning into its next frame, which is reused from
+    packet to packet. A carried packet is dropped if the next frame of its
+    channel does not continue it: if a frame was lost, going by the frame
+    counts when they are given, or if the first header pointer disagrees
+    with the packet's length.
+
+    Packets held in one frame are yielded as slices of its packet zone, as
+    by :func:`iter_mpdu_packets`, and reassembled packets as bytes.
+    '''
+
+    def __init__(self):
+        self._carry = {}
+        self._frame_counts = {}
+        self._counters = {
+            'packets': 0,
+            'reassembled_packets': 0,
+            'dropped_partials': 0
+        }
+
+    def _drop(self, channel, carry, reason):
+        ''''''
+        self._counters['dropped_partials'] += 1
+        log.debug('Dropping {} byte partial packet on virtual channel {}: {}'.format(
+            len(carry), channel, reason))
+        del carry[:]
+
+    def add(self, channel, first_hdr_ptr, packet_zone, frame_count=None):
+        ''' Add the M_PDU of a frame, yielding the packets it completes
+
+        Arguments:
+            channel:
+                The virtual channel ID of the frame, or any hashable value
+                identifying its channel.
+
+            first_hdr_ptr:
+                The M_PDU first header pointer.
+
+            packet_zone:
+                The M_PDU packet zone as bytes, a bytearray or a memoryview.
+
+            frame_count (optional):
+                The virtual channel frame count of the frame. If given, a
+                carried packet is dropped when the count skips a frame.
+
+        Returns:
+            A generator of the whole packets completed by the frame, in
+            order. The frame is only added as the generator is consumed.
+        '''
+        carry = self._carry.get(channel)
+        if carry is None:
+            carry = self._carry[channel] = bytearray()
+
+        if frame_count is not None:
+            last = self._frame_counts.get(channel)
+            self._frame_counts[channel] = frame_count
+            if carry and last is not None and (frame_count - last) % AOS_COUNT_MODULUS != 1:
+                self._drop(channel, carry, 'frame count skipped from {} to {}'.format(
+                    last, frame_count))
+
+        # A packet header at the start of the zone, or idle data, leaves
+        # the carried packet unfinished
+        if carry and (first_hdr_ptr == 0 or first_hdr_ptr == AOS_FIRST_HDR_PTR_IDLE):
+            self._drop(channel, carry, 'no continuation in the next frame')
+
+        # Only the first segment can continue the carried packet, and only
+        # the last can start a new one
+        packets = 0
+        for segment, data in iter_mpdu_packets(packet_zone, first_hdr_ptr):
+            if segment is _PACKET:
+                packets += 1
+                yield data
+                continue
+            if segment is _TRAILING_PARTIAL:
+                carry += data
+                continue
+            if not carry:
+                # The start of the packet was lost or came before the first frame
+                self._counters['dropped_partials'] += 1
+                continue
+
+            carry += data
+            size = len(carry)
+            if size >= _PACKET_HEADER_LEN:
+                length = (carry[4] << 8 | carry[5]) + _PACKET_HEADER_LEN + 1
+                if size == length:
+                    packet = bytes(carry)
+                    del carry[:]
+                    self._counters['reassembled_packets'] += 1
+                    packets += 1
+                    yield packet
+                    continue
+                # A continuation may leave the packet unfinished, but not a
+                # leading partial followed by a packet header
+                if size < length and segment is _CONTINUATION:
+                    continue
+                self._drop(channel, carry, 'packet length does not match first header pointer')
+            elif segment is _LEADING_PARTIAL:
+                self._drop(channel, carry, 'packet header cut short')
+        self._counters['packets'] += packets
+
+    def reset(self):
+        ''' Drop every carried packet, such as at the start of a pass '''
+        self._carry = {}
+        self._frame_counts = {}
+
+    def metrics(self):
+        ''' Returns the reassembly counters as a dict
+
+        The dict holds the number of packets yielded ('packets'), those
+        reassembled across frames ('reassembled_packets'), the partial
+        packets dropped ('dropped_partials') and the bytes carried over
+        for packets not yet complete ('pending').
+        '''
+        metrics = dict(self._counters)
+        metrics['pending'] = sum(len(carry) for carry in self._carry.values())
+        return metrics
@@ -27,7 +27,8 @@ import ait
 import ait.core.log
 
 import ait.dsn.sle.common as common
-import ait.dsn.sle.frames as frames
+from ait.dsn.sle.archive import archive_from_config, cds_to_unix
+from ait.dsn.sle.frame_output import FrameOutput
 from ait.dsn.sle.pdu.raf import *
 from ait.dsn.sle.pdu import raf
 
@@ -112,6 +113,13 @@ class RAF(common.SLE):
         self.frame_output_port = int(ait.config.get('dsn.sle.frame_output_port',
                                                     kwargs.get('frame_output_port',
                                                                ait.DEFAULT_FRAME_PORT)))
+        destinations = ait.config.get('dsn.sle.frame_output_destinations',
+                                      kwargs.get('frame_output_destinations', None))
+        self._frame_output = FrameOutput(self._downlink_frame_type,
+                                         destinations or [('localhost', self.frame_output_port)])
+
+        # Frames are also archived when dsn.sle.frame_archive is configured
+        self._frame_archive = archive_from_config(self._downlink_frame_type, **kwargs)
 
         self._handlers['RafBindReturn'].append(self._bind_return_handler)
         self._handlers['RafUnbindReturn'].append(self._unbind_return_handler)
@@ -125,6 +133,27 @@ class RAF(common.SLE):
         self._handlers['SyncNotification'].append(self._sync_notify_handler)
         self._handlers['RafPeerAbortInvocation'].append(self._peer_abort_handler)
 
+    @property
+    def frame_output_stats(self):
+        ''' Counters for the frames forwarded to the frame output destinations
+
+        Returns:
+            A dict with the number of datagrams sent ('frames_out'), idle
+            frames dropped ('idle_dropped'), failed sends ('send_errors')
+            and transfer buffers sent ('batches').
+        '''
+        return self._frame_output.metrics()
+
+    @property
+    def frame_archive_stats(self):
+        ''' Counters for the frames archived, as returned by
+        :meth:`ait.dsn.sle.archive.FrameArchive.metrics`, or None if frames
+        are not archived
+        '''
+        if self._frame_archive is None:
+            return None
+        return self._frame_archive.metrics()
+
     def bind(self, inst_id=None):
         ''' Bind to a RAF interface
 
@@ -261,8 +290,16 @@ class RAF(common.SLE):
 
         Returns:
             The decoded RAF PDU as an instance of the
-            :class:`ait.dsn.sle.pdu.raf.RafProvidertoUserPdu` class.
+            :class:`ait.dsn.sle.pdu.raf.RafProvidertoUserPdu` class. Transfer
+            buffers are decoded by :mod:`ait.dsn.sle.ber` into an
+            :class:`ait.dsn.sle.ber.TransferBuffer` that handlers can use in
+            the same way, unless the ``fast_decode`` option is disabled.
         '''
+        transfer_buffer = self._decode_transfer_buffer(message, 'rafTransferBuffer', True,
+                                                       FrameOrNotification())
+        if transfer_buffer is not None:
+            return transfer_buffer, b''
+
         return super(self.__class__, self).decode(message, RafProvidertoUserPdu())
 
     def _bind_return_handler(self, pdu):
@@ -335,6 +372,9 @@ class RAF(common.SLE):
         ''''''
         for data in pdu['rafTransferBuffer']:
             self._handle_pdu(data)
+        self._frame_output.send(self._telem_sock)
+        if self._frame_archive is not None:
+            self._frame_archive.poll()
 
     def _transfer_data_invoc_handler(self, pdu):
         ''''''
@@ -349,16 +389,13 @@ class RAF(common.SLE):
             ait.core.log.info(err)
             return
 
-        tm_frame_class = getattr(frames, self._downlink_frame_type)
-        tmf = tm_frame_class(tm_data)
-
-        # Add any frame-based logic/decisions here
-        if tmf.is_idle_frame:
-            ait.core.log.debug('Dropping {} marked as an idle frame'.format(tm_frame_class))
-            return
+        if self._frame_archive is not None:
+            ert = frame['earthReceiveTime'].getComponent().asOctets()
+            self._frame_archive.add(tm_data, cds_to_unix(ert))
 
-        ait.core.log.debug('Sending {} with {} bytes to frame port'.format(tm_frame_class, len(tm_data)))
-        self._telem_sock.sendto(tm_data, ('localhost', self.frame_output_port))
+        # Frames are sent once the whole transfer buffer has been handled
+        if not self._frame_output.add(tm_data):
+            ait.core.log.debug('Dropping {} marked as an idle frame'.format(self._downlink_frame_type))
 
     def _sync_notify_handler(self, pdu):
         ''''''
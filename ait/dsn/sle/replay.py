@@ -0,0 +1,334 @@
+# Advanced Multi-Mission Operations System (AMMOS) Instrument Toolkit (AIT)
+# Bespoke Link to Instruments and Small Satellites (BLISS)
+#
+# Copyright 2017, by the California Institute of Technology. ALL RIGHTS
+# RESERVED. United States Government Sponsorship acknowledged. Any
+# commercial use must be negotiated with the Office of Technology Transfer
+# at the California Institute of Technology.
+#
+# This software may be subject to U.S. export control laws. By accepting
+# this software, the user agrees to comply with all applicable U.S. export
+# laws and regulations. User has the responsibility to obtain export licenses,
+# or other export authority as may be required before exporting such
+# information to foreign countries or providing access to foreign persons.
+
+''' SLE Frame Replay
+
+The ait.dsn.sle.replay module replays recorded transfer frames through the
+deframing processor, the AIT plugins or anything else that takes frames,
+so past passes can be reprocessed faster than they were received.
+
+Frame files are memory-mapped and their frames handed out as memoryviews
+into the mapping, so replaying does not copy or read ahead. A file holds
+either fixed-length frames back to back, records of a big-endian length
+prefix followed by the frame, or records of an
+:data:`ait.dsn.sle.archive.RECORD_HEADER` followed by the frame, as in the
+segment files of a :class:`ait.dsn.sle.archive.FrameArchive`.
+
+Frames are replayed as fast as they can be handled, at the rate they were
+received, or that rate sped up N times. Archive segments are paced by the
+earth receive times of their frames. The time spent reading frames,
+decoding them into frame objects, handling them and waiting to pace them
+is reported for each replay.
+
+Attributes:
+    RECORD_FORMATS: Maps the record format names accepted by
+        :class:`FrameReplay` to the struct of the header preceding each
+        frame, or None for fixed-length frames. The frame length is the
+        last field of each header.
+
+Classes:
+    FrameReplay: Iterates over and replays the frames of a frame file.
+'''
+import itertools
+import mmap
+import socket
+import struct
+import time
+
+import ait
+import ait.core.log
+
+import ait.dsn.sle.archive as archive
+import ait.dsn.sle.frames as frames
+
+RECORD_FORMATS = {
+    'fixed': None,
+    'u16': struct.Struct('>H'),
+    'u32': struct.Struct('>I'),
+    'archive': archive.RECORD_HEADER
+}
+
+# Seconds ahead of schedule a replay may be before it sleeps
+_PACING_SLACK = 0.001
+
+
+class FrameReplay(object):
+    ''' Replay of the frames of a recorded frame file
+
+    The file is memory-mapped when the replay is created. Frames are
+    memoryviews into the mapping and are only valid until :meth:`close`.
+    Handlers that keep a frame beyond the call that receives it must copy
+    it. A trailing record cut short by the end of the file is skipped and
+    counted as truncated.
+
+    Arguments:
+        path:
+            The frame file to replay.
+
+        frame_len (optional):
+            The length of each frame, for 'fixed' files.
+
+        record_format (optional):
+            'fixed' for frames of frame_len bytes back to back, 'u16' or
+            'u32' for frames preceded by a 2 or 4 byte big-endian length,
+            or 'archive' for a frame archive segment.
+
+    Raises:
+        ValueError: If the record format is unknown or a fixed-length file
+            has no frame_len.
+    '''
+
+    def __init__(self, path, frame_len=None, record_format='fixed'):
+        if record_format not in RECORD_FORMATS:
+            raise ValueError('Unknown frame record format {}'.format(record_format))
+        if record_format == 'fixed' and not frame_len:
+            raise ValueError('Fixed-length frame files require a frame length')
+
+        self.path = path
+        self.frame_len = frame_len
+        self.record_format = record_format
+        self.truncated = 0
+
+        # Earth receive times of the frames of archive segments
+        self._times = None
+
+        with open(path, 'rb') as f:
+            try:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # Empty files cannot be mapped
+                self._mmap = None
+        self._view = memoryview(self._mmap) if self._mmap is not None else memoryview(b'')
+        self._offsets, self._lengths = self._scan()
+
+    def _scan(self):
+        ''' Returns the offsets and lengths of the frames in the file '''
+        size = len(self._view)
+        prefix = RECORD_FORMATS[self.record_format]
+        if prefix is None:
+            count, rest = divmod(size, self.frame_len)
+            self.truncated = 1 if rest else 0
+            return range(0, count * self.frame_len, self.frame_len), None
+
+        offsets, lengths = [], []
+        times = [] if prefix is archive.RECORD_HEADER else None
+        unpack_from = prefix.unpack_from
+        prefix_len = prefix.size
+        offset = 0
+        while offset + prefix_len <= size:
+            header = unpack_from(self._view, offset)
+            length = header[-1]
+            start = offset + prefix_len
+            if start + length > size:
+                break
+            offsets.append(start)
+            lengths.append(length)
+            if times is not None:
+                times.append(header[0] / 1e6)
+            offset = start + length
+        self._times = times
+        self.truncated = 1 if offset < size else 0
+        return offsets, lengths
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def __iter__(self):
+        view = self._view
+        if self._lengths is None:
+            frame_len = self.frame_len
+            for offset in self._offsets:
+                yield view[offset:offset + frame_len]
+        else:
+            for offset, length in zip(self._offsets, self._lengths):
+                yield view[offset:offset + length]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        ''' Unmap the file
+
+        Raises:
+            BufferError: If frames of the replay are still referenced.
+        '''
+        self._view.release()
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def replay(self, handler, frame_class=None, speed=0, frame_rate=None, limit=None):
+        ''' Replay the frames of the file through a handler
+
+        Arguments:
+            handler:
+                A function called with each frame, or the frame object
+                built from it if frame_class is given.
+
+            frame_class (optional):
+                A class, such as :class:`ait.dsn.sle.frames.AOSFrameView`,
+                called with each frame's memoryview to decode it before it
+                is handed to handler.
+
+            speed (optional):
+                0 to replay as fast as frames are handled, 1 to replay at
+                the rate frames were received, or N to replay N times
+                faster.
+
+            frame_rate (optional):
+                The frames per second the frames were received at. Archive
+                segments are paced by the earth receive times of their
+                frames unless it is given, and other files require it
+                when speed is not 0.
+
+            limit (optional):
+                The maximum number of frames to replay.
+
+        Returns:
+            A dict of the replay statistics, as described for
+            :meth:`report`.
+
+        Raises:
+            ValueError: If speed is not 0 and frame_rate is needed but not
+                given.
+        '''
+        times = None
+        if speed and not frame_rate:
+            if not self._times:
+                raise ValueError('Paced replay requires the frame rate the frames were received at')
+            first = self._times[0]
+            times = [(t - first) / speed for t in self._times]
+        interval = 1.0 / (frame_rate * speed) if speed and frame_rate else 0
+
+        clock = time.perf_counter
+        read_time = decode_time = handle_time = pace_time = 0.0
+        count = nbytes = 0
+
+        # Each stage ends where the next begins, so the clock is read once
+        # per stage rather than twice
+        start = t0 = clock()
+        for frame in itertools.islice(self, limit):
+            t1 = clock()
+            read_time += t1 - t0
+            nbytes += len(frame)
+
+            if frame_class is not None:
+                frame = frame_class(frame)
+                t0 = clock()
+                decode_time += t0 - t1
+                t1 = t0
+
+            handler(frame)
+            del frame
+            t0 = clock()
+            handle_time += t0 - t1
+            count += 1
+
+            if interval or times:
+                if times:
+                    delay = start + times[count] - t0 if count < len(times) else 0
+                else:
+                    delay = start + count * interval - t0
+                if delay > _PACING_SLACK:
+                    time.sleep(delay)
+                    t1 = clock()
+                    pace_time += t1 - t0
+                    t0 = t1
+
+        elapsed = clock() - start
+        return {
+            'frames': count,
+            'bytes': nbytes,
+            'truncated': self.truncated,
+            'elapsed': elapsed,
+            'frames_per_second': count / elapsed if elapsed else 0.0,
+            'stages': {
+                'read': read_time,
+                'decode': decode_time,
+                'handle': handle_time,
+                'pace': pace_time
+            }
+        }
+
+    def to_processor(self, processor, frame_type=None, **kwargs):
+        ''' Replay the frames in-process through a deframing processor
+
+        Each frame is wrapped in the frame view for frame_type, or the
+        processor's downlink frame type, and passed to the processor's
+        handle_frame. Other keyword arguments are passed to :meth:`replay`.
+
+        Arguments:
+            processor:
+                A :class:`ait.dsn.proc.deframe_packet_processor.Processor`.
+
+            frame_type (optional):
+                'TMTransFrame' or 'AOSTransFrame'.
+        '''
+        frame_type = frame_type or processor._downlink_frame_type
+        frame_class = frames.FRAME_VIEW_CLASSES.get(frame_type) or getattr(frames, frame_type)
+        return self.replay(processor.handle_frame, frame_class, **kwargs)
+
+    def to_udp(self, address, sock=None, **kwargs):
+        ''' Replay the frames as UDP datagrams
+
+        Frames are sent as they are to address, such as the frame port of
+        the deframing processor or the AIT plugins. Send errors are logged
+        and counted in the returned statistics as 'send_errors'. Other
+        keyword arguments are passed to :meth:`replay`.
+
+        Arguments:
+            address:
+                The (host, port) to send frames to.
+
+            sock (optional):
+                The UDP socket to send from.
+        '''
+        sock = sock or socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sendto = sock.sendto
+        errors = [0]
+
+        def send(frame):
+            try:
+                sendto(frame, address)
+            except socket.error as e:
+                if not errors[0]:
+                    ait.core.log.error('Unable to send frames to {}:{}: {}'.format(address[0], address[1], e))
+                errors[0] += 1
+
+        stats = self.replay(send, **kwargs)
+        stats['send_errors'] = errors[0]
+        return stats
+
+    @staticmethod
+    def report(stats):
+        ''' Returns a printable summary of replay statistics
+
+        The statistics dict returned by :meth:`replay` holds the number of
+        frames ('frames') and bytes ('bytes') replayed, whether the file
+        ended in a truncated record ('truncated'), the seconds the replay
+        took ('elapsed'), the frames replayed per second
+        ('frames_per_second') and the seconds spent in each stage
+        ('stages'): reading frames from the file, decoding them, handling
+        them and waiting to pace them.
+        '''
+        count = stats['frames'] or 1
+        lines = ['{} frames, {} bytes in {:.3f} s: {:.0f} frames/s, {:.1f} MB/s'.format(
+            stats['frames'], stats['bytes'], stats['elapsed'], stats['frames_per_second'],
+            stats['bytes'] / stats['elapsed'] / 1e6 if stats['elapsed'] else 0.0)]
+        for stage, seconds in stats['stages'].items():
+            lines.append('  {:8s} {:8.3f} s {:8.2f} us/frame'.format(stage, seconds, seconds / count * 1e6))
+        return '\n'.join(lines)
@@ -0,0 +1,326 @@
+# Advanced Multi-Mission Operations System (AMMOS) Instrument Toolkit (AIT)
+# Bespoke Link to Instruments and Small Satellites (BLISS)
+#
+# Copyright 2017, by the California Institute of Technology. ALL RIGHTS
+# RESERVED. United States Government Sponsorship acknowledged. Any
+# commercial use must be negotiated with the Office of Technology Transfer
+# at the California Institute of Technology.
+#
+# This software may be subject to U.S. export control laws. By accepting
+# this software, the user agrees to comply with all applicable U.S. export
+# laws and regulations. User has the responsibility to obtain export licenses,
+# or other export authority as may be required before exporting such
+# information to foreign countries or providing access to foreign persons.
+
+''' SLE Session Multiplexer
+
+The ait.dsn.sle.session module provides a manager that runs many SLE
+service instances (RAF, RCF and CLTU) on one event loop.
+
+Stand-alone SLE instances each spawn a socket reader greenlet, a decoder
+greenlet and open their own telemetry output socket. Instances added to a
+SessionManager instead share one reader that services every provider
+connection, one decoder that round-robins over the per-instance data
+queues, and one telemetry socket.
+
+Classes:
+    SessionManager: Owns a set of SLE associations and schedules their
+        reading and decoding.
+'''
+import socket
+import time
+
+import gevent
+import gevent.event
+import gevent.queue
+import gevent.select
+
+import ait
+import ait.core.log
+
+import ait.dsn.sle.common as common
+
+
+class Association(object):
+    ''' Reader state and counters for one SLE instance in a session '''
+
+    def __init__(self, service, recv_size):
+        self.service = service
+        self.framer = common.TMLFramer(recv_size)
+        self.hb_time = int(time.time())
+        self.bytes_received = 0
+        self.pdus_received = 0
+        self.pdus_decoded = 0
+        self.decode_errors = 0
+
+    def counters(self):
+        ''' Returns the counters of this association as a dict '''
+        return {
+            'bytes_received': self.bytes_received,
+            'pdus_received': self.pdus_received,
+            'pdus_decoded': self.pdus_decoded,
+            'decode_errors': self.decode_errors,
+            'queued': self.service._data_queue.qsize()
+        }
+
+
+class SessionManager(object):
+    ''' Run many SLE associations on one reader and one decoder greenlet
+
+    Services are registered with :meth:`add` before they are connected.
+    From then on :meth:`ait.dsn.sle.common.SLE.connect` hands the provider
+    connection to the session rather than spawning per-instance greenlets,
+    and :meth:`ait.dsn.sle.common.SLE.disconnect` removes it again.
+
+    The reader waits on all provider sockets at once, frames whatever
+    arrives and queues the PDUs on the owning instance's data queue. An
+    instance whose queue is full under the 'block' policy is simply not
+    read from until the decoder catches up, which pushes back on that
+    provider through TCP flow control without stalling the others. A
+    connection that the provider closes, that fails, or that carries data
+    which can not be framed is detached, its socket closed and its instance
+    returned to the 'unbound' state.
+
+    The decoder visits the instances in turn and decodes at most `quantum`
+    PDUs from each per visit, so a bursting provider cannot starve the rest.
+
+    Memory per association is bounded by the framer buffer (twice
+    `recv_size` unless a single PDU is larger) plus at most `queue_size`
+    queued PDUs, so the footprint of a session grows linearly with the
+    number of associations rather than with the provider's data rate.
+    '''
+
+    def __init__(self, *args, **kwargs):
+        self._recv_size = ait.config.get('dsn.sle.session.recv_size',
+                                         kwargs.get('recv_size', 65536))
+        self._queue_size = ait.config.get('dsn.sle.session.queue_size',
+                                          kwargs.get('queue_size', 32))
+        self._quantum = ait.config.get('dsn.sle.session.quantum',
+                                       kwargs.get('quantum', 8))
+        self._poll_interval = ait.config.get('dsn.sle.session.poll_interval',
+                                             kwargs.get('poll_interval', 1.0))
+
+        self._telem_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._services = []
+        self._associations = {}
+        self._retired = {
+            'bytes_received': 0,
+            'pdus_received': 0,
+            'pdus_decoded': 0,
+            'decode_errors': 0
+        }
+
+        self._work = gevent.event.Event()
+        self._reader = None
+        self._decoder = None
+        self._start_time = None
+
+    @property
+    def services(self):
+        ''' Returns the list of SLE instances registered with this session '''
+        return list(self._services)
+
+    def add(self, service):
+        ''' Register an SLE instance with this session
+
+        The instance's telemetry socket is replaced by the socket shared by
+        the session and its data queue is limited to the session's
+        `queue_size`. The instance must not be connected yet.
+
+        Arguments:
+            service:
+                A RAF, RCF or CLTU instance.
+
+        Returns:
+            The registered instance.
+        '''
+        service._session = self
+        service._telem_sock.close()
+        service._telem_sock = self._telem_sock
+        if service._data_queue_size > self._queue_size:
+            service._data_queue_size = self._queue_size
+            service._data_queue = gevent.queue.Queue(self._queue_size)
+        self._services.append(service)
+        return service
+
+    def attach(self, service):
+        ''' Start servicing the connected socket of a registered instance '''
+        self._associations[service] = Association(service, self._recv_size)
+
+    def detach(self, service):
+        ''' Stop servicing a registered instance's connection '''
+        assoc = self._associations.pop(service, None)
+        if assoc is None:
+            return
+
+        counters = assoc.counters()
+        for key in self._retired:
+            self._retired[key] += counters[key]
+
+    def _abort(self, service):
+        ''' Detach an instance whose connection was lost or is unusable
+
+        The instance's socket is closed and it is returned to the 'unbound'
+        state, as the provider will have dropped the association with it.
+        '''
+        self.detach(service)
+        try:
+            service._socket.close()
+        except socket.error as e:
+            ait.core.log.error('Error closing SLE provider socket: {}'.format(e))
+        service._state = 'unbound'
+
+    def start(self):
+        ''' Spawn the shared reader and decoder greenlets '''
+        self._start_time = time.time()
+        self._reader = gevent.spawn(self._read_loop)
+        self._decoder = gevent.spawn(self._decode_loop)
+
+    def stop(self):
+        ''' Disconnect all connected instances and stop the session '''
+        if self._reader:
+            self._reader.kill()
+        if self._decoder:
+            self._decoder.kill()
+
+        for service in list(self._associations):
+            service.disconnect()
+        self._telem_sock.close()
+
+    def metrics(self):
+        ''' Returns aggregate and per-association throughput metrics
+
+        Returns:
+            A dict with the session-wide totals of 'bytes_received',
+            'pdus_received', 'pdus_decoded', 'decode_errors' and 'queued',
+            the 'elapsed' seconds since :meth:`start`, the derived
+            'bytes_per_sec' and 'pdus_per_sec' decode rates, and an
+            'associations' list holding the counters of each connected
+            instance.
+        '''
+        totals = dict(self._retired)
+        totals['queued'] = 0
+        associations = []
+
+        for service, assoc in self._associations.items():
+            counters = assoc.counters()
+            for key in totals:
+                totals[key] += counters[key]
+            counters['inst_id'] = service._inst_id
+            counters['service_type'] = service._service_type
+            associations.append(counters)
+
+        elapsed = time.time() - self._start_time if self._start_time else 0.0
+        totals['elapsed'] = elapsed
+        totals['bytes_per_sec'] = totals['bytes_received'] / elapsed if elapsed else 0.0
+        totals['pdus_per_sec'] = totals['pdus_decoded'] / elapsed if elapsed else 0.0
+        totals['associations'] = associations
+        return totals
+
+    def _has_room(self, service):
+        return service._data_queue_policy != 'block' or not service._data_queue.full()
+
+    def _drain(self, assoc):
+        ''' Move complete PDUs from an association's framer to its queue '''
+        service = assoc.service
+        queue = service._data_queue
+        block = service._data_queue_policy == 'block'
+
+        if block and queue.full():
+            return
+
+        delivered = False
+        try:
+            for pdu in assoc.framer.pdus():
+                service._enqueue_pdu(bytes(pdu))
+                assoc.pdus_received += 1
+                delivered = True
+                if block and queue.full():
+                    break
+        except ValueError:
+            self._abort(service)
+
+        if delivered:
+            self._work.set()
+
+    def _read_loop(self):
+        ''' Service heartbeats and incoming data for every association '''
+        while True:
+            now = int(time.time())
+            sockets = {}
+            throttled = False
+
+            for assoc in list(self._associations.values()):
+                service = assoc.service
+                if service._need_heartbeat(now - assoc.hb_time):
+                    assoc.hb_time = now
+                    service._send_heartbeat()
+
+                if len(assoc.framer):
+                    self._drain(assoc)
+
+                if self._has_room(service):
+                    sockets[service._socket] = assoc
+                else:
+                    throttled = True
+
+            timeout = 0.01 if throttled else self._poll_interval
+            if not sockets:
+                gevent.sleep(timeout)
+                continue
+
+            try:
+                readable, _, _ = gevent.select.select(list(sockets), [], [], timeout)
+            except (socket.error, ValueError):
+                # A socket was closed underneath us; it will have been
+                # detached by the time we rebuild the socket list
+                gevent.sleep(0)
+                continue
+
+            for sock in readable:
+                assoc = sockets[sock]
+                if assoc.service not in self._associations:
+                    continue
+
+                try:
+                    nbytes = assoc.framer.recv_into(sock)
+                except socket.error as e:
+                    ait.core.log.error('Error reading from SLE provider: {}'.format(e))
+                    self._abort(assoc.service)
+                    continue
+
+                if nbytes == 0:
+                    ait.core.log.info('SLE provider closed the connection')
+                    self._abort(assoc.service)
+                    continue
+
+                assoc.bytes_received += nbytes
+                self._drain(assoc)
+
+    def _decode_loop(self):
+        ''' Decode queued PDUs, visiting each association in turn '''
+        while True:
+            self._work.wait()
+            self._work.clear()
+
+            pending = True
+            while pending:
+                pending = False
+                for assoc in list(self._associations.values()):
+                    queue = assoc.service._data_queue
+                    for _ in range(self._quantum):
+                        try:
+                            body = queue.get_nowait()
+                        except gevent.queue.Empty:
+                            break
+
+                        if common.decode_and_handle(assoc.service, body):
+                            assoc.pdus_decoded += 1
+                        else:
+                            assoc.decode_errors += 1
+
+                    if not queue.empty():
+                        pending = True
+
+                    # Let the reader and heartbeats in between visits
+                    gevent.sleep(0)
@@ -0,0 +1,472 @@
+# Advanced Multi-Mission Operations System (AMMOS) Instrument Toolkit (AIT)
+# Bespoke Link to Instruments and Small Satellites (BLISS)
+#
+# Copyright 2017, by the California Institute of Technology. ALL RIGHTS
+# RESERVED. United States Government Sponsorship acknowledged. Any
+# commercial use must be negotiated with the Office of Technology Transfer
+# at the California Institute of Technology.
+#
+# This software may be subject to U.S. export control laws. By accepting
+# this software, the user agrees to comply with all applicable U.S. export
+# laws and regulations. User has the responsibility to obtain export licenses,
+# or other export authority as may be required before exporting such
+# information to foreign countries or providing access to foreign persons.
+
+''' SLE Provider Simulator
+
+The ait.dsn.sle.simulator module provides a local SLE service provider for
+exercising and benchmarking the RAF, RCF and CLTU interfaces without a DSN
+station or SSPSim.
+
+The simulator speaks the same TML/ISP1 framing and pyasn1 PDUs as the user
+side. It answers BIND, START, STOP and UNBIND invocations, streams transfer
+buffers of annotated frames at a configurable rate while a RAF or RCF
+association is active, and accepts CLTU-TRANSFER-DATA invocations, returning
+them after a configurable processing delay and radiating them at a
+configurable uplink bit rate.
+
+Each annotated frame carries the time it was generated as its earth receive
+time so that users can measure end-to-end latency.
+
+Classes:
+    ProviderSimulator: A gevent StreamServer acting as an SLE provider.
+    ProviderConnection: The state of one user association with the
+        simulator.
+'''
+import datetime as dt
+import socket
+import struct
+
+import gevent
+import gevent.lock
+import gevent.queue
+import gevent.server
+from pyasn1.codec.ber.decoder import decode
+from pyasn1.codec.der.encoder import encode
+from pyasn1.error import PyAsn1Error
+
+import ait
+import ait.core.log
+
+import ait.dsn.sle.common as common
+from ait.dsn.sle.pdu.raf import RafUsertoProviderPdu, RafProvidertoUserPdu
+from ait.dsn.sle.pdu.rcf import RcfUsertoProviderPdu, RcfProvidertoUserPdu
+
+if ait.config.get('dsn.sle.fcltu.version', None) == 4:
+    from ait.dsn.sle.pdu.cltu.cltuv4 import CltuUserToProviderPdu, CltuProviderToUserPdu
+else:
+    from ait.dsn.sle.pdu.cltu.cltuv5 import CltuUserToProviderPdu, CltuProviderToUserPdu
+
+
+SERVICES = {
+    'raf': (RafUsertoProviderPdu, RafProvidertoUserPdu),
+    'rcf': (RcfUsertoProviderPdu, RcfProvidertoUserPdu),
+    'cltu': (CltuUserToProviderPdu, CltuProviderToUserPdu)
+}
+
+
+def tm_frame_source(frame_size, spacecraft_id=0, virtual_channel_id=0):
+    ''' Returns a function generating TM transfer frames
+
+    The frames have a TM primary header with incrementing master and
+    virtual channel frame counts, a first header pointer of zero and a
+    zero filled data field.
+
+    Arguments:
+        frame_size:
+            The total length of each frame in bytes.
+        spacecraft_id:
+            The spacecraft id to put in each frame header.
+        virtual_channel_id:
+            The virtual channel id to put in each frame header.
+
+    Returns:
+        A function taking the index of a frame and returning its bytes.
+    '''
+    word = ((spacecraft_id & 0x3FF) << 4) | ((virtual_channel_id & 0x7) << 1)
+    body = bytes(frame_size - 6)
+
+    def source(index):
+        count = index & 0xFF
+        return struct.pack('>HBBH', word, count, count, 0x1800) + body
+
+    return source
+
+
+class ProviderSimulator(gevent.server.StreamServer):
+    ''' A local SLE service provider
+
+    Arguments:
+        listener:
+            The (host, port) tuple to listen on. Port 0 picks a free port,
+            available afterwards as :attr:`server_port`.
+        service:
+            One of 'raf', 'rcf' or 'cltu'.
+
+    Keyword Arguments:
+        frame_rate:
+            Annotated frames per second streamed while a RAF or RCF
+            association is active. 0 streams as fast as the user reads.
+        frames_per_buffer:
+            Annotated frames in each transfer buffer.
+        frame_size:
+            Length in bytes of each streamed frame.
+        frame_source:
+            A function taking a frame index and returning the frame bytes.
+            Defaults to :func:`tm_frame_source` frames of `frame_size` bytes.
+        cltu_buffer_size:
+            Bytes of CLTU data the provider will hold awaiting radiation.
+        cltu_return_delay:
+            Seconds between receipt of a CLTU-TRANSFER-DATA invocation and
+            its return.
+        uplink_bit_rate:
+            Bits per second at which accepted CLTUs are radiated.
+    '''
+
+    def __init__(self, listener=('127.0.0.1', 0), service='raf', **kwargs):
+        super(ProviderSimulator, self).__init__(listener)
+
+        if service not in SERVICES:
+            raise ValueError('Unknown SLE service type: {}'.format(service))
+
+        self.service = service
+        self.responder_id = ait.config.get('dsn.sle.responder_id',
+                                           kwargs.get('responder_id', 'SSE'))
+        self.frame_rate = kwargs.get('frame_rate', 1000)
+        self.frames_per_buffer = kwargs.get('frames_per_buffer', 1)
+        self.frame_size = kwargs.get('frame_size', 1115)
+        self.frame_source = kwargs.get('frame_source', tm_frame_source(self.frame_size))
+        self.cltu_buffer_size = kwargs.get('cltu_buffer_size', 100000)
+        self.cltu_return_delay = kwargs.get('cltu_return_delay', 0.005)
+        self.uplink_bit_rate = kwargs.get('uplink_bit_rate', 2000)
+
+        self.connections = []
+        self._template = None
+
+    def handle(self, sock, address):
+        ''' Serve one user association until it disconnects '''
+        conn = ProviderConnection(self, sock)
+        self.connections.append(conn)
+        try:
+            conn.serve()
+        finally:
+            conn.close()
+            self.connections.remove(conn)
+
+    def transfer_buffer_template(self):
+        ''' Returns a transfer buffer template for :attr:`frames_per_buffer` frames
+
+        The template is a TML message holding one encoded transfer buffer
+        PDU along with the offsets of the earth receive time and frame data
+        of each annotated frame within it, so streaming only needs to patch
+        those bytes rather than re-encoding every buffer.
+
+        Returns:
+            A (bytearray, [ert offsets], [data offsets]) tuple.
+        '''
+        if self._template is not None:
+            return self._template
+
+        if self.frame_size < 8:
+            raise ValueError('Frame size must be at least 8 bytes')
+
+        pdu = SERVICES[self.service][1]()
+        buf = pdu['{}TransferBuffer'.format(self.service)]
+        ert_markers = []
+        data_markers = []
+
+        for i in range(self.frames_per_buffer):
+            ert = struct.pack('!Q', 0xA5A5A5A5A5A50000 + i)
+            marker = struct.pack('!Q', 0x5A5A5A5A5A5A0000 + i)
+            ert_markers.append(ert)
+            data_markers.append(marker)
+
+            frame = buf[i]['annotatedFrame']
+            frame['invokerCredentials']['unused'] = None
+            frame['earthReceiveTime']['ccsdsFormat'] = ert
+            frame['antennaId']['localForm'] = b'\x01'
+            frame['dataLinkContinuity'] = 0
+            if self.service == 'raf':
+                frame['deliveredFrameQuality'] = 0
+            frame['privateAnnotation']['null'] = None
+            frame['data'] = marker + bytes(self.frame_size - len(marker))
+
+        body = encode(pdu)
+        msg = bytearray(struct.pack(common.TML_SLE_FORMAT, common.TML_SLE_TYPE, len(body)) + body)
+        ert_offsets = [msg.find(m) for m in ert_markers]
+        data_offsets = [msg.find(m) for m in data_markers]
+
+        self._template = (msg, ert_offsets, data_offsets)
+        return self._template
+
+
+class ProviderConnection(object):
+    ''' The provider side of one SLE association '''
+
+    def __init__(self, server, sock):
+        self.server = server
+        self.sock = sock
+        self.state = 'unbound'
+        self.frames_sent = 0
+        self.cltus_received = 0
+        self.cltus_radiated = 0
+
+        self._in_pdu, self._out_pdu = SERVICES[server.service]
+        self._prefix = server.service
+        self._send_lock = gevent.lock.Semaphore()
+        self._streamer = None
+        self._radiator = None
+        self._radiation_queue = gevent.queue.Queue()
+        self._return_queue = gevent.queue.Queue()
+        self._returner = None
+        self._buffer_available = server.cltu_buffer_size
+        self._expected_cltu_id = 0
+        self._last_processed = None
+        self._last_ok = None
+
+        self._handlers = {
+            'BindInvocation': self._bind,
+            'UnbindInvocation': self._unbind,
+            'StartInvocation': self._start,
+            'StopInvocation': self._stop,
+            'TransferDataInvocation': self._transfer_data,
+            'PeerAbortInvocation': self._peer_abort
+        }
+
+    def serve(self):
+        ''' Read and answer user invocations until the user disconnects '''
+        if not self._read_context():
+            return
+
+        framer = common.TMLFramer(65536)
+        while True:
+            try:
+                nbytes = framer.recv_into(self.sock)
+            except socket.error:
+                return
+
+            if nbytes == 0:
+                return
+
+            for body in framer.pdus():
+                try:
+                    pdu = decode(bytes(body), asn1Spec=self._in_pdu())[0]
+                except PyAsn1Error:
+                    ait.core.log.error('Simulator unable to decode PDU. Skipping ...')
+                    continue
+
+                if not self._dispatch(pdu):
+                    return
+
+    def close(self):
+        ''' Stop streaming and radiating and close the connection '''
+        for greenlet in (self._streamer, self._radiator, self._returner):
+            if greenlet:
+                greenlet.kill()
+        self.sock.close()
+
+    def send(self, pdu):
+        ''' Encode and send a provider to user PDU '''
+        body = encode(pdu)
+        msg = struct.pack(common.TML_SLE_FORMAT, common.TML_SLE_TYPE, len(body)) + body
+        with self._send_lock:
+            self.sock.sendall(msg)
+
+    def _read_context(self):
+        size = struct.calcsize(common.TML_CONTEXT_MSG_FORMAT)
+        msg = b''
+        while len(msg) < size:
+            data = self.sock.recv(size - len(msg))
+            if not data:
+                return False
+            msg += data
+
+        if struct.unpack_from('!I', msg)[0] != common.TML_CONTEXT_MSG_TYPE:
+            ait.core.log.error('Simulator expected a TML context message. Closing ...')
+            return False
+        return True
+
+    def _dispatch(self, pdu):
+        name = pdu.getName()
+        handler = self._handlers.get(name[len(self._prefix):])
+        if handler is None:
+            ait.core.log.info('Simulator ignoring {}'.format(name))
+            return True
+        return handler(pdu.getComponent()) is not False
+
+    def _return(self, name):
+        pdu = self._out_pdu()
+        return pdu, pdu['{}{}'.format(self._prefix, name)]
+
+    def _bind(self, invoc):
+        pdu, ret = self._return('BindReturn')
+        ret['performerCredentials']['unused'] = None
+        ret['responderIdentifier'] = self.server.responder_id
+        ret['result']['positive'] = int(invoc['versionNumber'])
+        self.state = 'ready'
+        self.send(pdu)
+
+    def _unbind(self, invoc):
+        pdu, ret = self._return('UnbindReturn')
+        ret['responderCredentials']['unused'] = None
+        ret['result']['positive'] = None
+        self.state = 'unbound'
+        self.send(pdu)
+
+    def _start(self, invoc):
+        pdu, ret = self._return('StartReturn')
+        ret['performerCredentials']['unused'] = None
+        ret['invokeId'] = invoc['invokeId']
+
+        if self.server.service == 'cltu':
+            self._expected_cltu_id = int(invoc['firstCltuIdentification'])
+            now = common.generate_encoded_time(dt.datetime.utcnow())
+            ret['result']['positiveResult']['startRadiationTime']['ccsdsFormat'] = now
+            ret['result']['positiveResult']['stopRadiationTime']['undefined'] = None
+            self._radiator = gevent.spawn(self._radiate, self._radiation_queue)
+            if self._returner is None:
+                self._returner = gevent.spawn(self._return_transfer_data)
+        else:
+            ret['result']['positiveResult'] = None
+            self._streamer = gevent.spawn(self._stream)
+
+        self.state = 'active'
+        self.send(pdu)
+
+    def _stop(self, invoc):
+        # The streamer and radiator notice they have been replaced and exit
+        # between PDUs, so no PDU is cut off part way through being sent.
+        # CLTUs not yet radiated are discarded.
+        self._streamer = self._radiator = None
+        self._radiation_queue.put(None)
+        self._radiation_queue = gevent.queue.Queue()
+        self._buffer_available = self.server.cltu_buffer_size
+
+        pdu, ret = self._return('StopReturn')
+        ret['credentials']['unused'] = None
+        ret['invokeId'] = invoc['invokeId']
+        ret['result']['positiveResult'] = None
+        self.state = 'ready'
+        self.send(pdu)
+
+    def _peer_abort(self, invoc):
+        self.state = 'unbound'
+        return False
+
+    def _stream(self):
+        ''' Send transfer buffers at the configured frame rate '''
+        server = self.server
+        msg, ert_offsets, data_offsets = server.transfer_buffer_template()
+        interval = server.frames_per_buffer / float(server.frame_rate) if server.frame_rate else 0
+        frame_size = server.frame_size
+        due = gevent.get_hub().loop.now()
+
+        while self._streamer is gevent.getcurrent():
+            ert = common.generate_encoded_time(dt.datetime.utcnow())
+            for ert_offset, data_offset in zip(ert_offsets, data_offsets):
+                msg[ert_offset:ert_offset + 8] = ert
+                msg[data_offset:data_offset + frame_size] = server.frame_source(self.frames_sent)
+                self.frames_sent += 1
+
+            try:
+                with self._send_lock:
+                    self.sock.sendall(msg)
+            except socket.error:
+                # The user has gone away; serve() will clean up
+                return
+
+            if interval:
+                due += interval
+                gevent.sleep(max(0, due - gevent.get_hub().loop.now()))
+            else:
+                gevent.sleep(0)
+
+    def _transfer_data(self, invoc):
+        cltu_id = int(invoc['cltuIdentification'])
+        data = invoc['cltuData'].asOctets()
+        self.cltus_received += 1
+
+        diagnostic = None
+        if self.state != 'active':
+            diagnostic = 0  # unableToProcess
+        elif cltu_id != self._expected_cltu_id:
+            diagnostic = 2  # outOfSequence
+        elif len(data) > self._buffer_available:
+            diagnostic = 1  # unableToStore
+        else:
+            self._expected_cltu_id += 1
+            self._buffer_available -= len(data)
+            notify = int(invoc['slduRadiationNotification']) == 0
+            self._radiation_queue.put((cltu_id, len(data), int(invoc['delayTime']), notify))
+
+        # The return carries the id of the next CLTU the provider expects
+        due = gevent.get_hub().loop.now() + self.server.cltu_return_delay
+        self._return_queue.put((due, int(invoc['invokeId']), self._expected_cltu_id, diagnostic))
+
+    def _return_transfer_data(self):
+        ''' Send CLTU-TRANSFER-DATA returns in order once they are due '''
+        while True:
+            due, invoke_id, cltu_id, diagnostic = self._return_queue.get()
+            gevent.sleep(max(0, due - gevent.get_hub().loop.now()))
+            self._transfer_data_return(invoke_id, cltu_id, diagnostic)
+
+    def _transfer_data_return(self, invoke_id, cltu_id, diagnostic):
+        pdu, ret = self._return('TransferDataReturn')
+        ret['performerCredentials']['unused'] = None
+        ret['invokeId'] = invoke_id
+        ret['cltuIdentification'] = cltu_id
+        ret['cltuBufferAvailable'] = self._buffer_available
+        if diagnostic is None:
+            ret['result']['positiveResult'] = None
+        else:
+            ret['result']['negativeResult']['specific'] = diagnostic
+        self.send(pdu)
+
+    def _radiate(self, queue):
+        ''' Radiate accepted CLTUs in order at the uplink bit rate '''
+        loop = gevent.get_hub().loop
+        due = loop.now()
+        while True:
+            item = queue.get()
+            if item is None:
+                return
+
+            cltu_id, size, delay, notify = item
+            start = common.generate_encoded_time(dt.datetime.utcnow())
+            # Pace against a running deadline, as short CLTUs radiate faster
+            # than the resolution of a single sleep
+            due = max(due, loop.now()) + size * 8.0 / self.server.uplink_bit_rate + delay / 1e6
+            if due > loop.now():
+                gevent.sleep(due - loop.now())
+            stop = common.generate_encoded_time(dt.datetime.utcnow())
+            if self._radiator is not gevent.getcurrent():
+                return
+
+            self._buffer_available += size
+            self.cltus_radiated += 1
+            self._last_processed = (cltu_id, start)
+            self._last_ok = (cltu_id, stop)
+
+            if notify:
+                self._async_notify('cltuRadiated')
+            if queue.empty():
+                self._async_notify('bufferEmpty')
+
+    def _async_notify(self, notification):
+        pdu, invoc = self._return('AsyncNotifyInvocation')
+        invoc['invokerCredentials']['unused'] = None
+        invoc['cltuNotification'][notification] = None
+
+        cltu_id, start = self._last_processed
+        processed = invoc['cltuLastProcessed']['cltuProcessed']
+        processed['cltuIdentification'] = cltu_id
+        processed['radiationStartTime']['known']['ccsdsFormat'] = start
+        processed['cltuStatus'] = 0  # radiated
+
+        cltu_id, stop = self._last_ok
+        invoc['cltuLastOk']['cltuOk']['cltuIdentification'] = cltu_id
+        invoc['cltuLastOk']['cltuOk']['radiationStopTime']['ccsdsFormat'] = stop
+
+        invoc['productionStatus'] = 0  # operational
+        invoc['uplinkStatus'] = 3  # nominal
+        self.send(pdu)
@@ -0,0 +1,143 @@
+# Advanced Multi-Mission Operations System (AMMOS) Instrument Toolkit (AIT)
+# Bespoke Link to Instruments and Small Satellites (BLISS)
+#
+# Copyright 2017, by the California Institute of Technology. ALL RIGHTS
+# RESERVED. United States Government Sponsorship acknowledged. Any
+# commercial use must be negotiated with the Office of Technology Transfer
+# at the California Institute of Technology.
+#
+# This software may be subject to U.S. export control laws. By accepting
+# this software, the user agrees to comply with all applicable U.S. export
+# laws and regulations. User has the responsibility to obtain export licenses,
+# or other export authority as may be required before exporting such
+# information to foreign countries or providing access to foreign persons.
+import datetime as dt
+
+import pytest
+from pyasn1.codec.ber.encoder import encode
+
+import ait.dsn.sle
+import ait.dsn.sle.common as common
+from ait.dsn.sle.archive import INDEX_ENTRY, FrameArchive, FrameArchiveReader, cds_to_unix
+from ait.dsn.sle.pdu import raf
+from ait.dsn.sle.replay import FrameReplay
+
+T0 = 1700000000.0
+
+
+def _aos_frame(vcid, count, length=64):
+    return bytes([0x40, vcid]) + count.to_bytes(3, "big") + bytes(length - 5)
+
+
+def _tm_frame(vcid, count, length=64):
+    return bytes([0x12, 0x30 | vcid << 1, 0, count, 0, 0]) + bytes(length - 6)
+
+
+def _archive(tmp_path, **kwargs):
+    kwargs.setdefault("flush_interval", 0)
+    return FrameArchive(str(tmp_path), "AOSTransFrame", **kwargs)
+
+
+def test_cds_time_codes():
+    time_ = dt.datetime(2023, 11, 14, 22, 13, 20, 123456)
+    assert cds_to_unix(common.generate_encoded_time(time_)) == pytest.approx(T0 + 0.123456, abs=1e-6)
+
+    pico = (24058).to_bytes(2, "big") + (5).to_bytes(4, "big") + (250000000).to_bytes(4, "big")
+    assert cds_to_unix(pico) == pytest.approx(T0 - 22 * 3600 - 13 * 60 - 20 + 0.00525)
+
+
+def test_frames_are_written_in_batches(tmp_path):
+    # Each record is 15 header bytes and a 64 byte frame
+    archive = _archive(tmp_path, batch_size=79 * 11, fsync_interval=None)
+    for i in range(10):
+        archive.add(_aos_frame(i % 3, i), T0 + i)
+    assert archive.metrics()["writes"] == 0
+    archive.add(_aos_frame(0, 12), T0 + 12)
+    assert archive.metrics()["writes"] == 1
+
+    archive.add(_aos_frame(1, 13), T0 + 13)
+    assert archive.metrics()["pending"] == 79
+    assert archive.poll()
+    assert not archive.poll()
+    archive.close()
+
+    metrics = archive.metrics()
+    assert metrics["frames"] == 12
+    assert metrics["bytes"] == 12 * 79
+    assert metrics["fsyncs"] == 1
+    assert metrics["pending"] == 0
+
+
+def test_segments_rotate_and_are_indexed(tmp_path):
+    archive = _archive(tmp_path, batch_size=1, segment_size=79 * 4)
+    for i in range(10):
+        archive.add(_aos_frame(i % 2, i), T0 + i)
+    archive.close()
+
+    reader = FrameArchiveReader(str(tmp_path))
+    assert len(reader.segments) == 3
+    assert [len(reader.index(s)) for s in reader.segments] == [4, 4, 2]
+
+    records = list(reader.frames())
+    assert [r[2] for r in records] == list(range(10))
+    assert records[3] == (T0 + 3, 1, 3, _aos_frame(1, 3))
+
+    assert [r[2] for r in reader.frames(T0 + 2, T0 + 7, vcids=[0])] == [2, 4, 6]
+    lookup = reader.lookup(start=T0 + 8)
+    assert lookup == [(reader.segments[2], [0, 79])]
+
+
+def test_index_past_end_of_segment_is_ignored(tmp_path):
+    archive = _archive(tmp_path, batch_size=1)
+    for i in range(3):
+        archive.add(_aos_frame(5, i), T0 + i)
+    segment = archive.segment_path
+    archive.close()
+
+    # An index entry written without its record, and a partial entry
+    with open(segment[:-len(".frames")] + ".idx", "ab") as f:
+        f.write(INDEX_ENTRY.pack(3 * 79, int((T0 + 3) * 1e6), 5) + b"\x00\x01")
+    assert [r[2] for r in FrameArchiveReader(str(tmp_path)).frames()] == [0, 1, 2]
+
+
+def test_segments_replay_at_earth_receive_time(tmp_path):
+    archive = _archive(tmp_path)
+    for i in range(5):
+        archive.add(_aos_frame(1, i), T0 + i * 0.02)
+    archive.close()
+    segment, = FrameArchiveReader(str(tmp_path)).segments
+
+    with FrameReplay(segment, record_format="archive") as replay:
+        received = []
+        stats = replay.replay(lambda f: received.append(f.tobytes()), speed=2)
+    assert received == [_aos_frame(1, i) for i in range(5)]
+    # 80 ms of frames at twice the speed they were received at
+    assert stats["elapsed"] >= 0.035
+
+
+def test_raf_archives_received_frames(tmp_path):
+    raf_mngr = ait.dsn.sle.RAF(
+        hostnames=["localhost"],
+        port=5100,
+        frame_archive_directory=str(tmp_path),
+        frame_archive_flush_interval=0,
+    )
+
+    ert = common.generate_encoded_time(dt.datetime(2023, 11, 14, 22, 13, 20))
+    pdu = raf.RafProvidertoUserPdu()
+    buf = pdu["rafTransferBuffer"]
+    for i in range(3):
+        frame = buf[i]["annotatedFrame"]
+        frame["invokerCredentials"]["unused"] = None
+        frame["earthReceiveTime"]["ccsdsFormat"] = ert
+        frame["antennaId"]["localForm"] = b"\x01"
+        frame["dataLinkContinuity"] = 0
+        frame["deliveredFrameQuality"] = 0
+        frame["privateAnnotation"]["null"] = None
+        frame["data"] = _tm_frame(2, i)
+    raf_mngr._handle_pdu(raf_mngr.decode(encode(pdu))[0])
+
+    assert raf_mngr.frame_archive_stats["writes"] == 1
+    raf_mngr._frame_archive.close()
+    records = list(FrameArchiveReader(str(tmp_path)).frames())
+    assert records == [(T0, 2, i, _tm_frame(2, i)) for i in range(3)]
@@ -0,0 +1,150 @@
+# Advanced Multi-Mission Operations System (AMMOS) Instrument Toolkit (AIT)
+# Bespoke Link to Instruments and Small Satellites (BLISS)
+#
+# Copyright 2017, by the California Institute of Technology. ALL RIGHTS
+# RESERVED. United States Government Sponsorship acknowledged. Any
+# commercial use must be negotiated with the Office of Technology Transfer
+# at the California Institute of Technology.
+#
+# This software may be subject to U.S. export control laws. By accepting
+# this software, the user agrees to comply with all applicable U.S. export
+# laws and regulations. User has the responsibility to obtain export licenses,
+# or other export authority as may be required before exporting such
+# information to foreign countries or providing access to foreign persons.
+import pytest
+from pyasn1.codec.ber.encoder import encode
+from pyasn1.codec.der.decoder import decode
+
+import ait.dsn.sle
+import ait.dsn.sle.ber as ber
+from ait.dsn.sle.pdu import raf, rcf
+
+
+def _transfer_buffer(service, frames, notification=False):
+    ''' Encode a transfer buffer holding the given annotated frame variants '''
+    module = raf if service == "raf" else rcf
+    pdu = module.RafProvidertoUserPdu() if service == "raf" else module.RcfProvidertoUserPdu()
+    buf = pdu["{}TransferBuffer".format(service)]
+
+    for i, options in enumerate(frames):
+        frame = buf[i]["annotatedFrame"]
+        if options.get("credentials"):
+            frame["invokerCredentials"]["used"] = options["credentials"]
+        else:
+            frame["invokerCredentials"]["unused"] = None
+        if options.get("pico"):
+            frame["earthReceiveTime"]["ccsdsPicoFormat"] = bytes(range(i, i + 10))
+        else:
+            frame["earthReceiveTime"]["ccsdsFormat"] = bytes(range(i, i + 8))
+        if options.get("global_antenna"):
+            frame["antennaId"]["globalForm"] = (1, 3, 112, 4, 7)
+        else:
+            frame["antennaId"]["localForm"] = b"\x01\x02"
+        frame["dataLinkContinuity"] = options.get("continuity", 0)
+        if service == "raf":
+            frame["deliveredFrameQuality"] = options.get("quality", 0)
+        if options.get("annotation"):
+            frame["privateAnnotation"]["notNull"] = options["annotation"]
+        else:
+            frame["privateAnnotation"]["null"] = None
+        frame["data"] = bytes([i & 0xFF]) * options.get("size", 32)
+
+    if notification:
+        note = buf[len(frames)]["syncNotification"]
+        note["invokerCredentials"]["unused"] = None
+        note["notification"]["endOfData"] = None
+
+    return encode(pdu)
+
+
+FRAME_VARIANTS = [
+    {},
+    {"size": 1115, "continuity": -1, "quality": 2},
+    {"size": 65000},
+    {"pico": True, "global_antenna": True},
+    {"credentials": bytes(range(20)), "annotation": b"private"},
+]
+
+
+@pytest.mark.parametrize("service", ["raf", "rcf"])
+def test_walker_matches_pyasn1(service):
+    module = raf if service == "raf" else rcf
+    spec = module.RafProvidertoUserPdu() if service == "raf" else module.RcfProvidertoUserPdu()
+    message = _transfer_buffer(service, FRAME_VARIANTS)
+
+    expected = decode(message, asn1Spec=spec)[0]["{}TransferBuffer".format(service)]
+    items = ber.walk_transfer_buffer(message, frame_quality=(service == "raf"))
+
+    assert len(items) == len(expected)
+    for item, element in zip(items, expected):
+        frame = element["annotatedFrame"]
+        ert = frame["earthReceiveTime"]
+        assert item.earth_receive_time_format == ert.getName()
+        assert bytes(item.earth_receive_time) == ert.getComponent().asOctets()
+        assert item.antenna_id_format == frame["antennaId"].getName()
+        assert item.data_link_continuity == int(frame["dataLinkContinuity"])
+        assert bytes(item.data) == frame["data"].asOctets()
+
+        if service == "raf":
+            assert item.delivered_frame_quality == int(frame["deliveredFrameQuality"])
+        else:
+            assert item.delivered_frame_quality is None
+
+        annotation = frame["privateAnnotation"]
+        if annotation.getName() == "notNull":
+            assert bytes(item.private_annotation) == annotation.getComponent().asOctets()
+        else:
+            assert item.private_annotation is None
+
+        # The pyasn1 style accessors used by AnnotatedFrame handlers
+        assert item.getName() == element.getName()
+        assert item.getComponent()["data"].asOctets() == frame["data"].asOctets()
+        assert item["earthReceiveTime"][ert.getName()].asOctets() == ert.getComponent().asOctets()
+        assert "data" in item and item["data"].isValue
+        assert ("deliveredFrameQuality" in item) == (service == "raf")
+
+
+def test_walker_passes_notifications_to_pyasn1():
+    message = _transfer_buffer("raf", [{}], notification=True)
+    pdu = ait.dsn.sle.RAF(hostnames=["localhost"], port=5100).decode(message)[0]
+
+    assert isinstance(pdu, ber.TransferBuffer)
+    assert pdu.getName() == "rafTransferBuffer"
+    frame, note = pdu["rafTransferBuffer"]
+    assert isinstance(frame, ber.AnnotatedFrame)
+    assert note.getName() == "syncNotification"
+    assert "endOfData" in note["syncNotification"]["notification"]
+
+
+def test_walker_leaves_other_pdus_to_pyasn1():
+    pdu = raf.RafProvidertoUserPdu()
+    ret = pdu["rafStopReturn"]
+    ret["invokeId"] = 1
+    ret["credentials"]["unused"] = None
+    ret["result"]["positiveResult"] = None
+    message = encode(pdu)
+
+    assert ber.walk_transfer_buffer(message) is None
+    decoded = ait.dsn.sle.RAF(hostnames=["localhost"], port=5100).decode(message)[0]
+    assert decoded.getName() == "rafStopReturn"
+
+
+def test_walker_rejects_unexpected_encodings():
+    message = bytearray(_transfer_buffer("raf", [{}]))
+
+    with pytest.raises(ValueError):
+        ber.walk_transfer_buffer(message[:-1])
+
+    # An RCF walk of a RAF frame finds the quality field where it expects
+    # the private annotation
+    with pytest.raises(ValueError):
+        ber.walk_transfer_buffer(message, frame_quality=False)
+
+
+def test_fast_decode_can_be_disabled():
+    message = _transfer_buffer("rcf", [{}])
+    rcf_ = ait.dsn.sle.RCF(hostnames=["localhost"], port=5100, fast_decode=False)
+    pdu = rcf_.decode(message)[0]
+
+    assert not isinstance(pdu, ber.TransferBuffer)
+    assert pdu.getName() == "rcfTransferBuffer"
@@ -0,0 +1,85 @@
+# Advanced Multi-Mission Operations System (AMMOS) Instrument Toolkit (AIT)
+# Bespoke Link to Instruments and Small Satellites (BLISS)
+#
+# Copyright 2017, by the California Institute of Technology. ALL RIGHTS
+# RESERVED. United States Government Sponsorship acknowledged. Any
+# commercial use must be negotiated with the Office of Technology Transfer
+# at the California Institute of Technology.
+#
+# This software may be subject to U.S. export control laws. By accepting
+# this software, the user agrees to comply with all applicable U.S. export
+# laws and regulations. User has the responsibility to obtain export licenses,
+# or other export authority as may be required before exporting such
+# information to foreign countries or providing access to foreign persons.
+import datetime as dt
+
+import pytest
+
+import ait.dsn.sle
+from ait.dsn.sle.cltu import CltuTransferDataEncoder
+
+
+def _cltu(**kwargs):
+    return ait.dsn.sle.CLTU(hostnames=["localhost"], port=5100, **kwargs)
+
+
+@pytest.mark.parametrize(
+    "invoke_id, cltu_id, size, earliest, latest, delay, notify",
+    [
+        (0, 0, 1, None, None, 0, False),
+        (127, 128, 127, None, None, 0, True),
+        (128, 65535, 128, dt.datetime(2020, 1, 1), None, 1000, False),
+        (65535, 2 ** 31, 255, None, dt.datetime(2030, 6, 1), 2 ** 32 - 1, True),
+        (300, 2 ** 32 - 1, 65536, dt.datetime(2020, 1, 1), dt.datetime(2021, 1, 1), 7, False),
+    ],
+)
+def test_encoder_matches_pyasn1(invoke_id, cltu_id, size, earliest, latest, delay, notify):
+    cltu = _cltu()
+    data = bytes(i & 0xFF for i in range(size))
+
+    cltu._invoke_id = invoke_id
+    cltu._cltu_id = cltu_id
+    expected = cltu.encode_pdu(cltu._prepare_cltu_pdu(data, earliest, latest, delay, notify))
+
+    encoded = CltuTransferDataEncoder().encode(
+        invoke_id, cltu_id, data, earliest, latest, delay, notify
+    )
+    assert encoded == expected
+
+
+def test_encoder_matches_pyasn1_with_credentials():
+    cltu = _cltu()
+    cltu._auth_level = "all"
+    cltu._password = "pw"
+    credentials = cltu.make_credentials()
+
+    cltu.make_credentials = lambda: credentials
+    expected = cltu.encode_pdu(cltu._prepare_cltu_pdu(b"\x01\x02\x03"))
+    encoded = CltuTransferDataEncoder().encode(0, 0, b"\x01\x02\x03", credentials=credentials)
+    assert encoded == expected
+
+
+def test_encoder_rejects_out_of_range_values():
+    encoder = CltuTransferDataEncoder()
+    with pytest.raises(ValueError):
+        encoder.encode(65536, 0, b"\x00")
+    with pytest.raises(ValueError):
+        encoder.encode(0, 2 ** 32, b"\x00")
+    with pytest.raises(ValueError):
+        encoder.encode(0, 0, b"")
+    with pytest.raises(ValueError):
+        encoder.encode(0, 0, bytes(65537))
+
+
+def test_upload_cltu_sends_encoded_invocation():
+    cltu = _cltu()
+    sent = []
+    cltu.send = sent.append
+    cltu._cltu_id = 5
+
+    cltu.upload_cltu(b"\xeb\x90", notify=True)
+
+    cltu._invoke_id = 0
+    cltu._cltu_id = 5
+    assert sent == [cltu.encode_pdu(cltu._prepare_cltu_pdu(b"\xeb\x90", notify=True))]
+    assert cltu._cltu_id == 6
@@ -15,3 +15,211 @@ def test_generate_encoded_time():
     assert days == 10000
     assert ms == 3308
     assert us == 721
+
+
+def _tml_pdu(body):
+    return struct.pack(common.TML_HEADER_FORMAT, common.TML_SLE_TYPE, len(body)) + body
+
+
+def _tml_heartbeat():
+    return struct.pack(common.TML_CONTEXT_HB_FORMAT, common.TML_CONTEXT_HEARTBEAT_TYPE, 0)
+
+
+def test_tml_framer_split_across_reads():
+    bodies = [bytes([i]) * (10 * i + 1) for i in range(1, 8)]
+    stream = b"".join(_tml_pdu(b) for b in bodies[:3]) + _tml_heartbeat()
+    stream += b"".join(_tml_pdu(b) for b in bodies[3:])
+
+    framer = common.TMLFramer(16)
+    received = []
+    for i in range(0, len(stream), 7):
+        framer.feed(stream[i:i + 7])
+        received.extend(bytes(pdu) for pdu in framer.pdus())
+
+    assert received == bodies
+    assert len(framer) == 0
+
+
+def test_tml_framer_grows_for_large_pdu():
+    body = bytes(range(256)) * 40
+    framer = common.TMLFramer(64)
+    framer.feed(_tml_pdu(body))
+
+    assert [bytes(pdu) for pdu in framer.pdus()] == [body]
+    assert framer.capacity >= len(body)
+
+
+def test_tml_framer_recv_into():
+    class FakeSocket(object):
+        def __init__(self, data):
+            self._data = data
+
+        def recv_into(self, view):
+            n = min(len(view), len(self._data))
+            view[:n] = self._data[:n]
+            self._data = self._data[n:]
+            return n
+
+    bodies = [b"abc", b"defgh", b"i" * 100]
+    sock = FakeSocket(b"".join(_tml_pdu(b) for b in bodies))
+    framer = common.TMLFramer(32)
+
+    received = []
+    while framer.recv_into(sock):
+        received.extend(bytes(pdu) for pdu in framer.pdus())
+
+    assert received == bodies
+
+
+def test_tml_framer_rejects_unknown_header():
+    framer = common.TMLFramer(16)
+    framer.feed(struct.pack("!II", 0x05000000, 0))
+
+    with pytest.raises(ValueError):
+        list(framer.pdus())
+
+
+def _raf(**kwargs):
+    import ait.dsn.sle
+
+    return ait.dsn.sle.RAF(hostnames=["localhost"], port=5100, **kwargs)
+
+
+@pytest.mark.parametrize(
+    "policy,expected,counter",
+    [
+        ("drop_oldest", [b"2", b"3"], "dropped_oldest"),
+        ("drop_newest", [b"0", b"1"], "dropped_newest"),
+    ],
+)
+def test_data_queue_drop_policies(policy, expected, counter):
+    raf = _raf(data_queue_size=2, data_queue_policy=policy)
+    for i in range(4):
+        raf._enqueue_pdu(str(i).encode())
+
+    queued = [raf._data_queue.get_nowait() for _ in range(raf._data_queue.qsize())]
+    assert queued == expected
+    assert raf.data_queue_stats[counter] == 2
+
+
+def test_data_queue_rejects_unknown_policy():
+    with pytest.raises(ValueError):
+        _raf(data_queue_policy="spill")
+
+
+def test_data_processor_drains_queue():
+    import gevent
+
+    class Handler(object):
+        def __init__(self):
+            self._data_queue = gevent.queue.Queue(10)
+            self.handled = []
+
+        def decode(self, body):
+            return body.upper(), b""
+
+        def _handle_pdu(self, pdu):
+            self.handled.append(pdu)
+
+    handler = Handler()
+    worker = gevent.spawn(common.data_processor, handler)
+    for body in [b"a", b"b", b"c"]:
+        handler._data_queue.put(body)
+    gevent.sleep(0.01)
+    worker.kill()
+
+    assert handler.handled == [b"A", b"B", b"C"]
+
+
+def test_sle_instances_do_not_share_state():
+    import ait.dsn.sle
+
+    raf = _raf()
+    cltu = ait.dsn.sle.CLTU(hostnames=["localhost"], port=5100)
+
+    assert raf._handlers is not cltu._handlers
+    assert raf._data_queue is not cltu._data_queue
+    assert "CltuBindReturn" not in raf._handlers
+    assert len(raf._handlers["RafBindReturn"]) == 1
+
+    raf.invoke_id
+    assert cltu.invoke_id == 0
+
+
+def test_handle_pdu_dispatches_by_component_name():
+    from ait.dsn.sle.pdu.raf import RafProvidertoUserPdu
+
+    raf = _raf()
+    received = []
+    raf._handlers["RafTransferBuffer"] = [received.append]
+
+    pdu = RafProvidertoUserPdu()
+    pdu["rafTransferBuffer"].clear()
+    raf._handle_pdu(pdu)
+
+    assert received == [pdu]
+    assert common.pdu_handler_key("rafTransferBuffer") == "RafTransferBuffer"
+
+
+def _pyasn1_credentials(encoded_time, random_number, username, password):
+    ''' The credentials as encoded by building the pyasn1 objects '''
+    import hashlib
+
+    from pyasn1.codec.ber.encoder import encode
+    from pyasn1.codec.der.encoder import encode as der_encode
+
+    from ait.dsn.sle.pdu.common import HashInput, ISP1Credentials
+
+    hash_input = HashInput()
+    hash_input["time"] = encoded_time
+    hash_input["randomNumber"] = random_number
+    hash_input["username"] = username
+    hash_input["password"] = password
+
+    creds = ISP1Credentials()
+    creds["time"] = encoded_time
+    creds["randomNumber"] = random_number
+    creds["theProtected"] = hashlib.sha1(der_encode(hash_input)).digest()
+    return encode(creds)
+
+
+@pytest.mark.parametrize("random_number", [0, 127, 128, 65535, 2 ** 31 - 1])
+@pytest.mark.parametrize("username, password", [("LSE", "pw"), ("x" * 200, b"\x00" * 130)])
+def test_credentials_encoder_matches_pyasn1(random_number, username, password):
+    encoded_time = common.generate_encoded_time(dt.datetime(2021, 3, 4, 5, 6, 7, 890123))
+    encoder = common.CredentialsEncoder(username, password)
+
+    assert encoder.encode(encoded_time, random_number) == _pyasn1_credentials(
+        encoded_time, random_number, username, password
+    )
+
+
+def test_credentials_encoder_rejects_random_number_past_integer32():
+    encoded_time = common.generate_encoded_time(dt.datetime(2021, 3, 4, 5, 6, 7, 890123))
+    encoder = common.CredentialsEncoder("LSE", "pw")
+
+    with pytest.raises(ValueError):
+        encoder.encode(encoded_time, 2 ** 31)
+
+
+def test_credentials_encoder_follows_password_changes():
+    raf = _raf()
+    now = dt.datetime.utcnow()
+    first = raf._generate_encoded_credentials(now, 12345, "LSE", "old")
+    second = raf._generate_encoded_credentials(now, 12345, "LSE", "new")
+
+    assert first != second
+    assert second == _pyasn1_credentials(common.generate_encoded_time(now), 12345, "LSE", "new")
+    assert list(raf._credentials_encoders) == ["LSE"]
+
+
+def test_check_return_credentials():
+    from pyasn1.type import univ
+
+    raf = _raf()
+    creds = raf._generate_encoded_credentials(dt.datetime.utcnow(), 12345, "SSE", "peer")
+
+    assert raf._check_return_credentials(univ.OctetString(creds), "SSE", "peer")
+    assert not raf._check_return_credentials(univ.OctetString(creds), "SSE", "wrong")
+    assert not raf._check_return_credentials(univ.OctetString(creds[:-1] + b"\x00"), "SSE", "peer")
+    assert not raf._check_return_credentials(univ.OctetString(b"\x30\x00"), "SSE", "peer")
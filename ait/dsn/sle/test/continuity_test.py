@@ -0,0 +1,155 @@
+# Advanced Multi-Mission Operations System (AMMOS) Instrument Toolkit (AIT)
+# Bespoke Link to Instruments and Small Satellites (BLISS)
+#
+# Copyright 2017, by the California Institute of Technology. ALL RIGHTS
+# RESERVED. United States Government Sponsorship acknowledged. Any
+# commercial use must be negotiated with the Office of Technology Transfer
+# at the California Institute of Technology.
+#
+# This software may be subject to U.S. export control laws. By accepting
+# this software, the user agrees to comply with all applicable U.S. export
+# laws and regulations. User has the responsibility to obtain export licenses,
+# or other export authority as may be required before exporting such
+# information to foreign countries or providing access to foreign persons.
+import random
+
+import pytest
+
+from ait.dsn.sle.archive import FrameArchive, FrameArchiveReader
+from ait.dsn.sle.continuity import (
+    AOS_COUNT_MODULUS,
+    TM_COUNT_MODULUS,
+    ContinuityTracker,
+    FrameContinuity,
+    batch_continuity,
+)
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def _tm_header(scid, vcid, count):
+    return bytes([scid >> 4, (scid & 0x0F) << 4 | vcid << 1, 0, count & 0xFF, 0, 0])
+
+
+def _aos_header(scid, vcid, count, cycle=None):
+    signaling = 0 if cycle is None else 0x40 | cycle
+    count_bytes = (count & 0xFFFFFF).to_bytes(3, "big")
+    return bytes([0x40 | scid >> 2, (scid & 0x03) << 6 | vcid]) + count_bytes + bytes([signaling])
+
+
+def _aos_mcid(scid):
+    # AOS master channel IDs include the version number of 1
+    return 1 << 8 | scid
+
+
+def _stream(count, seed=0):
+    ''' AOS frame headers of two channels with losses, repeats and swaps '''
+    rng = random.Random(seed)
+    counts = {1: AOS_COUNT_MODULUS - 50, 2: 0}
+    headers = []
+    for _ in range(count):
+        vcid = rng.choice([1, 2])
+        counts[vcid] += 1 + (rng.randrange(1, 300) if rng.random() < 0.01 else 0)
+        headers.append(_aos_header(0x42, vcid, counts[vcid]))
+        if rng.random() < 0.01:
+            headers.append(headers[-1])
+        if rng.random() < 0.01 and len(headers) > 3:
+            headers[-1], headers[-3] = headers[-3], headers[-1]
+    return headers
+
+
+def test_tm_counts_wrap_and_classify():
+    tracker = ContinuityTracker("TMTransFrame")
+    statuses = [tracker.update_frame(_tm_header(0x1AB, 3, c)) for c in [254, 255, 0, 0, 4, 2, 5, 200]]
+    assert statuses == [
+        FrameContinuity.FIRST,
+        FrameContinuity.IN_SEQUENCE,
+        FrameContinuity.IN_SEQUENCE,
+        FrameContinuity.DUPLICATE,
+        FrameContinuity.GAP,
+        FrameContinuity.REORDER,
+        FrameContinuity.IN_SEQUENCE,
+        FrameContinuity.REORDER,
+    ]
+
+    metrics = tracker.metrics()[(0x1AB, 3)]
+    assert metrics["frames"] == 8
+    assert metrics["gaps"] == 1
+    assert metrics["missing"] == 3
+    assert metrics["duplicates"] == 1
+    assert metrics["reorders"] == 2
+    assert metrics["last_count"] == 5
+    assert metrics["gap_histogram"] == {2: 1}
+    # 2 arrived 2 behind 4, and 200 is 61 behind 5
+    assert metrics["reorder_histogram"] == {2: 1, 32: 1}
+
+
+def test_channels_are_tracked_separately():
+    tracker = ContinuityTracker("TMTransFrame")
+    tracker.update_frame(_tm_header(1, 0, 10))
+    tracker.update_frame(_tm_header(2, 0, 50))
+    tracker.update_frame(_tm_header(1, 1, 90))
+    assert tracker.update_frame(_tm_header(1, 0, 11)) is FrameContinuity.IN_SEQUENCE
+    assert tracker.update(2, 0, 51, TM_COUNT_MODULUS) is FrameContinuity.IN_SEQUENCE
+    assert sorted(tracker.metrics()) == [(1, 0), (1, 1), (2, 0)]
+
+    tracker.reset()
+    assert tracker.metrics() == {}
+
+
+def test_aos_counts_extend_with_cycle():
+    tracker = ContinuityTracker("AOSTransFrame")
+    assert tracker.update_frame(_aos_header(5, 7, 0xFFFFFF, cycle=2)) is FrameContinuity.FIRST
+    # The 24 bit count wraps into the next cycle
+    assert tracker.update_frame(_aos_header(5, 7, 0, cycle=3)) is FrameContinuity.IN_SEQUENCE
+    # Without the cycle the count would be back at the start of the range
+    assert tracker.update_frame(_aos_header(5, 7, 0x10, cycle=2)) is FrameContinuity.REORDER
+    assert tracker.metrics()[(_aos_mcid(5), 7)]["last_count"] == 3 << 24
+
+    with pytest.raises(ValueError):
+        ContinuityTracker("Unknown")
+
+
+@pytest.mark.skipif(numpy is None, reason="NumPy is not installed")
+def test_batch_agrees_with_streaming():
+    headers = _stream(20000)
+    tracker = ContinuityTracker("AOSTransFrame")
+    for header in headers:
+        tracker.update_frame(header)
+
+    batch = batch_continuity(numpy.frombuffer(b"".join(headers), dtype=numpy.uint8).reshape(-1, 6))
+    assert batch == tracker.metrics()
+    assert batch[(_aos_mcid(0x42), 1)]["gaps"] > 0
+    assert batch[(_aos_mcid(0x42), 1)]["reorders"] > 0
+    assert batch[(_aos_mcid(0x42), 1)]["duplicates"] > 0
+
+    tm = [_tm_header(9, 1, c) for c in list(range(250, 256)) + [3, 3, 1, 9]]
+    tracker = ContinuityTracker("TMTransFrame")
+    for header in tm:
+        tracker.update_frame(header)
+    assert batch_continuity(numpy.array([list(h) for h in tm], dtype=numpy.uint8), "TMTransFrame") == \
+        tracker.metrics()
+    assert batch_continuity(numpy.zeros((0, 6), dtype=numpy.uint8)) == {}
+
+
+@pytest.mark.skipif(numpy is None, reason="NumPy is not installed")
+def test_batch_over_archive(tmp_path):
+    headers = _stream(500, seed=1)
+    archive = FrameArchive(str(tmp_path), "AOSTransFrame", segment_size=4000, batch_size=500)
+    for i, header in enumerate(headers):
+        archive.add(header + bytes(i % 40), float(i))
+    archive.close()
+
+    reader = FrameArchiveReader(str(tmp_path))
+    assert len(reader.segments) > 1
+    archived = reader.frame_headers()
+    assert archived.shape == (len(headers), 6)
+    assert archived.tobytes() == b"".join(headers)
+
+    tracker = ContinuityTracker("AOSTransFrame")
+    for header in headers:
+        tracker.update_frame(header)
+    assert batch_continuity(archived) == tracker.metrics()
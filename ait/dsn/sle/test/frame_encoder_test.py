@@ -0,0 +1,204 @@
+# Advanced Multi-Mission Operations System (AMMOS) Instrument Toolkit (AIT)
+# Bespoke Link to Instruments and Small Satellites (BLISS)
+#
+# Copyright 2017, by the California Institute of Technology. ALL RIGHTS
+# RESERVED. United States Government Sponsorship acknowledged. Any
+# commercial use must be negotiated with the Office of Technology Transfer
+# at the California Institute of Technology.
+#
+# This software may be subject to U.S. export control laws. By accepting
+# this software, the user agrees to comply with all applicable U.S. export
+# laws and regulations. User has the responsibility to obtain export licenses,
+# or other export authority as may be required before exporting such
+# information to foreign countries or providing access to foreign persons.
+import socket
+
+import pytest
+
+import ait.dsn.sle.frames as frames
+from ait.dsn.sle.frame_encoder import (
+    IDLE_APID,
+    AOSFrameEncoder,
+    SyntheticDownlink,
+    TMFrameEncoder,
+)
+from ait.dsn.sle.frames import TMPacketSegment
+
+
+def _packet(apid, seq_count, data_len):
+    length = data_len - 1
+    header = bytes([0x08 | apid >> 8, apid & 0xFF, 0xC0 | seq_count >> 8, seq_count & 0xFF])
+    return header + length.to_bytes(2, "big") + bytes([seq_count & 0xFF]) * data_len
+
+
+def _packets(count):
+    return [_packet(1 + i % 3, i, 1 + (i * 37) % 90) for i in range(count)]
+
+
+def _apid(packet):
+    return (packet[0] & 0x07) << 8 | packet[1]
+
+
+def _reassemble_tm(frame_list, fecf_included=False):
+    packets, partial = [], None
+    for data in frame_list:
+        for segment, view in frames.iter_tm_packets(data, fecf_included):
+            if segment is TMPacketSegment.PACKET:
+                packets.append(bytes(view))
+            elif segment is TMPacketSegment.TRAILING_PARTIAL:
+                partial = bytes(view)
+            elif segment is TMPacketSegment.CONTINUATION:
+                partial += bytes(view)
+            else:
+                packets.append(partial + bytes(view))
+    return [p for p in packets if _apid(p) != IDLE_APID]
+
+
+def _reassemble_aos(frame_list, config):
+    stream, pointed = b"", []
+    for data in frame_list:
+        view = frames.AOSFrameView(data, config=config)
+        if view["mpdu_first_hdr_ptr"] != 0x7FF:
+            pointed.append(len(stream) + view["mpdu_first_hdr_ptr"])
+        stream += view["mpdu_packet_zone"]
+
+    packets, offsets, offset = [], [], 0
+    while offset + 6 <= len(stream):
+        length = (stream[offset + 4] << 8 | stream[offset + 5]) + 7
+        packets.append(stream[offset:offset + length])
+        offsets.append(offset)
+        offset += length
+
+    # Each first header pointer gives the first packet starting in its frame
+    assert set(pointed) <= set(offsets)
+    return [p for p in packets if _apid(p) != IDLE_APID]
+
+
+def test_tm_frames_carry_packets_in_order():
+    encoder = TMFrameEncoder(120, spacecraft_id=0x1AB, virtual_channel_id=5,
+                             ocf_included=True, fecf_included=True)
+    encoder.ocf = b"OCF!"
+    sent = _packets(40)
+    for packet in sent:
+        encoder.put(packet)
+
+    frame_list = []
+    while True:
+        data = encoder.encode(fill=True)
+        if data is None:
+            break
+        frame_list.append(data)
+
+    assert _reassemble_tm(frame_list, fecf_included=True) == sent
+    for count, data in enumerate(frame_list):
+        view = frames.TMFrameView(data)
+        assert view.spacecraft_id == 0x1AB
+        assert view.virtual_channel_id == 5
+        assert view.virtual_chan_frame_count == count
+        assert view.ocf_flag == 1
+        assert data[-6:-2] == b"OCF!"
+        assert frames.fecf_is_valid(data)
+
+    metrics = encoder.metrics()
+    assert metrics["frames"] == len(frame_list)
+    assert metrics["packets"] == 40
+    assert metrics["pending"] == 0
+
+
+def test_first_header_pointer_marks_next_packet():
+    encoder = TMFrameEncoder(6 + 20)
+    encoder.put(_packet(1, 0, 40))
+    encoder.put(_packet(1, 1, 3))
+
+    pointers = []
+    while encoder.pending:
+        data = encoder.encode(fill=True)
+        pointers.append(frames.TMFrameView(data).first_hdr_ptr)
+    # The 46 byte packet fills the first two frames and starts the third.
+    # The 5 bytes left in the third are too few for an idle packet, so the
+    # one filling them ends 2 bytes into a fourth frame.
+    assert pointers == [0, 0x7FF, 6, 2]
+
+
+def test_aos_frames_are_laid_out_by_config():
+    config = frames.AOSConfig(
+        virtual_channels={2: "m_pdu", 3: "vca_sdu"},
+        transfer_frame_insert_zone_len=3,
+        operational_control_field_included=True,
+        frame_error_control_field_included=True,
+    )
+    encoder = AOSFrameEncoder(100, spacecraft_id=0x42, virtual_channel_id=2, config=config)
+    sent = _packets(30)
+    for packet in sent:
+        encoder.put(packet)
+
+    buf = bytearray(100 * 50)
+    count = 0
+    while encoder.encode_into(buf, count * 100, fill=True):
+        count += 1
+    encoder.idle_frame_into(buf, count * 100)
+    frame_list = [bytes(buf[i * 100:(i + 1) * 100]) for i in range(count + 1)]
+
+    assert _reassemble_aos(frame_list[:-1], config) == sent
+    for i, data in enumerate(frame_list[:-1]):
+        view = frames.AOSFrameView(data, config=config)
+        assert view["spacecraft_id"] == 0x42
+        assert view.virtual_channel_id == 2
+        assert view["virtual_channel_frame_count"] == i.to_bytes(3, "big")
+        assert view["aos_data_field_type"] is frames.AOSDataFieldType.M_PDU
+        assert frames.fecf_is_valid(data)
+    assert frames.AOSFrameView(frame_list[-1], config=config).is_idle_frame
+
+    with pytest.raises(ValueError):
+        AOSFrameEncoder(100, virtual_channel_id=3, config=config)
+
+
+def test_frames_wait_for_packets_unless_filled():
+    encoder = TMFrameEncoder(64)
+    assert encoder.encode() is None
+    encoder.put(_packet(1, 0, 10))
+    assert encoder.encode() is None
+
+    data = encoder.encode(fill=True)
+    segments = list(frames.iter_tm_packets(data))
+    assert [s for s, _ in segments] == [TMPacketSegment.PACKET] * 2
+    assert _apid(bytes(segments[1][1])) == IDLE_APID
+    assert encoder.metrics()["idle_fill_bytes"] == 58 - 16
+
+
+def test_short_fill_spills_idle_packet_into_next_frame():
+    encoder = TMFrameEncoder(6 + 20)
+    encoder.put(_packet(1, 0, 11))
+    encoder.encode(fill=True)
+    # The 3 bytes left need a 7 byte idle packet
+    assert encoder.pending == 4
+
+    with pytest.raises(ValueError):
+        encoder.put(_packet(1, 0, 10)[:-1])
+
+
+def test_synthetic_downlink_counts_per_apid():
+    downlink = SyntheticDownlink(TMFrameEncoder(512), packet_len=100, apids=[10, 20])
+    buf = bytearray(512 * 20)
+    downlink.generate(buf, 20)
+
+    packets = _reassemble_tm([buf[i * 512:(i + 1) * 512] for i in range(20)])
+    for apid in (10, 20):
+        counts = [(p[2] & 0x3F) << 8 | p[3] for p in packets if _apid(p) == apid]
+        assert counts == list(range(len(counts)))
+    assert all(len(p) == 100 for p in packets)
+
+    source = downlink.frame_source()
+    assert len(source(0)) == 512
+
+
+def test_synthetic_downlink_sends_udp():
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver.bind(("127.0.0.1", 0))
+    receiver.settimeout(1)
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    downlink = SyntheticDownlink(TMFrameEncoder(256), packet_len=50)
+    assert downlink.send(sock, receiver.getsockname(), count=5, batch=2) == 5
+    received = [receiver.recv(1024) for _ in range(5)]
+    assert [frames.TMFrameView(d).virtual_chan_frame_count for d in received] == list(range(5))
@@ -0,0 +1,145 @@
+# Advanced Multi-Mission Operations System (AMMOS) Instrument Toolkit (AIT)
+# Bespoke Link to Instruments and Small Satellites (BLISS)
+#
+# Copyright 2017, by the California Institute of Technology. ALL RIGHTS
+# RESERVED. United States Government Sponsorship acknowledged. Any
+# commercial use must be negotiated with the Office of Technology Transfer
+# at the California Institute of Technology.
+#
+# This software may be subject to U.S. export control laws. By accepting
+# this software, the user agrees to comply with all applicable U.S. export
+# laws and regulations. User has the responsibility to obtain export licenses,
+# or other export authority as may be required before exporting such
+# information to foreign countries or providing access to foreign persons.
+import socket
+
+import pytest
+from pyasn1.codec.ber.encoder import encode
+
+import ait.dsn.sle
+import ait.dsn.sle.frames as frames
+from ait.dsn.sle.frame_output import FrameOutput, is_idle_aos_frame, is_idle_tm_frame
+from ait.dsn.sle.pdu import raf
+
+
+def _tm_frame(first_hdr_ptr, fill=0):
+    return bytes([0x12, 0x34, 0, 0, first_hdr_ptr >> 8, first_hdr_ptr & 0xFF]) + bytes([fill]) * 16
+
+
+def _aos_frame(vcid, fill=0):
+    return bytes([0x40, 0x40 | vcid, 0, 0, 1, 0]) + bytes([fill]) * 16
+
+
+def _transfer_buffer(frame_data):
+    pdu = raf.RafProvidertoUserPdu()
+    buf = pdu["rafTransferBuffer"]
+    for i, data in enumerate(frame_data):
+        frame = buf[i]["annotatedFrame"]
+        frame["invokerCredentials"]["unused"] = None
+        frame["earthReceiveTime"]["ccsdsFormat"] = bytes(8)
+        frame["antennaId"]["localForm"] = b"\x01"
+        frame["dataLinkContinuity"] = 0
+        frame["deliveredFrameQuality"] = 0
+        frame["privateAnnotation"]["null"] = None
+        frame["data"] = data
+    return encode(pdu)
+
+
+def _receiver():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(("127.0.0.1", 0))
+    sock.settimeout(1)
+    return sock
+
+
+def _receive(sock, count):
+    return [sock.recv(65536) for _ in range(count)]
+
+
+@pytest.mark.parametrize("first_hdr_ptr", [0, 0x7FE, 0x7FF, 0x7FE | 0x3800, 0x123])
+def test_tm_idle_check_matches_frame_decode(first_hdr_ptr):
+    data = _tm_frame(first_hdr_ptr)
+    tmf = frames.TMTransFrame()
+    tmf.decode(data)
+    assert is_idle_tm_frame(data) == tmf.is_idle_frame
+
+
+@pytest.mark.parametrize("vcid", [0, 1, 2, 62, 63])
+def test_aos_idle_check_matches_frame_decode(vcid):
+    data = _aos_frame(vcid)
+    assert is_idle_aos_frame(data) == frames.AOSTransFrame(data).is_idle_frame
+
+
+def test_frames_are_sent_to_every_destination_in_order():
+    receivers = [_receiver(), _receiver()]
+    output = FrameOutput("AOSTransFrame", [r.getsockname() for r in receivers])
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    sent = [_aos_frame(1, fill=i) for i in range(5)]
+    for data in sent[:2] + [_aos_frame(63)] + sent[2:]:
+        output.add(data)
+    assert output.metrics()["queued"] == 5
+
+    assert output.send(sock) == 10
+    for receiver in receivers:
+        assert _receive(receiver, 5) == sent
+
+    metrics = output.metrics()
+    assert metrics["frames_out"] == 10
+    assert metrics["idle_dropped"] == 1
+    assert metrics["batches"] == 1
+    assert metrics["queued"] == 0
+
+
+def test_send_errors_are_counted_per_destination():
+    class FailingSocket(object):
+        def __init__(self):
+            self.sent = []
+
+        def sendto(self, data, address):
+            if address[1] == 1:
+                raise socket.error("unreachable")
+            self.sent.append((data, address))
+
+    output = FrameOutput("TMTransFrame", ["localhost:1", "localhost:2"])
+    sock = FailingSocket()
+    output.add(_tm_frame(0))
+    output.add(_tm_frame(0))
+
+    assert output.send(sock) == 2
+    assert [address for _, address in sock.sent] == [("localhost", 2)] * 2
+    assert output.metrics()["send_errors"] == 1
+
+
+def test_destinations_are_validated():
+    assert FrameOutput("TMTransFrame", ["host:1", ("other", "2")]).destinations == [
+        ("host", 1),
+        ("other", 2),
+    ]
+    with pytest.raises(ValueError):
+        FrameOutput("TMTransFrame", [])
+    with pytest.raises(ValueError):
+        FrameOutput("TMTransFrame", ["nohost"])
+    with pytest.raises(ValueError):
+        FrameOutput("TMTransFrame", ["host:port"])
+
+
+@pytest.mark.parametrize("fast_decode", [True, False])
+def test_raf_sends_transfer_buffer_frames_as_one_batch(fast_decode):
+    receiver = _receiver()
+    raf_mngr = ait.dsn.sle.RAF(
+        hostnames=["localhost"],
+        port=5100,
+        fast_decode=fast_decode,
+        frame_output_destinations=[receiver.getsockname()],
+    )
+
+    sent = [_tm_frame(0, fill=i) for i in range(3)]
+    message = _transfer_buffer([sent[0], _tm_frame(0x7FE), sent[1], sent[2]])
+    raf_mngr._handle_pdu(raf_mngr.decode(message)[0])
+
+    assert _receive(receiver, 3) == sent
+    stats = raf_mngr.frame_output_stats
+    assert stats["frames_out"] == 3
+    assert stats["idle_dropped"] == 1
+    assert stats["batches"] == 1
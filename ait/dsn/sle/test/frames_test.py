@@ -11,15 +11,34 @@
 # laws and regulations. User has the responsibility to obtain export licenses,
 # or other export authority as may be required before exporting such
 # information to foreign countries or providing access to foreign persons.
+import mmap
 import os
+import random
+import tempfile
 import unittest
 
 import mock
 
 import ait.core
+import ait.dsn.sle.frames as frames
 from ait.dsn.sle.frames import AOSConfig
 from ait.dsn.sle.frames import AOSDataFieldType
 from ait.dsn.sle.frames import AOSTransFrame
+from ait.dsn.sle.frames import AOSFrameView
+from ait.dsn.sle.frames import TMFrameView
+from ait.dsn.sle.frames import TMPacketSegment
+from ait.dsn.sle.frames import TMTransFrame
+from ait.dsn.sle.frames import decode_aos_headers
+from ait.dsn.sle.frames import decode_frame_headers
+from ait.dsn.sle.frames import decode_tm_headers
+from ait.dsn.sle.frames import compute_fecf
+from ait.dsn.sle.frames import FecfCheck
+from ait.dsn.sle.frames import fecf_is_valid
+from ait.dsn.sle.frames import iter_tm_packets
+from ait.dsn.sle.frames import verify_fecf
+from ait.dsn.sle.frames import NO_FIRST_HDR_PTR
+from ait.dsn.sle.frames import numpy
+from ait.dsn.sle.utils import RateLimitedLog
 
 # Supress logging because noisy
 patcher = mock.patch("ait.core.log.info")
@@ -225,5 +244,353 @@ class AosTest(unittest.TestCase):
         self.assertIsNone(l_aos_cfg.get_data_field_type(100))
         self.assertIsNone(l_aos_cfg.get_data_field_type(-1))
 
+    def test_layout_matches_config(self):
+        layout = self.aos_cfg.layout
+        self.assertIs(self.aos_cfg.layout, layout)
+
+        self.assertEqual(layout.frame_header_error_control, slice(6, 8))
+        self.assertIsNone(layout.transfer_frame_insert_zone)
+        self.assertEqual(layout.data_field, slice(8, -6))
+        self.assertEqual(layout.operational_control_field, slice(-6, -2))
+        self.assertEqual(layout.frame_error_control_field, slice(-2, None))
+        self.assertEqual(len(layout.vc_types), 64)
+        self.assertEqual(layout.vc_types[2], AOSDataFieldType.M_PDU)
+        self.assertIsNone(layout.vc_types[5])
+        self.assertEqual(layout.vc_decoders[2], AOSTransFrame.decode_dataField_MPDU)
+
+        self.aos_cfg.vc_to_datafield_map[5] = AOSDataFieldType.VCA_SDU
+        self.assertIsNot(self.aos_cfg.compile_layout(), layout)
+        self.assertEqual(self.aos_cfg.layout.vc_types[5], AOSDataFieldType.VCA_SDU)
+
+    def test_undeclared_vc_logging_is_rate_limited(self):
+        frame_data = bytes.fromhex("7385000001110001" + "01234567" + "000003FF0880")
+        with mock.patch.object(frames, "_undeclared_vc_log", RateLimitedLog("info", 60)):
+            with mock.patch("ait.core.log.info") as info:
+                for _ in range(100):
+                    aos_frame = AOSTransFrame(config=self.aos_cfg, data=frame_data)
+        self.assertEqual(info.call_count, 1)
+        self.assertIn("aos_data_field_type", aos_frame)
+        self.assertIsNone(aos_frame["aos_data_field_type"])
+        self.assertEqual(aos_frame.data_field, bytes.fromhex("01234567"))
+
+    def test_rate_limited_log_reports_suppressed_messages(self):
+        log = RateLimitedLog("info", 10)
+        with mock.patch("ait.dsn.sle.utils.time.monotonic", side_effect=[0, 1, 2, 5, 11]):
+            with mock.patch("ait.core.log.info") as info:
+                logged = [log(key, "vc %d" % key) for key in (1, 1, 2, 1, 1)]
+        self.assertEqual(logged, [True, False, True, False, True])
+        self.assertEqual(
+            [c.args[0] for c in info.call_args_list],
+            ["vc 1", "vc 2", "vc 1 (2 similar messages suppressed)"],
+        )
+
     def test_reject_encode(self):
         pass
+
+
+class FrameViewTest(unittest.TestCase):
+    def setUp(self):
+        self.virt_chan_map = {1: "b_pdu", 2: "m_pdu", 3: "vca_sdu", 4: "idle"}
+        self.rand = random.Random(1234)
+
+    def _random_frames(self, count, size):
+        return [bytes(self.rand.getrandbits(8) for _ in range(size)) for _ in range(count)]
+
+    def _assert_matches(self, view, frame):
+        self.assertEqual(dict(view), dict(frame))
+        self.assertEqual(view.is_idle_frame, frame.is_idle_frame)
+        self.assertEqual(view.contains_data(), frame.contains_data())
+        self.assertEqual(view.data_field, frame.data_field)
+        self.assertEqual(view._data, frame._data)
+        self.assertEqual(view.virtual_channel, frame.virtual_channel)
+        self.assertEqual(view.master_channel_id, frame.master_channel_id)
+
+    def test_tm_view_matches_tm_frame(self):
+        for data in self._random_frames(500, 64):
+            # Steer some frames to idle, no-packet and short packet cases
+            data = bytearray(data)
+            choice = self.rand.randrange(4)
+            if choice == 0:
+                data[4] |= 0x07
+                data[5] = self.rand.choice([0xFE, 0xFF])
+            elif choice == 1:
+                data[4] &= 0x7F
+                data[10] = 0
+                data[11] = self.rand.randrange(64)
+            data = bytes(data)
+
+            frame = TMTransFrame()
+            frame.decode(data)
+            self._assert_matches(TMFrameView(data), frame)
+
+    def test_aos_view_matches_aos_frame(self):
+        configs = [
+            AOSConfig(virtual_channels=self.virt_chan_map),
+            AOSConfig(
+                virtual_channels=self.virt_chan_map,
+                frame_header_error_control_included=True,
+                transfer_frame_insert_zone_len=3,
+                operational_control_field_included=True,
+                frame_error_control_field_included=True,
+            ),
+            AOSConfig(virtual_channels=self.virt_chan_map, operational_control_field_included=True),
+        ]
+        for config in configs:
+            for data in self._random_frames(200, 48):
+                data = bytearray(data)
+                data[1] = (data[1] & 0xC0) | self.rand.choice([0, 1, 2, 3, 4, 5, 63])
+                data = bytes(data)
+
+                self._assert_matches(
+                    AOSFrameView(data, config=config), AOSTransFrame(data, config=config)
+                )
+
+    def test_undeclared_vc_data_field_type_is_none(self):
+        config = AOSConfig(virtual_channels=self.virt_chan_map)
+        # Spacecraft 0xCE on virtual channel 9, which is not configured
+        data = bytes.fromhex("7389000001110001" + "01234567" + "000003FF0880")
+        frame = AOSTransFrame(data, config=config)
+        view = AOSFrameView(data, config=config)
+
+        self.assertEqual(frame.virtual_channel, 9)
+        self.assertIn("aos_data_field_type", frame)
+        self.assertIsNone(frame["aos_data_field_type"])
+        self.assertIsNone(view["aos_data_field_type"])
+
+    def test_view_attributes_do_not_copy(self):
+        data = bytearray(bytes.fromhex("4082000001000000") + bytes(range(16)))
+        view = AOSFrameView(data, config=AOSConfig(virtual_channels=self.virt_chan_map))
+
+        self.assertEqual(view.aos_data_field_type, AOSDataFieldType.M_PDU)
+        self.assertIsInstance(view.mpdu_packet_zone, memoryview)
+        data[8] = 0xFF
+        self.assertEqual(view.mpdu_packet_zone[0], 0xFF)
+        self.assertIsInstance(view["mpdu_packet_zone"], bytes)
+
+        with self.assertRaises(KeyError):
+            view["bpdu_data_zone"]
+        self.assertNotIn("bpdu_data_zone", view)
+        self.assertFalse(hasattr(view, "__dict__"))
+
+class TMPacketTest(unittest.TestCase):
+    def _packet(self, apid, data_len):
+        length = data_len - 1
+        return bytes([0x08 | apid >> 8, apid & 0xFF, 0xC0, 0, length >> 8, length & 0xFF]) + bytes(
+            [apid & 0xFF]
+        ) * data_len
+
+    def _frame(self, first_hdr_ptr, data_field, ocf=False, sec_header=b""):
+        flags = 0x80 if sec_header else 0
+        header = bytes([0x12, 0x34 | ocf, 7, 9, flags | first_hdr_ptr >> 8, first_hdr_ptr & 0xFF])
+        return header + sec_header + data_field
+
+    def test_packets_and_partials_are_reported(self):
+        whole = [self._packet(1, 10), self._packet(2, 3)]
+        trailing = self._packet(3, 20)[:12]
+        data = self._frame(4, b"\xAA" * 4 + whole[0] + whole[1] + trailing)
+
+        segments = list(iter_tm_packets(data))
+        self.assertEqual(
+            [(kind, bytes(view)) for kind, view in segments],
+            [
+                (TMPacketSegment.LEADING_PARTIAL, b"\xAA" * 4),
+                (TMPacketSegment.PACKET, whole[0]),
+                (TMPacketSegment.PACKET, whole[1]),
+                (TMPacketSegment.TRAILING_PARTIAL, trailing),
+            ],
+        )
+        for _, view in segments:
+            self.assertIs(view.obj, data)
+
+        frame = TMTransFrame()
+        frame.decode(data)
+        self.assertEqual(
+            [bytes(v) for _, v in frame.iter_packets()], [bytes(v) for _, v in segments]
+        )
+        self.assertEqual(list(TMTransFrame().iter_packets()), [])
+
+    def test_truncated_header_is_trailing_partial(self):
+        data = self._frame(0, self._packet(1, 4) + b"\x08\x01\xC0")
+        self.assertEqual(
+            [kind for kind, _ in TMFrameView(data).iter_packets()],
+            [TMPacketSegment.PACKET, TMPacketSegment.TRAILING_PARTIAL],
+        )
+
+    def test_data_field_excludes_headers_and_trailers(self):
+        packet = self._packet(5, 6)
+        data = self._frame(0, packet + b"OCF!" + b"CR", ocf=True, sec_header=b"\x01\xFF")
+        self.assertEqual(
+            [(kind, bytes(view)) for kind, view in iter_tm_packets(data, fecf_included=True)],
+            [(TMPacketSegment.PACKET, packet)],
+        )
+
+    def test_special_first_header_pointers(self):
+        self.assertEqual(list(iter_tm_packets(self._frame(0x7FE, bytes(16)))), [])
+        self.assertEqual(
+            [(kind, bytes(view)) for kind, view in iter_tm_packets(self._frame(0x7FF, b"x" * 16))],
+            [(TMPacketSegment.CONTINUATION, b"x" * 16)],
+        )
+        # A first header pointer past the data field leaves only a partial
+        self.assertEqual(
+            [kind for kind, _ in iter_tm_packets(self._frame(40, bytes(16)))],
+            [TMPacketSegment.LEADING_PARTIAL],
+        )
+
+
+@unittest.skipIf(numpy is None, "NumPy is not installed")
+class FrameBatchTest(unittest.TestCase):
+    def setUp(self):
+        self.virt_chan_map = {1: "b_pdu", 2: "m_pdu", 3: "vca_sdu", 4: "idle", 5: "m_pdu"}
+        self.rand = random.Random(4321)
+
+    def _buffer(self, count, size, vcids=None):
+        buf = bytearray(self.rand.getrandbits(8) for _ in range(count * size))
+        if vcids:
+            for i in range(count):
+                buf[i * size + 1] = (buf[i * size + 1] & 0xC0) | self.rand.choice(vcids)
+        return bytes(buf)
+
+    def test_aos_batch_matches_aos_frame(self):
+        configs = [
+            AOSConfig(virtual_channels=self.virt_chan_map),
+            AOSConfig(
+                virtual_channels=self.virt_chan_map,
+                frame_header_error_control_included=True,
+                transfer_frame_insert_zone_len=3,
+                operational_control_field_included=True,
+                frame_error_control_field_included=True,
+            ),
+            AOSConfig(virtual_channels=self.virt_chan_map, frame_error_control_field_included=True),
+        ]
+        size = 40
+        for config in configs:
+            buf = self._buffer(300, size, vcids=[0, 1, 2, 3, 4, 5, 6, 63])
+            headers = decode_aos_headers(buf, size, config=config)
+            self.assertEqual(len(headers), 300)
+
+            for i, record in enumerate(headers):
+                frame = AOSTransFrame(buf[i * size:(i + 1) * size], config=config)
+                for key in (
+                    "master_channel_id",
+                    "version",
+                    "spacecraft_id",
+                    "virtual_channel_id",
+                    "replay_flag",
+                    "virtual_channel_frame_count_cycle_use_flag",
+                    "virtual_channel_frame_count_cycle",
+                ):
+                    self.assertEqual(record[key], frame[key])
+                self.assertEqual(
+                    record["virtual_channel_frame_count"],
+                    int.from_bytes(frame["virtual_channel_frame_count"], "big"),
+                )
+                self.assertEqual(record["is_idle"], frame.is_idle_frame)
+                self.assertEqual(
+                    record["mpdu_first_hdr_ptr"], frame.get("mpdu_first_hdr_ptr", NO_FIRST_HDR_PTR)
+                )
+                if frame.is_idle_frame:
+                    # The scalar decoder stops at the header of idle frames
+                    continue
+                if config.operational_control_field_included:
+                    self.assertEqual(
+                        record["operational_control_field"],
+                        int.from_bytes(frame["operational_control_field"], "big"),
+                    )
+                if config.frame_error_control_field_included:
+                    self.assertEqual(
+                        record["frame_error_control_field"],
+                        int.from_bytes(frame["frame_error_control_field"], "big"),
+                    )
+
+    def test_tm_batch_matches_tm_frame(self):
+        size = 24
+        buf = bytearray(self._buffer(300, size))
+        for i in range(0, 300, 3):
+            buf[i * size + 4] |= 0x07
+            buf[i * size + 5] = 0xFE
+        buf = bytes(buf)
+
+        headers = decode_frame_headers(buf, size, frame_type="TMTransFrame")
+        for i, record in enumerate(headers):
+            frame = TMTransFrame()
+            frame.decode(buf[i * size:(i + 1) * size])
+            for key in TMFrameView._HEADER_KEYS:
+                self.assertEqual(record[key], frame[key])
+            self.assertEqual(record["is_idle"], frame.is_idle_frame)
+
+    def test_batch_accepts_mmap_and_arrays(self):
+        size = 32
+        buf = self._buffer(50, size, vcids=[2, 63])
+        expected = decode_aos_headers(buf, size)
+
+        array = numpy.frombuffer(buf, dtype=numpy.uint8).reshape(-1, size)
+        self.assertTrue(numpy.array_equal(decode_aos_headers(array, size), expected))
+
+        with tempfile.TemporaryFile() as f:
+            f.write(buf)
+            f.flush()
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            headers = decode_aos_headers(mapped, size)
+            self.assertTrue(numpy.array_equal(headers, expected))
+            del headers
+            mapped.close()
+
+    def test_batch_rejects_bad_buffers(self):
+        with self.assertRaises(ValueError):
+            decode_aos_headers(bytes(33), 32)
+        with self.assertRaises(ValueError):
+            decode_tm_headers(bytes(10), 5)
+        with self.assertRaises(ValueError):
+            decode_frame_headers(bytes(32), 32, frame_type="Unknown")
+
+
+class FecfTest(unittest.TestCase):
+    def _frame(self, vcid, corrupt=False):
+        data = bytes([0x40, 0x40 | vcid, 0, 0, 1, 0]) + os.urandom(26)
+        fecf = compute_fecf(data) ^ (1 if corrupt else 0)
+        return data + fecf.to_bytes(2, "big")
+
+    def test_compute_fecf(self):
+        # CRC-16-CCITT check value
+        self.assertEqual(compute_fecf(b"123456789"), 0x29B1)
+
+        data = self._frame(1)
+        self.assertTrue(fecf_is_valid(data))
+        self.assertTrue(fecf_is_valid(memoryview(data)))
+        self.assertFalse(fecf_is_valid(self._frame(1, corrupt=True)))
+        self.assertFalse(fecf_is_valid(b"\x00\x00"))
+
+    def test_check_requires_fecf_field(self):
+        with self.assertRaises(ValueError):
+            AOSConfig(frame_error_control_field_check=True)
+
+    def test_check_drops_bad_frames_of_checked_vcs(self):
+        config = AOSConfig(frame_error_control_field_included=True,
+                           frame_error_control_field_check=[1])
+        self.assertEqual(config.layout.vc_fecf_checks[:3], (False, True, False))
+
+        check = FecfCheck("AOSTransFrame", config)
+        self.assertTrue(check.check(self._frame(1)))
+        self.assertFalse(check.check(self._frame(1, corrupt=True)))
+        self.assertTrue(check.check(self._frame(2, corrupt=True)))
+        self.assertEqual(check.metrics(), {"checked": 2, "failed": 1, "failed_by_vc": {1: 1}})
+
+        self.assertFalse(FecfCheck("AOSTransFrame").enabled)
+        self.assertTrue(FecfCheck("TMTransFrame", frame_error_control_field_check=True).enabled)
+
+    @unittest.skipIf(numpy is None, "NumPy is not installed")
+    def test_batch_check_matches_single_frame_check(self):
+        config = AOSConfig(frame_error_control_field_included=True,
+                           frame_error_control_field_check=True)
+        data = [self._frame(random.choice([1, 2]), corrupt=random.random() < 0.3)
+                for _ in range(100)]
+
+        single = FecfCheck("AOSTransFrame", config)
+        expected = [single.check(d) for d in data]
+
+        batch = FecfCheck("AOSTransFrame", config)
+        self.assertEqual(batch.check_batch(b"".join(data), 34).tolist(), expected)
+        self.assertEqual(batch.metrics(), single.metrics())
+
+        select = numpy.zeros(100, dtype=bool)
+        self.assertTrue(verify_fecf(b"".join(data), 34, select).all())
@@ -0,0 +1,144 @@
+# Advanced Multi-Mission Operations System (AMMOS) Instrument Toolkit (AIT)
+# Bespoke Link to Instruments and Small Satellites (BLISS)
+#
+# Copyright 2017, by the California Institute of Technology. ALL RIGHTS
+# RESERVED. United States Government Sponsorship acknowledged. Any
+# commercial use must be negotiated with the Office of Technology Transfer
+# at the California Institute of Technology.
+#
+# This software may be subject to U.S. export control laws. By accepting
+# this software, the user agrees to comply with all applicable U.S. export
+# laws and regulations. User has the responsibility to obtain export licenses,
+# or other export authority as may be required before exporting such
+# information to foreign countries or providing access to foreign persons.
+import ait.dsn.sle.frames as frames
+from ait.dsn.sle.frame_encoder import IDLE_APID, AOSFrameEncoder
+from ait.dsn.sle.frames import TMPacketSegment
+from ait.dsn.sle.mpdu import (
+    AOS_FIRST_HDR_PTR_IDLE,
+    AOS_FIRST_HDR_PTR_NO_PKTS,
+    MPDUReassembler,
+    iter_mpdu_packets,
+)
+
+
+def _packet(apid, seq_count, data_len):
+    header = bytes([0x08 | apid >> 8, apid & 0xFF, 0xC0 | seq_count >> 8, seq_count & 0xFF])
+    return header + (data_len - 1).to_bytes(2, "big") + bytes([seq_count & 0xFF]) * data_len
+
+
+def _packets(count):
+    # Packets of up to 300 bytes, so some span several 128 byte frames
+    return [_packet(1 + i % 3, i, 1 + (i * 53) % 300) for i in range(count)]
+
+
+def _frames(packets, scid=0x42):
+    # Virtual channel 2 carries M_PDUs in the test config
+    encoder = AOSFrameEncoder(128, spacecraft_id=scid, virtual_channel_id=2)
+    for packet in packets:
+        encoder.put(packet)
+    out = []
+    while True:
+        frame = encoder.encode(fill=bool(encoder.pending))
+        if frame is None:
+            return out
+        out.append(frame)
+
+
+def _without_idle(packets):
+    return [p for p in packets if (p[0] & 0x07) << 8 | p[1] != IDLE_APID]
+
+
+def _mpdu(frame):
+    view = frames.AOSFrameView(frame)
+    count = int.from_bytes(view["virtual_channel_frame_count"], "big")
+    channel = (view.master_channel_id, view.virtual_channel)
+    return channel, view.mpdu_first_hdr_ptr, view.mpdu_packet_zone, count
+
+
+def test_iter_mpdu_packets_segments():
+    first, second = _packet(1, 0, 10), _packet(2, 1, 40)
+    zone = b"tail" + first + second[:20]
+    segments = [(segment, bytes(view)) for segment, view in iter_mpdu_packets(zone, 4)]
+    assert segments == [
+        (TMPacketSegment.LEADING_PARTIAL, b"tail"),
+        (TMPacketSegment.PACKET, first),
+        (TMPacketSegment.TRAILING_PARTIAL, second[:20]),
+    ]
+
+    # Packets are sliced from the zone, and viewed in place in a memoryview
+    assert all(isinstance(view, bytes) for _, view in iter_mpdu_packets(zone, 4))
+    views = [view for _, view in iter_mpdu_packets(memoryview(zone), 4)]
+    assert all(isinstance(view, memoryview) for view in views)
+    assert [bytes(view) for view in views] == [data for _, data in segments]
+
+    # A header cut short is a trailing partial, and idle fill ends the walk
+    assert [s for s, _ in iter_mpdu_packets(first + second[:3], 0)] == \
+        [TMPacketSegment.PACKET, TMPacketSegment.TRAILING_PARTIAL]
+    assert [bytes(v) for _, v in iter_mpdu_packets(first + b"\xe0" * 50, 0)] == [first]
+
+    assert [s for s, _ in iter_mpdu_packets(zone, AOS_FIRST_HDR_PTR_NO_PKTS)] == \
+        [TMPacketSegment.CONTINUATION]
+    assert list(iter_mpdu_packets(zone, AOS_FIRST_HDR_PTR_IDLE)) == []
+    assert list(iter_mpdu_packets(b"", 0)) == []
+
+
+def test_reassembler_returns_every_packet():
+    packets = _packets(200)
+    reassembler = MPDUReassembler()
+    out = []
+    for frame in _frames(packets):
+        out.extend(bytes(p) for p in reassembler.add(*_mpdu(frame)))
+
+    # The last frame was filled with an idle packet
+    assert _without_idle(out) == packets
+    metrics = reassembler.metrics()
+    assert metrics["packets"] == len(packets) + 1
+    assert metrics["reassembled_packets"] > 0
+    assert metrics["dropped_partials"] == 0
+    assert metrics["pending"] == 0
+
+
+def test_reassembler_keeps_channels_apart():
+    ones, twos = _packets(60), _packets(90)[30:]
+    mixed = []
+    for one, two in zip(_frames(ones, scid=1), _frames(twos, scid=2)):
+        mixed += [one, two]
+
+    reassembler = MPDUReassembler()
+    out = {}
+    for frame in mixed:
+        channel, first_hdr_ptr, zone, count = _mpdu(frame)
+        packets = reassembler.add(channel, first_hdr_ptr, zone, count)
+        out.setdefault(channel[0] & 0xFF, []).extend(bytes(p) for p in packets)
+
+    assert _without_idle(out[1]) == ones
+    assert _without_idle(out[2]) == twos[:len(_without_idle(out[2]))]
+    assert reassembler.metrics()["dropped_partials"] == 0
+
+
+def test_reassembler_drops_packets_cut_by_lost_frames():
+    packets = _packets(200)
+    frame_list = _frames(packets)
+    lost = next(i for i, f in enumerate(frame_list) if _mpdu(f)[1] == AOS_FIRST_HDR_PTR_NO_PKTS)
+    del frame_list[lost]
+
+    reassembler = MPDUReassembler()
+    out = []
+    for frame in frame_list:
+        out.extend(bytes(p) for p in reassembler.add(*_mpdu(frame)))
+
+    # Only the packet spanning the lost frame is missing
+    out = _without_idle(out)
+    assert set(out) < set(packets)
+    assert len(out) == len(packets) - 1
+    assert reassembler.metrics()["dropped_partials"] >= 1
+
+    # Without frame counts the first header pointer catches the mismatch
+    reassembler = MPDUReassembler()
+    out = []
+    for frame in frame_list:
+        channel, first_hdr_ptr, zone, _ = _mpdu(frame)
+        out.extend(bytes(p) for p in reassembler.add(channel, first_hdr_ptr, zone))
+    assert _without_idle(out) == [p for p in packets if p in out]
+    assert len(_without_idle(out)) == len(packets) - 1
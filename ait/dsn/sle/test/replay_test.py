@@ -0,0 +1,105 @@
+# Advanced Multi-Mission Operations System (AMMOS) Instrument Toolkit (AIT)
+# Bespoke Link to Instruments and Small Satellites (BLISS)
+#
+# Copyright 2017, by the California Institute of Technology. ALL RIGHTS
+# RESERVED. United States Government Sponsorship acknowledged. Any
+# commercial use must be negotiated with the Office of Technology Transfer
+# at the California Institute of Technology.
+#
+# This software may be subject to U.S. export control laws. By accepting
+# this software, the user agrees to comply with all applicable U.S. export
+# laws and regulations. User has the responsibility to obtain export licenses,
+# or other export authority as may be required before exporting such
+# information to foreign countries or providing access to foreign persons.
+import socket
+
+import pytest
+
+import ait.dsn.sle.frames as frames
+from ait.dsn.sle.frame_encoder import SyntheticDownlink, TMFrameEncoder
+from ait.dsn.sle.replay import FrameReplay
+
+
+def _frames(count, frame_len=128):
+    buf = bytearray(frame_len * count)
+    SyntheticDownlink(TMFrameEncoder(frame_len), packet_len=40).generate(buf, count)
+    return [bytes(buf[i * frame_len:(i + 1) * frame_len]) for i in range(count)]
+
+
+def test_fixed_length_frames_are_views_into_file(tmp_path):
+    sent = _frames(10)
+    path = tmp_path / "frames.bin"
+    path.write_bytes(b"".join(sent) + b"\x00" * 5)
+
+    with FrameReplay(str(path), 128) as replay:
+        assert len(replay) == 10
+        assert replay.truncated == 1
+        received = []
+        for frame in replay:
+            assert isinstance(frame, memoryview)
+            received.append(frame.tobytes())
+            del frame
+    assert received == sent
+
+
+def test_length_prefixed_records(tmp_path):
+    sent = [b"\x01" * 10, b"", b"\x02" * 300]
+    path = tmp_path / "frames.dat"
+    path.write_bytes(b"".join(len(f).to_bytes(4, "big") + f for f in sent) + b"\x00\x00\x00\x09abc")
+
+    with FrameReplay(str(path), record_format="u32") as replay:
+        stats = replay.replay(lambda f: None)
+        assert [f.tobytes() for f in replay] == sent
+    assert stats["frames"] == 3
+    assert stats["bytes"] == 310
+    assert stats["truncated"] == 1
+
+    with pytest.raises(ValueError):
+        FrameReplay(str(path), record_format="u8")
+    with pytest.raises(ValueError):
+        FrameReplay(str(path))
+
+
+def test_replay_decodes_and_paces(tmp_path):
+    path = tmp_path / "frames.bin"
+    path.write_bytes(b"".join(_frames(20)))
+
+    counts = []
+    with FrameReplay(str(path), 128) as replay:
+        stats = replay.replay(lambda f: counts.append(f.virtual_chan_frame_count),
+                              frames.TMFrameView, speed=2, frame_rate=200)
+        with pytest.raises(ValueError):
+            replay.replay(lambda f: None, speed=1)
+        limited = replay.replay(lambda f: None, limit=5)
+
+    assert counts == list(range(20))
+    # 20 frames at twice 200 frames/s take 50 ms
+    assert stats["elapsed"] >= 0.045
+    assert stats["stages"]["pace"] > 0
+    assert stats["stages"]["decode"] > 0
+    assert limited["frames"] == 5
+    assert "frames/s" in FrameReplay.report(stats)
+
+
+def test_replay_over_udp(tmp_path):
+    sent = _frames(5)
+    path = tmp_path / "frames.bin"
+    path.write_bytes(b"".join(sent))
+
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver.bind(("127.0.0.1", 0))
+    receiver.settimeout(1)
+
+    with FrameReplay(str(path), 128) as replay:
+        stats = replay.to_udp(receiver.getsockname())
+    assert stats["send_errors"] == 0
+    assert [receiver.recv(1024) for _ in range(5)] == sent
+
+
+def test_empty_file(tmp_path):
+    path = tmp_path / "empty.bin"
+    path.write_bytes(b"")
+
+    with FrameReplay(str(path), 128) as replay:
+        assert len(replay) == 0
+        assert replay.replay(lambda f: None)["frames"] == 0
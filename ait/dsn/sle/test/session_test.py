@@ -0,0 +1,114 @@
+# Advanced Multi-Mission Operations System (AMMOS) Instrument Toolkit (AIT)
+# Bespoke Link to Instruments and Small Satellites (BLISS)
+#
+# Copyright 2017, by the California Institute of Technology. ALL RIGHTS
+# RESERVED. United States Government Sponsorship acknowledged. Any
+# commercial use must be negotiated with the Office of Technology Transfer
+# at the California Institute of Technology.
+#
+# This software may be subject to U.S. export control laws. By accepting
+# this software, the user agrees to comply with all applicable U.S. export
+# laws and regulations. User has the responsibility to obtain export licenses,
+# or other export authority as may be required before exporting such
+# information to foreign countries or providing access to foreign persons.
+import socket
+import struct
+
+import gevent
+
+import ait.dsn.sle
+import ait.dsn.sle.common as common
+from ait.dsn.sle.session import SessionManager
+
+
+def _session_raf(session, **kwargs):
+    raf = ait.dsn.sle.RAF(hostnames=["localhost"], port=5100, **kwargs)
+    return session.add(raf)
+
+
+def test_add_shares_telemetry_socket():
+    session = SessionManager()
+    first = _session_raf(session)
+    second = _session_raf(session)
+
+    assert first._telem_sock is second._telem_sock
+    assert session.services == [first, second]
+
+
+def test_decoder_round_robins_associations(monkeypatch):
+    session = SessionManager(quantum=2)
+    busy = _session_raf(session)
+    quiet = _session_raf(session)
+    for raf in (busy, quiet):
+        session.attach(raf)
+
+    order = []
+    monkeypatch.setattr(
+        common, "decode_and_handle", lambda handler, body: order.append(body) or True
+    )
+
+    for i in range(6):
+        busy._data_queue.put(b"busy%d" % i)
+    quiet._data_queue.put(b"quiet0")
+
+    session._work.set()
+    worker = gevent.spawn(session._decode_loop)
+    gevent.sleep(0.01)
+    worker.kill()
+
+    assert order[:3] == [b"busy0", b"busy1", b"quiet0"]
+    assert len(order) == 7
+
+    metrics = session.metrics()
+    assert metrics["pdus_decoded"] == 7
+    assert [a["pdus_decoded"] for a in metrics["associations"]] == [6, 1]
+
+
+def test_reader_frames_and_decodes_pdus(monkeypatch):
+    decoded = []
+    monkeypatch.setattr(
+        common, "decode_and_handle", lambda handler, body: decoded.append(body) or True
+    )
+
+    session = SessionManager(poll_interval=0.01)
+    raf = _session_raf(session)
+    raf._socket, provider = socket.socketpair()
+    session.attach(raf)
+    session.start()
+
+    for body in [b"one", b"three"]:
+        provider.sendall(struct.pack("!II", common.TML_SLE_TYPE, len(body)) + body)
+    gevent.sleep(0.05)
+
+    assert decoded == [b"one", b"three"]
+    assert session.metrics()["pdus_received"] == 2
+
+    provider.close()
+    gevent.sleep(0.05)
+    assert session.metrics()["associations"] == []
+    assert session.metrics()["bytes_received"] == 24
+    assert raf._socket.fileno() == -1
+    assert raf._state == "unbound"
+
+    session.stop()
+
+
+def test_reader_closes_socket_on_framing_error(monkeypatch):
+    monkeypatch.setattr(common, "decode_and_handle", lambda handler, body: True)
+
+    session = SessionManager(poll_interval=0.01)
+    raf = _session_raf(session)
+    raf._socket, provider = socket.socketpair()
+    raf._state = "active"
+    session.attach(raf)
+    session.start()
+
+    provider.sendall(struct.pack("!II", 0xBAD, 4) + b"junk")
+    gevent.sleep(0.05)
+
+    assert session.metrics()["associations"] == []
+    assert raf._socket.fileno() == -1
+    assert raf._state == "unbound"
+
+    provider.close()
+    session.stop()
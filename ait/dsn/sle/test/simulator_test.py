@@ -0,0 +1,103 @@
+# Advanced Multi-Mission Operations System (AMMOS) Instrument Toolkit (AIT)
+# Bespoke Link to Instruments and Small Satellites (BLISS)
+#
+# Copyright 2017, by the California Institute of Technology. ALL RIGHTS
+# RESERVED. United States Government Sponsorship acknowledged. Any
+# commercial use must be negotiated with the Office of Technology Transfer
+# at the California Institute of Technology.
+#
+# This software may be subject to U.S. export control laws. By accepting
+# this software, the user agrees to comply with all applicable U.S. export
+# laws and regulations. User has the responsibility to obtain export licenses,
+# or other export authority as may be required before exporting such
+# information to foreign countries or providing access to foreign persons.
+import time
+
+import gevent
+from pyasn1.codec.ber.decoder import decode
+
+import ait.dsn.sle
+import ait.dsn.sle.common as common
+from ait.dsn.sle.pdu.raf import RafProvidertoUserPdu
+from ait.dsn.sle.simulator import ProviderSimulator, tm_frame_source
+
+
+def _connect(cls, sim, **kwargs):
+    instance = cls(hostnames=["127.0.0.1"], port=sim.server_port, **kwargs)
+    # Config values take precedence over keyword arguments
+    instance._hostnames = ["127.0.0.1"]
+    instance._port = sim.server_port
+    instance.connect()
+    return instance
+
+
+def _wait_for(condition, timeout=2):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline
+        gevent.sleep(0.01)
+
+
+def test_transfer_buffer_template_patches_frames():
+    sim = ProviderSimulator(frames_per_buffer=3, frame_size=32)
+    msg, ert_offsets, data_offsets = sim.transfer_buffer_template()
+
+    source = tm_frame_source(32, spacecraft_id=250)
+    for i, (ert_offset, data_offset) in enumerate(zip(ert_offsets, data_offsets)):
+        msg[ert_offset:ert_offset + 8] = bytes([i]) * 8
+        msg[data_offset:data_offset + 32] = source(i)
+
+    pdu = decode(bytes(msg[common.TML_HEADER_LEN:]), asn1Spec=RafProvidertoUserPdu())[0]
+    frames = [f["annotatedFrame"] for f in pdu["rafTransferBuffer"]]
+    assert [f["earthReceiveTime"]["ccsdsFormat"].asOctets() for f in frames] == [
+        bytes([i]) * 8 for i in range(3)
+    ]
+    assert [f["data"].asOctets() for f in frames] == [source(i) for i in range(3)]
+
+
+def test_raf_association_lifecycle():
+    sim = ProviderSimulator(frame_rate=500, frames_per_buffer=2)
+    sim.start()
+
+    raf = _connect(ait.dsn.sle.RAF, sim)
+    received = []
+    raf.add_handler("AnnotatedFrame", received.append)
+
+    raf.bind()
+    _wait_for(lambda: raf._state == "ready")
+    raf.start(None, None)
+    _wait_for(lambda: len(received) >= 10)
+
+    raf.stop()
+    _wait_for(lambda: raf._state == "ready")
+    raf.unbind()
+    _wait_for(lambda: raf._state == "unbound")
+
+    raf.disconnect()
+    sim.stop()
+
+
+def test_cltu_returns_in_order():
+    sim = ProviderSimulator(service="cltu", cltu_return_delay=0.001, uplink_bit_rate=1e6)
+    sim.start()
+
+    cltu = _connect(ait.dsn.sle.CLTU, sim)
+    returns = []
+    cltu.add_handler("CltuTransferDataReturn", returns.append)
+
+    cltu.bind(inst_id="sagr=LSE-SSC.spack=Test.fsl-fg=1.cltu=cltu1")
+    _wait_for(lambda: cltu._state == "ready")
+    cltu.start()
+    _wait_for(lambda: cltu._state == "active")
+
+    first = cltu._cltu_id
+    for _ in range(5):
+        cltu.upload_cltu(bytes(64))
+    _wait_for(lambda: len(returns) == 5)
+
+    ids = [int(r["cltuTransferDataReturn"]["cltuIdentification"]) for r in returns]
+    assert ids == [first + i + 1 for i in range(5)]
+    assert all("positiveResult" in r["cltuTransferDataReturn"]["result"] for r in returns)
+
+    cltu.disconnect()
+    sim.stop()
@@ -0,0 +1,253 @@
+# Advanced Multi-Mission Operations System (AMMOS) Instrument Toolkit (AIT)
+# Bespoke Link to Instruments and Small Satellites (BLISS)
+#
+# Copyright 2017, by the California Institute of Technology. ALL RIGHTS
+# RESERVED. United States Government Sponsorship acknowledged. Any
+# commercial use must be negotiated with the Office of Technology Transfer
+# at the California Institute of Technology.
+#
+# This software may be subject to U.S. export control laws. By accepting
+# this software, the user agrees to comply with all applicable U.S. export
+# laws and regulations. User has the responsibility to obtain export licenses,
+# or other export authority as may be required before exporting such
+# information to foreign countries or providing access to foreign persons.
+import time
+from collections import defaultdict
+
+import gevent
+import pytest
+
+import ait.dsn.sle
+from ait.dsn.sle.cltu import CltuProviderToUserPdu
+from ait.dsn.sle.simulator import ProviderSimulator
+from ait.dsn.sle.uplink import CltuUplink, CltuUplinkError
+
+
+class FakeCltu(object):
+    ''' Records the CLTUs sent so that returns can be fed back by hand '''
+
+    def __init__(self):
+        self._handlers = defaultdict(list)
+        self._invoke_id = 0
+        self.next_cltu_id = 0
+        self.sent = []
+        self.unanswered = []
+
+    def add_handler(self, event, handler):
+        self._handlers[event].append(handler)
+
+    def transfer_data(self, tc_data, **kwargs):
+        invoke_id = self._invoke_id
+        cltu_id = self.next_cltu_id
+        self._invoke_id += 1
+        self.next_cltu_id += 1
+        self.sent.append((cltu_id, tc_data))
+        self.unanswered.append(invoke_id)
+        return (invoke_id, cltu_id)
+
+    def respond(self, next_id, available, diagnostic=None, invoke_id=None):
+        # Answers the oldest invocation unless told otherwise
+        if invoke_id is None:
+            invoke_id = self.unanswered[0]
+        if invoke_id in self.unanswered:
+            self.unanswered.remove(invoke_id)
+
+        pdu = CltuProviderToUserPdu()
+        ret = pdu["cltuTransferDataReturn"]
+        ret["performerCredentials"]["unused"] = None
+        ret["invokeId"] = invoke_id
+        ret["cltuIdentification"] = next_id
+        ret["cltuBufferAvailable"] = available
+        if diagnostic is None:
+            ret["result"]["positiveResult"] = None
+        else:
+            ret["result"]["negativeResult"]["specific"] = diagnostic
+        for handler in self._handlers["CltuTransferDataReturn"]:
+            handler(pdu)
+        gevent.sleep(0)
+
+
+def _wait_for(condition, timeout=2):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline
+        gevent.sleep(0.01)
+
+
+def test_window_limits_cltus_in_flight():
+    cltu = FakeCltu()
+    uplink = CltuUplink(cltu, window=3)
+    uplink.start()
+
+    results = [uplink.submit(bytes([i])) for i in range(5)]
+    _wait_for(lambda: len(cltu.sent) == 3)
+    assert [cltu_id for cltu_id, _ in cltu.sent] == [0, 1, 2]
+    # However often the sender wakes, the full window is one wait
+    gevent.sleep(0.01)
+    uplink.submit(bytes([5]))
+    gevent.sleep(0.01)
+    assert uplink.metrics()["window_waits"] == 1
+
+    cltu.respond(1, 1000)
+    _wait_for(lambda: len(cltu.sent) == 4)
+    assert results[0].get(timeout=1) == 0
+
+    for next_id in (2, 3, 4, 5, 6):
+        cltu.respond(next_id, 1000)
+    assert uplink.flush(timeout=1)
+    assert [r.get() for r in results] == [0, 1, 2, 3, 4]
+    assert uplink.metrics()["accepted"] == 6
+    uplink.stop()
+
+
+def test_reported_buffer_space_throttles_sending():
+    cltu = FakeCltu()
+    uplink = CltuUplink(cltu, window=10)
+    uplink.start()
+
+    for _ in range(4):
+        uplink.submit(bytes(100))
+    _wait_for(lambda: len(cltu.sent) == 4)
+    cltu.respond(1, 250)
+    gevent.sleep(0.01)
+
+    # The provider reported room for 250 bytes before storing the three
+    # 100 byte CLTUs still in flight, so another will not fit
+    assert uplink.in_flight == 3
+    assert uplink.metrics()["buffer_waits"] == 0
+
+    # Submitting more while sending is blocked is one wait
+    for _ in range(3):
+        uplink.submit(bytes(100))
+        gevent.sleep(0.01)
+    assert len(cltu.sent) == 4
+    assert uplink.metrics()["buffer_waits"] == 1
+
+    cltu.respond(2, 1000)
+    _wait_for(lambda: len(cltu.sent) == 7)
+    assert uplink.metrics()["buffer_waits"] == 1
+    uplink.stop()
+
+
+def test_rejected_cltus_are_resent_in_order():
+    cltu = FakeCltu()
+    uplink = CltuUplink(cltu, window=4, retry_delay=0)
+    uplink.start()
+
+    results = [uplink.submit(bytes([i])) for i in range(4)]
+    _wait_for(lambda: len(cltu.sent) == 4)
+
+    cltu.respond(1, 1000)
+    cltu.respond(1, 0, diagnostic=1)  # unableToStore
+    cltu.respond(1, 0, diagnostic=2)  # outOfSequence
+    gevent.sleep(0.01)
+    assert len(cltu.sent) == 4
+
+    cltu.respond(1, 1000, diagnostic=2)
+    _wait_for(lambda: len(cltu.sent) == 7)
+
+    # The CLTU identification restarts at the one the provider expects
+    assert cltu.sent[4:] == [(1, b"\x01"), (2, b"\x02"), (3, b"\x03")]
+    for next_id in (2, 3, 4):
+        cltu.respond(next_id, 1000)
+
+    assert [r.get(timeout=1) for r in results] == [0, 1, 2, 3]
+    metrics = uplink.metrics()
+    assert metrics["rejected"] == 3
+    assert metrics["retried"] == 3
+    assert metrics["failed"] == 0
+    uplink.stop()
+
+
+def test_permanent_rejection_fails_only_that_cltu():
+    cltu = FakeCltu()
+    uplink = CltuUplink(cltu, window=2, retry_delay=0)
+    uplink.start()
+
+    called = []
+    late = uplink.submit(b"\x00", callback=called.append)
+    ok = uplink.submit(b"\x01")
+    _wait_for(lambda: len(cltu.sent) == 2)
+
+    cltu.respond(0, 1000, diagnostic=5)  # lateSldu
+    cltu.respond(0, 1000, diagnostic=2)
+    _wait_for(lambda: len(cltu.sent) == 3)
+    assert cltu.sent[2:] == [(0, b"\x01")]
+    cltu.respond(1, 1000)
+
+    with pytest.raises(CltuUplinkError) as e:
+        late.get(timeout=1)
+    assert e.value.diagnostic == "lateSldu"
+    assert called == [late]
+    assert ok.get(timeout=1) == 0
+    uplink.stop()
+
+
+def test_returns_are_matched_by_invoke_id():
+    cltu = FakeCltu()
+    uplink = CltuUplink(cltu, window=3)
+    uplink.start()
+
+    results = [uplink.submit(bytes([i])) for i in range(3)]
+    _wait_for(lambda: len(cltu.sent) == 3)
+
+    # A return for an invocation never sent is ignored
+    cltu.respond(1, 1000, invoke_id=99)
+    assert uplink.in_flight == 3
+
+    cltu.respond(2, 1000, invoke_id=1)
+    assert results[1].get(timeout=1) == 1
+    assert not results[0].ready()
+
+    cltu.respond(1, 1000)
+    cltu.respond(3, 1000)
+    assert uplink.flush(timeout=1)
+    assert [r.get() for r in results] == [0, 1, 2]
+    assert uplink.metrics()["accepted"] == 3
+    uplink.stop()
+
+
+def test_stop_fails_outstanding_cltus():
+    cltu = FakeCltu()
+    uplink = CltuUplink(cltu, window=1)
+    uplink.start()
+
+    results = [uplink.submit(b"\x00") for _ in range(3)]
+    _wait_for(lambda: len(cltu.sent) == 1)
+    uplink.stop()
+
+    assert uplink.flush(timeout=0)
+    for result in results:
+        with pytest.raises(CltuUplinkError):
+            result.get(timeout=0)
+
+
+def test_uplink_against_simulator():
+    sim = ProviderSimulator(service="cltu", cltu_buffer_size=2048, cltu_return_delay=0.001,
+                            uplink_bit_rate=2e6)
+    sim.start()
+
+    service = ait.dsn.sle.CLTU(hostnames=["127.0.0.1"], port=sim.server_port)
+    # Config values take precedence over keyword arguments
+    service._hostnames = ["127.0.0.1"]
+    service._port = sim.server_port
+    service.connect()
+    service.bind(inst_id="sagr=LSE-SSC.spack=Test.fsl-fg=1.cltu=cltu1")
+    while service._state != "ready":
+        gevent.sleep(0.01)
+    service.start()
+    while service._state != "active":
+        gevent.sleep(0.01)
+
+    uplink = CltuUplink(service, window=8, buffer_size=2048)
+    uplink.start()
+    first = service.next_cltu_id
+    results = [uplink.submit(bytes(256)) for _ in range(40)]
+    assert uplink.flush(timeout=10)
+
+    assert [r.get() for r in results] == [first + i for i in range(40)]
+    assert uplink.metrics()["rejected"] == 0
+
+    uplink.stop()
+    service.disconnect()
+    sim.stop()
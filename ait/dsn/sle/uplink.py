@@ -0,0 +1,397 @@
+# Advanced Multi-Mission Operations System (AMMOS) Instrument Toolkit (AIT)
+# Bespoke Link to Instruments and Small Satellites (BLISS)
+#
+# Copyright 2017, by the California Institute of Technology. ALL RIGHTS
+# RESERVED. United States Government Sponsorship acknowledged. Any
+# commercial use must be negotiated with the Office of Technology Transfer
+# at the California Institute of Technology.
+#
+# This software may be subject to U.S. export control laws. By accepting
+# this software, the user agrees to comply with all applicable U.S. export
+# laws and regulations. User has the responsibility to obtain export licenses,
+# or other export authority as may be required before exporting such
+# information to foreign countries or providing access to foreign persons.
+
+''' Pipelined CLTU Uplink
+
+The ait.dsn.sle.uplink module provides an uplink engine that keeps a window
+of CLTU-TRANSFER-DATA invocations in flight on a started
+:class:`ait.dsn.sle.CLTU` instance rather than sending one CLTU at a time.
+
+The engine tracks each CLTU sent until the return with its invoke id
+arrives and holds back
+further CLTUs while the window is full or the provider's buffer, as last
+reported in cltuBufferAvailable, has no room for them. When the provider
+rejects a CLTU every CLTU sent after it is rejected as out of sequence, so
+the engine waits for the outstanding returns, resynchronizes the CLTU
+identification and sends them again in order. The rejected CLTU itself is
+retried if the rejection was transient, and failed otherwise.
+
+Attributes:
+    RETRYABLE_DIAGNOSTICS: The CLTU-TRANSFER-DATA diagnostics after which a
+        rejected CLTU is sent again.
+
+Classes:
+    CltuUplink: Sends CLTUs through a window of in-flight invocations and
+        reports the outcome of each.
+
+    CltuUplinkError: The exception a CLTU's result holds when it could not
+        be uplinked.
+'''
+import collections
+import socket
+
+import gevent
+import gevent.event
+
+import ait
+import ait.core.log
+
+RETRYABLE_DIAGNOSTICS = ('unableToStore', 'outOfSequence', 'duplicateInvokeId')
+
+
+class CltuUplinkError(Exception):
+    ''' A CLTU was rejected by the provider or could not be sent
+
+    Attributes:
+        cltu_id: The CLTU identification of the last attempt, or None if
+            the CLTU was never sent.
+
+        diagnostic: The name of the provider's diagnostic, e.g.
+            'lateSldu', or a description of why the CLTU was not sent.
+    '''
+
+    def __init__(self, cltu_id, diagnostic):
+        super(CltuUplinkError, self).__init__('CLTU #{} failed: {}'.format(cltu_id, diagnostic))
+        self.cltu_id = cltu_id
+        self.diagnostic = diagnostic
+
+
+class _Cltu(object):
+    ''' A CLTU awaiting upload or its return '''
+    __slots__ = ('data', 'options', 'result', 'attempts', 'invoke_id', 'cltu_id')
+
+    def __init__(self, data, options):
+        self.data = data
+        self.options = options
+        self.result = gevent.event.AsyncResult()
+        self.attempts = 0
+        self.invoke_id = None
+        self.cltu_id = None
+
+
+class CltuUplink(object):
+    ''' Pipelined uplink of CLTUs through a CLTU service instance
+
+    The engine registers handlers for CltuTransferDataReturn and
+    CltuAsyncNotifyInvocation on the service, which must be started before
+    CLTUs can be accepted by the provider.
+
+    ::
+
+        uplink = CltuUplink(cltu_mngr, window=32)
+        uplink.start()
+        for cltu in cltus:
+            uplink.submit(cltu, callback=lambda r: print(r.get()))
+        uplink.flush()
+
+    Arguments:
+        service:
+            The :class:`ait.dsn.sle.CLTU` instance to send CLTUs through.
+
+        window (int):
+            The number of CLTUs that may await their return at once.
+            Defaults to 16.
+
+        max_retries (int):
+            The number of times a CLTU rejected with one of the
+            :data:`RETRYABLE_DIAGNOSTICS` is sent again before it fails.
+            Defaults to 3.
+
+        retry_delay (float):
+            Seconds to wait after a rejection before sending again.
+            Defaults to 0.1.
+
+        buffer_size (int):
+            The provider's CLTU buffer size in bytes, if known. It bounds
+            the CLTUs sent before the first return reports the space
+            available. Defaults to None, which does not bound them.
+
+    Each of these can also be set under dsn.sle.fcltu.uplink in the AIT
+    config, which takes precedence.
+    '''
+
+    def __init__(self, service, **kwargs):
+        self._window = ait.config.get('dsn.sle.fcltu.uplink.window',
+                                      kwargs.get('window', 16))
+        self._max_retries = ait.config.get('dsn.sle.fcltu.uplink.max_retries',
+                                           kwargs.get('max_retries', 3))
+        self._retry_delay = ait.config.get('dsn.sle.fcltu.uplink.retry_delay',
+                                           kwargs.get('retry_delay', 0.1))
+        self._buffer_available = ait.config.get('dsn.sle.fcltu.uplink.buffer_size',
+                                                kwargs.get('buffer_size', None))
+
+        if self._window < 1:
+            raise ValueError('Uplink window must be at least 1')
+
+        self._service = service
+        self._buffer_capacity = self._buffer_available or 0
+
+        # CLTUs not yet sent, those to resend ahead of them after a
+        # rejection and those awaiting their return in the order sent,
+        # by invoke id
+        self._pending = collections.deque()
+        self._retry = collections.deque()
+        self._in_flight = collections.OrderedDict()
+        self._in_flight_bytes = 0
+
+        # Set from the first rejection until every CLTU sent before it was
+        # returned and the CLTU identification has been resynchronized
+        self._resyncing = False
+        self._requeue = []
+
+        # What sending is blocked on, 'window_waits' or 'buffer_waits', so
+        # each wait is counted once however often the sender wakes in it
+        self._waiting_on = None
+
+        self._wakeup = gevent.event.Event()
+        self._idle = gevent.event.Event()
+        self._idle.set()
+        self._sender = None
+
+        self._counters = {
+            'submitted': 0,
+            'sent': 0,
+            'accepted': 0,
+            'rejected': 0,
+            'retried': 0,
+            'failed': 0,
+            'window_waits': 0,
+            'buffer_waits': 0
+        }
+
+        service.add_handler('CltuTransferDataReturn', self._transfer_data_return_handler)
+        service.add_handler('CltuAsyncNotifyInvocation', self._async_notify_handler)
+
+    @property
+    def in_flight(self):
+        ''' The number of CLTUs awaiting their return '''
+        return len(self._in_flight)
+
+    def start(self):
+        ''' Start sending submitted CLTUs '''
+        if self._sender is None:
+            self._sender = gevent.spawn(self._send_loop)
+
+    def stop(self):
+        ''' Stop sending and fail every CLTU not yet returned '''
+        if self._sender is not None:
+            self._sender.kill()
+            self._sender = None
+
+        outstanding = list(self._in_flight.values()) + self._requeue
+        outstanding += list(self._retry) + list(self._pending)
+        self._in_flight.clear()
+        self._in_flight_bytes = 0
+        self._requeue = []
+        self._retry.clear()
+        self._pending.clear()
+
+        for cltu in outstanding:
+            self._fail(cltu, 'uplink stopped')
+        self._idle.set()
+
+    def submit(self, tc_data, callback=None, earliest_time=None, latest_time=None,
+               delay=0, notify=False):
+        ''' Queue a CLTU for upload
+
+        The remaining arguments are those of
+        :meth:`ait.dsn.sle.cltu.CLTU.upload_cltu`.
+
+        Arguments:
+            tc_data:
+                The data to transfer in the CLTU.
+
+            callback (optional):
+                A function called with the CLTU's result once it is ready.
+
+        Returns:
+            A :class:`gevent.event.AsyncResult` whose value is the CLTU
+            identification the provider accepted the CLTU under, or which
+            holds a :class:`CltuUplinkError` if the CLTU failed.
+        '''
+        cltu = _Cltu(tc_data, {
+            'earliest_time': earliest_time,
+            'latest_time': latest_time,
+            'delay': delay,
+            'notify': notify
+        })
+        if callback is not None:
+            cltu.result.rawlink(callback)
+
+        self._pending.append(cltu)
+        self._counters['submitted'] += 1
+        self._idle.clear()
+        self._wakeup.set()
+        return cltu.result
+
+    def flush(self, timeout=None):
+        ''' Wait until every submitted CLTU has been returned or failed
+
+        Arguments:
+            timeout (optional float):
+                The maximum number of seconds to wait.
+
+        Returns:
+            True if the uplink is idle, False if the timeout expired first.
+        '''
+        return self._idle.wait(timeout)
+
+    def metrics(self):
+        ''' Returns the uplink counters as a dict
+
+        Along with the counts of CLTUs submitted, sent, accepted, rejected,
+        retried and failed, the dict holds the number of times sending
+        waited on a full window or on the provider's buffer, the CLTUs
+        currently in flight and pending, and the estimated buffer space.
+        '''
+        metrics = dict(self._counters)
+        metrics['in_flight'] = len(self._in_flight)
+        metrics['pending'] = len(self._pending) + len(self._retry) + len(self._requeue)
+        metrics['buffer_available'] = self._buffer_space()
+        return metrics
+
+    def _buffer_space(self):
+        ''' The provider buffer space left once the in-flight CLTUs are stored '''
+        if self._buffer_available is None:
+            return None
+        return self._buffer_available - self._in_flight_bytes
+
+    def _next_cltu(self):
+        ''' Returns the next CLTU if it can be sent now, None otherwise '''
+        if self._resyncing:
+            return None
+
+        queue = self._retry if self._retry else self._pending
+        if not queue:
+            return None
+
+        if len(self._in_flight) >= self._window:
+            return self._wait('window_waits')
+
+        # With nothing in flight the estimate cannot improve until the
+        # provider answers, so a CLTU is always sent
+        space = self._buffer_space()
+        if self._in_flight and space is not None and len(queue[0].data) > space:
+            return self._wait('buffer_waits')
+
+        self._waiting_on = None
+        return queue.popleft()
+
+    def _wait(self, counter):
+        ''' Counts a wait on the window or buffer if sending was not already blocked on it '''
+        if self._waiting_on != counter:
+            self._waiting_on = counter
+            self._counters[counter] += 1
+        return None
+
+    def _send_loop(self):
+        ''''''
+        while True:
+            self._wakeup.clear()
+            cltu = self._next_cltu()
+            if cltu is None:
+                self._wakeup.wait()
+                continue
+
+            try:
+                (cltu.invoke_id, cltu.cltu_id) = self._service.transfer_data(cltu.data,
+                                                                             **cltu.options)
+            except (ValueError, socket.error) as e:
+                self._fail(cltu, str(e))
+                self._update_idle()
+                continue
+
+            self._in_flight[cltu.invoke_id] = cltu
+            self._in_flight_bytes += len(cltu.data)
+            self._counters['sent'] += 1
+
+            # Let the reader and decoder run between CLTUs
+            gevent.sleep(0)
+
+    def _transfer_data_return_handler(self, pdu):
+        ''''''
+        ret = pdu['cltuTransferDataReturn']
+        invoke_id = int(ret['invokeId'])
+        next_id = int(ret['cltuIdentification'])
+
+        if invoke_id not in self._in_flight:
+            ait.core.log.warn('Ignoring CLTU transfer data return with unknown '
+                              'invoke id {}'.format(invoke_id))
+            return
+
+        # Returns should arrive in the order the invocations were sent
+        if next(iter(self._in_flight)) != invoke_id:
+            ait.core.log.warn('CLTU with invoke id {} returned before CLTUs sent '
+                              'ahead of it'.format(invoke_id))
+        cltu = self._in_flight.pop(invoke_id)
+        self._in_flight_bytes -= len(cltu.data)
+        self._buffer_available = int(ret['cltuBufferAvailable'])
+        self._buffer_capacity = max(self._buffer_capacity, self._buffer_available)
+
+        result = ret['result']
+        if 'positiveResult' in result:
+            # An accepted CLTU is followed by the next identification
+            if next_id != cltu.cltu_id + 1:
+                ait.core.log.warn('CLTU #{} accepted, but the provider expects #{} next'.format(
+                    cltu.cltu_id, next_id))
+            self._counters['accepted'] += 1
+            cltu.result.set(cltu.cltu_id)
+        else:
+            self._counters['rejected'] += 1
+            diagnostic = result['negativeResult'].getComponent().prettyPrint()
+
+            if self._resyncing and diagnostic == 'outOfSequence':
+                # Rejected only because an earlier CLTU was
+                self._requeue.append(cltu)
+            else:
+                self._resyncing = True
+                cltu.attempts += 1
+                if diagnostic in RETRYABLE_DIAGNOSTICS and cltu.attempts <= self._max_retries:
+                    self._requeue.append(cltu)
+                else:
+                    self._fail(cltu, diagnostic)
+
+        if self._resyncing and not self._in_flight:
+            # The return carries the identification the provider expects next
+            self._service.next_cltu_id = next_id
+            self._counters['retried'] += len(self._requeue)
+            self._retry.extendleft(reversed(self._requeue))
+            self._requeue = []
+            gevent.spawn_later(self._retry_delay, self._end_resync)
+
+        self._update_idle()
+        self._wakeup.set()
+
+    def _async_notify_handler(self, pdu):
+        ''''''
+        notification = pdu['cltuAsyncNotifyInvocation']['cltuNotification'].getName()
+        if notification == 'bufferEmpty' and not self._in_flight:
+            self._buffer_available = self._buffer_capacity or None
+            self._wakeup.set()
+
+    def _end_resync(self):
+        ''''''
+        self._resyncing = False
+        self._wakeup.set()
+
+    def _fail(self, cltu, diagnostic):
+        ''''''
+        self._counters['failed'] += 1
+        ait.core.log.error('CLTU #{} could not be uplinked: {}'.format(cltu.cltu_id, diagnostic))
+        cltu.result.set_exception(CltuUplinkError(cltu.cltu_id, diagnostic))
+
+    def _update_idle(self):
+        ''''''
+        if not (self._pending or self._retry or self._requeue or self._in_flight):
+            self._idle.set()
@@ -8,6 +8,7 @@ import ait
 from ait.core.log import logger
 import ait.core.dmc
 import ait.dsn.sle
+from ait.dsn.sle.uplink import CltuUplink
 from ait.core import dmc
 import socket
 
@@ -114,6 +115,13 @@ class SLEInterfaceManager():
         except Exception as e:
             logger.warning(f"Unable to instantiate CLTU Service.  Error: {e}")
 
+        # CLTUs are uploaded through a pipelined uplink so that a batch
+        # keeps the forward link busy without overrunning the provider
+        self.cltu_uplink = None
+        if self.cltu_service is not None:
+            self.cltu_uplink = CltuUplink(self.cltu_service.service)
+            self.cltu_uplink.start()
+
         # Ensure that at least one service was created, else raise an error
         if self.raf_service is None and self.rcf_service is None and self.cltu_service is None:
             raise Exception("No service instance (RAF,RCF,CLTU) was instantiated")
@@ -522,18 +530,28 @@ class SLEInterfaceManager():
                 else:
                     ait.core.log.info(f"Pushing {data_len} chunks of CLTU data")
 
+            # Failures are reported per CLTU by the uplink once the
+            # provider returns them
             while srvc_info.data and proceed:
                 data_to_push = srvc_info.data[0]
                 try:
-                    self.cltu_service.service.upload_cltu(data_to_push)
+                    self.cltu_uplink.submit(data_to_push, callback=self._cltu_uplink_result)
                     del srvc_info.data[0]
                     if self.verbose:
-                        ait.core.log.info(f"tc_data sent: {data_to_push}")
+                        ait.core.log.info(f"tc_data queued: {data_to_push}")
                 except Exception as e:
                     ait.core.log.error(f"Error occurred while uploading CLTU data: {e}")
                     bottle.response.status = 400
                     proceed = False
 
+    def _cltu_uplink_result(self, result):
+        '''
+        Logs the outcome of a CLTU submitted by upload_handler
+        :param result: The CLTU's gevent AsyncResult
+        '''
+        if result.successful() and self.verbose:
+            ait.core.log.info(f"CLTU #{result.value} accepted by the provider.")
+
 
     def append_cltu_data(self, data):
         '''
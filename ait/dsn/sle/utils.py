@@ -13,6 +13,9 @@
 # information to foreign countries or providing access to foreign persons.
 
 import binascii
+import time
+
+import ait.core.log
 
 def hexint(b):
     if not b:
@@ -21,3 +24,46 @@ def hexint(b):
         return b
     else:
         return int(binascii.hexlify(b), 16)
+
+
+class RateLimitedLog(object):
+    ''' Logs a recurring message at most once per interval
+
+    Messages are grouped by a key, such as the virtual channel they concern.
+    The first message for a key is logged, and later ones within `interval`
+    seconds of it are counted rather than logged. The next message logged
+    for the key reports how many were suppressed.
+
+    Arguments:
+        level:
+            The name of the :mod:`ait.core.log` function to log with, e.g.
+            'info' or 'warn'.
+
+        interval:
+            The minimum number of seconds between messages for one key.
+    '''
+
+    def __init__(self, level='info', interval=60):
+        self._level = level
+        self._interval = interval
+        self._last = {}
+        self._suppressed = {}
+
+    def __call__(self, key, msg):
+        ''' Log msg unless a message for key was logged within the interval
+
+        Returns:
+            True if the message was logged, False if it was suppressed.
+        '''
+        now = time.monotonic()
+        last = self._last.get(key)
+        if last is not None and now - last < self._interval:
+            self._suppressed[key] = self._suppressed.get(key, 0) + 1
+            return False
+
+        suppressed = self._suppressed.pop(key, 0)
+        if suppressed:
+            msg = '{} ({} similar messages suppressed)'.format(msg, suppressed)
+        self._last[key] = now
+        getattr(ait.core.log, self._level)(msg)
+        return True